@@ -0,0 +1,222 @@
+"""
+Database deadlines for requests and Celery tasks.
+
+A slow statement holds the worker running it, and a few of them can tie up
+every gunicorn sync worker. Each request therefore gets a time budget:
+``DB_DEADLINE_DEFAULT`` seconds, the first matching prefix of
+``DB_DEADLINE_PATHS``, or the budget given to a view with ``@db_deadline``
+(or a ``db_deadline`` attribute on a view class). Celery tasks get
+``DB_DEADLINE_CELERY`` seconds, or their own ``db_deadline`` option.
+
+While the budget runs, a ``connection.execute_wrapper`` sets PostgreSQL's
+``statement_timeout`` to the time left before statements are executed, so a
+statement is cancelled by the server once the deadline passes, and no
+statement starts after it. Inside a transaction the timeout is set locally
+to it (``SET LOCAL``); outside one it is set for the session and reset when
+the budget ends. The timeout is only lowered again once it is
+``DB_DEADLINE_SLACK_MS`` above the time left, which keeps the extra round
+trip to about one per request.
+
+``DeadlineMiddleware`` answers requests that ran out of time with a 503, and
+every timeout is logged and counted in Redis per view or task.
+"""
+
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+import redis
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, connections
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL's error code for a statement cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+TIMEOUTS_KEY = "deadlines:timeouts"
+
+
+class DeadlineExceeded(OperationalError):
+    """
+    A statement was about to run after its deadline.
+    """
+
+
+def is_timeout(error):
+    """
+    Whether an exception is a statement stopped by its deadline.
+
+    Args:
+        error: The exception
+
+    Returns:
+        bool: True for ``DeadlineExceeded`` and statements PostgreSQL cancelled
+    """
+    if isinstance(error, DeadlineExceeded):
+        return True
+    return (
+        isinstance(error, OperationalError)
+        and getattr(error.__cause__, "pgcode", None) == QUERY_CANCELED
+    )
+
+
+def db_deadline(seconds):
+    """
+    Decorator giving a view its own database time budget.
+
+    Args:
+        seconds: The budget, counted from the start of the request
+    """
+
+    def decorator(view):
+        view.db_deadline = seconds
+        return view
+
+    return decorator
+
+
+class StatementDeadline:
+    """
+    Execute wrapper bounding statements by the time left until a deadline.
+    """
+
+    def __init__(self, budget, started=None):
+        """
+        Args:
+            budget: Seconds from ``started`` until the deadline
+            started: ``time.monotonic()`` when the budget started, defaults to now
+        """
+        self.started = time.monotonic() if started is None else started
+        self.budget = budget
+        # Per database alias: the timeout set and whether it was set in a transaction
+        self.applied = {}
+        # Aliases whose session timeout was changed
+        self.session_aliases = set()
+
+    @property
+    def deadline(self):
+        """Return the ``time.monotonic()`` of the deadline."""
+        return self.started + self.budget
+
+    def __call__(self, execute, sql, params, many, context):
+        """Set the statement timeout to the time left, then run the statement."""
+        remaining_ms = int((self.deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            raise DeadlineExceeded(f"The {self.budget}s database deadline has passed")
+        connection = context["connection"]
+        if connection.vendor == "postgresql":
+            applied = self.applied.get(connection.alias)
+            in_transaction = connection.in_atomic_block
+            if (
+                applied is None
+                or applied[0] - remaining_ms > settings.DB_DEADLINE_SLACK_MS
+                # A timeout set locally to a transaction ended with it
+                or (applied[1] and not in_transaction)
+            ):
+                # On the driver's cursor, so other wrappers do not see it
+                with connection.wrap_database_errors:
+                    context["cursor"].cursor.execute(
+                        "SELECT set_config('statement_timeout', %s, %s)",
+                        [f"{remaining_ms}ms", in_transaction],
+                    )
+                self.applied[connection.alias] = (remaining_ms, in_transaction)
+                if not in_transaction:
+                    self.session_aliases.add(connection.alias)
+        return execute(sql, params, many, context)
+
+    def reset(self):
+        """Reset the session timeouts that were set outside transactions."""
+        for alias in self.session_aliases:
+            connection = connections[alias]
+            # Even past CONN_MAX_AGE: the connection is only closed at the end
+            # of a request or task, and the block may have run outside either
+            if connection.connection is None:
+                continue
+            try:
+                with connection.wrap_database_errors, connection.connection.cursor() as cursor:
+                    cursor.execute("RESET statement_timeout")
+            except DatabaseError:
+                # The connection is unusable and will be replaced
+                logger.warning("Could not reset the statement timeout", exc_info=True)
+        self.applied.clear()
+        self.session_aliases.clear()
+
+
+@contextmanager
+def statement_deadline(budget, started=None):
+    """
+    Bound the statements run in the block by a deadline on every database.
+
+    Args:
+        budget: Seconds from ``started`` until the deadline
+        started: ``time.monotonic()`` when the budget started, defaults to now
+
+    Yields:
+        StatementDeadline: The wrapper, whose budget can still be changed
+    """
+    wrapper = StatementDeadline(budget, started)
+    try:
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(wrapper))
+            yield wrapper
+    finally:
+        wrapper.reset()
+
+
+def path_budget(path):
+    """Return the budget of the first ``DB_DEADLINE_PATHS`` prefix matching a path."""
+    for prefix, budget in settings.DB_DEADLINE_PATHS.items():
+        if path.startswith(prefix):
+            return budget
+    return settings.DB_DEADLINE_DEFAULT
+
+
+def view_budget(view):
+    """Return the budget set on a view function or its class, or None."""
+    for candidate in (view, getattr(view, "cls", None), getattr(view, "view_class", None)):
+        budget = getattr(candidate, "db_deadline", None)
+        if budget is not None:
+            return budget
+    return None
+
+
+def record_timeout(name, budget, elapsed):
+    """
+    Log a timeout and count it under a view or task name.
+
+    Args:
+        name: The view name or ``task:<task name>``
+        budget: The budget in seconds
+        elapsed: Seconds spent when the timeout surfaced
+    """
+    logger.warning(
+        "Database deadline exceeded in %s",
+        name,
+        extra={"deadline": {"name": name, "budget_s": budget, "elapsed_s": round(elapsed, 3)}},
+    )
+    try:
+        get_redis().hincrby(TIMEOUTS_KEY, name, 1)
+    except redis.RedisError:
+        logger.warning("Could not count a database deadline timeout", exc_info=True)
+
+
+def timeout_counts():
+    """
+    Return the number of timeouts per view or task, most frequent first.
+
+    Returns:
+        list: ``(name, count)`` pairs, empty if Redis is unavailable
+    """
+    try:
+        counts = get_redis().hgetall(TIMEOUTS_KEY)
+    except redis.RedisError:
+        logger.warning("Could not read the database deadline timeouts", exc_info=True)
+        return []
+    return sorted(
+        ((name.decode(), int(count)) for name, count in counts.items()),
+        key=lambda item: -item[1],
+    )
@@ -0,0 +1,170 @@
+"""
+Shared HTTP client with keep-alive connection pooling.
+
+This module provides a lazily created, per-process client for outgoing HTTP
+requests. Connections are kept open after each response and reused for the
+next request to the same host, so repeated calls to a host skip the TCP and
+TLS handshakes.
+"""
+
+import http.client
+import os
+import threading
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+# Errors of a kept-alive connection the server closed while it was idle
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class HTTPResponse:
+    """
+    A fully read response.
+    """
+
+    def __init__(self, status, headers, body):
+        """
+        Args:
+            status: The status code
+            headers: The response headers
+            body: The response body as bytes
+        """
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self):
+        """Whether the status is 2xx."""
+        return 200 <= self.status < 300
+
+
+class PooledHTTPClient:
+    """
+    HTTP client keeping up to ``maxsize`` idle connections per host.
+
+    Connections are checked out for one request at a time, so the client can
+    be shared by threads. A request on a reused connection that the server
+    closed in the meantime is retried once on a new connection.
+    """
+
+    def __init__(self, maxsize=None, timeout=None):
+        """
+        Args:
+            maxsize: Idle connections kept per host, defaults to ``HTTP_POOL_MAXSIZE``
+            timeout: Default socket timeout in seconds, defaults to ``HTTP_TIMEOUT``
+        """
+        self.maxsize = maxsize or settings.HTTP_POOL_MAXSIZE
+        self.timeout = timeout or settings.HTTP_TIMEOUT
+        self.connections_opened = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _checkout(self, key, timeout):
+        """Return an idle connection to a host, or a new one."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Sockets inherited through fork are shared with the parent
+                self._idle, self._pid = {}, os.getpid()
+            idle = self._idle.get(key)
+            if idle:
+                connection = idle.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+            self.connections_opened += 1
+
+        scheme, host, port = key
+        connection_class = (
+            http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        )
+        return connection_class(host, port, timeout=timeout), False
+
+    def _checkin(self, key, connection):
+        """Keep a connection for reuse, or close it if the pool is full."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if self._pid == os.getpid() and len(idle) < self.maxsize:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        """
+        Send a request and read the whole response.
+
+        Args:
+            method: The HTTP method
+            url: The absolute URL
+            body: The request body as bytes
+            headers: A mapping of request headers
+            timeout: Socket timeout in seconds, defaults to the client's
+
+        Returns:
+            HTTPResponse: The response
+
+        Raises:
+            OSError: If the connection fails or times out
+            http.client.HTTPException: If the response is malformed
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        for attempt in range(2):
+            connection, reused = self._checkout(key, timeout or self.timeout)
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                result = HTTPResponse(response.status, response.headers, response.read())
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(key, connection)
+            return result
+
+    def post(self, url, body, headers=None, timeout=None):
+        """Send a POST request; see ``request``."""
+        return self.request("POST", url, body=body, headers=headers, timeout=timeout)
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+_client = None
+
+
+def get_http_client():
+    """
+    Return the process-wide pooled HTTP client.
+
+    Returns:
+        PooledHTTPClient: The shared client
+    """
+    global _client
+    if _client is None:
+        _client = PooledHTTPClient()
+    return _client
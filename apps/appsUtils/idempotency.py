@@ -0,0 +1,199 @@
+"""
+Idempotency-Key support for DRF views.
+
+A client that retries a POST with the same ``Idempotency-Key`` header gets the
+first attempt's response replayed byte for byte instead of running the view
+again. Keys are scoped to the view and the authenticated user, and are stored
+in Redis with the fingerprint of the request that created them for
+``IDEMPOTENCY_KEY_TTL`` seconds. Reusing a key for a different request is
+rejected.
+
+The first request holds a lock while it runs. Concurrent duplicates poll for
+its stored response for up to ``IDEMPOTENCY_WAIT_TIMEOUT`` seconds instead of
+executing the view a second time. Server errors are not stored, so they can
+be retried. If Redis is unavailable requests run without idempotency.
+"""
+
+import hashlib
+import json
+import logging
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+KEY_PREFIX = "idempotency"
+POLL_INTERVAL = 0.05
+
+
+class IdempotencyConflict(APIException):
+    """Raised when a request with the same key is still running."""
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is already in progress."
+    default_code = "idempotency_conflict"
+
+
+class IdempotencyKeyReused(APIException):
+    """Raised when a key is reused for a different request."""
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+class _Replay(Exception):
+    """Carries a stored response out of ``initial`` to ``handle_exception``."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _replay(stored):
+    """
+    Rebuild a stored response.
+
+    Args:
+        stored: The hash written by ``IdempotentMixin._store``
+
+    Returns:
+        HttpResponse: The response with the original status, headers and body
+    """
+    response = HttpResponse(stored[b"content"], status=int(stored[b"status"]))
+    for header, value in json.loads(stored[b"headers"]):
+        response[header] = value
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+class IdempotentMixin:
+    """
+    View mixin that honours the ``Idempotency-Key`` header.
+
+    Place it before the DRF view class. Only methods listed in
+    ``idempotent_methods`` are affected.
+    """
+
+    idempotent_methods = ("POST",)
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Run the usual checks, then claim the idempotency key or replay its response.
+
+        Raises:
+            IdempotencyConflict: If a duplicate is still running after the wait
+            IdempotencyKeyReused: If the key belongs to a different request
+        """
+        self._idempotency = None
+        key = request.headers.get(HEADER)
+        if key is None or request.method not in self.idempotent_methods:
+            return super().initial(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f"Must be 1 to {MAX_KEY_LENGTH} characters."})
+
+        # Hash the raw body before anything parses the request stream
+        fingerprint = hashlib.sha256(
+            b"\0".join([request.method.encode(), request.path.encode(), request.body])
+        ).hexdigest()
+        super().initial(request, *args, **kwargs)
+
+        user_id = request.user.pk if request.user.is_authenticated else "anonymous"
+        scope = hashlib.sha256(key.encode()).hexdigest()
+        redis_key = f"{KEY_PREFIX}:{type(self).__name__}:{user_id}:{scope}"
+        try:
+            self._claim(redis_key, fingerprint)
+        except redis.RedisError:
+            logger.warning("Could not check Idempotency-Key, running request", exc_info=True)
+            self._idempotency = None
+
+    def _claim(self, redis_key, fingerprint):
+        """
+        Take the lock for a key, waiting on a concurrent holder if needed.
+
+        Args:
+            redis_key: The Redis key of the stored response
+            fingerprint: The hash of the current request
+        """
+        client = get_redis()
+        lock_key = f"{redis_key}:lock"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+
+        while True:
+            locked = client.set(lock_key, token, nx=True, ex=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+            # Checked after taking the lock, as the holder stores before releasing
+            stored = client.hgetall(redis_key)
+            if stored:
+                if locked:
+                    client.delete(lock_key)
+                if stored[b"fingerprint"].decode() != fingerprint:
+                    raise IdempotencyKeyReused()
+                raise _Replay(_replay(stored))
+            if locked:
+                self._idempotency = (redis_key, lock_key, token, fingerprint)
+                return
+            if time.monotonic() >= deadline:
+                raise IdempotencyConflict()
+            time.sleep(POLL_INTERVAL)
+
+    def _release(self, response=None):
+        """
+        Store the response unless it is a server error, then release the lock.
+
+        Args:
+            response: The rendered response, or None if the view raised
+        """
+        redis_key, lock_key, token, fingerprint = self._idempotency
+        self._idempotency = None
+        try:
+            client = get_redis()
+            if response is not None and response.status_code < 500:
+                pipeline = client.pipeline(transaction=True)
+                pipeline.hset(
+                    redis_key,
+                    mapping={
+                        "fingerprint": fingerprint,
+                        "status": response.status_code,
+                        "headers": json.dumps(list(response.items())),
+                        "content": response.content,
+                    },
+                )
+                pipeline.expire(redis_key, settings.IDEMPOTENCY_KEY_TTL)
+                pipeline.execute()
+            # Only delete the lock if it is still ours
+            if client.get(lock_key) == token.encode():
+                client.delete(lock_key)
+        except redis.RedisError:
+            logger.warning("Could not store Idempotency-Key response", exc_info=True)
+
+    def handle_exception(self, exc):
+        """Return replayed responses and release the lock if the view fails."""
+        if isinstance(exc, _Replay):
+            return exc.response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            if getattr(self, "_idempotency", None):
+                self._release()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Render the response and store it under the claimed key."""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "_idempotency", None):
+            if hasattr(response, "render"):
+                response.render()
+            self._release(response)
+        return response
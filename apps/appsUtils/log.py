@@ -0,0 +1,275 @@
+"""
+Structured, non-blocking logging.
+
+Records are put on a bounded in-memory queue by ``QueueJSONHandler`` and
+written as one JSON object per line by a ``QueueListener`` thread, so request
+threads never wait on stdout. When the queue is full new records are dropped
+and counted instead of blocking. The listener is started on first use in each
+process, which keeps the handler safe to configure before gunicorn forks.
+
+Every record carries the request id of the request or Celery task it was
+logged from. Filters sample high-volume loggers, and the formatter redacts
+values of secret fields such as passwords and tokens.
+"""
+
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = "[REDACTED]"
+
+# Attributes every LogRecord has; anything else was passed with ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "request_id",
+}
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def get_request_id():
+    """Return the id of the request or task being handled, or None."""
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """
+    Set the id logged with records of the current request or task.
+
+    Returns:
+        contextvars.Token: The token to pass to ``reset_request_id``
+    """
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    """Restore the request id that was current before ``set_request_id``."""
+    _request_id.reset(token)
+
+
+def new_request_id():
+    """Return a new random request id."""
+    return uuid.uuid4().hex
+
+
+class RequestIdFilter(logging.Filter):
+    """Filter adding the current request id to every record as ``request_id``."""
+
+    def filter(self, record):
+        """Tag the record; never drops it."""
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Filter keeping only a fraction of the records of high-volume loggers.
+
+    Records of ``WARNING`` and above are always kept.
+    """
+
+    def __init__(self, rates=None):
+        """
+        Args:
+            rates: Mapping of logger name to the fraction of its records kept;
+                a name also covers its child loggers
+        """
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._cache = {}
+
+    def rate(self, name):
+        """Return the fraction of records kept for a logger name."""
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            parts = name.split(".")
+            for end in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:end])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        """Keep the record with the probability configured for its logger."""
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+def _alternatives(fields):
+    """Return a regex alternation of field names; one that never matches if empty."""
+    return "|".join(re.escape(field) for field in sorted(fields)) or "(?!)"
+
+
+def secret_key_pattern(fields):
+    """
+    Return a pattern matching key names that hold secrets.
+
+    A key matches a field name exactly or as its last underscore-separated
+    part, so ``password`` also covers ``smtp_password``.
+    """
+    return re.compile(rf"(?i)^(?:\w*_)?(?:{_alternatives(fields)})$")
+
+
+def redact(value, secret_key):
+    """
+    Return a copy of a value with the values of secret keys replaced.
+
+    Args:
+        value: A mapping, list or scalar, searched recursively
+        secret_key: Pattern from ``secret_key_pattern``
+
+    Returns:
+        The value with secrets replaced by ``REDACTED``
+    """
+    if isinstance(value, Mapping):
+        return {
+            key: REDACTED if secret_key.match(str(key)) else redact(item, secret_key)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item, secret_key) for item in value]
+    if isinstance(value, tuple):
+        return tuple(redact(item, secret_key) for item in value)
+    return value
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formatter writing each record as a single-line JSON object.
+
+    Fields passed with ``extra`` are included, and secrets are redacted from
+    them and from the message.
+    """
+
+    def __init__(self, redacted_fields=()):
+        """
+        Args:
+            redacted_fields: Key names whose values are never logged
+        """
+        super().__init__()
+        self.secret_key = secret_key_pattern(redacted_fields)
+        # key=value, key: value and "key": "value" pairs
+        self._pairs = re.compile(
+            rf"""(?i)(["']?\b(?:\w*_)?(?:{_alternatives(redacted_fields)})\b["']?\s*[:=]\s*)"""
+            r"""("[^"]*"|'[^']*'|[^\s,;}&]+)"""
+        )
+        self._credentials = re.compile(r"(?i)\b(bearer|basic)\s+[\w.~+/=-]+")
+
+    def redact_text(self, text):
+        """Replace credentials and the values of secret keys in free text."""
+        text = self._credentials.sub(rf"\1 {REDACTED}", text)
+        return self._pairs.sub(rf"\1{REDACTED}", text)
+
+    def format(self, record):
+        """Return the record as JSON."""
+        document = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self.redact_text(record.getMessage()),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in record.__dict__.items():
+            if key in _RECORD_ATTRIBUTES or key in document:
+                continue
+            if self.secret_key.match(key):
+                document[key] = REDACTED
+            else:
+                document[key] = redact(value, self.secret_key)
+        if record.exc_info:
+            document["exception"] = self.redact_text(self.formatException(record.exc_info))
+        elif record.exc_text:
+            document["exception"] = self.redact_text(record.exc_text)
+        if record.stack_info:
+            document["stack"] = record.stack_info
+        return json.dumps(document, default=str)
+
+
+class QueueJSONHandler(QueueHandler):
+    """
+    Handler queueing records for a listener thread that writes them as JSON.
+
+    Only the message is formatted in the logging thread, so later changes to
+    mutable arguments do not leak into the output; JSON encoding, redaction
+    and the write happen in the listener.
+    """
+
+    def __init__(self, stream=None, queue_size=10_000, redacted_fields=()):
+        """
+        Args:
+            stream: Where the listener writes, defaults to ``sys.stdout``
+            queue_size: Records buffered before new ones are dropped
+            redacted_fields: Key names whose values are never logged
+        """
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.target.setFormatter(JSONFormatter(redacted_fields))
+        self.dropped = 0
+        self.listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the listener thread for this process, if it is not running."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A listener inherited through fork has no thread; its queue may
+            # hold records that will be written by the parent
+            self.queue = queue.Queue(self.queue_size)
+            self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Write the queued records and stop the listener thread."""
+        with self._lock:
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def close(self):
+        """Flush and stop the listener when logging shuts down."""
+        self.stop()
+        super().close()
+
+    def prepare(self, record):
+        """Return a copy of the record with its message merged into ``msg``."""
+        prepared = copy.copy(record)
+        if record.args:
+            prepared.args = redact(record.args, self.target.formatter.secret_key)
+            prepared.msg = prepared.getMessage()
+            prepared.args = None
+        return prepared
+
+    def enqueue(self, record):
+        """Queue a record, dropping it if the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        """Queue a record, starting the listener first in a new process."""
+        if self._pid != os.getpid():
+            self.start()
+        super().emit(record)
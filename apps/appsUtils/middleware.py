@@ -0,0 +1,112 @@
+"""
+Shared middleware.
+"""
+
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .deadlines import is_timeout, path_budget, record_timeout, statement_deadline, view_budget
+from .log import new_request_id, reset_request_id, set_request_id
+
+access_logger = logging.getLogger("apps.access")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Ids accepted from clients and proxies; anything else is replaced
+_VALID_REQUEST_ID = re.compile(r"^[\w.:-]{1,128}$")
+
+
+class RequestIdMiddleware:
+    """
+    Tag the request, its log records and its Celery tasks with a request id.
+
+    The id is taken from the ``X-Request-ID`` header set by the load balancer
+    or client, or generated, and is returned in the same response header.
+    One access log record is written per request to the ``apps.access``
+    logger.
+    """
+
+    def __init__(self, get_response):
+        """Wrap the next handler."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Handle the request with its id bound to the logging context."""
+        request_id = request.headers.get(REQUEST_ID_HEADER, "")
+        if not _VALID_REQUEST_ID.match(request_id):
+            request_id = new_request_id()
+        request.request_id = request_id
+
+        token = set_request_id(request_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            response[REQUEST_ID_HEADER] = request_id
+            if access_logger.isEnabledFor(logging.INFO):
+                access_logger.info(
+                    "%s %s %s",
+                    request.method,
+                    request.path,
+                    response.status_code,
+                    extra={
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    },
+                )
+            return response
+        finally:
+            reset_request_id(token)
+
+
+class DeadlineMiddleware:
+    """
+    Run each request's statements within its database deadline.
+
+    The budget is taken from ``DB_DEADLINE_PATHS`` or ``DB_DEADLINE_DEFAULT``
+    when the request starts, and replaced by the view's own budget once the
+    view is resolved; see ``apps.appsUtils.deadlines``. Requests whose
+    statements ran out of time are answered with a 503. A default of 0
+    disables the middleware.
+    """
+
+    def __init__(self, get_response):
+        """Wrap the next handler."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Handle the request within its deadline."""
+        budget = path_budget(request.path_info)
+        if not budget:
+            return self.get_response(request)
+        with statement_deadline(budget) as deadline:
+            request.db_deadline = deadline
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Switch to the view's budget, if it has one."""
+        deadline = getattr(request, "db_deadline", None)
+        budget = view_budget(view_func)
+        if deadline is not None and budget is not None:
+            deadline.budget = budget
+
+    def process_exception(self, request, exception):
+        """Answer a request whose statements ran out of time with a 503."""
+        deadline = getattr(request, "db_deadline", None)
+        if deadline is None or not is_timeout(exception):
+            return None
+        match = request.resolver_match
+        record_timeout(
+            match.view_name if match else request.path_info,
+            deadline.budget,
+            time.monotonic() - deadline.started,
+        )
+        response = JsonResponse(
+            {"detail": "The request took too long. Try again later."}, status=503
+        )
+        response["Retry-After"] = str(settings.DB_DEADLINE_RETRY_AFTER)
+        return response
@@ -0,0 +1,24 @@
+"""
+Information about the running process.
+
+Kept free of Django imports, so the gunicorn configuration can use it in the
+master before the app is loaded.
+"""
+
+import os
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def current_rss():
+    """
+    Return the resident memory of this process in bytes.
+
+    Returns:
+        int | None: The resident set size, or None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
@@ -0,0 +1,31 @@
+"""
+Shared Redis client.
+
+This module provides a lazily created, per-process Redis client for features
+that need direct Redis access rather than the Celery broker.
+"""
+
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """
+    Return the process-wide Redis client for ``settings.REDIS_URL``.
+
+    The client's connection pool is reset automatically after a fork, so it is
+    safe to create before gunicorn or Celery forks its workers.
+
+    Returns:
+        redis.Redis: The shared client
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _client
@@ -0,0 +1,177 @@
+"""
+Buffered tracking of user logins and last-seen times.
+
+Recording a login or an authenticated request writes a timestamp to a Redis
+hash instead of updating the user row. A per-process throttle skips users
+already recorded within ``USER_ACTIVITY_STALENESS`` seconds, so busy clients
+cost at most one Redis write per window. The ``flush_user_activity`` Celery
+beat task drains the hashes in bounded batches, each applied to the database
+as a single ``UPDATE ... FROM (VALUES ...)``.
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+
+import redis
+from django.conf import settings
+from django.db import connection
+
+from apps.appsUtils.redis_client import get_redis
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# Map of activity kind to the User column it updates
+ACTIVITY_COLUMNS = {
+    "last_login": "last_login",
+    "last_seen": "last_seen",
+}
+
+KEY_PREFIX = "auth:activity"
+
+# Upper bound on users remembered by the per-process throttle
+LOCAL_THROTTLE_MAX_SIZE = 50_000
+
+_recorded = {kind: {} for kind in ACTIVITY_COLUMNS}
+
+
+def _live_key(kind):
+    """Return the Redis hash that collects new events of a kind."""
+    return f"{KEY_PREFIX}:{kind}"
+
+
+def _pending_key(kind):
+    """Return the Redis hash holding events of a kind that are being flushed."""
+    return f"{KEY_PREFIX}:{kind}:flushing"
+
+
+def record_activity(kind, user_id, when=None):
+    """
+    Record that a user logged in or was seen.
+
+    Args:
+        kind: Either ``"last_login"`` or ``"last_seen"``
+        user_id: The primary key of the user
+        when: The event time as a Unix timestamp, defaults to now
+
+    Returns:
+        bool: Whether the event was written to the buffer
+    """
+    recorded = _recorded[kind]
+    now = time.monotonic()
+    previous = recorded.get(user_id)
+    if previous is not None and now - previous < settings.USER_ACTIVITY_STALENESS:
+        return False
+
+    if len(recorded) >= LOCAL_THROTTLE_MAX_SIZE:
+        recorded.clear()
+    recorded[user_id] = now
+
+    try:
+        get_redis().hset(_live_key(kind), user_id, time.time() if when is None else when)
+    except redis.RedisError:
+        # Activity timestamps are best effort and must never fail the request
+        logger.warning("Could not buffer %s for user %s", kind, user_id, exc_info=True)
+        recorded.pop(user_id, None)
+        return False
+    return True
+
+
+def record_login(user_id):
+    """Record a successful login for a user."""
+    return record_activity("last_login", user_id)
+
+
+def record_seen(user_id):
+    """Record an authenticated request by a user."""
+    return record_activity("last_seen", user_id)
+
+
+def buffer_last_login(sender, user, **kwargs):
+    """
+    Receiver for ``user_logged_in`` that buffers the login instead of saving.
+    """
+    record_login(user.pk)
+
+
+def apply_activity(kind, timestamps):
+    """
+    Write buffered timestamps to the user table in a single statement.
+
+    Rows are only updated when the buffered time is newer than the stored one.
+
+    Args:
+        kind: Either ``"last_login"`` or ``"last_seen"``
+        timestamps: A mapping of user id to Unix timestamp
+
+    Returns:
+        int: The number of rows updated
+    """
+    if not timestamps:
+        return 0
+
+    quote = connection.ops.quote_name
+    column = quote(ACTIVITY_COLUMNS[kind])
+    values = ", ".join(["(%s::bigint, %s::timestamptz)"] * len(timestamps))
+    params = []
+    for user_id, timestamp in timestamps.items():
+        params.extend([user_id, datetime.fromtimestamp(timestamp, tz=timezone.utc)])
+
+    sql = (
+        f"UPDATE {quote(User._meta.db_table)} AS u SET {column} = v.at "
+        f"FROM (VALUES {values}) AS v(id, at) "
+        f"WHERE u.id = v.id AND (u.{column} IS NULL OR u.{column} < v.at)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def flush_activity(kind, batch_size=None, max_batches=None):
+    """
+    Move buffered events of one kind from Redis into the database.
+
+    The live hash is atomically renamed to a pending hash, which is then drained
+    ``batch_size`` entries at a time. Entries are removed from Redis only after
+    their batch is written, and a run stops after ``max_batches`` so a backlog
+    is worked off over several runs instead of in one long task. Writes are
+    idempotent, so concurrent flushes of the same pending hash are harmless.
+
+    Args:
+        kind: Either ``"last_login"`` or ``"last_seen"``
+        batch_size: Maximum number of users per UPDATE statement
+        max_batches: Maximum number of statements per run
+
+    Returns:
+        int: The number of buffered events flushed
+    """
+    batch_size = batch_size or settings.USER_ACTIVITY_FLUSH_BATCH_SIZE
+    max_batches = max_batches or settings.USER_ACTIVITY_FLUSH_MAX_BATCHES
+    client = get_redis()
+    live, pending = _live_key(kind), _pending_key(kind)
+    flushed = 0
+
+    for _ in range(max_batches):
+        if not client.exists(pending):
+            try:
+                client.renamenx(live, pending)
+            except redis.ResponseError:
+                # The live hash does not exist: nothing left to flush
+                break
+
+        # HSCAN may return empty pages before the end; only cursor 0 ends it
+        batch, cursor = {}, None
+        while cursor != 0 and len(batch) < batch_size:
+            cursor, entries = client.hscan(pending, cursor or 0, count=batch_size)
+            batch.update(entries)
+        if not batch:
+            break
+        batch = dict(list(batch.items())[:batch_size])
+
+        apply_activity(kind, {int(key): float(value) for key, value in batch.items()})
+        client.hdel(pending, *batch)
+        flushed += len(batch)
+
+    return flushed
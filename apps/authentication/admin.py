@@ -5,7 +5,94 @@ This module provides admin interface configurations for user-related models.
 """
 
 from django.contrib import admin
-from django.contrib.auth.admin import UserAdmin
-from .models import User
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-admin.site.register(User, UserAdmin)
+from .deletion import request_deletion
+from .models import AccountDeletion, User, WebhookDelivery, WebhookEndpoint
+from .pagination import EstimatedCountPaginator
+from .search import MIN_SEARCH_LENGTH, search_users
+from .webhooks import redeliver
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    """
+    User admin that avoids exact row counts and unindexed searches on large tables.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ["delete_in_background"]
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search through the trigram-indexed user search.
+
+        Terms shorter than one trigram fall back to the default admin search.
+
+        Args:
+            request: The HTTP request object
+            queryset: The changelist queryset
+            search_term: The term entered in the admin search box
+
+        Returns:
+            tuple: The filtered queryset and whether it may contain duplicates
+        """
+        if len(search_term.strip()) < MIN_SEARCH_LENGTH:
+            return super().get_search_results(request, queryset, search_term)
+        return search_users(queryset, search_term, rank=False), False
+
+    @admin.action(description="Deactivate and delete selected users in the background")
+    def delete_in_background(self, request, queryset):
+        """Deactivate the selected users and queue the deletion of their accounts."""
+        count = 0
+        for user in queryset.iterator():
+            request_deletion(user, actor=request.user)
+            count += 1
+        self.message_user(request, f"{count} users deactivated and queued for deletion.")
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    """
+    Admin for following the progress of account deletions.
+    """
+
+    list_display = ("user_id", "requested_at", "step", "batches", "runs", "completed_at")
+    readonly_fields = [field.name for field in AccountDeletion._meta.fields]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        """Deletions are requested through the user admin or the API."""
+        return False
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    """
+    Admin for registering webhook endpoints.
+    """
+
+    list_display = ("url", "is_active", "topics", "max_concurrency", "batch_size", "created_at")
+    list_filter = ("is_active",)
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    """
+    Admin for inspecting pending and dead-lettered webhook deliveries.
+    """
+
+    list_display = ("id", "endpoint", "status", "attempts", "next_attempt_at", "last_error")
+    list_filter = ("status", "endpoint")
+    list_select_related = ("endpoint",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ["redeliver_selected"]
+
+    @admin.action(description="Redeliver selected dead deliveries")
+    def redeliver_selected(self, request, queryset):
+        """Queue the selected dead-lettered deliveries again."""
+        count = redeliver(queryset)
+        self.message_user(request, f"{count} deliveries queued for redelivery.")
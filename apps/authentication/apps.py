@@ -16,3 +16,20 @@ class AuthenticationConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.authentication"
+
+    def ready(self):
+        """
+        Buffer session logins' last_login like JWT logins, and queue webhooks.
+
+        Django's own receiver saves the user on every admin login, which also
+        re-saves the profile through the post_save signal.
+        """
+        from django.contrib.auth.signals import user_logged_in
+
+        from .activity import buffer_last_login
+        from .outbox import user_event
+        from .webhooks import enqueue_event
+
+        user_logged_in.disconnect(dispatch_uid="update_last_login")
+        user_logged_in.connect(buffer_last_login, dispatch_uid="update_last_login")
+        user_event.connect(enqueue_event, dispatch_uid="enqueue_webhooks")
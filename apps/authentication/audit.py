@@ -0,0 +1,411 @@
+"""
+Append-only audit log of profile and email account changes.
+
+``record_audit_event`` hands an event to a buffer once its transaction
+commits, so an audited request costs a Redis ``RPUSH`` (``AUDIT_BUFFER=redis``)
+or a list append (``AUDIT_BUFFER=local``) instead of an INSERT. Buffered
+events are written in batches with ``COPY``: the Redis list by the
+``flush_audit_events`` beat task, the in-process buffer by a background
+thread of each process.
+
+On PostgreSQL the table is partitioned by month of ``created_at``. The
+``maintain_audit_partitions`` beat task creates partitions
+``AUDIT_PARTITIONS_AHEAD`` months in advance and drops those older than
+``AUDIT_RETENTION_MONTHS``, which removes old events without a bulk DELETE.
+A batch holding events of a month without a partition creates it first.
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.appsUtils.log import get_request_id
+from apps.appsUtils.redis_client import get_redis
+
+from .models import AuditEvent
+from .seeding import copy_rows
+
+logger = logging.getLogger(__name__)
+
+# Columns of a buffered event row, in order
+COLUMNS = ("created_at", "action", "user_id", "actor_id", "changes", "request_id")
+
+KEY_PREFIX = "auth:audit"
+
+# Seconds after which the lock of a Redis flush that died is released
+FLUSH_LOCK_TIMEOUT = 300
+
+PARTITION_NAME = re.compile(rf"^{AuditEvent._meta.db_table}_(\d{{4}})(\d{{2}})$")
+
+# Months whose partition is known to exist, per process
+_partitions = set()
+
+
+def month_start(when):
+    """Return the first instant of the UTC month of an aware datetime."""
+    when = when.astimezone(dt_timezone.utc)
+    return when.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    """Return the first instant of the month ``count`` months after another."""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    """Return the name of the partition holding a month."""
+    return f"{AuditEvent._meta.db_table}_{month:%Y%m}"
+
+
+def is_partitioned():
+    """Whether the audit table is a partitioned PostgreSQL table."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass(%s))",
+            [AuditEvent._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def create_partitions(months):
+    """
+    Create the missing partitions of some months.
+
+    Months already created by this process are not checked again.
+
+    Args:
+        months: First instants of the months, as from ``month_start``
+
+    Returns:
+        list: The names of the partitions created
+    """
+    months = set(months) - _partitions
+    if not months or not is_partitioned():
+        return []
+
+    quote = connection.ops.quote_name
+    created = []
+    with connection.cursor() as cursor:
+        for month in sorted(months):
+            name = partition_name(month)
+            cursor.execute("SELECT to_regclass(%s)", [quote(name)])
+            if cursor.fetchone()[0] is None:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF "
+                    f"{quote(AuditEvent._meta.db_table)} FOR VALUES FROM (%s) TO (%s)",
+                    [month, add_months(month, 1)],
+                )
+                created.append(name)
+    _partitions.update(months)
+    return created
+
+
+def drop_partitions(before):
+    """
+    Drop the partitions whose events are all older than a time.
+
+    Only partitions named by ``partition_name`` are considered.
+
+    Args:
+        before: First instant of the oldest month to keep
+
+    Returns:
+        list: The names of the partitions dropped
+    """
+    if not is_partitioned():
+        return []
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [quote(AuditEvent._meta.db_table)],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    dropped = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match is None:
+            continue
+        month = datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+        if add_months(month, 1) > before:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {quote(name)}")
+        _partitions.discard(month)
+        dropped.append(name)
+    return dropped
+
+
+def maintain_partitions(months_ahead=None, retention_months=None, now=None):
+    """
+    Create the partitions of the coming months and drop expired ones.
+
+    Args:
+        months_ahead: Months after the current one to create, defaults to
+            ``AUDIT_PARTITIONS_AHEAD``
+        retention_months: Full months kept before the current one, defaults to
+            ``AUDIT_RETENTION_MONTHS``; 0 keeps every partition
+        now: The current time, defaults to now
+
+    Returns:
+        dict: The names of the partitions created and dropped
+    """
+    if months_ahead is None:
+        months_ahead = settings.AUDIT_PARTITIONS_AHEAD
+    if retention_months is None:
+        retention_months = settings.AUDIT_RETENTION_MONTHS
+    current = month_start(now or timezone.now())
+
+    created = create_partitions(add_months(current, count) for count in range(months_ahead + 1))
+    dropped = drop_partitions(add_months(current, -retention_months)) if retention_months else []
+    if created or dropped:
+        logger.info("Audit partitions created: %s; dropped: %s", created, dropped)
+    return {"created": created, "dropped": dropped}
+
+
+def write_rows(rows):
+    """
+    Write buffered event rows with ``COPY``, creating missing partitions first.
+
+    Args:
+        rows: Sequences of values in ``COLUMNS`` order, ``created_at`` as an
+            ISO string and ``changes`` as JSON text
+
+    Returns:
+        int: The number of events written
+    """
+    if not rows:
+        return 0
+    create_partitions({month_start(parse_datetime(row[0])) for row in rows})
+    with transaction.atomic():
+        copy_rows(AuditEvent._meta.db_table, COLUMNS, rows)
+    return len(rows)
+
+
+class RedisBuffer:
+    """
+    Buffer in a Redis list shared by every process.
+
+    Events survive restarts of the web processes and are written by the
+    ``flush_audit_events`` beat task. Like the activity buffer, the live list
+    is renamed to a pending list that is drained one batch at a time, each
+    batch trimmed only after it is written. An event may be written twice if
+    the trim fails after its batch was committed.
+    """
+
+    live_key = f"{KEY_PREFIX}:events"
+    pending_key = f"{KEY_PREFIX}:events:flushing"
+    lock_key = f"{KEY_PREFIX}:flush"
+
+    def add(self, row):
+        """Append an event row to the list."""
+        try:
+            get_redis().rpush(self.live_key, json.dumps(row))
+        except redis.RedisError:
+            # Unlike activity timestamps, audit events must not be dropped
+            logger.warning("Could not buffer an audit event; writing it now", exc_info=True)
+            write_rows([row])
+
+    def flush(self, batch_size=None, max_batches=None):
+        """
+        Write buffered events to the database.
+
+        A flush already running in another worker makes this one return
+        immediately.
+
+        Args:
+            batch_size: Events per ``COPY``, defaults to ``AUDIT_FLUSH_BATCH_SIZE``
+            max_batches: Batches per run, defaults to ``AUDIT_FLUSH_MAX_BATCHES``
+
+        Returns:
+            int: The number of events written
+        """
+        batch_size = batch_size or settings.AUDIT_FLUSH_BATCH_SIZE
+        max_batches = max_batches or settings.AUDIT_FLUSH_MAX_BATCHES
+        client = get_redis()
+        if not client.set(self.lock_key, os.getpid(), nx=True, ex=FLUSH_LOCK_TIMEOUT):
+            return 0
+
+        flushed = 0
+        try:
+            for _ in range(max_batches):
+                if not client.exists(self.pending_key):
+                    try:
+                        client.renamenx(self.live_key, self.pending_key)
+                    except redis.ResponseError:
+                        # The live list does not exist: nothing left to flush
+                        break
+
+                entries = client.lrange(self.pending_key, 0, batch_size - 1)
+                if not entries:
+                    break
+                write_rows([json.loads(entry) for entry in entries])
+                client.ltrim(self.pending_key, len(entries), -1)
+                flushed += len(entries)
+        finally:
+            client.delete(self.lock_key)
+        return flushed
+
+
+class LocalBuffer:
+    """
+    Buffer in the memory of each process, written by a background thread.
+
+    The thread writes the buffer every ``AUDIT_FLUSH_INTERVAL`` seconds or as
+    soon as it holds ``AUDIT_FLUSH_BATCH_SIZE`` events, and the buffer is
+    written once more when the process exits. The thread is started on first
+    use in each process, so the buffer is safe to create before gunicorn
+    forks. Events of a process that is killed are lost, and new events are
+    dropped and counted while ``AUDIT_LOCAL_MAX_EVENTS`` wait on a failing
+    database.
+    """
+
+    def __init__(self, batch_size=None, interval=None, max_events=None):
+        """
+        Args:
+            batch_size: Events per ``COPY``, defaults to ``AUDIT_FLUSH_BATCH_SIZE``
+            interval: Seconds between writes, defaults to ``AUDIT_FLUSH_INTERVAL``
+            max_events: Events buffered before new ones are dropped, defaults
+                to ``AUDIT_LOCAL_MAX_EVENTS``
+        """
+        self.batch_size = batch_size or settings.AUDIT_FLUSH_BATCH_SIZE
+        self.interval = interval or settings.AUDIT_FLUSH_INTERVAL
+        self.max_events = max_events or settings.AUDIT_LOCAL_MAX_EVENTS
+        self.rows = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    def start(self):
+        """Start the writer thread for this process, if it is not running."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Rows inherited through fork are written by the parent
+            self.rows = []
+            self._wakeup = threading.Event()
+            threading.Thread(target=self._run, name="audit-writer", daemon=True).start()
+            atexit.register(self._flush_at_exit)
+            self._pid = os.getpid()
+
+    def add(self, row):
+        """Append an event row, waking the writer once a batch is full."""
+        if self._pid != os.getpid():
+            self.start()
+        with self._lock:
+            if len(self.rows) >= self.max_events:
+                self.dropped += 1
+                return
+            self.rows.append(row)
+            full = len(self.rows) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Write the buffered events in batches.
+
+        Returns:
+            int: The number of events written
+
+        Raises:
+            Exception: Whatever writing raised; the unwritten events stay buffered
+        """
+        flushed = 0
+        while True:
+            with self._lock:
+                rows, self.rows = self.rows[: self.batch_size], self.rows[self.batch_size :]
+            if not rows:
+                return flushed
+            try:
+                write_rows(rows)
+            except Exception:
+                with self._lock:
+                    self.rows[:0] = rows
+                raise
+            flushed += len(rows)
+
+    def _run(self):
+        """Write the buffer whenever the interval passes or a batch fills up."""
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.warning("Could not write audit events", exc_info=True)
+            finally:
+                close_old_connections()
+
+    def _flush_at_exit(self):
+        """Write what is left in the buffer of this process."""
+        if self._pid != os.getpid():
+            return
+        try:
+            self.flush()
+        except Exception:
+            logger.warning("Could not write audit events at exit", exc_info=True)
+
+
+BUFFERS = {
+    "local": LocalBuffer,
+    "redis": RedisBuffer,
+}
+
+_buffer = None
+
+
+def get_buffer():
+    """
+    Return the process-wide buffer selected by ``AUDIT_BUFFER``.
+
+    Returns:
+        RedisBuffer or LocalBuffer: The buffer
+    """
+    global _buffer
+    if _buffer is None:
+        _buffer = BUFFERS[settings.AUDIT_BUFFER]()
+    return _buffer
+
+
+def record_audit_event(action, user_id, actor_id=None, changes=None):
+    """
+    Buffer an audit event when the current transaction commits.
+
+    Nothing is recorded if the transaction rolls back.
+
+    Args:
+        action: What happened, such as ``"profile.updated"``
+        user_id: The id of the user whose data changed
+        actor_id: The id of the user who made the change
+        changes: JSON-serializable details of the change
+    """
+    row = (
+        timezone.now().isoformat(),
+        action,
+        user_id,
+        actor_id,
+        json.dumps(changes or {}, cls=DjangoJSONEncoder),
+        get_request_id(),
+    )
+    transaction.on_commit(lambda: get_buffer().add(row))
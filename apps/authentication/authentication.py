@@ -0,0 +1,115 @@
+"""
+Authentication classes for the REST API.
+
+This module contains the JWT authentication used by default for API views.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .activity import record_seen
+from .revocation import is_revoked
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of access tokens whose signature has already been verified.
+
+    Entries are dropped once the token expires, so a hit is only ever a token
+    that would verify again. Revocation is checked on every request regardless.
+    """
+
+    def __init__(self):
+        """Create an empty cache."""
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, raw_token):
+        """
+        Return the validated token for a raw token, or None on a miss.
+
+        Args:
+            raw_token: The encoded token from the Authorization header
+
+        Returns:
+            The validated token, or None if it is not cached or has expired
+        """
+        with self.lock:
+            validated_token = self.tokens.get(raw_token)
+            if validated_token is None:
+                return None
+            if validated_token["exp"] <= time.time():
+                del self.tokens[raw_token]
+                return None
+            self.tokens.move_to_end(raw_token)
+            return validated_token
+
+    def add(self, raw_token, validated_token):
+        """Remember a verified token, evicting the least recently used one if full."""
+        max_size = settings.JWT_VERIFIED_TOKEN_CACHE_SIZE
+        if max_size <= 0:
+            return
+        with self.lock:
+            self.tokens[raw_token] = validated_token
+            self.tokens.move_to_end(raw_token)
+            while len(self.tokens) > max_size:
+                self.tokens.popitem(last=False)
+
+    def clear(self):
+        """Forget every cached token."""
+        with self.lock:
+            self.tokens.clear()
+
+
+_verified_tokens = VerifiedTokenCache()
+
+
+class ActivityJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that rejects revoked tokens and records when each user
+    was last seen.
+    """
+
+    def get_validated_token(self, raw_token):
+        """
+        Validate the token and check it against the revocation store.
+
+        Signature verification is skipped for tokens already verified by this
+        process.
+
+        Args:
+            raw_token: The encoded token from the Authorization header
+
+        Returns:
+            The validated token
+
+        Raises:
+            InvalidToken: If the token is invalid or revoked
+        """
+        validated_token = _verified_tokens.get(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            _verified_tokens.add(raw_token, validated_token)
+        if is_revoked(validated_token.payload):
+            raise InvalidToken("Token is revoked")
+        return validated_token
+
+    def authenticate(self, request):
+        """
+        Authenticate the request and buffer the user's last-seen time.
+
+        Args:
+            request: The HTTP request object
+
+        Returns:
+            A (user, token) tuple, or None if no token was supplied
+        """
+        result = super().authenticate(request)
+        if result is not None:
+            record_seen(result[0].pk)
+        return result
@@ -0,0 +1,251 @@
+"""
+Batched backfills of existing rows.
+
+Data migrations of large tables must not rewrite the table in one statement,
+which locks every row it touches until it commits. ``run_backfill`` walks the
+table in primary key order instead, updating ``BACKFILL_BATCH_SIZE`` rows per
+transaction and sleeping ``BACKFILL_BATCH_SLEEP`` seconds between batches.
+Every batch waits at most ``BACKFILL_LOCK_TIMEOUT_MS`` for a row lock and is
+retried after a lock timeout.
+
+Each batch saves a ``BackfillProgress`` checkpoint in its own transaction, so
+a backfill that is interrupted, or stopped by its time budget, resumes where
+it left off. Backfills can be run ahead of a deploy with the ``backfill``
+management command; the migration needing one then only has the rows added
+since. Rows are only visited up to the largest primary key when the run
+starts; rows written later must already be written correctly by the code.
+
+Backfills are registered in ``BACKFILLS`` and run from migrations with the
+migration's ``apps`` registry, so they see the historical models.
+"""
+
+import logging
+import time
+import zlib
+from functools import partial
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, Max, OuterRef
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .maintenance import advisory_lock, lock_timeout_transaction, retry_lock_timeouts
+
+logger = logging.getLogger(__name__)
+
+
+class Backfill:
+    """
+    An update applied to every existing row of a table.
+    """
+
+    def __init__(self, name, model, update):
+        """
+        Args:
+            name: The name the checkpoint is saved under
+            model: The ``app_label.ModelName`` of the table; its primary key
+                must be an integer
+            update: Callable updating the rows of a queryset as needed and
+                returning the number of rows changed
+        """
+        self.name = name
+        self.model_label = model
+        self.update = update
+
+    @property
+    def lock_key(self):
+        """Return the id of the backfill's advisory lock, a signed 32-bit integer."""
+        return zlib.crc32(f"backfill:{self.name}".encode()) - 2**31
+
+
+def lowercase_emails(queryset):
+    """
+    Lowercase the email addresses of users.
+
+    Addresses whose lowercase form another user already has are left as they
+    are; they are reported when the case-insensitive unique index is built.
+
+    Args:
+        queryset: The users of the batch
+
+    Returns:
+        int: The number of addresses changed
+    """
+    model = queryset.model
+    taken = model._base_manager.filter(email=Lower(OuterRef("email"))).exclude(pk=OuterRef("pk"))
+    pending = queryset.exclude(email=Lower("email")).filter(~Exists(taken))
+    try:
+        with transaction.atomic():
+            return pending.update(email=Lower("email"))
+    except IntegrityError:
+        # Two addresses of the batch differ only in case; the first one wins
+        changed = 0
+        for pk in pending.values_list("pk", flat=True):
+            try:
+                with transaction.atomic():
+                    changed += model._base_manager.filter(pk=pk).update(email=Lower("email"))
+            except IntegrityError:
+                pass
+        return changed
+
+
+BACKFILLS = {
+    backfill.name: backfill
+    for backfill in (Backfill("lowercase_emails", "authentication.User", lowercase_emails),)
+}
+
+
+def format_progress(progress):
+    """Return a one-line summary of a backfill's progress."""
+    line = (
+        f"{progress['name']}: {progress['rows_updated']} rows updated in "
+        f"{progress['batches']} batches"
+    )
+    if progress["percent"] is not None:
+        line += f", {progress['percent']}% of keys"
+    if progress["eta_s"] is not None:
+        line += f", about {progress['eta_s']}s left"
+    return line
+
+
+def _report(message, progress, report=None):
+    """Log a backfill's progress and hand it to the caller's report."""
+    logger.info(message, progress["name"], extra={"backfill": progress})
+    if report:
+        report(progress)
+
+
+def update_batch(backfill, model, checkpoint, batch_size, lock_timeout_ms, max_key):
+    """
+    Update the next batch of rows and move the checkpoint past it.
+
+    Args:
+        backfill: The Backfill
+        model: The model class of the table
+        checkpoint: The BackfillProgress, updated in place
+        batch_size: Maximum rows per batch
+        lock_timeout_ms: Longest wait for a lock
+        max_key: The largest primary key visited
+
+    Returns:
+        bool: Whether there are rows left
+
+    Raises:
+        OperationalError: On a lock timeout, with nothing saved
+    """
+    rows = model._base_manager.filter(pk__lte=max_key)
+    if checkpoint.last_key is not None:
+        rows = rows.filter(pk__gt=checkpoint.last_key)
+
+    with lock_timeout_transaction(lock_timeout_ms):
+        # The key of the batch's last row, found by walking the primary key index
+        keys = rows.order_by("pk").values_list("pk", flat=True)[batch_size - 1 : batch_size]
+        last = next(iter(keys), max_key)
+        changed = backfill.update(rows.filter(pk__lte=last))
+        checkpoint.last_key = last
+        checkpoint.rows_updated += changed
+        checkpoint.batches += 1
+        checkpoint.save()
+    return last < max_key
+
+
+def run_backfill(
+    backfill,
+    apps=None,
+    batch_size=None,
+    sleep=None,
+    lock_timeout_ms=None,
+    time_budget=None,
+    restart=False,
+    report=None,
+):
+    """
+    Apply a backfill to the rows it has not visited yet.
+
+    Args:
+        backfill: The Backfill
+        apps: The app registry, the historical one in migrations
+        batch_size: Rows per batch, defaults to ``BACKFILL_BATCH_SIZE``
+        sleep: Seconds between batches, defaults to ``BACKFILL_BATCH_SLEEP``
+        lock_timeout_ms: Longest lock wait per batch, defaults to
+            ``BACKFILL_LOCK_TIMEOUT_MS``
+        time_budget: Seconds after which the run stops, unlimited by default
+        restart: Whether to start again from the first row
+        report: Callable receiving the progress, which is also logged, every
+            ``BACKFILL_REPORT_INTERVAL`` seconds and when the run stops
+
+    Returns:
+        dict: The progress, with ``completed`` telling whether every row was
+        visited, or ``{"skipped": True}`` if another process is running it
+
+    Raises:
+        OperationalError: After ``BACKFILL_MAX_LOCK_TIMEOUTS`` lock timeouts
+            in a row; the next run resumes from the last batch
+    """
+    apps = apps or global_apps
+    batch_size = batch_size or settings.BACKFILL_BATCH_SIZE
+    sleep = settings.BACKFILL_BATCH_SLEEP if sleep is None else sleep
+    lock_timeout_ms = lock_timeout_ms or settings.BACKFILL_LOCK_TIMEOUT_MS
+    model = apps.get_model(backfill.model_label)
+    progress_model = apps.get_model("authentication", "BackfillProgress")
+
+    with advisory_lock(backfill.lock_key) as locked:
+        if not locked:
+            logger.info("Skipping the %s backfill; another process is running it", backfill.name)
+            return {"skipped": True}
+
+        checkpoint, _ = progress_model.objects.get_or_create(name=backfill.name)
+        if restart:
+            checkpoint.last_key, checkpoint.rows_updated, checkpoint.batches = None, 0, 0
+            checkpoint.completed_at = None
+        first_key = checkpoint.last_key
+        max_key = model._base_manager.aggregate(key=Max("pk"))["key"]
+        started = last_report = time.monotonic()
+        remaining = max_key is not None and (first_key is None or first_key < max_key)
+
+        def progress():
+            elapsed = time.monotonic() - started
+            percent = eta = None
+            if max_key and checkpoint.last_key is not None:
+                percent = round(min(100, max(0, 100 * checkpoint.last_key / max_key)), 1)
+                done = checkpoint.last_key - (first_key or 0)
+                if done > 0 and remaining:
+                    eta = round(elapsed * (max_key - checkpoint.last_key) / done)
+            return {
+                "name": backfill.name,
+                "rows_updated": checkpoint.rows_updated,
+                "batches": checkpoint.batches,
+                "last_key": checkpoint.last_key,
+                "max_key": max_key,
+                "percent": percent,
+                "eta_s": eta,
+                "elapsed_s": round(elapsed, 3),
+                "completed": not remaining,
+            }
+
+        while remaining:
+            if time_budget is not None and time.monotonic() - started >= time_budget:
+                break
+            remaining, _ = retry_lock_timeouts(
+                partial(
+                    update_batch, backfill, model, checkpoint, batch_size, lock_timeout_ms, max_key
+                ),
+                settings.BACKFILL_MAX_LOCK_TIMEOUTS,
+                sleep,
+                f"in the {backfill.name} backfill",
+            )
+            if time.monotonic() - last_report >= settings.BACKFILL_REPORT_INTERVAL:
+                _report("Backfilling %s", progress(), report)
+                last_report = time.monotonic()
+            if remaining:
+                time.sleep(sleep)
+
+        if not remaining:
+            checkpoint.completed_at = timezone.now()
+        checkpoint.save()
+
+    result = progress()
+    _report("Ran the %s backfill", result, report)
+    return result
@@ -0,0 +1,326 @@
+"""
+Asynchronous, batched deletion of user accounts.
+
+Deleting a user with ``user.delete()`` cascades to every row that depends on
+it in one transaction, holding the request and the row locks for as long as
+the largest account takes. ``request_deletion`` instead only deactivates the
+user, revokes their tokens and queues the ``delete_user_account`` Celery task.
+
+The task deletes the tables depending on the user children first, found by
+following the ``CASCADE`` foreign keys from the user model, so tables added
+later are covered without changes here. Each table is emptied
+``ACCOUNT_DELETION_BATCH_SIZE`` rows per transaction, with a pause of
+``ACCOUNT_DELETION_BATCH_SLEEP`` seconds between batches. No batch waits
+longer than ``ACCOUNT_DELETION_LOCK_TIMEOUT_MS`` for a lock. The user row
+goes last.
+
+Every batch updates its ``AccountDeletion`` in its own transaction, so the
+progress survives a crash; nothing needs to be undone, as deleted rows stay
+deleted. A run stops after ``ACCOUNT_DELETION_TIME_BUDGET`` seconds and
+queues the next one. The ``resume_account_deletions`` beat task queues
+deletions that made no progress for ``ACCOUNT_DELETION_STALE_AFTER`` seconds,
+for example after a worker crashed. On PostgreSQL one worker at a time
+deletes an account.
+"""
+
+import logging
+import time
+import zlib
+from datetime import timedelta
+from functools import partial
+
+import redis
+from celery import current_app
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .audit import record_audit_event
+from .maintenance import advisory_lock, lock_timeout_transaction, retry_lock_timeouts
+from .models import AccountDeletion, record_event
+from .revocation import revoke_user_sessions
+
+logger = logging.getLogger(__name__)
+
+DELETE_TASK = "apps.authentication.tasks.delete_user_account"
+
+
+class DeletionStep:
+    """
+    A table whose rows belonging to the user are deleted.
+    """
+
+    def __init__(self, model, lookup):
+        """
+        Args:
+            model: The model class of the table
+            lookup: The lookup from the table to the user's primary key,
+                such as ``"user"`` or ``"lead__user"``
+        """
+        self.model = model
+        self.lookup = lookup
+
+    @property
+    def label(self):
+        """Return the ``app_label.ModelName`` of the table."""
+        return self.model._meta.label
+
+    def rows(self, user_id):
+        """Return the rows of the table belonging to a user."""
+        return self.model._base_manager.filter(**{self.lookup: user_id})
+
+
+def _cascades(model):
+    """Yield the models and foreign key names of the relations cascading from a model."""
+    for field in model._meta.get_fields(include_hidden=True):
+        if (
+            field.auto_created
+            and not field.concrete
+            and (field.one_to_many or field.one_to_one)
+            and field.on_delete is models.CASCADE
+        ):
+            yield field.related_model, field.field.name
+
+
+def deletion_plan(model=None, path=(), seen=frozenset()):
+    """
+    Return the tables depending on a model, in an order they can be emptied.
+
+    The dependents of each table come before it. Relations leading back to a
+    model already on the path are left to the final delete.
+
+    Args:
+        model: The model whose dependents are planned, the user model by default
+        path: The foreign key names from ``model`` to the user
+        seen: The models on the path
+
+    Returns:
+        list: The DeletionSteps
+    """
+    model = model or get_user_model()
+    seen = seen | {model}
+    steps = []
+    for related, name in _cascades(model):
+        if related in seen:
+            continue
+        lookup = (name, *path)
+        steps.extend(deletion_plan(related, lookup, seen))
+        steps.append(DeletionStep(related, "__".join(lookup)))
+    return steps
+
+
+def lock_key(user_id):
+    """Return the id of a user's deletion advisory lock, a signed 32-bit integer."""
+    return zlib.crc32(f"deletion:{user_id}".encode()) - 2**31
+
+
+def schedule_deletion(deletion_id, countdown=None):
+    """Queue the ``delete_account`` task for a deletion."""
+    current_app.send_task(DELETE_TASK, args=[deletion_id], countdown=countdown)
+
+
+def request_deletion(user, actor=None):
+    """
+    Deactivate a user now and queue the deletion of their account.
+
+    The user can no longer log in or use their tokens once this returns.
+    Asking again for a user whose deletion is pending queues it again.
+
+    Args:
+        user: The user to delete
+        actor: The user asking for the deletion, defaults to ``user``
+
+    Returns:
+        AccountDeletion: The deletion's progress
+    """
+    actor_id = (actor or user).pk
+    with transaction.atomic():
+        deletion, created = AccountDeletion.objects.get_or_create(
+            user_id=user.pk, defaults={"requested_by": actor_id}
+        )
+        if user.is_active:
+            user.is_active = False
+            user.save(update_fields=["is_active"])
+        if created:
+            record_audit_event("account.deletion_requested", user.pk, actor_id)
+        transaction.on_commit(partial(schedule_deletion, deletion.pk))
+    try:
+        revoke_user_sessions(user.pk)
+    except redis.RedisError:
+        # Inactive users are refused by the authentication backends anyway
+        logger.warning("Could not revoke the tokens of user %s", user.pk, exc_info=True)
+    return deletion
+
+
+def _count(deletion, counts):
+    """Add the rows deleted per table to a deletion's progress."""
+    for label, count in counts.items():
+        if count:
+            deletion.rows_deleted[label] = deletion.rows_deleted.get(label, 0) + count
+
+
+def delete_batch(step, deletion, batch_size, lock_timeout_ms):
+    """
+    Delete the next batch of a table's rows and record it in the progress.
+
+    Args:
+        step: The DeletionStep
+        deletion: The AccountDeletion, updated in place
+        batch_size: Maximum rows per batch
+        lock_timeout_ms: Longest wait for a lock
+
+    Returns:
+        int: The number of rows deleted from the table
+
+    Raises:
+        OperationalError: On a lock timeout, with nothing deleted
+    """
+    with lock_timeout_transaction(lock_timeout_ms):
+        pks = list(
+            step.rows(deletion.user_id).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return 0
+        _, counts = step.model._base_manager.filter(pk__in=pks).delete()
+        _count(deletion, counts)
+        deletion.step = step.label
+        deletion.batches += 1
+        deletion.save(update_fields=["step", "rows_deleted", "batches", "updated_at"])
+    return len(pks)
+
+
+def delete_user(deletion, lock_timeout_ms):
+    """Delete the user row itself, and what is left depending on it, and complete the deletion."""
+    with lock_timeout_transaction(lock_timeout_ms):
+        deleted, counts = get_user_model()._base_manager.filter(pk=deletion.user_id).delete()
+        _count(deletion, counts)
+        if deleted:
+            record_event("user.deleted", deletion.user_id, {"user_id": deletion.user_id})
+            record_audit_event(
+                "account.deleted",
+                deletion.user_id,
+                deletion.requested_by,
+                {"rows_deleted": deletion.rows_deleted},
+            )
+        deletion.step = ""
+        deletion.completed_at = timezone.now()
+        deletion.save(update_fields=["step", "rows_deleted", "completed_at", "updated_at"])
+
+
+def deletion_progress(deletion):
+    """Return a deletion's progress as a dict."""
+    return {
+        "user_id": deletion.user_id,
+        "step": deletion.step,
+        "rows_deleted": sum(deletion.rows_deleted.values()),
+        "tables": dict(deletion.rows_deleted),
+        "batches": deletion.batches,
+        "runs": deletion.runs,
+        "completed": deletion.completed_at is not None,
+    }
+
+
+def run_deletion(deletion_id, batch_size=None, sleep=None, lock_timeout_ms=None, time_budget=None):
+    """
+    Delete an account's rows from where the last run stopped.
+
+    Args:
+        deletion_id: The id of the AccountDeletion
+        batch_size: Rows per batch, defaults to ``ACCOUNT_DELETION_BATCH_SIZE``
+        sleep: Seconds between batches, defaults to ``ACCOUNT_DELETION_BATCH_SLEEP``
+        lock_timeout_ms: Longest lock wait per batch, defaults to
+            ``ACCOUNT_DELETION_LOCK_TIMEOUT_MS``
+        time_budget: Seconds after which the run stops, defaults to
+            ``ACCOUNT_DELETION_TIME_BUDGET``; 0 for no limit
+
+    Returns:
+        dict: The progress, with ``completed`` telling whether the user is
+        gone, or ``{"skipped": True}`` if another worker is deleting it
+
+    Raises:
+        OperationalError: After ``ACCOUNT_DELETION_MAX_LOCK_TIMEOUTS`` lock
+            timeouts in a row; the next run resumes from the last batch
+    """
+    batch_size = batch_size or settings.ACCOUNT_DELETION_BATCH_SIZE
+    sleep = settings.ACCOUNT_DELETION_BATCH_SLEEP if sleep is None else sleep
+    lock_timeout_ms = lock_timeout_ms or settings.ACCOUNT_DELETION_LOCK_TIMEOUT_MS
+    time_budget = settings.ACCOUNT_DELETION_TIME_BUDGET if time_budget is None else time_budget
+    user_id = AccountDeletion.objects.values_list("user_id", flat=True).get(pk=deletion_id)
+
+    with advisory_lock(lock_key(user_id)) as locked:
+        if not locked:
+            logger.info("Skipping the deletion of user %s; another worker is running it", user_id)
+            return {"skipped": True}
+        # Read under the lock, after the last run's batches committed
+        deletion = AccountDeletion.objects.get(pk=deletion_id)
+        if deletion.completed_at is not None:
+            return deletion_progress(deletion)
+        AccountDeletion.objects.filter(pk=deletion_id).update(runs=F("runs") + 1)
+        deletion.runs += 1
+        started = time.monotonic()
+        try:
+            for step in deletion_plan():
+                while True:
+                    if time_budget and time.monotonic() - started >= time_budget:
+                        progress = deletion_progress(deletion)
+                        logger.info(
+                            "Deleting the account of user %s", user_id, extra={"deletion": progress}
+                        )
+                        return progress
+                    deleted, _ = retry_lock_timeouts(
+                        partial(delete_batch, step, deletion, batch_size, lock_timeout_ms),
+                        settings.ACCOUNT_DELETION_MAX_LOCK_TIMEOUTS,
+                        sleep,
+                        f"deleting {step.label} of user {user_id}",
+                    )
+                    if deleted < batch_size:
+                        break
+                    time.sleep(sleep)
+            delete_user(deletion, lock_timeout_ms)
+        except Exception as error:
+            AccountDeletion.objects.filter(pk=deletion_id).update(
+                last_error=repr(error), updated_at=timezone.now()
+            )
+            raise
+
+    progress = deletion_progress(deletion)
+    logger.info("Deleted the account of user %s", user_id, extra={"deletion": progress})
+    return progress
+
+
+def delete_account(deletion_id):
+    """
+    Run a deletion and queue its next run if the time budget stopped it.
+
+    Returns:
+        dict: The progress of this run
+    """
+    progress = run_deletion(deletion_id)
+    if not progress.get("skipped") and not progress["completed"]:
+        schedule_deletion(deletion_id)
+    return progress
+
+
+def resume_stalled(stale_after=None):
+    """
+    Queue the deletions that made no progress for a while.
+
+    Args:
+        stale_after: Seconds without progress, defaults to
+            ``ACCOUNT_DELETION_STALE_AFTER``
+
+    Returns:
+        int: The number of deletions queued
+    """
+    stale_after = stale_after or settings.ACCOUNT_DELETION_STALE_AFTER
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stalled = list(
+        AccountDeletion.objects.filter(completed_at__isnull=True, updated_at__lt=cutoff)
+        .order_by("updated_at")
+        .values_list("pk", flat=True)
+    )
+    for deletion_id in stalled:
+        schedule_deletion(deletion_id)
+    return len(stalled)
@@ -0,0 +1,229 @@
+"""
+Bulk changes to the email accounts of a profile.
+
+Email accounts live in the ``UserProfile.email_accounts`` JSON blob, keyed by
+address. ``EmailAccountView`` reads and rewrites the whole blob for each
+account; ``apply_operations`` instead applies a batch of add, update and
+remove operations in a single ``UPDATE``. On PostgreSQL the new blob is built
+by the database from the removed addresses and the added or updated
+accounts, so the blob itself is never read. Other databases get the same
+result from a read and rewrite of the blob.
+
+The batch is all or nothing. Only the profile version and account addresses
+are read, to check every operation against them: an add must name a new
+address and an update or remove an existing one. The ``UPDATE`` only
+applies if the version did not change since, and bumps it. A client that
+sent the version it last saw gets a ``VersionConflict`` when another write
+got in first; otherwise the batch is checked again against the new version.
+``EmailAccountView`` changes single accounts through the same update, with
+``save_account`` and ``remove_account``.
+"""
+
+import json
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .audit import record_audit_event
+from .models import UserProfile, record_event
+
+ADD, UPDATE, REMOVE = "add", "update", "remove"
+OPERATIONS = (ADD, UPDATE, REMOVE)
+
+# Statuses of applied operations
+APPLIED = {ADD: "added", UPDATE: "updated", REMOVE: "removed"}
+
+# Times a batch is checked again after a concurrent write, without a client version
+MAX_ATTEMPTS = 3
+
+
+class VersionConflict(Exception):
+    """
+    The profile changed since the version the client sent.
+    """
+
+    def __init__(self, version):
+        """Record the current version of the profile."""
+        super().__init__(f"The profile is at version {version}")
+        self.version = version
+
+
+def account_record(data):
+    """
+    Return the stored form of a validated email account.
+
+    Args:
+        data: The validated data of an ``EmailAccountSerializer``
+
+    Returns:
+        dict: The account settings, stored under its address
+    """
+    return {
+        "provider": data.get("provider"),
+        "smtp_server": data.get("smtp_server"),
+        "smtp_port": data.get("smtp_port"),
+        "imap_server": data.get("imap_server"),
+        "imap_port": data.get("imap_port"),
+        "use_tls": data.get("use_tls", True),
+        "is_active": True,
+    }
+
+
+def _version_and_addresses(profiles):
+    """
+    Read a profile's version and email account addresses.
+
+    Returns:
+        tuple: The version, the set of addresses, and the accounts themselves
+        where the database cannot list the addresses alone, else None
+    """
+    if connection.vendor == "postgresql":
+        addresses = RawSQL(
+            "ARRAY(SELECT jsonb_object_keys(COALESCE(email_accounts, '{}'::jsonb)))", []
+        )
+        profiles = profiles.annotate(addresses=addresses)
+        version, keys = profiles.values_list("version", "addresses").get()
+        return version, set(keys), None
+    version, accounts = profiles.values_list("version", "email_accounts").get()
+    accounts = accounts or {}
+    return version, set(accounts), accounts
+
+
+def check_operations(operations, addresses):
+    """
+    Check each operation against the current addresses.
+
+    Args:
+        operations: ``(op, email, data)`` tuples
+        addresses: The addresses of the profile's accounts
+
+    Returns:
+        tuple: The per-item results, and whether every operation can be applied
+    """
+    results, valid = [], True
+    for op, email, _ in operations:
+        if op == ADD and email in addresses:
+            results.append({"op": op, "email": email, "status": "conflict", "error": "exists"})
+            valid = False
+        elif op != ADD and email not in addresses:
+            results.append({"op": op, "email": email, "status": "conflict", "error": "not_found"})
+            valid = False
+        else:
+            results.append({"op": op, "email": email, "status": APPLIED[op]})
+    if not valid:
+        for result in results:
+            if result["status"] != "conflict":
+                result["status"] = "skipped"
+    return results, valid
+
+
+def _new_accounts(operations, accounts):
+    """Return the email accounts after the operations."""
+    removed = [email for op, email, _ in operations if op == REMOVE]
+    upserted = {email: account_record(data) for op, email, data in operations if op != REMOVE}
+    if accounts is not None:
+        accounts = {email: account for email, account in accounts.items() if email not in removed}
+        return {**accounts, **upserted}
+    return RawSQL(
+        "(COALESCE(email_accounts, '{}'::jsonb) - %s::text[]) || %s::jsonb",
+        [removed, json.dumps(upserted)],
+    )
+
+
+def apply_operations(user, operations, version=None, actor=None):
+    """
+    Apply a batch of email account operations to a user's profile.
+
+    Args:
+        user: The user owning the profile
+        operations: ``(op, email, data)`` tuples, with the validated
+            ``EmailAccountSerializer`` data of adds and updates; each address
+            appears once
+        version: The profile version the client last saw, if any
+        actor: The user making the change, defaults to ``user``
+
+    Returns:
+        tuple: The per-item results, whether the batch was applied, and the
+        profile version after it
+
+    Raises:
+        VersionConflict: If ``version`` is not the current version
+    """
+    actor = actor or user
+    profiles = UserProfile.objects.filter(user=user)
+    for _ in range(MAX_ATTEMPTS):
+        with transaction.atomic():
+            current, addresses, accounts = _version_and_addresses(profiles)
+            if version is not None and version != current:
+                raise VersionConflict(current)
+            results, valid = check_operations(operations, addresses)
+            if not valid:
+                return results, False, current
+            updated = profiles.filter(version=current).update(
+                email_accounts=_new_accounts(operations, accounts),
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                # Another write got in between the read and the update
+                if version is not None:
+                    raise VersionConflict(profiles.values_list("version", flat=True).get())
+                continue
+            # update() sends no post_save, so record the profile event here
+            record_event(
+                "user.profile_updated",
+                user.pk,
+                {"user_id": user.pk, "fields": ["email_accounts"], "version": current + 1},
+            )
+            for op, email, data in operations:
+                changes = {"email": email}
+                if op != REMOVE:
+                    changes["provider"] = data.get("provider")
+                record_audit_event(f"email_account.{APPLIED[op]}", user.pk, actor.pk, changes)
+            return results, True, current + 1
+    raise VersionConflict(profiles.values_list("version", flat=True).get())
+
+
+def save_account(user, email, data, actor=None):
+    """
+    Add an email account, or update it if its address is already connected.
+
+    Args:
+        user: The user owning the profile
+        email: The address of the account
+        data: The validated ``EmailAccountSerializer`` data
+        actor: The user making the change, defaults to ``user``
+
+    Returns:
+        tuple: The status, ``"added"`` or ``"updated"``, and the profile
+        version after it
+
+    Raises:
+        VersionConflict: If concurrent adds and removes of the address kept
+            both operations from applying
+    """
+    for _ in range(MAX_ATTEMPTS):
+        # The address may be connected or removed between two attempts
+        for op in (ADD, UPDATE):
+            results, applied, version = apply_operations(user, [(op, email, data)], actor=actor)
+            if applied:
+                return results[0]["status"], version
+    raise VersionConflict(version)
+
+
+def remove_account(user, email, actor=None):
+    """
+    Remove an email account.
+
+    Args:
+        user: The user owning the profile
+        email: The address of the account
+        actor: The user making the change, defaults to ``user``
+
+    Returns:
+        bool: Whether the account was connected and is now removed
+    """
+    _, applied, _ = apply_operations(user, [(REMOVE, email, None)], actor=actor)
+    return applied
@@ -0,0 +1,159 @@
+"""
+Query filters for user listings, exports and the audit log.
+
+This module contains helpers that translate request query parameters into
+queryset filters shared by the user-facing admin endpoints.
+"""
+
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+
+from .models import UserManager
+
+
+def parse_datetime_param(name, value, end_of_day=False):
+    """
+    Parse an ISO date or datetime query parameter.
+
+    Args:
+        name: The parameter name, used in error messages
+        value: The raw parameter value
+        end_of_day: Whether a bare date should resolve to the end of that day
+
+    Returns:
+        An aware datetime, or None if the value is empty
+
+    Raises:
+        ValidationError: If the value is not a valid date or datetime
+    """
+    if not value:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise serializers.ValidationError({name: "Enter a valid ISO date or datetime."})
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_bool_param(name, value):
+    """
+    Parse a boolean query parameter.
+
+    Args:
+        name: The parameter name, used in error messages
+        value: The raw parameter value
+
+    Returns:
+        True, False, or None if the value is empty
+
+    Raises:
+        ValidationError: If the value is not a recognised boolean
+    """
+    if value in (None, ""):
+        return None
+    if isinstance(value, bool):
+        return value
+
+    lowered = str(value).lower()
+    if lowered in ("1", "true", "yes"):
+        return True
+    if lowered in ("0", "false", "no"):
+        return False
+    raise serializers.ValidationError({name: "Enter true or false."})
+
+
+def filter_users(queryset, params):
+    """
+    Apply the shared user filters to a queryset.
+
+    Supported parameters are ``email``, matched regardless of case,
+    ``joined_after``, ``joined_before`` and ``is_active``. Unknown parameters
+    are ignored.
+
+    Args:
+        queryset: The User queryset to filter
+        params: A mapping of query parameters
+
+    Returns:
+        The filtered queryset
+    """
+    joined_after = parse_datetime_param("joined_after", params.get("joined_after"))
+    joined_before = parse_datetime_param(
+        "joined_before", params.get("joined_before"), end_of_day=True
+    )
+    is_active = parse_bool_param("is_active", params.get("is_active"))
+    email = params.get("email")
+
+    if email:
+        # Addresses are stored lowercased
+        queryset = queryset.filter(email=UserManager.normalize_email(email))
+    if joined_after is not None:
+        queryset = queryset.filter(date_joined__gte=joined_after)
+    if joined_before is not None:
+        queryset = queryset.filter(date_joined__lte=joined_before)
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active)
+    return queryset
+
+
+def parse_id_param(name, value):
+    """
+    Parse a positive integer id query parameter.
+
+    Args:
+        name: The parameter name, used in error messages
+        value: The raw parameter value
+
+    Returns:
+        The id, or None if the value is empty
+
+    Raises:
+        ValidationError: If the value is not a positive integer
+    """
+    if not value:
+        return None
+    if not value.isdigit():
+        raise serializers.ValidationError({name: "Enter a valid id."})
+    return int(value)
+
+
+def filter_audit_events(queryset, params):
+    """
+    Apply the audit log filters to a queryset.
+
+    Supported parameters are ``user_id``, ``actor_id``, ``action``, ``after``
+    and ``before``. Time bounds also limit the partitions scanned.
+
+    Args:
+        queryset: The AuditEvent queryset to filter
+        params: A mapping of query parameters
+
+    Returns:
+        The filtered queryset
+    """
+    user_id = parse_id_param("user_id", params.get("user_id"))
+    actor_id = parse_id_param("actor_id", params.get("actor_id"))
+    after = parse_datetime_param("after", params.get("after"))
+    before = parse_datetime_param("before", params.get("before"), end_of_day=True)
+    action = params.get("action")
+
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    if actor_id is not None:
+        queryset = queryset.filter(actor_id=actor_id)
+    if action:
+        queryset = queryset.filter(action=action)
+    if after is not None:
+        queryset = queryset.filter(created_at__gte=after)
+    if before is not None:
+        queryset = queryset.filter(created_at__lte=before)
+    return queryset
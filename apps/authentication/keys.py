@@ -0,0 +1,170 @@
+"""
+Asymmetric JWT signing keys.
+
+Keys are read once per process from ``JWT_SIGNING_KEYS_DIR``, which holds one
+PEM file per key named ``<kid>.pem``. Private keys (RSA or Ed25519) can sign
+and verify; public keys only verify, which is how a retired key is kept around
+until the tokens it signed have expired. Tokens are signed with the key named
+by ``JWT_ACTIVE_KID``, or the last private key in sorted order if unset, and
+carry its ``kid`` in their header so verification is a dictionary lookup of an
+already parsed key.
+
+To rotate, add the new key while the old one is still active so it is
+published in the JWKS document for at least ``JWT_JWKS_MAX_AGE`` seconds,
+then make it active. Drop the old key once ``REFRESH_TOKEN_LIFETIME`` has
+passed.
+
+When no directory is configured the key ring is empty and tokens fall back to
+simplejwt's ``ALGORITHM`` and ``SIGNING_KEY``.
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+KEY_SETTINGS = frozenset({"JWT_SIGNING_KEYS_DIR", "JWT_ACTIVE_KID"})
+
+
+class SigningKey:
+    """
+    A parsed JWT key identified by its ``kid``.
+    """
+
+    def __init__(self, kid, private_key=None, public_key=None):
+        """
+        Wrap a private key, or a public key that can only verify.
+
+        Args:
+            kid: The key id placed in token headers
+            private_key: A parsed RSA or Ed25519 private key
+            public_key: A parsed public key, derived from the private key if omitted
+        """
+        self.kid = kid
+        self.private_key = private_key
+        self.public_key = public_key or private_key.public_key()
+
+        if isinstance(self.public_key, rsa.RSAPublicKey):
+            self.algorithm = "RS256"
+            jwk = RSAAlgorithm.to_jwk(self.public_key, as_dict=True)
+        elif isinstance(self.public_key, ed25519.Ed25519PublicKey):
+            self.algorithm = "EdDSA"
+            jwk = OKPAlgorithm.to_jwk(self.public_key, as_dict=True)
+        else:
+            raise ImproperlyConfigured(f"JWT key {kid} must be an RSA or Ed25519 key")
+        self.jwk = {**jwk, "kid": kid, "alg": self.algorithm, "use": "sig"}
+
+    @classmethod
+    def from_pem(cls, kid, pem):
+        """
+        Parse a PEM encoded private or public key.
+
+        Args:
+            kid: The key id
+            pem: The PEM bytes
+
+        Returns:
+            SigningKey: The parsed key
+        """
+        if b"PRIVATE KEY" in pem:
+            return cls(kid, private_key=serialization.load_pem_private_key(pem, password=None))
+        return cls(kid, public_key=serialization.load_pem_public_key(pem))
+
+    @property
+    def can_sign(self):
+        """Return whether this key has its private half."""
+        return self.private_key is not None
+
+
+class KeyRing:
+    """
+    The keys of one process, indexed by ``kid``, with a prebuilt JWKS document.
+    """
+
+    def __init__(self, keys=(), active_kid=None):
+        """
+        Index the keys and pick the signing key.
+
+        Args:
+            keys: The SigningKey objects
+            active_kid: The kid to sign with, defaults to the last private key
+
+        Raises:
+            ImproperlyConfigured: If the active key is missing or cannot sign
+        """
+        self.keys = {key.kid: key for key in keys}
+        self.active = None
+        if self.keys:
+            if not active_kid:
+                signing_kids = sorted(kid for kid, key in self.keys.items() if key.can_sign)
+                active_kid = signing_kids[-1] if signing_kids else None
+            self.active = self.keys.get(active_kid)
+            if self.active is None or not self.active.can_sign:
+                raise ImproperlyConfigured(f"No private JWT key for active kid {active_kid!r}")
+
+        self.jwks = {"keys": [self.keys[kid].jwk for kid in sorted(self.keys)]}
+        self.jwks_json = json.dumps(self.jwks, separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.sha256(self.jwks_json).hexdigest()[:32]}"'
+
+    @classmethod
+    def from_directory(cls, path, active_kid=None):
+        """
+        Load every ``<kid>.pem`` file in a directory.
+
+        Args:
+            path: The directory holding the keys
+            active_kid: The kid to sign with
+
+        Returns:
+            KeyRing: The loaded key ring
+        """
+        keys = [SigningKey.from_pem(pem.stem, pem.read_bytes()) for pem in Path(path).glob("*.pem")]
+        return cls(keys, active_kid)
+
+    def __bool__(self):
+        """Return whether any keys are configured."""
+        return bool(self.keys)
+
+    def get(self, kid):
+        """Return the key for a kid, or None if it is unknown."""
+        return self.keys.get(kid)
+
+
+_key_ring = None
+_key_ring_lock = threading.Lock()
+
+
+def get_key_ring():
+    """
+    Return the process-wide key ring, loading it on first use.
+
+    Returns:
+        KeyRing: The configured keys, empty if none are configured
+    """
+    global _key_ring
+    if _key_ring is None:
+        with _key_ring_lock:
+            if _key_ring is None:
+                if settings.JWT_SIGNING_KEYS_DIR:
+                    _key_ring = KeyRing.from_directory(
+                        settings.JWT_SIGNING_KEYS_DIR, settings.JWT_ACTIVE_KID
+                    )
+                else:
+                    _key_ring = KeyRing()
+    return _key_ring
+
+
+@receiver(setting_changed)
+def reset_key_ring(setting, **kwargs):
+    """Reload the key ring when its settings are overridden."""
+    global _key_ring
+    if setting in KEY_SETTINGS:
+        _key_ring = None
@@ -0,0 +1,281 @@
+"""
+Batched deletion of expired rows.
+
+Sessions, and outstanding refresh tokens when simplejwt's blacklist app is
+installed, are kept until they are explicitly deleted. Deleting them all with
+one statement, as ``clearsessions`` does, locks every expired row for the
+whole statement and leaves a burst of dead tuples behind. The
+``cleanup_expired_rows`` Celery beat task instead deletes
+``MAINTENANCE_BATCH_SIZE`` rows per transaction and sleeps between batches.
+Batches walk an index in keyset order, so each one starts where the last one
+stopped instead of rescanning the dead entries it left. Rows locked by
+requests are skipped, every batch waits at most
+``MAINTENANCE_LOCK_TIMEOUT_MS`` for a lock, and a run stops after
+``MAINTENANCE_TIME_BUDGET`` seconds or ``MAINTENANCE_MAX_LOCK_TIMEOUTS`` lock
+timeouts in a row; the next run carries on.
+
+On PostgreSQL each table is cleaned by one worker at a time: a run that
+cannot take the table's advisory lock skips it. The backfills and account
+deletions batch their writes with the same lock and lock timeout helpers.
+"""
+
+import logging
+import time
+import zlib
+from contextlib import contextmanager
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL's error code for a lock_timeout
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+class CleanupTarget:
+    """
+    A table whose expired rows are deleted.
+    """
+
+    def __init__(self, name, model, expiry_field, key_field=None):
+        """
+        Args:
+            name: The name results are reported under
+            model: The ``app_label.ModelName`` of the table
+            expiry_field: The column holding the expiry time
+            key_field: Indexed column batches are ordered by, defaults to
+                ``expiry_field``
+        """
+        self.name = name
+        self.model_label = model
+        self.expiry_field = expiry_field
+        self.key_field = key_field or expiry_field
+
+    @property
+    def installed(self):
+        """Whether the model's app is installed."""
+        try:
+            apps.get_app_config(self.model_label.partition(".")[0])
+        except LookupError:
+            return False
+        return True
+
+    @property
+    def model(self):
+        """Return the model class."""
+        return apps.get_model(self.model_label)
+
+    @property
+    def lock_key(self):
+        """Return the id of the table's advisory lock, a signed 32-bit integer."""
+        return zlib.crc32(f"maintenance:{self.name}".encode()) - 2**31
+
+
+CLEANUP_TARGETS = {
+    target.name: target
+    for target in (
+        CleanupTarget("sessions", "sessions.Session", "expire_date"),
+        # expires_at is not indexed; token ids grow with their expiry
+        CleanupTarget(
+            "outstanding_tokens", "token_blacklist.OutstandingToken", "expires_at", "id"
+        ),
+    )
+}
+
+
+@contextmanager
+def advisory_lock(key):
+    """
+    Try to take a session-level advisory lock for the duration of the block.
+
+    Yields:
+        bool: Whether the lock was taken; always True on other databases
+    """
+    if connection.vendor != "postgresql":
+        yield True
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        locked = cursor.fetchone()[0]
+    try:
+        yield locked
+    finally:
+        if locked:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+
+
+def is_lock_timeout(error):
+    """Whether an exception is a statement stopped by PostgreSQL's lock_timeout."""
+    return (
+        isinstance(error, OperationalError)
+        and getattr(error.__cause__, "pgcode", None) == LOCK_NOT_AVAILABLE
+    )
+
+
+@contextmanager
+def lock_timeout_transaction(lock_timeout_ms):
+    """
+    Run the block in a transaction whose lock waits are bounded.
+
+    Args:
+        lock_timeout_ms: Longest wait for a lock, set locally to the
+            transaction on PostgreSQL
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('lock_timeout', %s, true)", [f"{lock_timeout_ms}ms"]
+                )
+        yield
+
+
+def retry_lock_timeouts(batch, max_lock_timeouts, sleep, description):
+    """
+    Run a batch, running it again after each lock timeout.
+
+    Args:
+        batch: Callable running one batch in a ``lock_timeout_transaction``
+        max_lock_timeouts: Lock timeouts in a row after which the error is raised
+        sleep: Seconds to wait before running the batch again
+        description: What the batch does, for the warning logged on each timeout
+
+    Returns:
+        tuple: The batch's result and the lock timeouts before it succeeded
+
+    Raises:
+        OperationalError: After ``max_lock_timeouts`` lock timeouts in a row
+    """
+    lock_timeouts = 0
+    while True:
+        try:
+            return batch(), lock_timeouts
+        except OperationalError as error:
+            if not is_lock_timeout(error):
+                raise
+            lock_timeouts += 1
+            logger.warning("Lock timeout %s", description)
+            if lock_timeouts >= max_lock_timeouts:
+                raise
+        time.sleep(sleep)
+
+
+def delete_batch(target, cutoff, after, batch_size, lock_timeout_ms):
+    """
+    Delete one batch of expired rows in its own transaction.
+
+    Args:
+        target: The CleanupTarget
+        cutoff: Rows expiring before this time are deleted
+        after: Key of the last batch's last row, or None for the first batch
+        batch_size: Maximum rows deleted
+        lock_timeout_ms: Longest wait for a lock
+
+    Returns:
+        tuple: Rows deleted and the key to continue after, None when done
+    """
+    model, key = target.model, target.key_field
+    # Expiry times are not unique; rows sharing the last one are seen again
+    after_lookup = "gt" if key == model._meta.pk.name else "gte"
+    queryset = model._base_manager.filter(**{f"{target.expiry_field}__lt": cutoff})
+    if after is not None:
+        queryset = queryset.filter(**{f"{key}__{after_lookup}": after})
+
+    with lock_timeout_transaction(lock_timeout_ms):
+        rows = list(
+            queryset.select_for_update(skip_locked=True)
+            .order_by(key)
+            .values_list("pk", key)[:batch_size]
+        )
+        if not rows:
+            return 0, None
+        model._base_manager.filter(pk__in=[pk for pk, _ in rows]).delete()
+    return len(rows), (rows[-1][1] if len(rows) == batch_size else None)
+
+
+def delete_expired(target, batch_size=None, sleep=None, lock_timeout_ms=None, time_budget=None):
+    """
+    Delete the expired rows of a table in batches.
+
+    Args:
+        target: The CleanupTarget
+        batch_size: Rows per batch, defaults to ``MAINTENANCE_BATCH_SIZE``
+        sleep: Seconds between batches, defaults to ``MAINTENANCE_BATCH_SLEEP``
+        lock_timeout_ms: Longest lock wait per batch, defaults to
+            ``MAINTENANCE_LOCK_TIMEOUT_MS``
+        time_budget: Seconds after which the run stops, defaults to
+            ``MAINTENANCE_TIME_BUDGET``
+
+    Returns:
+        dict: Rows deleted, batches, lock timeouts, elapsed seconds and rows
+        per second while deleting, or ``{"skipped": True}`` if another worker
+        holds the table's lock
+    """
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    sleep = settings.MAINTENANCE_BATCH_SLEEP if sleep is None else sleep
+    lock_timeout_ms = lock_timeout_ms or settings.MAINTENANCE_LOCK_TIMEOUT_MS
+    time_budget = time_budget or settings.MAINTENANCE_TIME_BUDGET
+
+    with advisory_lock(target.lock_key) as locked:
+        if not locked:
+            logger.info("Skipping %s cleanup; another worker is running it", target.name)
+            return {"skipped": True}
+
+        cutoff = timezone.now()
+        started = time.monotonic()
+        deleted = batches = lock_timeouts = 0
+        deleting = 0.0
+        after = None
+        while time.monotonic() - started < time_budget:
+            batch_started = time.monotonic()
+            try:
+                (count, after), retried = retry_lock_timeouts(
+                    partial(delete_batch, target, cutoff, after, batch_size, lock_timeout_ms),
+                    settings.MAINTENANCE_MAX_LOCK_TIMEOUTS,
+                    sleep,
+                    f"deleting expired {target.name}",
+                )
+            except OperationalError as error:
+                if not is_lock_timeout(error):
+                    raise
+                lock_timeouts += settings.MAINTENANCE_MAX_LOCK_TIMEOUTS
+                break
+            lock_timeouts += retried
+            deleting += time.monotonic() - batch_started
+            deleted += count
+            batches += 1
+            if after is None:
+                break
+            time.sleep(sleep)
+
+    result = {
+        "deleted": deleted,
+        "batches": batches,
+        "lock_timeouts": lock_timeouts,
+        "elapsed_s": round(time.monotonic() - started, 3),
+        "rows_per_sec": round(deleted / deleting, 1) if deleting else None,
+    }
+    logger.info("Deleted expired %s", target.name, extra={"cleanup": result})
+    return result
+
+
+def cleanup_expired(names=None, **options):
+    """
+    Delete the expired rows of every installed cleanup target.
+
+    Args:
+        names: Target names, defaults to all
+        **options: Passed to ``delete_expired``
+
+    Returns:
+        dict: The result of each target that is installed
+    """
+    targets = [CLEANUP_TARGETS[name] for name in names or CLEANUP_TARGETS]
+    return {
+        target.name: delete_expired(target, **options) for target in targets if target.installed
+    }
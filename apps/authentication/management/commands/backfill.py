@@ -0,0 +1,45 @@
+"""
+Django management command to run a batched backfill ahead of its migration.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.authentication.backfill import BACKFILLS, format_progress, run_backfill
+
+
+class Command(BaseCommand):
+    """Django command running a registered backfill from its checkpoint."""
+
+    help = (
+        "Updates existing rows in small throttled batches, resuming from the last "
+        "checkpoint, so the migration needing the backfill has little left to do"
+    )
+
+    def add_arguments(self, parser):
+        """Add the backfill options."""
+        parser.add_argument("name", help=f"The backfill: {', '.join(BACKFILLS)}")
+        parser.add_argument("--batch-size", type=int, help="Rows updated per transaction")
+        parser.add_argument("--sleep", type=float, help="Seconds between batches")
+        parser.add_argument("--lock-timeout-ms", type=int, help="Longest lock wait per batch")
+        parser.add_argument("--time-budget", type=int, help="Seconds after which the run stops")
+        parser.add_argument(
+            "--restart", action="store_true", help="Start again from the first row"
+        )
+
+    def handle(self, *args, **options):
+        """Run the backfill, reporting its progress."""
+        if options["name"] not in BACKFILLS:
+            raise CommandError(f"Unknown backfill: {options['name']}")
+        result = run_backfill(
+            BACKFILLS[options["name"]],
+            batch_size=options["batch_size"],
+            sleep=options["sleep"],
+            lock_timeout_ms=options["lock_timeout_ms"],
+            time_budget=options["time_budget"],
+            restart=options["restart"],
+            report=lambda progress: self.stdout.write(format_progress(progress)),
+        )
+        if result.get("skipped"):
+            raise CommandError("The backfill is running in another process")
+        if not result["completed"]:
+            self.stdout.write("Stopped by the time budget; run again to resume")
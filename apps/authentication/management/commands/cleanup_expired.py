@@ -0,0 +1,44 @@
+"""
+Django management command to delete expired sessions and tokens in batches.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.authentication.maintenance import CLEANUP_TARGETS, cleanup_expired
+
+
+class Command(BaseCommand):
+    """Django command running the expired row cleanup once."""
+
+    help = (
+        "Deletes expired sessions and tokens in small throttled batches, like the "
+        "cleanup_expired_rows beat task"
+    )
+
+    def add_arguments(self, parser):
+        """Add the cleanup options."""
+        parser.add_argument(
+            "targets",
+            nargs="*",
+            metavar="TARGET",
+            help=f"Tables to clean: {', '.join(CLEANUP_TARGETS)} (defaults to all)",
+        )
+        parser.add_argument("--batch-size", type=int, help="Rows deleted per transaction")
+        parser.add_argument("--sleep", type=float, help="Seconds between batches")
+        parser.add_argument("--lock-timeout-ms", type=int, help="Longest lock wait per batch")
+        parser.add_argument("--time-budget", type=int, help="Seconds after which a table stops")
+
+    def handle(self, *args, **options):
+        """Clean the selected tables and report the rate of each."""
+        unknown = set(options["targets"]) - set(CLEANUP_TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown targets: {', '.join(sorted(unknown))}")
+        results = cleanup_expired(
+            options["targets"],
+            batch_size=options["batch_size"],
+            sleep=options["sleep"],
+            lock_timeout_ms=options["lock_timeout_ms"],
+            time_budget=options["time_budget"],
+        )
+        for name, result in results.items():
+            self.stdout.write(f"{name}: {result}")
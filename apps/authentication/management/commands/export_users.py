@@ -0,0 +1,53 @@
+"""
+Django management command to stream users and profiles to CSV or NDJSON.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+
+from apps.authentication.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_rows
+from apps.authentication.filters import filter_users
+
+
+class Command(BaseCommand):
+    """Django command to export users and their profiles."""
+
+    help = "Streams users and their profiles as CSV or NDJSON in constant memory"
+
+    def add_arguments(self, parser):
+        """Add the export options."""
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write to (defaults to stdout)")
+        parser.add_argument("--joined-after", help="ISO date or datetime")
+        parser.add_argument("--joined-before", help="ISO date or datetime")
+        parser.add_argument("--is-active", help="Filter on active status (true/false)")
+        parser.add_argument("--after", type=int, help="Resume after this user id")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        """Write the export to the requested output."""
+        User = get_user_model()
+        try:
+            queryset = filter_users(
+                User.objects.all(),
+                {
+                    "joined_after": options["joined_after"],
+                    "joined_before": options["joined_before"],
+                    "is_active": options["is_active"],
+                },
+            )
+        except serializers.ValidationError as exc:
+            raise CommandError(exc.detail) from exc
+
+        render, _ = EXPORT_FORMATS[options["format"]]
+        rows = export_rows(queryset, after=options["after"], chunk_size=options["chunk_size"])
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as handle:
+                for chunk in render(rows):
+                    handle.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Export written to {options['output']}"))
+        else:
+            for chunk in render(rows):
+                self.stdout.write(chunk, ending="")
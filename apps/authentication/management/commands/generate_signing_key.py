@@ -0,0 +1,50 @@
+"""
+Django management command to create a JWT signing key.
+"""
+
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    """Django command to write a new private key to the signing keys directory."""
+
+    help = "Generates an RS256 or EdDSA JWT signing key named <kid>.pem"
+
+    def add_arguments(self, parser):
+        """Add the key options."""
+        parser.add_argument("--algorithm", choices=["RS256", "EdDSA"], default="RS256")
+        parser.add_argument("--kid", help="Key id (defaults to the current UTC time)")
+        parser.add_argument(
+            "--directory", help="Where to write the key (defaults to JWT_SIGNING_KEYS_DIR)"
+        )
+
+    def handle(self, *args, **options):
+        """Generate the key and write it as PKCS#8 PEM."""
+        directory = options["directory"] or settings.JWT_SIGNING_KEYS_DIR
+        if not directory:
+            raise CommandError("Pass --directory or set JWT_SIGNING_KEYS_DIR")
+        kid = options["kid"] or timezone.now().strftime("%Y%m%d%H%M%S")
+        path = Path(directory) / f"{kid}.pem"
+        if path.exists():
+            raise CommandError(f"{path} already exists")
+
+        if options["algorithm"] == "EdDSA":
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        else:
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch(mode=0o600)
+        path.write_bytes(pem)
+        self.stdout.write(self.style.SUCCESS(f"Signing key {kid} written to {path}"))
@@ -0,0 +1,80 @@
+"""
+Django management command to publish user lifecycle events from the outbox.
+"""
+
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.authentication.outbox import PUBLISHERS, get_publisher, relay
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between attempts while publishing keeps failing, in seconds
+MAX_BACKOFF = 30
+
+
+class Command(BaseCommand):
+    """Django command relaying outbox events to Celery or a Redis stream."""
+
+    help = (
+        "Publishes user lifecycle events from the transactional outbox until stopped; "
+        "several relays can run side by side"
+    )
+
+    def add_arguments(self, parser):
+        """Add the relay options."""
+        parser.add_argument(
+            "--publisher",
+            choices=sorted(PUBLISHERS),
+            help="Where events are published (defaults to OUTBOX_PUBLISHER)",
+        )
+        parser.add_argument("--batch-size", type=int, help="Events claimed per transaction")
+        parser.add_argument(
+            "--poll-interval", type=float, help="Seconds to wait when the outbox is empty"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Publish the pending events and exit"
+        )
+
+    def handle(self, *args, **options):
+        """Relay events until stopped, backing off while publishing fails."""
+        publisher = get_publisher(options["publisher"])
+        batch_size = options["batch_size"] or settings.OUTBOX_BATCH_SIZE
+        poll_interval = options["poll_interval"] or settings.OUTBOX_POLL_INTERVAL
+
+        if options["once"]:
+            published = relay(publisher, batch_size)
+            self.stderr.write(self.style.SUCCESS(f"Published {published} events"))
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        failures = 0
+        while not self.stopping:
+            try:
+                published = relay(publisher, batch_size)
+            except Exception:
+                failures += 1
+                delay = min(poll_interval * 2**failures, MAX_BACKOFF)
+                logger.warning(
+                    "Publishing outbox events failed; retrying in %.1fs", delay, exc_info=True
+                )
+                close_old_connections()
+                time.sleep(delay)
+                continue
+            failures = 0
+            if published:
+                self.stderr.write(f"Published {published} events")
+            else:
+                time.sleep(poll_interval)
+        self.stderr.write("Relay stopped")
+
+    def stop(self, signum, frame):
+        """Finish the current batch, then exit."""
+        self.stopping = True
@@ -0,0 +1,153 @@
+"""
+Django management command to load synthetic users and profiles.
+"""
+
+import multiprocessing
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils.dateparse import parse_date
+
+from apps.authentication.models import User, UserProfile
+from apps.authentication.seeding import (
+    BLOCK_SIZE,
+    create_index,
+    drop_indexes,
+    load_blocks,
+    reserve_user_ids,
+    secondary_indexes,
+)
+
+
+def _setup_worker():
+    """Pool initializer making Django usable in a worker process."""
+    # Spawned workers start without apps; forked ones must not reuse the
+    # parent's connections
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    """Django command to seed users and profiles for performance environments."""
+
+    help = (
+        "Loads deterministic synthetic users and profiles with COPY, using several "
+        "worker processes"
+    )
+
+    def add_arguments(self, parser):
+        """Add the seeding options."""
+        parser.add_argument("count", type=int, help="Number of users to create")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the generated data")
+        parser.add_argument(
+            "--prefix", default="seed", help="Prefix of every username and email address"
+        )
+        parser.add_argument("--password", default="SeedPassword123!", help="Password of all users")
+        parser.add_argument(
+            "--joined-before",
+            help="ISO date the join dates end at (defaults to today); keep it fixed for "
+            "identical data across runs",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=multiprocessing.cpu_count(),
+            help="Worker processes generating and loading rows (Postgres only)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20_000,
+            help=f"Users per COPY transaction, rounded to a multiple of {BLOCK_SIZE}",
+        )
+        parser.add_argument("--max-email-accounts", type=int, default=50)
+        parser.add_argument("--max-signature-size", type=int, default=1000)
+        parser.add_argument(
+            "--rebuild-indexes",
+            action="store_true",
+            help="Drop secondary indexes before loading and rebuild them afterwards",
+        )
+
+    def handle(self, *args, **options):
+        """Generate and load the rows, then report the throughput."""
+        count = options["count"]
+        if count <= 0:
+            raise CommandError("count must be positive")
+        joined_before = datetime.now(timezone.utc).date()
+        if options["joined_before"]:
+            try:
+                joined_before = parse_date(options["joined_before"])
+            except ValueError:
+                joined_before = None
+            if joined_before is None:
+                raise CommandError("--joined-before must be an ISO date")
+
+        postgres = connection.vendor == "postgresql"
+        workers = max(1, options["workers"]) if postgres else 1
+        blocks_per_batch = max(1, options["batch_size"] // BLOCK_SIZE)
+        total_blocks = -(-count // BLOCK_SIZE)
+        batches = [
+            range(start, min(start + blocks_per_batch, total_blocks))
+            for start in range(0, total_blocks, blocks_per_batch)
+        ]
+
+        started = time.perf_counter()
+        prefix = options["prefix"]
+        if User.objects.filter(username__in=[f"{prefix}0", f"{prefix}{count - 1}"]).exists():
+            raise CommandError(f"Users with the prefix {prefix!r} exist; pass another --prefix")
+        load = partial(
+            load_blocks,
+            count=count,
+            seed=options["seed"],
+            prefix=prefix,
+            first_id=reserve_user_ids(count),
+            password_hash=make_password(options["password"]),
+            joined_before=datetime(*joined_before.timetuple()[:3], tzinfo=timezone.utc),
+            max_email_accounts=options["max_email_accounts"],
+            max_signature_size=options["max_signature_size"],
+        )
+        indexes = secondary_indexes() if postgres and options["rebuild_indexes"] else []
+        drop_indexes(indexes)
+
+        loaded = 0
+        try:
+            for users in self.run(load, batches, workers):
+                loaded += users
+                self.progress(loaded, count, started)
+        finally:
+            if indexes:
+                self.stderr.write(f"Rebuilding {len(indexes)} indexes")
+                definitions = [definition for _, definition in indexes]
+                list(self.run(create_index, definitions, workers))
+
+        if postgres:
+            with connection.cursor() as cursor:
+                for model in (User, UserProfile):
+                    cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {loaded} users and profiles in {elapsed:.1f}s "
+                f"({2 * loaded / elapsed:,.0f} rows/s)"
+            )
+        )
+
+    def run(self, func, items, workers):
+        """Yield ``func(item)`` for each item, in worker processes if there are several."""
+        if workers == 1:
+            yield from map(func, items)
+            return
+        connections.close_all()
+        with multiprocessing.Pool(workers, initializer=_setup_worker) as pool:
+            yield from pool.imap_unordered(func, items)
+
+    def progress(self, loaded, count, started):
+        """Report how many users are loaded so far."""
+        rate = 2 * loaded / (time.perf_counter() - started)
+        self.stderr.write(f"{loaded}/{count} users ({rate:,.0f} rows/s)")
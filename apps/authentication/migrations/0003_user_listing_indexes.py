@@ -0,0 +1,24 @@
+# Generated by Django 5.1.8 on 2026-10-19 13:16
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0002_user'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['date_joined', 'id'], name='auth_user_joined_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['is_active', 'date_joined', 'id'], name='auth_user_active_joined_idx'),
+        ),
+    ]
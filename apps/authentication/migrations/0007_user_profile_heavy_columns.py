@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:36
+
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+HEAVY_COLUMNS = ("email_signature", "email_accounts")
+
+# PostgreSQL's error code for a compression method the server was built without
+FEATURE_NOT_SUPPORTED = "0A000"
+
+
+def set_compression(method):
+    """
+    Return a migration function setting the TOAST compression of the heavy
+    profile columns.
+
+    Large values are already compressed and stored out of line by Postgres;
+    lz4 (Postgres 14+) compresses and decompresses faster than the default
+    pglz. Servers built without lz4 keep pglz.
+    """
+
+    def migrate(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor != "postgresql" or connection.pg_version < 140000:
+            return
+        model = apps.get_model("authentication", "UserProfile")
+        table = schema_editor.quote_name(model._meta.db_table)
+        columns = ", ".join(
+            f"ALTER COLUMN {schema_editor.quote_name(column)} SET COMPRESSION {method}"
+            for column in HEAVY_COLUMNS
+        )
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                schema_editor.execute(f"ALTER TABLE {table} {columns}")
+        except DatabaseError as error:
+            if getattr(error.__cause__, "pgcode", None) != FEATURE_NOT_SUPPORTED:
+                raise
+            logger.warning("Keeping the default compression of %s: %s", table, error)
+
+    return migrate
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_user_profile_version'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='userprofile',
+            options={'base_manager_name': 'objects'},
+        ),
+        migrations.RunPython(set_compression("lz4"), set_compression("default")),
+    ]
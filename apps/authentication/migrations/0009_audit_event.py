@@ -0,0 +1,74 @@
+# Generated by Django 5.1.15 on 2026-10-19 14:30
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_audit_table(apps, schema_editor):
+    """
+    Create the audit table, partitioned by month on PostgreSQL.
+
+    A partitioned table's primary key must include the partition column, so
+    it is ``(created_at, id)``. Partitions are created by
+    ``apps.authentication.audit`` before events of a new month are written.
+    """
+    model = apps.get_model("authentication", "AuditEvent")
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(model)
+        return
+    table = schema_editor.quote_name(model._meta.db_table)
+    schema_editor.execute(
+        f"""
+        CREATE TABLE {table} (
+            "id" bigint GENERATED BY DEFAULT AS IDENTITY,
+            "created_at" timestamp with time zone NOT NULL,
+            "action" varchar(64) NOT NULL,
+            "user_id" bigint NOT NULL,
+            "actor_id" bigint NULL,
+            "changes" jsonb NOT NULL,
+            "request_id" varchar(128) NULL,
+            PRIMARY KEY ("created_at", "id")
+        ) PARTITION BY RANGE ("created_at")
+        """
+    )
+    schema_editor.execute(
+        f'CREATE INDEX "auth_audit_user_idx" ON {table} ("user_id", "created_at", "id")'
+    )
+
+
+def drop_audit_table(apps, schema_editor):
+    """Drop the audit table with its partitions."""
+    schema_editor.delete_model(apps.get_model("authentication", "AuditEvent"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0008_outbox_event'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='AuditEvent',
+                    fields=[
+                        ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                        ('action', models.CharField(max_length=64)),
+                        ('user_id', models.BigIntegerField()),
+                        ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                        ('changes', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                        ('request_id', models.CharField(blank=True, max_length=128, null=True)),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['user_id', 'created_at', 'id'], name='auth_audit_user_idx')],
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_audit_table, drop_audit_table),
+            ],
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.1.15 on 2026-10-19 14:45
+
+import apps.authentication.models
+import django.db.models.functions.text
+from django.db import migrations, models
+
+from apps.authentication.backfill import BACKFILLS, run_backfill
+
+INDEX_NAME = 'auth_user_email_lower_uniq'
+
+EMAIL_CONSTRAINT = models.UniqueConstraint(
+    django.db.models.functions.text.Lower('email'), name=INDEX_NAME
+)
+
+
+def lowercase_emails(apps, schema_editor):
+    """Lowercase existing email addresses in throttled, resumable batches."""
+    result = run_backfill(BACKFILLS['lowercase_emails'], apps=apps)
+    if result.get('skipped'):
+        raise RuntimeError("The lowercase_emails backfill is running elsewhere; migrate again later")
+
+
+def create_email_index(apps, schema_editor):
+    """
+    Build the unique index on LOWER(email) without blocking writes.
+
+    On PostgreSQL the index is built concurrently. A build that failed leaves
+    an invalid index behind, which is dropped and built again.
+    """
+    User = apps.get_model('authentication', 'User')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.add_constraint(User, EMAIL_CONSTRAINT)
+        return
+
+    table = schema_editor.quote_name(User._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT LOWER(email) FROM {table} GROUP BY 1 HAVING COUNT(*) > 1 LIMIT 20"
+        )
+        duplicates = [row[0] for row in cursor.fetchall()]
+        if duplicates:
+            raise RuntimeError(
+                "Users share these email addresses in different cases; merge or rename "
+                f"them and migrate again: {', '.join(duplicates)}"
+            )
+        cursor.execute(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+            [INDEX_NAME],
+        )
+        row = cursor.fetchone()
+        if row and row[0]:
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{INDEX_NAME}"')
+        cursor.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{INDEX_NAME}" '
+            f'ON {table} (LOWER("email"))'
+        )
+
+
+def drop_email_index(apps, schema_editor):
+    """Drop the unique index on LOWER(email)."""
+    User = apps.get_model('authentication', 'User')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.remove_constraint(User, EMAIL_CONSTRAINT)
+        return
+    schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{INDEX_NAME}"')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0011_backfill_progress'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', apps.authentication.models.UserManager()),
+            ],
+        ),
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop, elidable=True),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(model_name='user', constraint=EMAIL_CONSTRAINT),
+            ],
+            database_operations=[
+                migrations.RunPython(create_email_index, drop_email_index),
+            ],
+        ),
+    ]
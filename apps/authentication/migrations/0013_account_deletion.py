@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0012_case_insensitive_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(unique=True)),
+                ('requested_by', models.BigIntegerField(blank=True, null=True)),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('step', models.CharField(blank=True, max_length=200)),
+                ('rows_deleted', models.JSONField(default=dict)),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('completed_at__isnull', True)), fields=['updated_at'], name='auth_deletion_pending_idx')],
+            },
+        ),
+    ]
@@ -6,17 +6,124 @@ authentication-related functionality.
 """
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import UserManager as BaseUserManager
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.functions import Lower, Upper
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.appsUtils.log import get_request_id
+
+
+class UserManager(BaseUserManager):
+    """
+    User manager treating email addresses as case-insensitive.
+
+    Addresses are stored lowercased, and logins look users up by
+    ``LOWER(email)``, which the ``auth_user_email_lower_uniq`` index serves.
+    """
+
+    @classmethod
+    def normalize_email(cls, email):
+        """Return the email address lowercased."""
+        return super().normalize_email(email).lower()
+
+    def get_by_natural_key(self, email):
+        """Return the user with an email address, ignoring its case."""
+        return self.alias(email_lower=Lower("email")).get(email_lower=email.lower())
 
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
+    last_seen = models.DateTimeField(blank=True, null=True)
+
+    objects = UserManager()
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        """Meta class for the User model."""
+
+        constraints = [
+            models.UniqueConstraint(Lower("email"), name="auth_user_email_lower_uniq"),
+        ]
+        indexes = [
+            # Keyset pagination and date_joined filters on the user listing
+            models.Index(fields=["date_joined", "id"], name="auth_user_joined_id_idx"),
+            models.Index(
+                fields=["is_active", "date_joined", "id"], name="auth_user_active_joined_idx"
+            ),
+            # Trigram indexes serving icontains search (UPPER(col) LIKE UPPER(...))
+            GinIndex(OpClass(Upper("email"), name="gin_trgm_ops"), name="auth_user_email_trgm_idx"),
+            GinIndex(
+                OpClass(Upper("username"), name="gin_trgm_ops"), name="auth_user_username_trgm_idx"
+            ),
+            GinIndex(
+                OpClass(Upper("first_name"), name="gin_trgm_ops"), name="auth_user_first_trgm_idx"
+            ),
+            GinIndex(
+                OpClass(Upper("last_name"), name="gin_trgm_ops"), name="auth_user_last_trgm_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Save the user and its outbox event in one transaction."""
+        if self.email:
+            self.email = UserManager.normalize_email(self.email)
+        with transaction.atomic(using=kwargs.get("using"), savepoint=False):
+            super().save(*args, **kwargs)
+
+
+# Profile columns that can grow large and are only loaded on request
+HEAVY_PROFILE_FIELDS = ("email_signature", "email_accounts")
+
+
+class UserProfileQuerySet(models.QuerySet):
+    """
+    Queryset that leaves the heavy profile columns out unless asked for.
+    """
+
+    def _undefer(self, *fields):
+        """
+        Stop deferring the given columns.
+
+        Querysets narrowed with ``only()`` are returned unchanged, as their
+        columns were chosen explicitly.
+        """
+        clone = self._chain()
+        deferred, defer = clone.query.deferred_loading
+        if defer:
+            clone.query.deferred_loading = deferred.difference(fields), True
+        return clone
+
+    def with_signature(self):
+        """Load the email signature."""
+        return self._undefer("email_signature")
+
+    def with_email_accounts(self):
+        """Load the connected email accounts."""
+        return self._undefer("email_accounts")
+
+    def with_heavy_fields(self):
+        """Load every column."""
+        return self._undefer(*HEAVY_PROFILE_FIELDS)
+
+
+class UserProfileManager(models.Manager.from_queryset(UserProfileQuerySet)):
+    """
+    Manager that defers the heavy profile columns by default.
+
+    It is also the base manager, so ``user.profile`` is deferred as well.
+    """
+
+    def get_queryset(self):
+        """Return profiles without their heavy columns."""
+        return super().get_queryset().defer(*HEAVY_PROFILE_FIELDS)
+
 
 class UserProfile(models.Model):
     """
@@ -35,16 +142,277 @@ class UserProfile(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Incremented on every real change; used as the profile's ETag
+    version = models.PositiveIntegerField(default=1)
+
+    objects = UserProfileManager()
 
     class Meta:
         """Meta class for the UserProfile model."""
 
         app_label = "authentication"
+        base_manager_name = "objects"
+        indexes = [
+            GinIndex(
+                OpClass(Upper("company_name"), name="gin_trgm_ops"),
+                name="auth_profile_company_trgm_idx",
+            ),
+        ]
 
     def __str__(self):
         """Return a string representation of the user profile."""
         return f"{self.user.username}'s Profile"
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """
+        Reload from the database, including heavy columns that were loaded.
+
+        Columns that are still deferred stay deferred.
+        """
+        if from_queryset is None:
+            from_queryset = type(self).objects.with_heavy_fields()
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    def save(self, *args, **kwargs):
+        """Save the profile and its outbox event in one transaction."""
+        with transaction.atomic(using=kwargs.get("using"), savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class OutboxEvent(models.Model):
+    """
+    A user lifecycle event waiting to be published.
+
+    Events are written in the transaction of the change they describe and
+    deleted by the relay once published (see ``apps.authentication.outbox``).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=64)
+    # The id of the user the event is about
+    key = models.CharField(max_length=64)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    request_id = models.CharField(max_length=128, blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        """Meta class for the OutboxEvent model."""
+
+        app_label = "authentication"
+
+    def __str__(self):
+        """Return a string representation of the event."""
+        return f"{self.topic} {self.key} ({self.pk})"
+
+
+class AuditEvent(models.Model):
+    """
+    A change to a user's profile or email accounts, kept for auditing.
+
+    On PostgreSQL the table is partitioned by month of ``created_at``; rows
+    are written in batches by ``apps.authentication.audit`` and never updated.
+    The user ids are plain columns so the log outlives deleted users.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    action = models.CharField(max_length=64)
+    # The user whose data changed and the user who changed it
+    user_id = models.BigIntegerField()
+    actor_id = models.BigIntegerField(blank=True, null=True)
+    changes = models.JSONField(encoder=DjangoJSONEncoder)
+    request_id = models.CharField(max_length=128, blank=True, null=True)
+
+    class Meta:
+        """Meta class for the AuditEvent model."""
+
+        app_label = "authentication"
+        indexes = [
+            models.Index(fields=["user_id", "created_at", "id"], name="auth_audit_user_idx"),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the event."""
+        return f"{self.action} {self.user_id} ({self.pk})"
+
+
+class BackfillProgress(models.Model):
+    """
+    The checkpoint of a batched backfill (see ``apps.authentication.backfill``).
+
+    It is saved in the transaction of every batch, so an interrupted backfill
+    resumes after the last batch that committed.
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    # Primary key of the last row updated
+    last_key = models.BigIntegerField(blank=True, null=True)
+    rows_updated = models.BigIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the BackfillProgress model."""
+
+        app_label = "authentication"
+        verbose_name_plural = "backfill progress"
+
+    def __str__(self):
+        """Return a string representation of the checkpoint."""
+        return f"{self.name} after {self.last_key}"
+
+
+class AccountDeletion(models.Model):
+    """
+    The progress of deleting a deactivated user's account in batches.
+
+    Dependent rows are deleted by ``apps.authentication.deletion`` in
+    batches that each update this row in their transaction, so a deletion
+    interrupted by a crash resumes where it stopped. The user id is a plain
+    column so the record outlives the user.
+    """
+
+    user_id = models.BigIntegerField(unique=True)
+    # The user who asked for the deletion
+    requested_by = models.BigIntegerField(blank=True, null=True)
+    requested_at = models.DateTimeField(default=timezone.now)
+    # The table being emptied, as app_label.ModelName
+    step = models.CharField(max_length=200, blank=True)
+    # Rows deleted per table
+    rows_deleted = models.JSONField(default=dict)
+    batches = models.PositiveIntegerField(default=0)
+    runs = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the AccountDeletion model."""
+
+        app_label = "authentication"
+        indexes = [
+            models.Index(
+                fields=["updated_at"],
+                name="auth_deletion_pending_idx",
+                condition=models.Q(completed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the deletion."""
+        state = "completed" if self.completed_at else self.step or "pending"
+        return f"Deletion of user {self.user_id} ({state})"
+
+
+class WebhookEndpoint(models.Model):
+    """
+    A URL that user lifecycle events are posted to.
+
+    Events are delivered in signed batches (see ``apps.authentication.webhooks``).
+    """
+
+    url = models.URLField(max_length=500)
+    # Key of the HMAC signature sent with every batch
+    secret = models.CharField(max_length=128)
+    # Event topics delivered, such as "user.created"; empty for all
+    topics = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    max_concurrency = models.PositiveSmallIntegerField(
+        default=2, help_text="Deliveries to this endpoint in flight at once"
+    )
+    batch_size = models.PositiveSmallIntegerField(
+        default=100, help_text="Events posted per request"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Meta class for the WebhookEndpoint model."""
+
+        app_label = "authentication"
+
+    def __str__(self):
+        """Return a string representation of the endpoint."""
+        return self.url
+
+    def subscribes_to(self, topic):
+        """Whether events of a topic are delivered to this endpoint."""
+        return not self.topics or topic in self.topics
+
+
+class WebhookDelivery(models.Model):
+    """
+    An event waiting to be delivered to an endpoint.
+
+    Rows are deleted once delivered; those still failing after the last
+    attempt stay behind as dead letters.
+    """
+
+    PENDING = "pending"
+    DEAD = "dead"
+    STATUS_CHOICES = [(PENDING, "Pending"), (DEAD, "Dead")]
+
+    id = models.BigAutoField(primary_key=True)
+    endpoint = models.ForeignKey(
+        WebhookEndpoint, on_delete=models.CASCADE, related_name="deliveries"
+    )
+    event = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        """Meta class for the WebhookDelivery model."""
+
+        app_label = "authentication"
+        verbose_name_plural = "webhook deliveries"
+        indexes = [
+            # Due pending deliveries of an endpoint, oldest first
+            models.Index(
+                fields=["endpoint", "next_attempt_at", "id"],
+                name="auth_webhook_due_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the delivery."""
+        return f"{self.event.get('topic')} to {self.endpoint_id} ({self.status})"
+
+
+# Fields of the user sent with its events; never credentials
+USER_EVENT_FIELDS = ("email", "username", "first_name", "last_name", "is_active")
+
+# Bookkeeping columns left out of the changed fields of profile events
+PROFILE_BOOKKEEPING_FIELDS = {"version", "updated_at"}
+
+
+def record_event(topic, key, payload, using=None):
+    """
+    Write an event to the outbox in the current transaction.
+
+    Args:
+        topic: The event type, such as ``"user.created"``
+        key: The id of the user the event is about
+        payload: JSON-serializable event data
+        using: The database alias to write to
+
+    Returns:
+        OutboxEvent: The saved event
+    """
+    return OutboxEvent.objects.using(using).create(
+        topic=topic, key=str(key), payload=payload, request_id=get_request_id()
+    )
+
+
+def record_user_event(topic, user, update_fields=None, using=None):
+    """Write a ``user.*`` event with the user's public fields to the outbox."""
+    payload = {"user_id": user.pk, **{field: getattr(user, field) for field in USER_EVENT_FIELDS}}
+    payload["fields"] = sorted(update_fields) if update_fields is not None else None
+    return record_event(topic, user.pk, payload, using=using)
+
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -53,11 +421,30 @@ def create_user_profile(sender, instance, created, **kwargs):
     """
     if created:
         UserProfile.objects.create(user=instance)
+        record_user_event("user.created", instance, using=kwargs.get("using"))
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def record_user_update(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal to record user updates in the outbox
+
+    The profile holds no user columns, so it is not saved along with the user.
     """
-    Signal to save the user profile when the user is saved
+    if not created:
+        record_user_event("user.updated", instance, update_fields, using=kwargs.get("using"))
+
+
+@receiver(post_save, sender=UserProfile)
+def record_profile_update(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal to record targeted profile updates in the outbox
+
+    Only saves naming their ``update_fields`` are recorded; a profile is saved
+    whole when it is created, which ``user.created`` already covers.
     """
-    instance.profile.save()
+    if created or update_fields is None:
+        return
+    fields = sorted(set(update_fields) - PROFILE_BOOKKEEPING_FIELDS)
+    payload = {"user_id": instance.user_id, "fields": fields, "version": instance.version}
+    record_event("user.profile_updated", instance.user_id, payload, using=kwargs.get("using"))
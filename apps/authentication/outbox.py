@@ -0,0 +1,180 @@
+"""
+Relay of user lifecycle events from the transactional outbox.
+
+``OutboxEvent`` rows are written by the user and profile signals in the same
+transaction as the change they describe, so an event exists exactly when its
+change was committed. The relay claims the oldest rows in batches with
+``SELECT ... FOR UPDATE SKIP LOCKED``, publishes each batch in bulk to Celery
+or to a Redis stream and deletes the rows in the same transaction. Relays
+running side by side claim different rows instead of waiting on each other.
+
+Delivery is at least once: if publishing fails the batch is rolled back and
+published again later, and if the commit fails after publishing, the events
+are published twice. Consumers use the event ``id`` to ignore repeats. Events
+are published in id order by a single relay; with several relays, events of
+the same user may be delivered out of order.
+"""
+
+import json
+import logging
+
+from celery import current_app
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.dispatch import Signal
+
+from apps.appsUtils.redis_client import get_redis
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Sent by the ``handle_user_event`` task for every event published to Celery;
+# receivers get the event document as ``event``
+user_event = Signal()
+
+EVENT_FIELDS = ("id", "topic", "key", "payload", "request_id", "created_at")
+
+
+def event_document(row):
+    """
+    Return the published form of an outbox row.
+
+    Args:
+        row: A values dictionary with ``EVENT_FIELDS``
+
+    Returns:
+        dict: The JSON-serializable event
+    """
+    return {**row, "created_at": row["created_at"].isoformat()}
+
+
+class CeleryPublisher:
+    """
+    Publish events as ``OUTBOX_CELERY_TASK`` tasks, one per event.
+
+    A batch is sent over a single producer connection, and every task id is
+    derived from the event id so retried deliveries are recognisable.
+    """
+
+    def __init__(self, task_name=None, app=None):
+        """
+        Args:
+            task_name: The task receiving each event, defaults to the setting
+            app: The Celery app, defaults to the current app
+        """
+        self.task_name = task_name or settings.OUTBOX_CELERY_TASK
+        self.app = app or current_app
+
+    def publish(self, events):
+        """Send one task per event."""
+        with self.app.producer_or_acquire() as producer:
+            for event in events:
+                self.app.send_task(
+                    self.task_name,
+                    args=[event],
+                    task_id=f"outbox-{event['id']}",
+                    producer=producer,
+                )
+
+
+class RedisStreamPublisher:
+    """
+    Append events to the ``OUTBOX_STREAM`` Redis stream in one round trip.
+
+    The stream is capped at about ``OUTBOX_STREAM_MAXLEN`` entries.
+    """
+
+    def __init__(self, stream=None, maxlen=None, client=None):
+        """
+        Args:
+            stream: The stream key, defaults to the setting
+            maxlen: Approximate stream length kept, defaults to the setting
+            client: The Redis client, defaults to the shared client
+        """
+        self.stream = stream or settings.OUTBOX_STREAM
+        self.maxlen = maxlen or settings.OUTBOX_STREAM_MAXLEN
+        self.client = client
+
+    def publish(self, events):
+        """Append the events with XADD; Redis errors propagate to the relay."""
+        pipeline = (self.client or get_redis()).pipeline(transaction=False)
+        for event in events:
+            fields = {
+                **{key: str(event[key]) for key in ("id", "topic", "key", "created_at")},
+                "request_id": event["request_id"] or "",
+                "payload": json.dumps(event["payload"], cls=DjangoJSONEncoder),
+            }
+            pipeline.xadd(self.stream, fields, maxlen=self.maxlen, approximate=True)
+        pipeline.execute()
+
+
+PUBLISHERS = {
+    "celery": CeleryPublisher,
+    "redis": RedisStreamPublisher,
+}
+
+
+def get_publisher(name=None):
+    """
+    Return a publisher by name.
+
+    Args:
+        name: ``"celery"`` or ``"redis"``, defaults to ``OUTBOX_PUBLISHER``
+
+    Returns:
+        The publisher
+    """
+    return PUBLISHERS[name or settings.OUTBOX_PUBLISHER]()
+
+
+def relay_batch(publisher, batch_size=None):
+    """
+    Claim, publish and delete the oldest unclaimed events.
+
+    Args:
+        publisher: Object whose ``publish(events)`` sends the batch
+        batch_size: Maximum events per batch, defaults to ``OUTBOX_BATCH_SIZE``
+
+    Returns:
+        int: The number of events published
+
+    Raises:
+        Exception: Whatever the publisher raised; the events stay in the outbox
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        rows = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .order_by("pk")
+            .values(*EVENT_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        publisher.publish([event_document(row) for row in rows])
+        OutboxEvent.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+    return len(rows)
+
+
+def relay(publisher, batch_size=None, max_batches=None):
+    """
+    Publish pending events until the outbox has no full batch left.
+
+    Args:
+        publisher: Object whose ``publish(events)`` sends a batch
+        batch_size: Maximum events per batch, defaults to ``OUTBOX_BATCH_SIZE``
+        max_batches: Stop after this many batches, defaults to no limit
+
+    Returns:
+        int: The number of events published
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    published = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = relay_batch(publisher, batch_size)
+        published += count
+        batches += 1
+        if count < batch_size:
+            break
+    return published
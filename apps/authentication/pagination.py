@@ -0,0 +1,203 @@
+"""
+Pagination classes for user listings.
+
+This module contains a keyset paginator for the API, which never issues
+``OFFSET`` or ``COUNT(*)`` queries, and a Django paginator for the admin that
+falls back to the planner's row estimate on large, unfiltered tables.
+"""
+
+import base64
+import json
+from urllib.parse import urlencode
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination on a ``(datetime field, id)`` pair.
+
+    Results are ordered newest first. The cursor is an opaque token encoding the
+    position of the last row on the page, so each page is a single index range
+    scan regardless of how deep the client has paged.
+    """
+
+    ordering_field = "date_joined"
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return a single page of results after the requested cursor.
+
+        Args:
+            queryset: The queryset to paginate
+            request: The HTTP request object
+            view: The view being paginated
+
+        Returns:
+            list: The objects on the requested page
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f"{self.ordering_field}__lte": value}),
+                Q(**{f"{self.ordering_field}__lt": value}) | Q(pk__lt=pk),
+            )
+
+        queryset = queryset.order_by(f"-{self.ordering_field}", "-pk")
+        results = list(queryset[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+        self.last = results[-1] if results else None
+        return results
+
+    def get_page_size(self, request):
+        """
+        Return the page size requested by the client, capped at the maximum.
+
+        Args:
+            request: The HTTP request object
+
+        Returns:
+            int: The number of results per page
+        """
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        """
+        Decode the position encoded in the request's cursor.
+
+        Args:
+            request: The HTTP request object
+
+        Returns:
+            tuple: The ordering value and primary key, or None without a cursor
+
+        Raises:
+            NotFound: If the cursor cannot be decoded
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw, pk = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            value = parse_datetime(raw)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def encode_cursor(self, instance):
+        """
+        Encode the position of an instance as a cursor token.
+
+        Args:
+            instance: The last object on the current page
+
+        Returns:
+            str: The cursor token
+        """
+        position = [getattr(instance, self.ordering_field).isoformat(), instance.pk]
+        return base64.urlsafe_b64encode(json.dumps(position).encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        """Return the URL of the next page, or None on the last page."""
+        if not self.has_next or self.last is None:
+            return None
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = self.encode_cursor(self.last)
+        return self.request.build_absolute_uri(f"{self.request.path}?{urlencode(params, True)}")
+
+    def get_paginated_response(self, data):
+        """Wrap a page of serialized data with the link to the next page."""
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        """Describe the paginated response for the API schema."""
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class AuditKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination of audit events, newest first.
+
+    Each page only scans the partitions up to its cursor.
+    """
+
+    ordering_field = "created_at"
+    page_size = 100
+    max_page_size = 1000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the Postgres row estimate for large unfiltered tables.
+
+    An exact ``COUNT(*)`` is a full scan on Postgres. When the queryset has no
+    filters and ``pg_class.reltuples`` reports more rows than
+    ``estimate_threshold``, the estimate is used instead.
+    """
+
+    estimate_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        """Return the estimated or exact number of objects."""
+        estimate = self.estimated_count()
+        if estimate is not None and estimate > self.estimate_threshold:
+            return estimate
+        return super().count
+
+    def estimated_count(self):
+        """
+        Read the planner's row estimate for an unfiltered queryset.
+
+        Returns:
+            int: The estimated row count, or None when no estimate applies
+        """
+        queryset = self.object_list
+        query = getattr(queryset, "query", None)
+        if query is None or query.where:
+            return None
+
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < 0:
+            return None
+        return int(row[0])
@@ -0,0 +1,375 @@
+"""
+Revocation store for JWTs.
+
+Revoked tokens are recorded in Redis under their ``jti`` with a TTL equal to
+the token's remaining lifetime, so the store never grows past the set of
+unexpired revoked tokens. Each revocation also sets bits in a Bloom filter
+bitmap per expiry day and is appended to an event stream.
+
+Every process keeps a local copy of the Bloom filters, kept current by
+reading the event stream at most once per ``TOKEN_REVOCATION_SYNC_INTERVAL``
+seconds. A token missing from the local filter is not revoked and needs no
+Redis round trip; only filter hits are confirmed against Redis. At the default
+capacity of one million revocations per day and a 0.1% false positive rate a
+filter takes about 1.8 MB per process.
+
+Revoking all of a user's sessions increments a per-user generation counter.
+Tokens carry the generation they were issued under in the ``gen`` claim and
+are rejected once it falls behind.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+
+import redis
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+
+from apps.appsUtils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CLAIM = "gen"
+
+KEY_PREFIX = "auth:revoked"
+GENERATIONS_KEY = f"{KEY_PREFIX}:generations"
+EVENTS_KEY = f"{KEY_PREFIX}:events"
+EVENTS_MAX_LENGTH = 100_000
+SYNC_BATCH_SIZE = 1000
+
+BUCKET_SECONDS = 86400
+
+
+class BloomFilter:
+    """
+    Bloom filter whose bit layout matches a Redis bitmap built with ``SETBIT``.
+    """
+
+    def __init__(self, size, hash_count, bits=None):
+        """
+        Create an empty filter or wrap an existing bitmap.
+
+        Args:
+            size: Number of bits in the filter
+            hash_count: Number of bit positions per item
+            bits: Existing bitmap bytes, shorter bitmaps are zero-padded
+        """
+        self.size = size
+        self.hash_count = hash_count
+        self.bits = bytearray((size + 7) // 8)
+        if bits:
+            self.bits[: len(bits)] = bits[: len(self.bits)]
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        """
+        Create a filter sized for a number of items at a false positive rate.
+
+        Args:
+            capacity: Expected number of items
+            error_rate: Acceptable false positive probability
+
+        Returns:
+            BloomFilter: An empty filter
+        """
+        size, hash_count = cls.dimensions(capacity, error_rate)
+        return cls(size, hash_count)
+
+    @staticmethod
+    def dimensions(capacity, error_rate):
+        """
+        Return the optimal bit count and hash count for a capacity.
+
+        Args:
+            capacity: Expected number of items
+            error_rate: Acceptable false positive probability
+
+        Returns:
+            tuple: The number of bits and the number of hashes
+        """
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return size, hash_count
+
+    def positions(self, item):
+        """
+        Return the bit positions for an item using double hashing.
+
+        Args:
+            item: The string to hash
+
+        Returns:
+            list: The bit offsets
+        """
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+    def add(self, item):
+        """Add an item to the filter."""
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 0x80 >> (position & 7)
+
+    def __contains__(self, item):
+        """Return whether the item may have been added."""
+        return all(
+            self.bits[position >> 3] & (0x80 >> (position & 7))
+            for position in self.positions(item)
+        )
+
+
+def _bucket(exp):
+    """Return the expiry-day bucket for a token expiry timestamp."""
+    return int(exp) // BUCKET_SECONDS
+
+
+def _bloom_key(bucket):
+    """Return the Redis bitmap key for a bucket."""
+    return f"{KEY_PREFIX}:bloom:{bucket}"
+
+
+def _token_key(jti):
+    """Return the Redis key recording a revoked jti."""
+    return f"{KEY_PREFIX}:jti:{jti}"
+
+
+def _new_filter(bits=None):
+    """Create a filter with the configured dimensions."""
+    size, hash_count = BloomFilter.dimensions(
+        settings.TOKEN_REVOCATION_BLOOM_CAPACITY, settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE
+    )
+    return BloomFilter(size, hash_count, bits)
+
+
+class RevocationCache:
+    """
+    Per-process copy of the revocation Bloom filters and user generations.
+    """
+
+    def __init__(self):
+        """Create an empty cache that bootstraps on first use."""
+        self.filters = {}
+        self.generations = {}
+        self.last_event_id = None
+        self.synced_at = None
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """Forget all local state so the next sync bootstraps from Redis."""
+        with self.lock:
+            self.filters = {}
+            self.generations = {}
+            self.last_event_id = None
+            self.synced_at = None
+
+    def add_token(self, bucket, jti):
+        """Record a revoked jti in the local filter for its bucket."""
+        token_filter = self.filters.get(bucket)
+        if token_filter is None:
+            token_filter = self.filters[bucket] = _new_filter()
+        token_filter.add(jti)
+
+    def set_generation(self, user_id, generation):
+        """Record a user's token generation if it is newer than the local one."""
+        if generation > self.generations.get(user_id, 0):
+            self.generations[user_id] = generation
+
+    def sync(self, client):
+        """
+        Bring the local state up to date if the sync interval has passed.
+
+        Args:
+            client: The Redis client
+        """
+        now = time.monotonic()
+        if self.synced_at is not None and (
+            now - self.synced_at < settings.TOKEN_REVOCATION_SYNC_INTERVAL
+        ):
+            return
+
+        with self.lock:
+            if self.synced_at is not None and (
+                now - self.synced_at < settings.TOKEN_REVOCATION_SYNC_INTERVAL
+            ):
+                return
+            try:
+                if self.last_event_id is None or not self.apply_events(client):
+                    self.bootstrap(client)
+            except redis.RedisError:
+                logger.warning("Could not sync token revocations", exc_info=True)
+            current = _bucket(time.time())
+            self.filters = {
+                bucket: token_filter
+                for bucket, token_filter in self.filters.items()
+                if bucket >= current
+            }
+            self.synced_at = now
+
+    def bootstrap(self, client):
+        """
+        Load the current filters and generations from Redis.
+
+        The stream position is read first, so events racing with the load are
+        applied again on the next sync, which is harmless.
+
+        Args:
+            client: The Redis client
+        """
+        latest = client.xrevrange(EVENTS_KEY, count=1)
+        last_event_id = latest[0][0] if latest else b"0-0"
+
+        first_bucket = _bucket(time.time())
+        days = math.ceil(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds() / BUCKET_SECONDS)
+        buckets = list(range(first_bucket, first_bucket + days + 1))
+
+        pipeline = client.pipeline(transaction=False)
+        pipeline.hgetall(GENERATIONS_KEY)
+        for bucket in buckets:
+            pipeline.get(_bloom_key(bucket))
+        generations, *bitmaps = pipeline.execute()
+
+        self.generations = {int(user): int(gen) for user, gen in generations.items()}
+        self.filters = {
+            bucket: _new_filter(bits) for bucket, bits in zip(buckets, bitmaps) if bits
+        }
+        self.last_event_id = last_event_id
+
+    def apply_events(self, client):
+        """
+        Apply revocation events recorded since the last sync.
+
+        Args:
+            client: The Redis client
+
+        Returns:
+            bool: False if events were trimmed before they could be read
+        """
+        while True:
+            events = client.xrange(EVENTS_KEY, min=self.last_event_id, count=SYNC_BATCH_SIZE + 1)
+            if self.last_event_id != b"0-0":
+                if not events or events[0][0] != self.last_event_id:
+                    return False
+                events = events[1:]
+            if not events:
+                return True
+
+            for event_id, fields in events:
+                if b"jti" in fields:
+                    self.add_token(int(fields[b"bucket"]), fields[b"jti"].decode())
+                else:
+                    self.set_generation(int(fields[b"user"]), int(fields[b"gen"]))
+                self.last_event_id = event_id
+
+            if len(events) < SYNC_BATCH_SIZE:
+                return True
+
+
+_cache = RevocationCache()
+
+
+def is_revoked(payload):
+    """
+    Return whether a token has been revoked.
+
+    Args:
+        payload: The decoded token payload
+
+    Returns:
+        bool: Whether the token is revoked
+    """
+    client = get_redis()
+    _cache.sync(client)
+
+    user_id = payload.get(api_settings.USER_ID_CLAIM)
+    if user_id is not None and payload.get(GENERATION_CLAIM, 0) < _cache.generations.get(
+        int(user_id), 0
+    ):
+        return True
+
+    jti = payload.get(api_settings.JTI_CLAIM)
+    token_filter = _cache.filters.get(_bucket(payload["exp"]))
+    if jti is None or token_filter is None or jti not in token_filter:
+        return False
+
+    try:
+        return bool(client.exists(_token_key(jti)))
+    except redis.RedisError:
+        # A filter hit that cannot be confirmed is treated as revoked
+        logger.warning("Could not confirm revocation of %s", jti, exc_info=True)
+        return True
+
+
+def revoke_token(payload):
+    """
+    Revoke a token until it expires.
+
+    Args:
+        payload: The decoded token payload
+
+    Returns:
+        bool: True if the token was revoked by this call, False if it already was
+    """
+    jti = payload[api_settings.JTI_CLAIM]
+    exp = int(payload["exp"])
+    bucket = _bucket(exp)
+    token_filter = _new_filter()
+
+    pipeline = get_redis().pipeline(transaction=True)
+    pipeline.set(_token_key(jti), 1, nx=True, ex=max(1, exp - int(time.time())))
+    for position in token_filter.positions(jti):
+        pipeline.setbit(_bloom_key(bucket), position, 1)
+    pipeline.expireat(_bloom_key(bucket), (bucket + 2) * BUCKET_SECONDS)
+    pipeline.xadd(
+        EVENTS_KEY, {"jti": jti, "bucket": bucket}, maxlen=EVENTS_MAX_LENGTH, approximate=True
+    )
+    newly_revoked = pipeline.execute()[0]
+
+    _cache.add_token(bucket, jti)
+    return bool(newly_revoked)
+
+
+def current_generation(user_id):
+    """
+    Return the token generation new tokens for a user should carry.
+
+    This reads Redis directly so tokens issued right after a revocation in
+    another process are not born revoked.
+
+    Args:
+        user_id: The primary key of the user
+
+    Returns:
+        int: The user's current generation
+    """
+    try:
+        generation = get_redis().hget(GENERATIONS_KEY, user_id)
+    except redis.RedisError:
+        logger.warning("Could not read token generation for %s", user_id, exc_info=True)
+        return _cache.generations.get(int(user_id), 0)
+    return int(generation or 0)
+
+
+def revoke_user_sessions(user_id):
+    """
+    Revoke every token issued to a user so far.
+
+    Args:
+        user_id: The primary key of the user
+
+    Returns:
+        int: The user's new generation
+    """
+    client = get_redis()
+    generation = client.hincrby(GENERATIONS_KEY, user_id, 1)
+    client.xadd(
+        EVENTS_KEY,
+        {"user": user_id, "gen": generation},
+        maxlen=EVENTS_MAX_LENGTH,
+        approximate=True,
+    )
+    _cache.set_generation(int(user_id), generation)
+    return generation
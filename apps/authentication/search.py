@@ -0,0 +1,56 @@
+"""
+Trigram-backed user search.
+
+This module contains the user search used by the admin and the search API.
+Matching uses ``icontains``, which Postgres compiles to
+``UPPER(column) LIKE UPPER('%term%')`` and serves from the GIN trigram indexes
+declared on ``User`` and ``UserProfile``. On Postgres, results are ranked by
+trigram word similarity across the searched fields.
+"""
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import UserProfile
+
+# Trigram indexes cannot narrow patterns shorter than one trigram
+MIN_SEARCH_LENGTH = 3
+
+USER_SEARCH_FIELDS = ("email", "username", "first_name", "last_name")
+
+
+def search_users(queryset, term, rank=True):
+    """
+    Filter users matching a search term in any searchable field.
+
+    The user columns and the profile's ``company_name`` are matched in two
+    branches of a ``UNION`` so that each branch can be answered from its own
+    trigram indexes; a single ``OR`` across the join would force a scan.
+
+    Args:
+        queryset: The User queryset to search
+        term: The search term
+        rank: Whether to annotate and order by relevance
+
+    Returns:
+        QuerySet: The matching users, best matches first when ranked
+    """
+    term = term.strip()
+    condition = Q()
+    for field in USER_SEARCH_FIELDS:
+        condition |= Q(**{f"{field}__icontains": term})
+    matches = (
+        queryset.model._default_manager.filter(condition)
+        .values("pk")
+        .union(UserProfile.objects.filter(company_name__icontains=term).values("user_id"))
+    )
+    queryset = queryset.filter(pk__in=matches)
+
+    if not rank or connections[queryset.db].vendor != "postgresql":
+        return queryset
+
+    similarities = [TrigramWordSimilarity(term, field) for field in USER_SEARCH_FIELDS]
+    similarities.append(Coalesce(TrigramWordSimilarity(term, "profile__company_name"), 0.0))
+    return queryset.annotate(rank=Greatest(*similarities)).order_by("-rank", "pk")
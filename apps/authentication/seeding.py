@@ -0,0 +1,312 @@
+"""
+Deterministic bulk seeding of users and profiles.
+
+This module generates synthetic ``User`` and ``UserProfile`` rows for
+performance environments and loads them with ``COPY`` on Postgres. Rows are
+produced in fixed-size blocks, each from its own random generator seeded with
+the run's seed and the block number, so the same seed yields the same data
+whatever the number of worker processes or the load batch size. All users
+share one precomputed password hash. The benchmark factories build their
+users and profiles from the same names and field generators.
+"""
+
+import io
+import json
+import random
+from datetime import timedelta
+
+from django.db import connection, transaction
+
+from .models import User, UserProfile
+
+# Rows generated from one random generator; batches are multiples of this
+BLOCK_SIZE = 1000
+
+USER_COLUMNS = (
+    "id",
+    "password",
+    "last_login",
+    "is_superuser",
+    "username",
+    "first_name",
+    "last_name",
+    "email",
+    "is_staff",
+    "is_active",
+    "date_joined",
+    "last_seen",
+)
+PROFILE_COLUMNS = (
+    "user_id",
+    "company_name",
+    "phone_number",
+    "email_signature",
+    "email_accounts",
+    "created_at",
+    "updated_at",
+    "version",
+)
+
+FIRST_NAMES = (
+    "Ada Alan Amara Barbara Carlos Chen Claude Dennis Donald Edsger Elena Fatima Frances "
+    "Grace Hiro Ines John Ken Leslie Lina Margaret Mateo Niklaus Noor Olga Priya Radia Sven "
+    "Tim Yusuf"
+).split()
+LAST_NAMES = (
+    "Allen Berners-Lee Dijkstra Garcia Hamilton Hopper Ivanova Kim Knuth Lamport Liskov "
+    "Lovelace McCarthy Nakamura Okafor Patel Perlman Ritchie Rossi Shannon Silva Thompson "
+    "Turing Wirth"
+).split()
+COMPANY_WORDS = (
+    "Analytical Atlas Blue Cloud Data Difference Engines Global Harbor Labs Mail North "
+    "Orbit Signal Systems Works"
+).split()
+PROVIDERS = ("smtp", "gmail", "outlook", "yahoo")
+
+
+def _email_account(rng, index):
+    """Return one connected email account entry, as an address and settings pair."""
+    provider = rng.choice(PROVIDERS)
+    return f"inbox{index}@example.com", {
+        "provider": provider,
+        "smtp_server": f"smtp.{provider}.example.com",
+        "smtp_port": rng.choice((25, 465, 587)),
+        "imap_server": f"imap.{provider}.example.com",
+        "imap_port": 993,
+        "use_tls": True,
+        "is_active": rng.random() < 0.9,
+    }
+
+
+def email_accounts(rng, count):
+    """Return an ``email_accounts`` mapping with ``count`` connected accounts."""
+    return dict(_email_account(rng, index) for index in range(count))
+
+
+def company_name(rng):
+    """Return a company name of two words."""
+    return f"{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)}"
+
+
+def phone_number(rng):
+    """Return a phone number in the 555 range."""
+    return f"+1 555 {rng.randrange(10_000_000):07d}"
+
+
+def email_signature(first_name, last_name):
+    """Return the unpadded email signature of a user."""
+    return f"Regards,\n{first_name} {last_name}\n"
+
+
+def generate_block(
+    block,
+    count,
+    seed,
+    prefix,
+    first_id,
+    password_hash,
+    joined_before,
+    max_email_accounts=50,
+    max_signature_size=1000,
+):
+    """
+    Generate the user and profile rows of one block.
+
+    Args:
+        block: The block number; the block holds seed indexes
+            ``block * BLOCK_SIZE`` up to the next block
+        count: The total number of users seeded, which truncates the last block
+        seed: The run's seed
+        prefix: Prefix of every username and email address
+        first_id: The primary key of the user with seed index 0
+        password_hash: The hashed password shared by all users
+        joined_before: Latest join date; users joined up to two years before it
+        max_email_accounts: Upper bound of connected accounts per profile
+        max_signature_size: Upper bound of the email signature length
+
+    Returns:
+        tuple: Lists of user rows and profile rows, in ``USER_COLUMNS`` and
+        ``PROFILE_COLUMNS`` order
+    """
+    rng = random.Random(f"{seed}:{block}")
+    users, profiles = [], []
+    start = block * BLOCK_SIZE
+    for index in range(start, min(start + BLOCK_SIZE, count)):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        age = rng.randrange(2 * 365 * 86400)
+        # Formatted once, as each timestamp is loaded into several columns
+        joined = str(joined_before - timedelta(seconds=age))
+        seen = str(joined_before - timedelta(seconds=rng.randrange(age + 1)))
+        active = rng.random() < 0.97
+        users.append(
+            (
+                first_id + index,
+                password_hash,
+                seen if rng.random() < 0.7 else None,
+                False,
+                f"{prefix}{index}",
+                first_name,
+                last_name,
+                f"{prefix}{index}@example.com",
+                False,
+                active,
+                joined,
+                seen if active else None,
+            )
+        )
+
+        # Most profiles have a couple of accounts, a long tail has dozens
+        accounts = min(int(rng.expovariate(0.5)), max_email_accounts)
+        signature = email_signature(first_name, last_name)
+        profiles.append(
+            (
+                first_id + index,
+                company_name(rng),
+                phone_number(rng),
+                signature.ljust(rng.randrange(len(signature), max_signature_size + 1), "-"),
+                json.dumps(email_accounts(rng, accounts)),
+                joined,
+                seen,
+                1,
+            )
+        )
+    return users, profiles
+
+
+def reserve_user_ids(count):
+    """
+    Reserve a contiguous range of user primary keys.
+
+    On Postgres the id sequence is advanced past the range, so rows inserted
+    later by the application do not collide with seeded ones.
+
+    Args:
+        count: Number of ids to reserve
+
+    Returns:
+        int: The first reserved id
+    """
+    table = connection.ops.quote_name(User._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor != "postgresql":
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+            return cursor.fetchone()[0] + 1
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST("
+            f"(SELECT COALESCE(MAX(id), 0) FROM {table}), "
+            f"nextval(pg_get_serial_sequence(%s, 'id')) - 1) + %s)",
+            [User._meta.db_table, User._meta.db_table, count],
+        )
+        return cursor.fetchone()[0] - count + 1
+
+
+def _copy_value(value):
+    """Encode a value for the text format of ``COPY``."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        if "\\" in value:
+            value = value.replace("\\", "\\\\")
+        return value.replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+    return str(value)
+
+
+def copy_rows(table, columns, rows):
+    """
+    Load rows into a table, with ``COPY`` on Postgres.
+
+    Args:
+        table: The table name
+        columns: The column names, in row order
+        rows: Tuples of Python values; None is loaded as NULL
+    """
+    quote = connection.ops.quote_name
+    column_list = ", ".join(quote(column) for column in columns)
+    with connection.cursor() as cursor:
+        if connection.vendor != "postgresql":
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(
+                f"INSERT INTO {quote(table)} ({column_list}) VALUES ({placeholders})", rows
+            )
+            return
+
+        # The text format with escaping by str.replace is several times faster
+        # than csv, which quotes and doubles every quote in the JSON column
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(map(_copy_value, row)))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {quote(table)} ({column_list}) FROM STDIN", buffer)
+
+
+def load_blocks(blocks, **options):
+    """
+    Generate and load blocks of users and profiles in one transaction.
+
+    Args:
+        blocks: The block numbers to load
+        **options: Passed to ``generate_block``
+
+    Returns:
+        int: The number of users loaded
+    """
+    users, profiles = [], []
+    for block in blocks:
+        block_users, block_profiles = generate_block(block, **options)
+        users.extend(block_users)
+        profiles.extend(block_profiles)
+
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                # Seeded rows can be regenerated, so a crash losing the last
+                # commits is acceptable
+                cursor.execute("SET LOCAL synchronous_commit TO OFF")
+        copy_rows(User._meta.db_table, USER_COLUMNS, users)
+        copy_rows(UserProfile._meta.db_table, PROFILE_COLUMNS, profiles)
+    return len(users)
+
+
+def secondary_indexes():
+    """
+    Return the indexes on the user and profile tables that back no constraint.
+
+    Only these can be dropped during a load; primary keys, unique constraints
+    and unique indexes, such as the one on the lowercased email, stay in place
+    so the loaded rows are still checked against them.
+
+    Returns:
+        list: ``(name, definition)`` pairs, as reported by ``pg_indexes``
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT i.indexname, i.indexdef
+            FROM pg_indexes i
+            JOIN pg_namespace n ON n.nspname = i.schemaname
+            JOIN pg_class c ON c.relname = i.indexname AND c.relnamespace = n.oid
+            JOIN pg_index x ON x.indexrelid = c.oid
+            WHERE i.schemaname = current_schema()
+              AND i.tablename IN (%s, %s)
+              AND NOT x.indisunique
+              AND NOT x.indisprimary
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = c.oid)
+            ORDER BY i.indexname
+            """,
+            [User._meta.db_table, UserProfile._meta.db_table],
+        )
+        return cursor.fetchall()
+
+
+def drop_indexes(indexes):
+    """Drop indexes returned by ``secondary_indexes``."""
+    with connection.cursor() as cursor:
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {connection.ops.quote_name(name)}")
+
+
+def create_index(definition):
+    """Recreate an index from its ``pg_indexes`` definition."""
+    with connection.cursor() as cursor:
+        cursor.execute(definition)
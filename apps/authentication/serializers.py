@@ -5,11 +5,23 @@ This module contains serializers for handling user registration, profile updates
 and email account management.
 """
 
+from functools import cached_property
+
+import redis
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
-from rest_framework import serializers
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 
-from .models import User, UserProfile
+from .activity import record_login
+from .email_accounts import OPERATIONS, REMOVE
+from .models import AuditEvent, User, UserProfile
+from .revocation import GENERATION_CLAIM, current_generation, is_revoked, revoke_token
+from .tokens import RefreshToken
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -29,6 +41,102 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that limits output to the fields named in ``?fields=``.
+    """
+
+    fields_query_param = "fields"
+
+    def __init__(self, *args, **kwargs):
+        """Drop any fields the request did not ask for."""
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None:
+            return
+
+        requested = request.query_params.get(self.fields_query_param)
+        if not requested:
+            return
+
+        names = {name.strip() for name in requested.split(",") if name.strip()}
+        unknown = names - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {self.fields_query_param: f"Unknown fields: {', '.join(sorted(unknown))}."}
+            )
+        for name in set(self.fields) - names:
+            self.fields.pop(name)
+
+
+class UserListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Read-only serializer for the admin user listing.
+    """
+
+    company_name = serializers.CharField(source="profile.company_name", read_only=True)
+    phone_number = serializers.CharField(source="profile.phone_number", read_only=True)
+
+    class Meta:
+        """
+        Meta class for UserListSerializer.
+
+        Defines the model and fields for the user listing.
+        """
+
+        model = User
+        fields = (
+            "id",
+            "email",
+            "username",
+            "first_name",
+            "last_name",
+            "is_active",
+            "is_staff",
+            "date_joined",
+            "last_login",
+            "company_name",
+            "phone_number",
+        )
+        read_only_fields = fields
+
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for audit log events.
+    """
+
+    class Meta:
+        """
+        Meta class for AuditEventSerializer.
+
+        Defines the model and fields for the audit log.
+        """
+
+        model = AuditEvent
+        fields = ("id", "created_at", "action", "user_id", "actor_id", "changes", "request_id")
+        read_only_fields = fields
+
+
+def _assign_changed(instance, values):
+    """
+    Set the attributes whose value differs and return their names.
+
+    Args:
+        instance: The model instance to update
+        values: A mapping of attribute name to new value
+
+    Returns:
+        list: The names of the attributes that changed
+    """
+    changed = []
+    for field, value in values.items():
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed.append(field)
+    return changed
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """
     Serializer for the UserProfile model.
@@ -60,10 +168,17 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "email", "created_at", "updated_at"]
 
+    changed = False
+    changed_fields = ()
+
     def update(self, instance, validated_data):
         """
         Update a user profile instance with validated data.
 
+        Only columns whose value actually changes are written, each model with
+        ``save(update_fields=...)``. A request that changes nothing writes
+        nothing; any real change increments the profile version.
+
         Args:
             instance: The UserProfile instance to update
             validated_data: The validated data to update with
@@ -71,24 +186,113 @@ class UserProfileSerializer(serializers.ModelSerializer):
         Returns:
             The updated UserProfile instance
         """
-        # Handle user data separately
-        user_data = validated_data.pop("user", {})
-        if user_data:
-            user = instance.user
-            user.first_name = user_data.get("first_name", user.first_name)
-            user.last_name = user_data.get("last_name", user.last_name)
-            user.save()
+        user = instance.user
+        user_fields = _assign_changed(user, validated_data.pop("user", {}))
+        profile_fields = _assign_changed(instance, validated_data)
+
+        self.changed_fields = [*user_fields, *profile_fields]
+        self.changed = bool(self.changed_fields)
+        if not self.changed:
+            return instance
+
+        if user_fields:
+            user.save(update_fields=user_fields)
+        instance.version += 1
+        instance.save(update_fields=[*profile_fields, "version", "updated_at"])
+        return instance
 
-        # Update profile data
-        instance.company_name = validated_data.get("company_name", instance.company_name)
-        instance.phone_number = validated_data.get("phone_number", instance.phone_number)
-        instance.email_signature = validated_data.get("email_signature", instance.email_signature)
 
-        if "email_accounts" in validated_data:
-            instance.email_accounts = validated_data.get("email_accounts")
+class PrecompiledReader:
+    """
+    Read-only fast path producing the same output as a ModelSerializer.
 
-        instance.save()
-        return instance
+    Instantiating a ModelSerializer rebuilds its fields from the model on every
+    call, and ``to_representation`` walks dotted sources attribute by attribute.
+    The reader builds the fields once per serializer class and keeps, for each
+    readable field, its ``.values()`` lookup and bound ``to_representation``.
+    Only plain model fields and dotted sources through relations are supported.
+    """
+
+    def __init__(self, serializer_class):
+        """
+        Wrap a serializer class; its fields are built on first use.
+
+        Args:
+            serializer_class: The ModelSerializer subclass to mirror
+        """
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def columns(self):
+        """Return (field name, lookup, source attributes, to_representation) tuples."""
+        columns = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if not field.source_attrs or isinstance(field, serializers.SerializerMethodField):
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name} cannot be precompiled"
+                )
+            columns.append(
+                (name, "__".join(field.source_attrs), field.source_attrs, field.to_representation)
+            )
+        return columns
+
+    @cached_property
+    def lookups(self):
+        """Return the ``.values()`` lookups needed to represent a row."""
+        return [lookup for _, lookup, _, _ in self.columns]
+
+    def from_values(self, row):
+        """
+        Represent a row fetched with ``.values(*self.lookups)``.
+
+        Args:
+            row: The values dictionary
+
+        Returns:
+            dict: The serialized data
+        """
+        data = {}
+        for name, lookup, _, to_representation in self.columns:
+            value = row[lookup]
+            data[name] = None if value is None else to_representation(value)
+        return data
+
+    def from_instance(self, instance):
+        """
+        Represent a model instance that is already loaded.
+
+        Args:
+            instance: The model instance
+
+        Returns:
+            dict: The serialized data
+        """
+        data = {}
+        for name, _, source_attrs, to_representation in self.columns:
+            value = instance
+            for attr in source_attrs:
+                value = getattr(value, attr)
+            data[name] = None if value is None else to_representation(value)
+        return data
+
+
+user_reader = PrecompiledReader(UserSerializer)
+profile_reader = PrecompiledReader(UserProfileSerializer)
+
+
+class LowercaseEmailField(serializers.EmailField):
+    """
+    Email field lowercasing addresses before they are validated.
+
+    Users' addresses are stored lowercased, so uniqueness validators compare
+    them exactly.
+    """
+
+    def to_internal_value(self, data):
+        """Return the address lowercased."""
+        return User.objects.normalize_email(super().to_internal_value(data))
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -96,7 +300,7 @@ class RegisterSerializer(serializers.ModelSerializer):
     Serializer for user registration.
     """
 
-    email = serializers.EmailField(
+    email = LowercaseEmailField(
         required=True, validators=[UniqueValidator(queryset=User.objects.all())]
     )
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -171,3 +375,152 @@ class EmailAccountSerializer(serializers.Serializer):
         # Here you might want to validate the connection to the email server
         # before accepting the credentials
         return attrs
+
+
+class BulkEmailAccountSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of email account operations
+
+    Each operation is an object with an ``op`` of ``add``, ``update`` or
+    ``remove``. Adds and updates carry the fields of an email account and are
+    validated together by ``EmailAccountSerializer(many=True)``; removes only
+    name the ``email``. Errors are reported per operation, in order.
+    """
+
+    version = serializers.IntegerField(required=False, min_value=1)
+    operations = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_operations(self, operations):
+        """
+        Validate every operation and return them as ``(op, email, data)`` tuples.
+
+        Args:
+            operations: The operations as sent
+
+        Returns:
+            list: The validated operations
+
+        Raises:
+            ValidationError: With one error object per operation, empty for
+                the valid ones
+        """
+        limit = settings.EMAIL_ACCOUNTS_BULK_MAX_OPERATIONS
+        if len(operations) > limit:
+            raise serializers.ValidationError(f"At most {limit} operations are allowed.")
+        errors = [{} for _ in operations]
+        emails = [None] * len(operations)
+        accounts, account_indexes = [], []
+        for index, operation in enumerate(operations):
+            op = operation.get("op")
+            if op not in OPERATIONS:
+                errors[index] = {"op": [f"Must be one of {', '.join(OPERATIONS)}."]}
+            elif op == REMOVE:
+                try:
+                    emails[index] = serializers.EmailField().run_validation(operation.get("email"))
+                except serializers.ValidationError as error:
+                    errors[index] = {"email": error.detail}
+            else:
+                accounts.append({key: value for key, value in operation.items() if key != "op"})
+                account_indexes.append(index)
+
+        accounts_serializer = EmailAccountSerializer(data=accounts, many=True)
+        data = [None] * len(operations)
+        if accounts_serializer.is_valid():
+            for index, account in zip(account_indexes, accounts_serializer.validated_data):
+                data[index], emails[index] = account, account["email"]
+        else:
+            for index, error in zip(account_indexes, accounts_serializer.errors):
+                errors[index] = error
+
+        seen = set()
+        for index, email in enumerate(emails):
+            if email in seen:
+                errors[index] = {"email": ["Appears in an earlier operation."]}
+            elif email is not None:
+                seen.add(email)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return [
+            (operation["op"], email, account)
+            for operation, email, account in zip(operations, emails, data)
+        ]
+
+
+class ActivityTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Token obtain serializer that buffers last_login instead of saving the user.
+    """
+
+    token_class = RefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        """
+        Create a refresh token stamped with the user's token generation.
+
+        Args:
+            user: The authenticated user
+
+        Returns:
+            RefreshToken: The new refresh token
+        """
+        token = super().get_token(user)
+        token[GENERATION_CLAIM] = current_generation(user.pk)
+        return token
+
+    def validate(self, attrs):
+        """
+        Validate the credentials and record the login.
+
+        Args:
+            attrs: The attributes to validate
+
+        Returns:
+            The access and refresh tokens
+        """
+        data = super().validate(attrs)
+        record_login(self.user.pk)
+        return data
+
+
+class RevocationUnavailable(APIException):
+    """Raised when a refresh token cannot be revoked because Redis is unavailable."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Tokens cannot be refreshed right now. Try again later."
+    default_code = "revocation_unavailable"
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Token refresh serializer that revokes each refresh token once it is used.
+    """
+
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        """
+        Reject revoked refresh tokens and revoke the presented one.
+
+        The revocation is claimed atomically, so two concurrent refreshes with
+        the same token cannot both succeed. Without Redis the old token could
+        not be revoked, so no new tokens are issued either.
+
+        Args:
+            attrs: The attributes to validate
+
+        Returns:
+            The new access and refresh tokens
+
+        Raises:
+            TokenError: If the refresh token is revoked or was already used
+            RevocationUnavailable: If the token cannot be revoked
+        """
+        refresh = self.token_class(attrs["refresh"])
+        try:
+            revoked = is_revoked(refresh.payload) or not revoke_token(refresh.payload)
+        except redis.RedisError as error:
+            raise RevocationUnavailable from error
+        if revoked:
+            raise TokenError("Token is revoked")
+        return super().validate(attrs)
@@ -0,0 +1,126 @@
+"""
+Celery tasks for the authentication app.
+"""
+
+from celery import shared_task
+
+from .activity import ACTIVITY_COLUMNS, flush_activity
+from .audit import RedisBuffer, get_buffer, maintain_partitions
+from .deletion import delete_account, resume_stalled
+from .maintenance import cleanup_expired
+from .models import OutboxEvent
+from .outbox import user_event
+from .webhooks import deliver, dispatch
+
+
+@shared_task
+def flush_user_activity():
+    """
+    Flush buffered last_login and last_seen timestamps to the database.
+
+    Returns:
+        dict: The number of events flushed per kind
+    """
+    return {kind: flush_activity(kind) for kind in ACTIVITY_COLUMNS}
+
+
+@shared_task
+def cleanup_expired_rows():
+    """
+    Delete expired sessions and tokens in throttled batches.
+
+    Returns:
+        dict: The rows deleted and the deletion rate per table
+    """
+    return cleanup_expired()
+
+
+@shared_task
+def flush_audit_events():
+    """
+    Write audit events buffered in Redis to the database.
+
+    Returns:
+        int: The number of events written
+    """
+    buffer = get_buffer()
+    if not isinstance(buffer, RedisBuffer):
+        # Each process writes its own buffer
+        return 0
+    return buffer.flush()
+
+
+@shared_task
+def maintain_audit_partitions():
+    """
+    Create the audit partitions of the coming months and drop expired ones.
+
+    Returns:
+        dict: The names of the partitions created and dropped
+    """
+    return maintain_partitions()
+
+
+@shared_task
+def handle_user_event(event):
+    """
+    Hand a user lifecycle event published from the outbox to its receivers.
+
+    Args:
+        event: The event document, see ``apps.authentication.outbox``
+    """
+    user_event.send(sender=OutboxEvent, event=event)
+
+
+@shared_task
+def deliver_webhooks(endpoint_id):
+    """
+    Post the due events of a webhook endpoint in batches.
+
+    Args:
+        endpoint_id: The id of the WebhookEndpoint
+
+    Returns:
+        dict: Events delivered and failed, and whether the endpoint was at
+        its concurrency limit
+    """
+    return deliver(endpoint_id)
+
+
+@shared_task
+def dispatch_webhooks():
+    """
+    Schedule delivery to endpoints with due events, including retries.
+
+    Returns:
+        int: The number of endpoints scheduled
+    """
+    return dispatch()
+
+
+@shared_task(acks_late=True)
+def delete_user_account(deletion_id):
+    """
+    Delete the rows of a deactivated account in batches, then the user.
+
+    Acknowledged once done, so a deletion whose worker crashed is delivered
+    again and resumes from its last batch.
+
+    Args:
+        deletion_id: The id of the AccountDeletion
+
+    Returns:
+        dict: The progress of the deletion
+    """
+    return delete_account(deletion_id)
+
+
+@shared_task
+def resume_account_deletions():
+    """
+    Queue the account deletions that stopped making progress.
+
+    Returns:
+        int: The number of deletions queued
+    """
+    return resume_stalled()
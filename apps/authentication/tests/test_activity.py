@@ -0,0 +1,128 @@
+"""
+Tests for buffered login and last-seen tracking.
+
+This module contains test cases for recording activity into the Redis buffer,
+flushing it to the database in bulk, and the login paths that feed it.
+"""
+
+import time
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from apps.authentication import activity
+from apps.authentication.models import User
+
+
+@pytest.mark.django_db
+class TestApplyActivity:
+    """Test writing buffered timestamps to the user table."""
+
+    def test_updates_only_newer_timestamps(self):
+        """Test that stale timestamps never overwrite newer stored values."""
+        first = User.objects.create_user(
+            username="first", email="first@example.com", password="TestPassword123!"
+        )
+        second = User.objects.create_user(
+            username="second", email="second@example.com", password="TestPassword123!"
+        )
+        now = time.time()
+        User.objects.filter(pk=second.pk).update(
+            last_seen=timezone.now() + timedelta(hours=1)
+        )
+
+        updated = activity.apply_activity("last_seen", {first.pk: now, second.pk: now})
+
+        assert updated == 1
+        first.refresh_from_db()
+        assert abs(first.last_seen.timestamp() - now) < 0.001
+
+    def test_does_not_save_profile(self, django_assert_num_queries):
+        """Test that a flush is a single statement with no profile writes."""
+        user = User.objects.create_user(
+            username="user", email="user@example.com", password="TestPassword123!"
+        )
+
+        with django_assert_num_queries(1):
+            activity.apply_activity("last_login", {user.pk: time.time()})
+
+
+def test_record_activity_is_throttled(redis_client, settings):
+    """Test that repeated events within the staleness window hit Redis once."""
+    settings.USER_ACTIVITY_STALENESS = 60
+
+    assert activity.record_seen(42) is True
+    assert activity.record_seen(42) is False
+    assert activity.record_login(42) is True
+
+    assert redis_client.hset.call_count == 2
+
+
+@pytest.mark.django_db
+def test_flush_activity_drains_pending_hash(redis_client):
+    """Test that a flush writes buffered entries and removes them from Redis."""
+    user = User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!"
+    )
+    now = time.time()
+    redis_client.exists.return_value = False
+    redis_client.hscan.side_effect = [
+        (0, {str(user.pk).encode(): str(now).encode()}),
+        (0, {}),
+    ]
+
+    flushed = activity.flush_activity("last_login", batch_size=10, max_batches=5)
+
+    assert flushed == 1
+    redis_client.renamenx.assert_called_with(
+        "auth:activity:last_login", "auth:activity:last_login:flushing"
+    )
+    redis_client.hdel.assert_called_once_with(
+        "auth:activity:last_login:flushing", str(user.pk).encode()
+    )
+    user.refresh_from_db()
+    assert user.last_login is not None
+
+
+@pytest.mark.django_db
+def test_flush_activity_follows_scan_cursor(redis_client):
+    """Test that an empty HSCAN page with a cursor left does not end the flush."""
+    user = User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!"
+    )
+    redis_client.exists.return_value = True
+    redis_client.hscan.side_effect = [
+        (17, {}),
+        (0, {str(user.pk).encode(): str(time.time()).encode()}),
+        (0, {}),
+    ]
+
+    flushed = activity.flush_activity("last_login", batch_size=10, max_batches=5)
+
+    assert flushed == 1
+    assert [call.args[1] for call in redis_client.hscan.call_args_list] == [0, 17, 0]
+    user.refresh_from_db()
+    assert user.last_login is not None
+
+
+@pytest.mark.django_db
+def test_token_obtain_buffers_last_login(api_client, redis_client):
+    """Test that obtaining a token buffers the login instead of saving the user."""
+    user = User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!"
+    )
+
+    response = api_client.post(
+        reverse("token_obtain_pair"),
+        {"email": "user@example.com", "password": "TestPassword123!"},
+        format="json",
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    redis_client.hset.assert_called_once()
+    assert redis_client.hset.call_args.args[:2] == ("auth:activity:last_login", user.pk)
+    user.refresh_from_db()
+    assert user.last_login is None
@@ -0,0 +1,314 @@
+"""
+Tests for the audit log.
+
+This module contains test cases for recording profile and email account
+changes, the Redis and in-process buffers, writing batches into monthly
+partitions with retention, and the keyset-paginated audit listing.
+"""
+
+import importlib
+import json
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+import pytest
+import redis
+from django.apps import apps
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.authentication import audit
+from apps.authentication.audit import (
+    LocalBuffer,
+    RedisBuffer,
+    maintain_partitions,
+    record_audit_event,
+    write_rows,
+)
+from apps.authentication.models import AuditEvent, User
+
+postgresql_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Needs PostgreSQL partitioning"
+)
+
+EMAIL_ACCOUNT = {
+    "email": "inbox@example.com",
+    "provider": "gmail",
+    "smtp_server": "smtp.gmail.com",
+    "smtp_port": 587,
+    "imap_server": "imap.gmail.com",
+    "imap_port": 993,
+    "password": "app-password",
+}
+
+
+def event_row(created_at, action="profile.updated", user_id=1, changes=None):
+    """Return a buffered event row."""
+    return (created_at.isoformat(), action, user_id, user_id, json.dumps(changes or {}), None)
+
+
+@pytest.fixture
+def redis_buffer(fake_redis, settings):
+    """Buffer audit events in the in-memory Redis."""
+    settings.AUDIT_BUFFER = "redis"
+    with mock.patch.object(audit, "_buffer", None):
+        yield audit.get_buffer()
+
+
+@pytest.fixture
+def partitioned_table(db):
+    """Make the audit table partitioned, as the migration creates it."""
+    migration = importlib.import_module("apps.authentication.migrations.0009_audit_event")
+    if not audit.is_partitioned():
+        with connection.schema_editor() as schema_editor:
+            schema_editor.delete_model(AuditEvent)
+            migration.create_audit_table(apps, schema_editor)
+    with mock.patch.object(audit, "_partitions", set()):
+        yield
+
+
+def partitions():
+    """Return the names of the audit table's partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [AuditEvent._meta.db_table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+@pytest.mark.django_db
+class TestRecording:
+    """Test that audited changes are buffered once committed."""
+
+    @pytest.fixture
+    def client(self, user):
+        """Return a client authenticated as the user."""
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_profile_patch_records_changed_fields(
+        self, client, user, redis_buffer, django_capture_on_commit_callbacks
+    ):
+        """Test the event of a profile PATCH."""
+        with django_capture_on_commit_callbacks(execute=True):
+            client.patch(
+                reverse("profile-details"),
+                {"first_name": "Ada", "company_name": "Acme"},
+                format="json",
+            )
+        redis_buffer.flush()
+
+        event = AuditEvent.objects.get()
+        assert (event.action, event.user_id, event.actor_id) == (
+            "profile.updated",
+            user.pk,
+            user.pk,
+        )
+        assert event.changes == {"fields": ["first_name", "company_name"]}
+
+    def test_unchanged_patch_records_nothing(
+        self, client, redis_buffer, django_capture_on_commit_callbacks
+    ):
+        """Test that a PATCH writing nothing is not audited."""
+        with django_capture_on_commit_callbacks(execute=True):
+            client.patch(reverse("profile-details"), {"company_name": None}, format="json")
+
+        assert redis_buffer.flush() == 0
+
+    def test_email_accounts_added_and_removed(
+        self, client, redis_buffer, django_capture_on_commit_callbacks
+    ):
+        """Test the events of adding, replacing and removing an email account."""
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post(reverse("email-accounts"), EMAIL_ACCOUNT, format="json")
+            client.post(reverse("email-accounts"), EMAIL_ACCOUNT, format="json")
+            client.delete(
+                reverse("email-account-detail", kwargs={"email_id": EMAIL_ACCOUNT["email"]})
+            )
+        redis_buffer.flush()
+
+        events = AuditEvent.objects.order_by("pk")
+        assert [event.action for event in events] == [
+            "email_account.added",
+            "email_account.updated",
+            "email_account.removed",
+        ]
+        assert events[0].changes == {"email": "inbox@example.com", "provider": "gmail"}
+        assert "password" not in json.dumps([event.changes for event in events])
+
+    def test_rolled_back_change_records_nothing(self, redis_buffer):
+        """Test that events are only buffered when their transaction commits."""
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                record_audit_event("profile.updated", 1)
+                raise RuntimeError
+
+        assert redis_buffer.flush() == 0
+
+
+@pytest.mark.django_db
+class TestBuffers:
+    """Test buffering events and writing them in batches."""
+
+    @pytest.fixture
+    def no_writer_thread(self):
+        """Leave writing the in-process buffer to the test."""
+        with mock.patch.object(LocalBuffer, "start"):
+            yield
+
+    def test_redis_buffer_writes_in_batches(self, redis_buffer):
+        """Test that a flush writes every buffered event, batch by batch."""
+        now = timezone.now()
+        for user_id in range(5):
+            redis_buffer.add(event_row(now, user_id=user_id))
+
+        with mock.patch.object(audit, "copy_rows", wraps=audit.copy_rows) as copy_rows:
+            assert redis_buffer.flush(batch_size=2) == 5
+
+        assert copy_rows.call_count == 3
+        assert sorted(AuditEvent.objects.values_list("user_id", flat=True)) == [0, 1, 2, 3, 4]
+        assert redis_buffer.flush() == 0
+
+    def test_redis_buffer_keeps_events_that_failed(self, redis_buffer):
+        """Test that events stay buffered when writing fails."""
+        redis_buffer.add(event_row(timezone.now()))
+
+        with mock.patch.object(audit, "copy_rows", side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                redis_buffer.flush()
+
+        assert redis_buffer.flush() == 1
+
+    def test_concurrent_redis_flush_is_skipped(self, redis_buffer, fake_redis):
+        """Test that a flush returns while another worker is flushing."""
+        redis_buffer.add(event_row(timezone.now()))
+        fake_redis.set(RedisBuffer.lock_key, 1)
+
+        assert redis_buffer.flush() == 0
+
+    def test_redis_outage_writes_directly(self, redis_buffer, fake_redis):
+        """Test that an event is written directly when Redis is unavailable."""
+        with mock.patch.object(fake_redis, "rpush", side_effect=redis.ConnectionError):
+            redis_buffer.add(event_row(timezone.now()))
+
+        assert AuditEvent.objects.count() == 1
+
+    @pytest.mark.usefixtures("no_writer_thread")
+    def test_local_buffer(self):
+        """Test that the in-process buffer writes its events and drops overflow."""
+        buffer = LocalBuffer(batch_size=2, interval=3600, max_events=3)
+        for user_id in range(4):
+            buffer.add(event_row(timezone.now(), user_id=user_id))
+
+        assert buffer.dropped == 1
+        assert buffer.flush() == 3
+        assert AuditEvent.objects.count() == 3
+
+    @pytest.mark.usefixtures("no_writer_thread")
+    def test_local_buffer_keeps_events_that_failed(self):
+        """Test that events stay in the in-process buffer when writing fails."""
+        buffer = LocalBuffer(batch_size=10, interval=3600)
+        buffer.add(event_row(timezone.now()))
+
+        with mock.patch.object(audit, "copy_rows", side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                buffer.flush()
+
+        assert len(buffer.rows) == 1
+
+
+@postgresql_only
+@pytest.mark.usefixtures("partitioned_table")
+class TestPartitions:
+    """Test the monthly partitions."""
+
+    NOW = datetime(2026, 10, 19, 12, tzinfo=dt_timezone.utc)
+
+    def test_write_creates_missing_partitions(self):
+        """Test that events are written into the partition of their month."""
+        write_rows(
+            [event_row(self.NOW), event_row(datetime(2026, 8, 31, 23, 59, tzinfo=dt_timezone.utc))]
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tableoid::regclass::text FROM {AuditEvent._meta.db_table} "
+                "ORDER BY created_at"
+            )
+            tables = [row[0] for row in cursor.fetchall()]
+        assert tables == ["authentication_auditevent_202608", "authentication_auditevent_202610"]
+
+    def test_maintenance_creates_ahead_and_drops_expired(self):
+        """Test that future partitions are created and expired ones dropped."""
+        write_rows([event_row(self.NOW - timedelta(days=days)) for days in (70, 100, 400)])
+
+        result = maintain_partitions(months_ahead=2, retention_months=3, now=self.NOW)
+
+        assert result == {
+            "created": [
+                "authentication_auditevent_202610",
+                "authentication_auditevent_202611",
+                "authentication_auditevent_202612",
+            ],
+            "dropped": ["authentication_auditevent_202509"],
+        }
+        assert partitions() == [
+            "authentication_auditevent_202607",
+            "authentication_auditevent_202608",
+            "authentication_auditevent_202610",
+            "authentication_auditevent_202611",
+            "authentication_auditevent_202612",
+        ]
+        assert AuditEvent.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestAuditEventList:
+    """Test the audit listing."""
+
+    @pytest.fixture
+    def admin_client(self):
+        """Return a client authenticated as a staff user."""
+        admin = User.objects.create_user(
+            username="admin", email="admin@example.com", password="TestPassword123!", is_staff=True
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        return client
+
+    def test_pages_newest_first_with_filters(self, admin_client):
+        """Test keyset paging through the events of one user."""
+        now = timezone.now()
+        write_rows(
+            [event_row(now - timedelta(minutes=minutes), user_id=7) for minutes in range(5)]
+            + [event_row(now, user_id=8)]
+        )
+        url = reverse("audit-event-list")
+
+        first = admin_client.get(url, {"user_id": 7, "page_size": 3})
+        second = admin_client.get(first.data["next"])
+
+        created = [event["created_at"] for event in first.data["results"]]
+        created += [event["created_at"] for event in second.data["results"]]
+        assert len(created) == 5
+        assert created == sorted(created, reverse=True)
+        assert second.data["next"] is None
+
+    def test_rejects_invalid_filters(self, admin_client):
+        """Test that malformed ids are rejected."""
+        response = admin_client.get(reverse("audit-event-list"), {"user_id": "me"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_requires_staff(self, auth_client):
+        """Test that regular users cannot read the audit log."""
+        response = auth_client.get(reverse("audit-event-list"))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,190 @@
+"""
+Tests for case-insensitive email addresses and batched backfills.
+
+This module contains test cases for logging in with an email address in any
+case, the unique index on LOWER(email), and lowercasing existing addresses in
+keyset batches that resume from their checkpoint.
+"""
+
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.urls import reverse
+
+from apps.authentication import backfill
+from apps.authentication.backfill import BACKFILLS, run_backfill
+from apps.authentication.models import BackfillProgress, User
+from apps.authentication.serializers import RegisterSerializer
+
+LOWERCASE_EMAILS = BACKFILLS["lowercase_emails"]
+
+postgresql_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Needs PostgreSQL locking"
+)
+
+
+@pytest.fixture
+def mixed_case_users(db):
+    """Create 7 users and give 5 of them mixed-case addresses behind save()'s back."""
+    users = [
+        User.objects.create_user(username=f"user{index}", email=f"user{index}@example.com")
+        for index in range(7)
+    ]
+    for index, user in enumerate(users[:5]):
+        User.objects.filter(pk=user.pk).update(email=f"User{index}@Example.COM")
+    return users
+
+
+def emails():
+    """Return the stored addresses in primary key order."""
+    return list(User.objects.order_by("pk").values_list("email", flat=True))
+
+
+@pytest.mark.django_db
+class TestCaseInsensitiveEmail:
+    """Test that email addresses match regardless of case."""
+
+    def test_addresses_are_stored_lowercased(self):
+        """Test that created and saved users get lowercased addresses."""
+        user = User.objects.create_user(username="alice", email="Alice@Example.COM")
+        user.email = "ALICE@example.org"
+        user.save()
+
+        user.refresh_from_db()
+        assert user.email == "alice@example.org"
+
+    def test_login_ignores_case(self, api_client):
+        """Test that a token is issued for the address in another case."""
+        User.objects.create_user(username="alice", email="alice@example.com", password="x-Pass-123")
+
+        response = api_client.post(
+            reverse("token_obtain_pair"),
+            {"email": "ALICE@Example.com", "password": "x-Pass-123"},
+            format="json",
+        )
+
+        assert response.status_code == 200
+        assert "access" in response.data
+
+    def test_registration_rejects_address_in_another_case(self):
+        """Test that an address already taken in another case cannot register."""
+        User.objects.create_user(username="alice", email="alice@example.com")
+        serializer = RegisterSerializer(
+            data={
+                "username": "alice2",
+                "email": "Alice@Example.com",
+                "password": "x-Pass-123-long",
+                "password2": "x-Pass-123-long",
+            }
+        )
+
+        assert not serializer.is_valid()
+        assert "email" in serializer.errors
+
+    def test_index_rejects_address_in_another_case(self):
+        """Test that the database refuses addresses differing only in case."""
+        User.objects.create_user(username="alice", email="alice@example.com")
+
+        with pytest.raises(IntegrityError):
+            User.objects.bulk_create([User(username="alice2", email="ALICE@example.com")])
+
+
+@pytest.mark.django_db
+class TestBackfill:
+    """Test lowercasing existing addresses in batches."""
+
+    def test_lowercases_in_batches(self, mixed_case_users):
+        """Test that every row is visited in keyset batches and the run completes."""
+        result = run_backfill(LOWERCASE_EMAILS, batch_size=3, sleep=0)
+
+        assert result["completed"]
+        assert (result["rows_updated"], result["batches"], result["percent"]) == (5, 3, 100)
+        assert all(email == email.lower() for email in emails())
+        checkpoint = BackfillProgress.objects.get(name="lowercase_emails")
+        assert checkpoint.last_key == mixed_case_users[-1].pk
+        assert checkpoint.completed_at is not None
+
+    def test_resumes_from_checkpoint(self, mixed_case_users):
+        """Test that an interrupted run carries on after its last committed batch."""
+        update_batch = backfill.update_batch
+        calls = []
+
+        def interrupt_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return update_batch(*args)
+
+        with mock.patch.object(backfill, "update_batch", side_effect=interrupt_second_batch):
+            with pytest.raises(KeyboardInterrupt):
+                run_backfill(LOWERCASE_EMAILS, batch_size=2, sleep=0)
+        assert emails()[2] != emails()[2].lower()
+
+        result = run_backfill(LOWERCASE_EMAILS, batch_size=2, sleep=0)
+
+        assert result["completed"]
+        assert (result["rows_updated"], result["batches"]) == (5, 4)
+        assert all(email == email.lower() for email in emails())
+
+    def test_time_budget_and_restart(self, mixed_case_users):
+        """Test that a run stopped by its budget is incomplete, and restart starts over."""
+        stopped = run_backfill(LOWERCASE_EMAILS, batch_size=2, sleep=0.02, time_budget=0.01)
+
+        assert not stopped["completed"]
+        assert stopped["batches"] == 1
+
+        restarted = run_backfill(LOWERCASE_EMAILS, batch_size=2, sleep=0, restart=True)
+
+        assert restarted["completed"]
+        assert (restarted["rows_updated"], restarted["batches"]) == (3, 4)
+
+    def test_reports_progress(self, mixed_case_users, settings):
+        """Test that the progress is reported between batches and at the end."""
+        settings.BACKFILL_REPORT_INTERVAL = 0
+        reports = []
+
+        run_backfill(LOWERCASE_EMAILS, batch_size=3, sleep=0, report=reports.append)
+
+        assert [report["batches"] for report in reports] == [1, 2, 3, 3]
+        assert reports[-1]["completed"]
+
+    def test_command(self, mixed_case_users):
+        """Test the management command."""
+        out = StringIO()
+
+        call_command("backfill", "lowercase_emails", "--sleep", "0", stdout=out)
+
+        assert "lowercase_emails: 5 rows updated in 1 batches, 100% of keys" in out.getvalue()
+        with pytest.raises(CommandError):
+            call_command("backfill", "nothing")
+
+
+@postgresql_only
+@pytest.mark.django_db(transaction=True)
+class TestBackfillLocking:
+    """Test that batches never wait long for locks held by requests."""
+
+    def test_gives_up_after_lock_timeouts(self, mixed_case_users, settings):
+        """Test that a batch blocked by a row lock times out and keeps the checkpoint."""
+        settings.BACKFILL_MAX_LOCK_TIMEOUTS = 2
+        other = connections.create_connection("default")
+        try:
+            other.set_autocommit(False)
+            with other.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT id FROM {User._meta.db_table} WHERE id = %s FOR UPDATE",
+                    [mixed_case_users[0].pk],
+                )
+
+            with pytest.raises(OperationalError):
+                run_backfill(LOWERCASE_EMAILS, sleep=0, lock_timeout_ms=10)
+            other.rollback()
+        finally:
+            other.close()
+
+        assert BackfillProgress.objects.get(name="lowercase_emails").last_key is None
+        assert run_backfill(LOWERCASE_EMAILS, sleep=0)["rows_updated"] == 5
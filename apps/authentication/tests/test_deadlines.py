@@ -0,0 +1,215 @@
+"""
+Tests for database deadlines.
+
+This module contains test cases for bounding statements by the time left in
+a request or Celery task, answering requests that ran out of time with a 503,
+and counting the timeouts.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from django.db import OperationalError, connection, transaction
+from django.http import JsonResponse
+from django.test import Client
+from django.urls import path
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.appsUtils.deadlines import (
+    DeadlineExceeded,
+    db_deadline,
+    is_timeout,
+    statement_deadline,
+    timeout_counts,
+)
+from apps.config.celery import end_db_deadline, start_db_deadline
+
+pytestmark = [
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs statement_timeout"),
+    pytest.mark.urls(__name__),
+]
+
+# Long enough to hold a worker for the whole test run if it were not cancelled
+PATHOLOGICAL_QUERY = "SELECT pg_sleep(30)"
+
+
+def run(sql):
+    """Run a statement and return the first column of its first row."""
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchone()[0]
+
+
+def statement_timeout_ms():
+    """Return the session's statement_timeout in milliseconds."""
+    return int(run("SELECT setting FROM pg_settings WHERE name = 'statement_timeout'"))
+
+
+@db_deadline(0.2)
+def pathological_view(request):
+    """Run a statement that never finishes in time."""
+    return JsonResponse({"result": run(PATHOLOGICAL_QUERY)})
+
+
+@db_deadline(5)
+def timeout_view(request):
+    """Return the statement timeouts seen outside and inside a transaction."""
+    outside = statement_timeout_ms()
+    with transaction.atomic():
+        inside = statement_timeout_ms()
+    return JsonResponse({"outside": outside, "inside": inside})
+
+
+@db_deadline(0.05)
+def late_view(request):
+    """Query after the deadline has passed."""
+    time.sleep(0.1)
+    return JsonResponse({"result": run("SELECT 1")})
+
+
+def default_view(request):
+    """Query with the budget of the path."""
+    return JsonResponse({"timeout": statement_timeout_ms()})
+
+
+class PathologicalAPIView(APIView):
+    """DRF view with a class budget running a statement that never finishes in time."""
+
+    authentication_classes = []
+    permission_classes = []
+    db_deadline = 0.2
+
+    def get(self, request):
+        """Run the statement."""
+        return Response({"result": run(PATHOLOGICAL_QUERY)})
+
+
+urlpatterns = [
+    path("pathological/", pathological_view, name="pathological"),
+    path("timeout/", timeout_view, name="timeout"),
+    path("late/", late_view, name="late"),
+    path("slow/default/", default_view, name="default"),
+    path("api/pathological/", PathologicalAPIView.as_view(), name="api-pathological"),
+]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures("fake_redis")
+class TestRequestDeadlines:
+    """Test the deadlines of requests."""
+
+    def test_pathological_query_gets_503(self):
+        """Test that a statement outliving the view's budget is cancelled."""
+        started = time.monotonic()
+        response = Client().get("/pathological/")
+
+        assert time.monotonic() - started < 2
+        assert response.status_code == 503
+        assert response["Retry-After"] == "5"
+        assert timeout_counts() == [("pathological", 1)]
+
+    def test_drf_view_with_class_budget(self):
+        """Test that DRF views re-raising the cancellation get a 503 too."""
+        response = Client().get("/api/pathological/")
+
+        assert response.status_code == 503
+        assert timeout_counts() == [("api-pathological", 1)]
+
+    def test_no_statement_starts_after_the_deadline(self):
+        """Test that a statement is refused once the deadline has passed."""
+        response = Client().get("/late/")
+
+        assert response.status_code == 503
+        assert timeout_counts() == [("late", 1)]
+
+    def test_timeout_is_the_time_left(self):
+        """Test that statements get the time left, locally inside transactions."""
+        response = Client().get("/timeout/")
+
+        data = response.json()
+        assert 4000 < data["inside"] <= data["outside"] <= 5000
+        # The session timeout is reset once the request is over
+        assert statement_timeout_ms() == 0
+
+    def test_path_budget(self, settings):
+        """Test that views without a budget use the first matching path prefix."""
+        settings.DB_DEADLINE_PATHS = {"/slow/": 1, "/": 3}
+
+        assert 0 < Client().get("/slow/default/").json()["timeout"] <= 1000
+
+    def test_disabled(self, settings):
+        """Test that a default of 0 leaves statements without a timeout."""
+        settings.DB_DEADLINE_DEFAULT = 0
+
+        assert Client().get("/slow/default/").json()["timeout"] == 0
+
+    def test_workers_are_not_exhausted(self):
+        """Test that concurrent pathological requests all return within their budget."""
+
+        def request(_):
+            try:
+                return Client().get("/pathological/").status_code
+            finally:
+                connection.close()
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            statuses = list(pool.map(request, range(8)))
+
+        assert statuses == [503] * 8
+        assert time.monotonic() - started < 5
+        assert timeout_counts() == [("pathological", 8)]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures("fake_redis")
+class TestTaskDeadlines:
+    """Test the deadlines of Celery tasks."""
+
+    def test_task_budget(self, settings):
+        """Test that a task's statements are bounded by its own budget and counted."""
+        settings.DB_DEADLINE_CELERY = 60
+        task = SimpleNamespace(name="tasks.pathological", db_deadline=0.2)
+
+        start_db_deadline(task_id="1", task=task)
+        assert statement_timeout_ms() <= 200
+        with pytest.raises(OperationalError) as error:
+            run(PATHOLOGICAL_QUERY)
+        end_db_deadline(task_id="1", task=task, retval=error.value)
+
+        assert timeout_counts() == [("task:tasks.pathological", 1)]
+        assert statement_timeout_ms() == 0
+
+    def test_default_task_budget(self, settings):
+        """Test that tasks without a budget get DB_DEADLINE_CELERY."""
+        settings.DB_DEADLINE_CELERY = 60
+        task = SimpleNamespace(name="tasks.other")
+
+        start_db_deadline(task_id="2", task=task)
+        try:
+            assert 59000 < statement_timeout_ms() <= 60000
+        finally:
+            end_db_deadline(task_id="2", task=task, retval=None)
+        assert timeout_counts() == []
+
+
+@pytest.mark.django_db
+class TestStatementDeadline:
+    """Test the execute wrapper itself."""
+
+    def test_refuses_statements_after_the_deadline(self):
+        """Test that DeadlineExceeded is raised without reaching the database."""
+        with statement_deadline(0.01):
+            time.sleep(0.02)
+            with pytest.raises(DeadlineExceeded) as error:
+                run("SELECT 1")
+
+        assert is_timeout(error.value)
+
+    def test_other_errors_are_not_timeouts(self):
+        """Test that only cancelled statements count as timeouts."""
+        assert not is_timeout(OperationalError("connection lost"))
+        assert not is_timeout(ValueError())
@@ -0,0 +1,247 @@
+"""
+Tests for batched account deletion.
+
+This module contains test cases for deactivating a user at once, deleting
+their rows in batches children first, resuming an interrupted deletion, the
+time budget and lock timeouts of a run, and the deletion endpoint.
+"""
+
+import itertools
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import Permission
+from django.db import OperationalError, connection, connections
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from apps.authentication import deletion, revocation
+from apps.authentication.deletion import (
+    delete_account,
+    deletion_plan,
+    lock_key,
+    request_deletion,
+    resume_stalled,
+    run_deletion,
+)
+from apps.authentication.models import AccountDeletion, OutboxEvent, User, UserProfile
+
+postgresql_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Needs PostgreSQL locking"
+)
+
+
+@pytest.fixture
+def fake_redis(fake_redis):
+    """Extend the in-memory Redis with a fresh revocation cache."""
+    revocation._cache.reset()
+    yield fake_redis
+    revocation._cache.reset()
+
+
+@pytest.fixture
+def scheduled():
+    """Record the deletions queued instead of sending them to Celery."""
+    with mock.patch.object(deletion, "schedule_deletion") as schedule:
+        yield schedule
+
+
+@pytest.fixture
+def user(db):
+    """Create a user with 25 admin log entries and 3 permissions."""
+    user = User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!"
+    )
+    LogEntry.objects.bulk_create(
+        LogEntry(user=user, action_flag=1, object_repr=f"object {index}") for index in range(25)
+    )
+    user.user_permissions.add(*Permission.objects.order_by("pk")[:3])
+    return user
+
+
+@pytest.fixture
+def pending(user):
+    """Return a deletion requested for the user, without deactivating them."""
+    return AccountDeletion.objects.create(user_id=user.pk, requested_by=user.pk)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("fake_redis")
+class TestRequestDeletion:
+    """Test deactivating a user and queueing their deletion."""
+
+    def test_deactivates_and_revokes_at_once(
+        self, user, scheduled, fake_redis, django_capture_on_commit_callbacks
+    ):
+        """Test that the user is inactive, their tokens revoked and the deletion queued."""
+        with django_capture_on_commit_callbacks(execute=True):
+            pending = request_deletion(user)
+
+        user.refresh_from_db()
+        assert not user.is_active
+        assert fake_redis.hget(revocation.GENERATIONS_KEY, user.pk) == b"1"
+        scheduled.assert_called_once_with(pending.pk)
+        assert LogEntry.objects.filter(user=user).count() == 25
+
+    def test_asking_again_queues_the_same_deletion(self, user, scheduled):
+        """Test that one deletion is kept per user."""
+        first = request_deletion(user)
+        second = request_deletion(user)
+
+        assert first.pk == second.pk
+        assert AccountDeletion.objects.count() == 1
+
+    def test_deactivates_without_redis(self, user, scheduled):
+        """Test that a Redis outage does not stop the deactivation."""
+        with mock.patch.object(
+            deletion, "revoke_user_sessions", side_effect=deletion.redis.ConnectionError
+        ):
+            request_deletion(user)
+
+        assert not User.objects.get(pk=user.pk).is_active
+
+
+def test_plan_covers_every_dependent_table():
+    """Test that each table cascading from the user is deleted through its foreign key."""
+    steps = {step.label: step.lookup for step in deletion_plan()}
+
+    assert steps["admin.LogEntry"] == "user"
+    assert steps["authentication.UserProfile"] == "user"
+    assert steps["authentication.User_user_permissions"] == "user"
+
+
+@pytest.mark.django_db
+class TestRunDeletion:
+    """Test deleting an account's rows in batches."""
+
+    def test_deletes_in_batches_then_the_user(self, user, pending):
+        """Test that rows go in batches, the user last, and the progress is kept."""
+        progress = run_deletion(pending.pk, batch_size=10, sleep=0, time_budget=0)
+
+        assert progress["completed"]
+        assert progress["tables"]["admin.LogEntry"] == 25
+        assert progress["tables"]["authentication.User_user_permissions"] == 3
+        assert progress["tables"]["authentication.User"] == 1
+        assert not User.objects.filter(pk=user.pk).exists()
+        assert not UserProfile.objects.filter(user_id=user.pk).exists()
+        assert not LogEntry.objects.exists()
+        pending.refresh_from_db()
+        assert pending.batches >= 5
+        assert pending.completed_at is not None
+        assert OutboxEvent.objects.filter(topic="user.deleted", key=str(user.pk)).exists()
+
+    def test_resumes_after_a_crash(self, user, pending):
+        """Test that a run dying mid-way keeps its batches and the next run finishes."""
+        delete_batch = deletion.delete_batch
+        calls = []
+
+        def crash_on_third_batch(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError("worker lost")
+            return delete_batch(*args)
+
+        with mock.patch.object(deletion, "delete_batch", crash_on_third_batch):
+            with pytest.raises(RuntimeError):
+                run_deletion(pending.pk, batch_size=10, sleep=0, time_budget=0)
+
+        pending.refresh_from_db()
+        assert pending.rows_deleted == {"admin.LogEntry": 20}
+        assert "worker lost" in pending.last_error
+        assert LogEntry.objects.count() == 5
+
+        progress = run_deletion(pending.pk, batch_size=10, sleep=0, time_budget=0)
+
+        assert progress["completed"]
+        assert progress["runs"] == 2
+        assert progress["tables"]["admin.LogEntry"] == 25
+
+    def test_stops_after_time_budget_and_requeues(self, user, pending, scheduled, settings):
+        """Test that a run out of time queues the next, which carries on."""
+        settings.ACCOUNT_DELETION_BATCH_SIZE = 10
+        settings.ACCOUNT_DELETION_BATCH_SLEEP = 0
+        settings.ACCOUNT_DELETION_TIME_BUDGET = 25
+        clock = itertools.count(step=10)
+
+        with mock.patch.object(deletion.time, "monotonic", lambda: next(clock)):
+            progress = delete_account(pending.pk)
+
+        assert not progress["completed"]
+        assert progress["batches"] <= 2
+        scheduled.assert_called_once_with(pending.pk)
+        assert User.objects.filter(pk=user.pk).exists()
+
+        assert run_deletion(pending.pk, sleep=0, time_budget=0)["completed"]
+
+    def test_completed_deletion_is_not_run_again(self, user, pending):
+        """Test that a deletion delivered twice completes once."""
+        run_deletion(pending.pk, sleep=0, time_budget=0)
+
+        progress = run_deletion(pending.pk, sleep=0, time_budget=0)
+
+        assert progress["completed"]
+        assert progress["runs"] == 1
+
+    def test_resumes_stalled_deletions(self, user, pending, scheduled):
+        """Test that deletions without recent progress are queued again."""
+        done = AccountDeletion.objects.create(user_id=user.pk + 1, completed_at=timezone.now())
+        stale = timezone.now() - timedelta(hours=1)
+        AccountDeletion.objects.filter(pk__in=[pending.pk, done.pk]).update(updated_at=stale)
+
+        assert resume_stalled() == 1
+        scheduled.assert_called_once_with(pending.pk)
+
+
+@pytest.fixture
+def other_connection():
+    """Return a second connection to the test database."""
+    other = connections.create_connection("default")
+    yield other
+    other.close()
+
+
+@postgresql_only
+@pytest.mark.django_db(transaction=True)
+class TestLocking:
+    """Test coordination with other workers and requests."""
+
+    def test_skips_account_deleted_by_another_worker(self, user, pending, other_connection):
+        """Test that a second worker leaves an account being deleted alone."""
+        with other_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [lock_key(user.pk)])
+
+        assert run_deletion(pending.pk, sleep=0) == {"skipped": True}
+        assert LogEntry.objects.count() == 25
+
+    def test_gives_up_after_lock_timeouts(self, user, pending, other_connection, settings):
+        """Test that batches waiting on a lock time out and the error is recorded."""
+        settings.ACCOUNT_DELETION_MAX_LOCK_TIMEOUTS = 2
+        other_connection.set_autocommit(False)
+        with other_connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {LogEntry._meta.db_table} IN ACCESS EXCLUSIVE MODE")
+
+        with pytest.raises(OperationalError):
+            run_deletion(pending.pk, sleep=0, lock_timeout_ms=10)
+
+        other_connection.rollback()
+        pending.refresh_from_db()
+        assert "lock timeout" in pending.last_error
+        assert pending.completed_at is None
+        assert User.objects.filter(pk=user.pk).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("fake_redis")
+def test_delete_account_endpoint(api_client, user, scheduled):
+    """Test that the endpoint deactivates the user and answers 202."""
+    api_client.force_authenticate(user=user)
+
+    response = api_client.delete(reverse("delete-account"))
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.data["user_id"] == user.pk
+    assert not response.data["completed"]
+    assert not User.objects.get(pk=user.pk).is_active
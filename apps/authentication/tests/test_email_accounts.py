@@ -0,0 +1,261 @@
+"""
+Tests for bulk email account changes.
+
+This module contains test cases for the bulk email account endpoint: its
+single UPDATE, per-operation validation and results, all-or-nothing
+conflicts and optimistic concurrency on the profile version, which the
+single-account endpoint shares.
+"""
+
+from unittest import mock
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from apps.authentication import email_accounts
+from apps.authentication.models import OutboxEvent, User, UserProfile
+
+postgresql_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Needs jsonb operators"
+)
+
+
+def account(email, provider="gmail"):
+    """Return the fields of an email account."""
+    return {
+        "email": email,
+        "provider": provider,
+        "smtp_server": "smtp.example.com",
+        "smtp_port": 587,
+        "imap_server": "imap.example.com",
+        "imap_port": 993,
+        "password": "app-password",
+    }
+
+
+@pytest.fixture
+def user(db):
+    """Create a user with two connected email accounts."""
+    user = User.objects.create_user(username="user", email="user@example.com")
+    user.profile.email_accounts = {
+        "old@example.com": {"provider": "smtp"},
+        "keep@example.com": {"provider": "smtp"},
+    }
+    user.profile.save()
+    return user
+
+
+@pytest.fixture
+def client(api_client, user):
+    """Return an API client authenticated as the user."""
+    api_client.force_authenticate(user=user)
+    return api_client
+
+
+def bulk(client, operations, **data):
+    """POST a batch of operations and return the response and its statements."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(
+            reverse("email-accounts-bulk"), {"operations": operations, **data}, format="json"
+        )
+    return response, [query["sql"] for query in context.captured_queries]
+
+
+def stored_accounts(user):
+    """Return the user's stored email accounts."""
+    return UserProfile.objects.with_email_accounts().get(user=user).email_accounts
+
+
+@pytest.mark.django_db
+class TestBulkEmailAccounts:
+    """Test applying batches of email account operations."""
+
+    def test_applies_batch(self, client, user):
+        """Test that adds, updates and removes are applied with per-item results."""
+        version = user.profile.version
+        response, _ = bulk(
+            client,
+            [
+                {"op": "add", **account("new@example.com")},
+                {"op": "update", **account("keep@example.com", provider="outlook")},
+                {"op": "remove", "email": "old@example.com"},
+            ],
+            version=version,
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["version"] == version + 1
+        assert [result["status"] for result in response.data["results"]] == [
+            "added",
+            "updated",
+            "removed",
+        ]
+        accounts = stored_accounts(user)
+        assert sorted(accounts) == ["keep@example.com", "new@example.com"]
+        assert accounts["keep@example.com"]["provider"] == "outlook"
+        assert "password" not in accounts["new@example.com"]
+        event = OutboxEvent.objects.filter(topic="user.profile_updated").latest("pk")
+        assert event.payload == {
+            "user_id": user.pk,
+            "fields": ["email_accounts"],
+            "version": version + 1,
+        }
+
+    @postgresql_only
+    def test_one_update_without_reading_the_blob(self, client):
+        """Test that 50 accounts are written by one UPDATE and the blob is never selected."""
+        operations = [{"op": "add", **account(f"box{index}@example.com")} for index in range(50)]
+
+        response, statements = bulk(client, operations)
+
+        assert response.status_code == status.HTTP_200_OK
+        updates = [sql for sql in statements if sql.startswith("UPDATE")]
+        assert len(updates) == 1
+        assert "jsonb" in updates[0]
+        selects = [sql for sql in statements if sql.startswith("SELECT")]
+        assert not any('"email_accounts" FROM' in sql for sql in selects)
+
+    def test_conflicts_apply_nothing(self, client, user):
+        """Test that one conflicting operation leaves every account unchanged."""
+        version = user.profile.version
+        response, _ = bulk(
+            client,
+            [
+                {"op": "add", **account("new@example.com")},
+                {"op": "add", **account("keep@example.com")},
+                {"op": "remove", "email": "gone@example.com"},
+            ],
+        )
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert [
+            (result["status"], result.get("error")) for result in response.data["results"]
+        ] == [("skipped", None), ("conflict", "exists"), ("conflict", "not_found")]
+        assert sorted(stored_accounts(user)) == ["keep@example.com", "old@example.com"]
+        assert UserProfile.objects.get(user=user).version == version
+
+    def test_validation_errors_per_operation(self, client):
+        """Test that errors are reported in the position of their operation."""
+        response, _ = bulk(
+            client,
+            [
+                {"op": "add", **account("new@example.com")},
+                {"op": "add", **{**account("bad@example.com"), "smtp_port": "x"}},
+                {"op": "rename", "email": "old@example.com"},
+                {"op": "remove", "email": "not-an-address"},
+            ],
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = response.data["operations"]
+        assert errors[0] == {}
+        assert "smtp_port" in errors[1]
+        assert "op" in errors[2]
+        assert "email" in errors[3]
+
+    def test_address_appears_once(self, client):
+        """Test that two operations on the same address are refused."""
+        response, _ = bulk(
+            client,
+            [
+                {"op": "update", **account("keep@example.com")},
+                {"op": "remove", "email": "keep@example.com"},
+            ],
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["operations"][1] == {"email": ["Appears in an earlier operation."]}
+
+    def test_operation_limit(self, client, settings):
+        """Test that batches over the limit are refused."""
+        settings.EMAIL_ACCOUNTS_BULK_MAX_OPERATIONS = 1
+        operations = [{"op": "remove", "email": "old@example.com"}] * 2
+
+        response, _ = bulk(client, operations)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_stale_version(self, client, user):
+        """Test that a batch made against an old version is rejected with 412."""
+        version = user.profile.version
+
+        response, _ = bulk(
+            client, [{"op": "remove", "email": "old@example.com"}], version=version + 1
+        )
+
+        assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+        assert response.data["version"] == version
+        assert "old@example.com" in stored_accounts(user)
+
+
+@pytest.mark.django_db
+class TestConcurrentWrites:
+    """Test writes landing between the check and the update."""
+
+    @pytest.fixture
+    def concurrent_write(self, user):
+        """Bump the profile version right after the first read, as another request would."""
+        read = email_accounts._version_and_addresses
+        calls = []
+
+        def read_then_write(profiles):
+            result = read(profiles)
+            calls.append(result)
+            if len(calls) == 1:
+                UserProfile.objects.filter(user=user).update(version=result[0] + 5)
+            return result
+
+        with mock.patch.object(email_accounts, "_version_and_addresses", read_then_write):
+            yield calls
+
+    def test_checked_again_without_client_version(self, client, user, concurrent_write):
+        """Test that the batch is checked against the new version and applied."""
+        response, _ = bulk(client, [{"op": "remove", "email": "old@example.com"}])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(concurrent_write) == 2
+        assert response.data["version"] == concurrent_write[1][0] + 1
+        assert "old@example.com" not in stored_accounts(user)
+
+    def test_single_account_keeps_concurrent_changes(self, client, user, concurrent_write):
+        """Test that adding one account is checked again instead of overwriting."""
+        response = client.post(reverse("email-accounts"), account("new@example.com"), format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(concurrent_write) == 2
+        profile = UserProfile.objects.get(user=user)
+        assert profile.version == concurrent_write[1][0] + 1
+        assert sorted(stored_accounts(user)) == [
+            "keep@example.com",
+            "new@example.com",
+            "old@example.com",
+        ]
+
+    def test_single_account_update_and_remove(self, client, user):
+        """Test that the single-account endpoint updates and removes through the same path."""
+        version = user.profile.version
+
+        updated = client.post(
+            reverse("email-accounts"), account("keep@example.com", "outlook"), format="json"
+        )
+        removed = client.delete(reverse("email-account-detail", args=["old@example.com"]))
+        missing = client.delete(reverse("email-account-detail", args=["old@example.com"]))
+
+        assert (updated.status_code, removed.status_code) == (201, 200)
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+        updated_account = email_accounts.account_record(account("keep@example.com", "outlook"))
+        assert stored_accounts(user) == {"keep@example.com": updated_account}
+        assert UserProfile.objects.get(user=user).version == version + 2
+
+    def test_rejected_with_client_version(self, client, user, concurrent_write):
+        """Test that a client sending its version learns the profile changed."""
+        version = user.profile.version
+
+        response, _ = bulk(client, [{"op": "remove", "email": "old@example.com"}], version=version)
+
+        assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+        assert response.data["version"] == version + 5
+        assert "old@example.com" in stored_accounts(user)
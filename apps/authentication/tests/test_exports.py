@@ -0,0 +1,93 @@
+"""
+Tests for the user export endpoint and command.
+
+This module contains test cases for streaming CSV and NDJSON exports, their
+filters, and resuming an export from a keyset cursor.
+"""
+
+import csv
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+
+from apps.authentication.models import User
+
+
+def _content(response):
+    """Join a streaming response body into a string."""
+    return b"".join(response.streaming_content).decode("utf-8")
+
+
+@pytest.fixture
+def users():
+    """Create a handful of users with profiles."""
+    created = []
+    for index in range(5):
+        user = User.objects.create_user(
+            username=f"user{index}",
+            email=f"user{index}@example.com",
+            password="TestPassword123!",
+            is_active=index != 0,
+        )
+        user.profile.company_name = f"Company {index}"
+        user.profile.email_accounts = {f"box{index}@example.com": {"provider": "gmail"}}
+        user.profile.save()
+        created.append(user)
+    return created
+
+
+@pytest.mark.django_db
+class TestUserExportView:
+    """Test the UserExportView."""
+
+    def test_requires_admin(self, auth_client):
+        """Test that non-staff users cannot export."""
+        response = auth_client.get(reverse("user-export"))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_export_csv(self, staff_client, users):
+        """Test streaming a CSV export with profile columns."""
+        response = staff_client.get(reverse("user-export"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/csv"
+        rows = list(csv.DictReader(io.StringIO(_content(response))))
+        assert len(rows) == 6
+        by_email = {row["email"]: row for row in rows}
+        assert by_email["user1@example.com"]["company_name"] == "Company 1"
+        assert json.loads(by_email["user1@example.com"]["email_accounts"]) == {
+            "box1@example.com": {"provider": "gmail"}
+        }
+
+    def test_export_ndjson_filtered_and_resumed(self, staff_client, users):
+        """Test filtering on is_active and resuming after a cursor."""
+        response = staff_client.get(
+            reverse("user-export"),
+            {"output": "ndjson", "is_active": "true", "after": users[1].pk},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        rows = [json.loads(line) for line in _content(response).splitlines()]
+        assert [row["id"] for row in rows] == [user.pk for user in users[2:]]
+
+    def test_invalid_output(self, staff_client):
+        """Test that an unknown output format is rejected."""
+        response = staff_client.get(reverse("user-export"), {"output": "xml"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_export_users_command(users):
+    """Test that the export command writes NDJSON to stdout."""
+    out = io.StringIO()
+
+    call_command("export_users", "--format", "ndjson", "--is-active", "false", stdout=out)
+
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [row["email"] for row in rows] == ["user0@example.com"]
@@ -0,0 +1,120 @@
+"""
+Tests for Idempotency-Key handling.
+
+This module contains test cases for replaying retried registration and email
+account requests.
+"""
+
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.appsUtils import idempotency
+from apps.authentication import email_accounts
+from apps.authentication.models import User
+from apps.authentication.views import EmailAccountView
+
+
+REGISTRATION = {
+    "username": "testuser",
+    "email": "testuser@example.com",
+    "first_name": "Test",
+    "last_name": "User",
+}
+
+
+@pytest.mark.django_db
+class TestIdempotentRegistration:
+    """Test Idempotency-Key handling on the registration endpoint."""
+
+    def test_retry_replays_response(self, api_client, fake_redis):
+        """Test that a retry returns the first response without creating another user."""
+        first = api_client.post(
+            reverse("register"), REGISTRATION, format="json", HTTP_IDEMPOTENCY_KEY="abc"
+        )
+        retry = api_client.post(
+            reverse("register"), REGISTRATION, format="json", HTTP_IDEMPOTENCY_KEY="abc"
+        )
+
+        assert first.status_code == retry.status_code == status.HTTP_201_CREATED
+        assert retry.content == first.content
+        assert retry["Content-Type"] == first["Content-Type"]
+        assert retry[idempotency.REPLAYED_HEADER] == "true"
+        assert User.objects.filter(email=REGISTRATION["email"]).count() == 1
+
+    def test_reused_key_for_other_request_is_rejected(self, api_client, fake_redis):
+        """Test that a key cannot be reused with a different body."""
+        api_client.post(
+            reverse("register"), REGISTRATION, format="json", HTTP_IDEMPOTENCY_KEY="abc"
+        )
+
+        response = api_client.post(
+            reverse("register"),
+            {**REGISTRATION, "email": "other@example.com", "username": "other"},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="abc",
+        )
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert not User.objects.filter(email="other@example.com").exists()
+
+    def test_in_flight_duplicate_conflicts_after_wait(self, api_client, fake_redis, settings):
+        """Test that a duplicate gives up with 409 while the first request holds the lock."""
+        settings.IDEMPOTENCY_WAIT_TIMEOUT = 0
+        lock_key = None
+
+        def hold_lock(key, value, nx=False, ex=None):
+            nonlocal lock_key
+            lock_key = key
+            return None
+
+        with mock.patch.object(fake_redis, "set", side_effect=hold_lock):
+            response = api_client.post(
+                reverse("register"), REGISTRATION, format="json", HTTP_IDEMPOTENCY_KEY="abc"
+            )
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert lock_key.endswith(":lock")
+        assert not User.objects.exists()
+
+    def test_without_key_runs_normally(self, api_client, fake_redis):
+        """Test that requests without the header never touch Redis."""
+        response = api_client.post(reverse("register"), REGISTRATION, format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert fake_redis.keys() == []
+
+
+@pytest.mark.django_db
+def test_email_account_retry_writes_profile_once(fake_redis):
+    """Test that a retried email account request saves the profile once."""
+    user = User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!"
+    )
+    data = {
+        "email": "sales@example.com",
+        "provider": "smtp",
+        "smtp_server": "smtp.example.com",
+        "smtp_port": 587,
+        "imap_server": "imap.example.com",
+        "imap_port": 993,
+        "password": "secret",
+    }
+    factory = APIRequestFactory()
+    responses = []
+
+    with mock.patch(
+        "apps.authentication.views.save_account", wraps=email_accounts.save_account
+    ) as save:
+        for _ in range(2):
+            request = factory.post("/", data, format="json", HTTP_IDEMPOTENCY_KEY="retry-1")
+            force_authenticate(request, user=user)
+            response = EmailAccountView.as_view()(request)
+            responses.append(response)
+
+    assert [response.status_code for response in responses] == [201, 201]
+    assert responses[0].content == responses[1].content
+    assert save.call_count == 1
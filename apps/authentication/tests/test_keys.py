@@ -0,0 +1,162 @@
+"""
+Tests for asymmetric JWT signing.
+
+This module contains test cases for the signing key ring, key rotation, the
+JWKS endpoint, and the verified access token cache.
+"""
+
+import time
+from unittest import mock
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import TokenError
+
+from apps.authentication import authentication, revocation
+from apps.authentication.models import User
+from apps.authentication.tokens import AccessToken, RefreshToken, token_backend
+
+
+@pytest.fixture
+def key_dir(tmp_path, settings):
+    """Configure a key directory holding an RSA and an Ed25519 key."""
+    call_command("generate_signing_key", algorithm="RS256", kid="rsa-1", directory=tmp_path)
+    call_command("generate_signing_key", algorithm="EdDSA", kid="ed-1", directory=tmp_path)
+    settings.JWT_SIGNING_KEYS_DIR = str(tmp_path)
+    settings.JWT_ACTIVE_KID = "rsa-1"
+    return tmp_path
+
+
+@pytest.fixture
+def user():
+    """Create a user to issue tokens for."""
+    return User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!"
+    )
+
+
+@pytest.mark.django_db
+class TestKeyRingSigning:
+    """Test signing and verifying tokens with the key ring."""
+
+    @pytest.mark.parametrize("kid, algorithm", [("rsa-1", "RS256"), ("ed-1", "EdDSA")])
+    def test_signs_with_active_key(self, key_dir, settings, user, kid, algorithm):
+        """Test that tokens carry the active kid and verify with its algorithm."""
+        settings.JWT_ACTIVE_KID = kid
+
+        encoded = str(AccessToken.for_user(user))
+
+        assert jwt.get_unverified_header(encoded) == {"alg": algorithm, "kid": kid, "typ": "JWT"}
+        assert AccessToken(encoded)["user_id"] == str(user.pk)
+
+    def test_rotation_keeps_old_tokens_valid(self, key_dir, settings, user):
+        """Test that tokens signed by the previous key verify after rotation."""
+        encoded = str(RefreshToken.for_user(user))
+
+        settings.JWT_ACTIVE_KID = "ed-1"
+
+        assert RefreshToken(encoded)["user_id"] == str(user.pk)
+        assert jwt.get_unverified_header(str(RefreshToken.for_user(user)))["kid"] == "ed-1"
+
+    def test_removed_key_is_rejected(self, key_dir, settings, user):
+        """Test that tokens whose kid is no longer configured are rejected."""
+        encoded = str(AccessToken.for_user(user))
+        (key_dir / "rsa-1.pem").unlink()
+        settings.JWT_ACTIVE_KID = "ed-1"
+
+        with pytest.raises(TokenError):
+            AccessToken(encoded)
+
+    def test_public_key_only_cannot_sign(self, key_dir, settings):
+        """Test that a verification-only key cannot be made active."""
+        (key_dir / "pub-1.pem").write_bytes(_public_pem(key_dir / "rsa-1.pem"))
+        settings.JWT_ACTIVE_KID = "pub-1"
+
+        with pytest.raises(ImproperlyConfigured):
+            str(AccessToken())
+
+
+def _public_pem(private_path):
+    """Return the public half of a PEM private key."""
+    private_key = serialization.load_pem_private_key(private_path.read_bytes(), password=None)
+    return private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+@pytest.mark.django_db
+class TestJWKSView:
+    """Test the JWKS endpoint."""
+
+    def test_lists_public_keys(self, client, key_dir):
+        """Test that every key is published with cache headers."""
+        response = client.get(reverse("jwks"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Cache-Control"] == "public, max-age=300"
+        keys = {key["kid"]: key for key in response.json()["keys"]}
+        assert keys["rsa-1"]["kty"] == "RSA" and keys["rsa-1"]["alg"] == "RS256"
+        assert keys["ed-1"]["kty"] == "OKP" and keys["ed-1"]["alg"] == "EdDSA"
+        assert all("d" not in key for key in keys.values())
+
+    def test_not_modified(self, client, key_dir):
+        """Test that a matching If-None-Match returns 304."""
+        etag = client.get(reverse("jwks"))["ETag"]
+
+        response = client.get(reverse("jwks"), HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+class TestVerifiedTokenCache:
+    """Test that verified access tokens skip signature checks."""
+
+    def test_second_request_skips_decode(self, api_client, key_dir, redis_client, user):
+        """Test that a repeated token is verified once but checked for revocation each time."""
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+        with mock.patch.object(token_backend, "decode", wraps=token_backend.decode) as decode:
+            first = api_client.get(reverse("profile"))
+            second = api_client.get(reverse("profile"))
+
+        assert first.status_code == second.status_code == status.HTTP_200_OK
+        assert decode.call_count == 1
+
+    def test_revoked_token_rejected_from_cache(self, api_client, key_dir, redis_client, user):
+        """Test that a cached token is still rejected once the user's sessions are revoked."""
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        assert api_client.get(reverse("profile")).status_code == status.HTTP_200_OK
+
+        redis_client.hincrby.return_value = 1
+        revocation.revoke_user_sessions(user.pk)
+
+        assert api_client.get(reverse("profile")).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_expired_entries_are_dropped(self, user):
+        """Test that a cached token past its expiry is not returned."""
+        cache = authentication.VerifiedTokenCache()
+        token = AccessToken.for_user(user)
+        token["exp"] = int(time.time()) - 1
+
+        cache.add(b"raw", token)
+
+        assert cache.get(b"raw") is None
+
+    def test_cache_is_bounded(self, settings, user):
+        """Test that the least recently used token is evicted."""
+        settings.JWT_VERIFIED_TOKEN_CACHE_SIZE = 2
+        cache = authentication.VerifiedTokenCache()
+        token = AccessToken.for_user(user)
+
+        cache.add(b"first", token)
+        cache.add(b"second", token)
+        cache.get(b"first")
+        cache.add(b"third", token)
+
+        assert list(cache.tokens) == [b"first", b"third"]
@@ -0,0 +1,210 @@
+"""
+Tests for structured logging.
+
+This module contains test cases for the JSON formatter, redaction, sampling,
+the queued handler and request id propagation to responses and Celery tasks.
+"""
+
+import io
+import json
+import logging
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from django.test import Client
+
+from apps.appsUtils import log
+from apps.appsUtils.log import (
+    REDACTED,
+    JSONFormatter,
+    QueueJSONHandler,
+    RequestIdFilter,
+    SamplingFilter,
+)
+from apps.config import celery
+
+FIELDS = ("password", "token", "authorization")
+
+
+def make_record(msg="message", args=None, level=logging.INFO, name="apps.test", **extra):
+    """Return a log record with ``extra`` fields set."""
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def request_id():
+    """Bind a request id for the duration of a test."""
+    token = log.set_request_id("req-1")
+    yield "req-1"
+    log.reset_request_id(token)
+
+
+class TestJSONFormatter:
+    """Test formatting and redaction."""
+
+    def test_formats_record_with_extras(self, request_id):
+        """Test that the record, its extras and the request id are written."""
+        record = make_record("%s logged in", ("alice",), user_id=7)
+        RequestIdFilter().filter(record)
+
+        document = json.loads(JSONFormatter(FIELDS).format(record))
+
+        assert document["message"] == "alice logged in"
+        assert document["level"] == "INFO"
+        assert document["logger"] == "apps.test"
+        assert document["request_id"] == "req-1"
+        assert document["user_id"] == 7
+
+    def test_redacts_secret_extras(self):
+        """Test that secret keys are redacted at any depth and with prefixes."""
+        record = make_record(
+            smtp_password="hunter2", payload={"user": "alice", "auth": [{"token": "abc"}]}
+        )
+
+        document = json.loads(JSONFormatter(FIELDS).format(record))
+
+        assert document["smtp_password"] == REDACTED
+        assert document["payload"] == {"user": "alice", "auth": [{"token": REDACTED}]}
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "password=hunter2 user=alice",
+            "{'password': 'hunter2', 'user': 'alice'}",
+            '{"smtp_password": "hunter2", "user": "alice"}',
+            "Authorization: Bearer hunter2.sig user=alice",
+        ],
+    )
+    def test_redacts_message_text(self, text):
+        """Test that secrets written into the message are redacted."""
+        message = json.loads(JSONFormatter(FIELDS).format(make_record(text)))["message"]
+
+        assert "hunter2" not in message
+        assert REDACTED in message
+        assert "alice" in message
+
+
+class TestSamplingFilter:
+    """Test sampling of high-volume loggers."""
+
+    def test_rate_applies_to_child_loggers(self):
+        """Test that the most specific configured prefix wins."""
+        sampling = SamplingFilter({"apps.access": 0.1, "apps.access.health": 0})
+
+        assert sampling.rate("apps.access.api") == 0.1
+        assert sampling.rate("apps.access.health.ping") == 0
+        assert sampling.rate("apps.accessory") == 1.0
+
+    def test_drops_sampled_out_records(self):
+        """Test that records of a logger sampled at 0 are dropped."""
+        sampling = SamplingFilter({"apps.access": 0})
+
+        assert not sampling.filter(make_record(name="apps.access"))
+        assert sampling.filter(make_record(name="apps.other"))
+
+    def test_keeps_warnings(self):
+        """Test that warnings are kept whatever the rate."""
+        sampling = SamplingFilter({"apps.access": 0})
+
+        assert sampling.filter(make_record(name="apps.access", level=logging.WARNING))
+
+
+class TestQueueJSONHandler:
+    """Test the queued handler and its listener."""
+
+    def test_writes_json_lines_from_listener(self):
+        """Test that queued records are written by the listener as JSON."""
+        stream = io.StringIO()
+        handler = QueueJSONHandler(stream=stream, redacted_fields=FIELDS)
+        try:
+            handler.handle(make_record("login %r", ({"password": "hunter2"},)))
+        finally:
+            handler.stop()
+
+        message = json.loads(stream.getvalue())["message"]
+        assert "hunter2" not in message
+        assert message.startswith("login {'password': ")
+
+    def test_formats_message_when_logged(self):
+        """Test that arguments changed after logging do not affect the output."""
+        stream = io.StringIO()
+        handler = QueueJSONHandler(stream=stream)
+        items = ["a"]
+        try:
+            handler.handle(make_record("items %s", (items,)))
+            items.append("b")
+        finally:
+            handler.stop()
+
+        assert json.loads(stream.getvalue())["message"] == "items ['a']"
+
+    def test_drops_records_when_queue_is_full(self):
+        """Test that a full queue drops and counts records instead of blocking."""
+        handler = QueueJSONHandler(stream=io.StringIO(), queue_size=1)
+        with mock.patch.object(handler, "start"):
+            handler._pid = None
+            for _ in range(3):
+                handler.handle(make_record())
+
+        assert handler.dropped == 2
+
+
+@pytest.mark.django_db
+class TestRequestIdMiddleware:
+    """Test request ids on responses and access records."""
+
+    def test_echoes_request_id(self, caplog):
+        """Test that a valid incoming id is used for the response and the log."""
+        with caplog.at_level(logging.INFO, logger="apps.access"):
+            response = Client().get("/health/", HTTP_X_REQUEST_ID="lb-1234")
+
+        assert response["X-Request-ID"] == "lb-1234"
+        record = next(r for r in caplog.records if r.name == "apps.access")
+        assert record.request_id == "lb-1234"
+        assert (record.method, record.path, record.status) == ("GET", "/health/", 200)
+        assert log.get_request_id() is None
+
+    @pytest.mark.parametrize("header", ["", "not valid!", "x" * 200])
+    def test_replaces_missing_or_invalid_id(self, header):
+        """Test that a new id is generated when the header is unusable."""
+        response = Client().get("/health/", HTTP_X_REQUEST_ID=header)
+
+        assert response["X-Request-ID"] != header
+        assert len(response["X-Request-ID"]) == 32
+
+
+class TestCeleryRequestId:
+    """Test carrying the request id to Celery tasks."""
+
+    def test_publish_adds_header(self, request_id):
+        """Test that tasks published during a request carry its id."""
+        headers = {}
+
+        celery.propagate_request_id(headers=headers)
+
+        assert headers["request_id"] == "req-1"
+
+    def test_task_binds_sent_request_id(self):
+        """Test that a task logs under the id of the request that sent it."""
+        task = SimpleNamespace(request=SimpleNamespace(request_id="req-1"))
+
+        celery.bind_request_id(task_id="task-1", task=task)
+        try:
+            assert log.get_request_id() == "req-1"
+        finally:
+            celery.unbind_request_id()
+
+        assert log.get_request_id() is None
+
+    def test_task_without_request_uses_task_id(self):
+        """Test that tasks not sent from a request log under their own id."""
+        task = SimpleNamespace(request=SimpleNamespace())
+
+        celery.bind_request_id(task_id="task-1", task=task)
+        try:
+            assert log.get_request_id() == "task-1"
+        finally:
+            celery.unbind_request_id()
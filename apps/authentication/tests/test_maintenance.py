@@ -0,0 +1,163 @@
+"""
+Tests for the expired row cleanup.
+
+This module contains test cases for deleting expired sessions in keyset
+batches, the advisory lock shared by concurrent workers, the lock timeout and
+the retries after it.
+"""
+
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+
+from apps.authentication.maintenance import (
+    CLEANUP_TARGETS,
+    LOCK_NOT_AVAILABLE,
+    cleanup_expired,
+    delete_expired,
+    retry_lock_timeouts,
+)
+
+SESSIONS = CLEANUP_TARGETS["sessions"]
+
+postgresql_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Needs PostgreSQL locking"
+)
+
+
+@pytest.fixture
+def sessions(db):
+    """Create 7 expired sessions, 2 sharing an expiry time, and 3 live ones."""
+    now = timezone.now()
+    expiries = [now - timedelta(hours=hours) for hours in (1, 2, 3, 3, 4, 5, 6)]
+    expiries += [now + timedelta(hours=hours) for hours in (1, 2, 3)]
+    Session.objects.bulk_create(
+        Session(session_key=f"key{index:02d}", session_data="", expire_date=expire_date)
+        for index, expire_date in enumerate(expiries)
+    )
+
+
+@pytest.fixture
+def other_connection():
+    """Return a second connection to the test database."""
+    other = connections.create_connection("default")
+    yield other
+    other.close()
+
+
+@pytest.mark.django_db
+class TestDeleteExpired:
+    """Test deleting expired rows in batches."""
+
+    def test_deletes_expired_rows_in_batches(self, sessions):
+        """Test that only expired rows are deleted, batch by batch."""
+        result = delete_expired(SESSIONS, batch_size=3, sleep=0)
+
+        assert result["deleted"] == 7
+        assert result["batches"] == 3
+        assert result["rows_per_sec"] > 0
+        assert Session.objects.count() == 3
+        assert not Session.objects.filter(expire_date__lt=timezone.now()).exists()
+
+    def test_stops_when_time_budget_is_spent(self, sessions):
+        """Test that a run stops after its budget and the next run carries on."""
+        first = delete_expired(SESSIONS, batch_size=2, sleep=0.02, time_budget=0.01)
+        second = delete_expired(SESSIONS, batch_size=2, sleep=0)
+
+        assert first["batches"] == 1
+        assert first["deleted"] + second["deleted"] == 7
+
+    def test_skips_uninstalled_targets(self, sessions):
+        """Test that tables of apps that are not installed are left out."""
+        results = cleanup_expired(sleep=0)
+
+        assert set(results) == {"sessions"}
+
+    def test_command_reports_results(self, sessions):
+        """Test the management command."""
+        out = StringIO()
+
+        call_command("cleanup_expired", "sessions", "--sleep", "0", stdout=out)
+
+        assert "'deleted': 7" in out.getvalue()
+
+
+@postgresql_only
+@pytest.mark.django_db(transaction=True)
+class TestLocking:
+    """Test coordination with other workers and requests."""
+
+    def test_skips_table_locked_by_another_worker(self, sessions, other_connection):
+        """Test that a second worker skips a table being cleaned."""
+        with other_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [SESSIONS.lock_key])
+
+        assert delete_expired(SESSIONS, sleep=0) == {"skipped": True}
+        assert Session.objects.count() == 10
+
+    def test_gives_up_after_lock_timeouts(self, sessions, other_connection, settings):
+        """Test that a batch waiting on a table lock times out instead of queueing."""
+        settings.MAINTENANCE_MAX_LOCK_TIMEOUTS = 2
+        other_connection.set_autocommit(False)
+        with other_connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {Session._meta.db_table} IN ACCESS EXCLUSIVE MODE")
+
+        result = delete_expired(SESSIONS, sleep=0, lock_timeout_ms=10)
+
+        other_connection.rollback()
+        assert result["lock_timeouts"] == 2
+        assert result["deleted"] == 0
+
+
+def lock_timeout():
+    """Return the error a statement stopped by lock_timeout raises."""
+    cause = Exception("canceling statement due to lock timeout")
+    cause.pgcode = LOCK_NOT_AVAILABLE
+    error = OperationalError(*cause.args)
+    error.__cause__ = cause
+    return error
+
+
+class TestRetryLockTimeouts:
+    """Test running a batch again after lock timeouts."""
+
+    def test_retries_until_the_batch_succeeds(self):
+        """Test that the result comes with the number of lock timeouts before it."""
+        attempts = iter([lock_timeout(), lock_timeout(), "done"])
+
+        def batch():
+            outcome = next(attempts)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert retry_lock_timeouts(batch, 3, 0, "in a test") == ("done", 2)
+
+    def test_raises_after_too_many_in_a_row(self):
+        """Test that the lock timeout is raised once the limit is reached."""
+        attempts = []
+
+        def batch():
+            attempts.append(1)
+            raise lock_timeout()
+
+        with pytest.raises(OperationalError):
+            retry_lock_timeouts(batch, 2, 0, "in a test")
+        assert len(attempts) == 2
+
+    def test_other_errors_are_not_retried(self):
+        """Test that errors other than lock timeouts are raised at once."""
+        attempts = []
+
+        def batch():
+            attempts.append(1)
+            raise OperationalError("server closed the connection")
+
+        with pytest.raises(OperationalError):
+            retry_lock_timeouts(batch, 3, 0, "in a test")
+        assert len(attempts) == 1
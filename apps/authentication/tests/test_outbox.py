@@ -0,0 +1,253 @@
+"""
+Tests for the transactional outbox.
+
+This module contains test cases for recording user lifecycle events with their
+changes, the publishers, and relaying batches with SKIP LOCKED.
+"""
+
+import json
+import threading
+from unittest import mock
+
+import pytest
+from django.db import connection, transaction
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.authentication import outbox, tasks
+from apps.authentication.models import OutboxEvent, User, UserProfile
+from apps.authentication.outbox import CeleryPublisher, RedisStreamPublisher, relay, relay_batch
+
+
+class ListPublisher:
+    """Publisher keeping the published batches in a list."""
+
+    def __init__(self):
+        self.batches = []
+
+    def publish(self, events):
+        self.batches.append(events)
+
+
+def create_user(username="user"):
+    """Create a user and return it."""
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password="TestPassword123!"
+    )
+
+
+def topics():
+    """Return the topics in the outbox in order."""
+    return list(OutboxEvent.objects.order_by("pk").values_list("topic", flat=True))
+
+
+@pytest.mark.django_db
+class TestRecording:
+    """Test that changes write their events."""
+
+    def test_registration_records_created_event(self):
+        """Test the event of a registered user."""
+        response = APIClient().post(
+            reverse("register"),
+            {
+                "username": "newuser",
+                "email": "new@example.com",
+                "password": "StrongPass123!",
+                "password2": "StrongPass123!",
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        event = OutboxEvent.objects.get()
+        user = User.objects.get(username="newuser")
+        assert event.topic == "user.created"
+        assert event.key == str(user.pk)
+        assert event.payload["email"] == "new@example.com"
+        assert "password" not in event.payload
+
+    def test_targeted_updates_record_changed_fields(self):
+        """Test the events of a profile PATCH changing user and profile columns."""
+        user = create_user()
+        OutboxEvent.objects.all().delete()
+        client = APIClient()
+        client.force_authenticate(user)
+
+        client.patch(
+            reverse("profile-details"), {"first_name": "Ada", "company_name": "Acme"}, format="json"
+        )
+
+        user_event, profile_event = OutboxEvent.objects.order_by("pk")
+        assert (user_event.topic, user_event.payload["fields"]) == ("user.updated", ["first_name"])
+        assert user_event.payload["first_name"] == "Ada"
+        assert profile_event.topic == "user.profile_updated"
+        assert profile_event.payload["fields"] == ["company_name"]
+        assert profile_event.payload["version"] == 2
+
+    def test_full_user_save_records_one_event(self):
+        """Test that saving a whole user records only its own event."""
+        user = create_user()
+        OutboxEvent.objects.all().delete()
+
+        user.save()
+
+        assert topics() == ["user.updated"]
+
+    def test_full_save_of_loaded_user_leaves_profile_alone(self):
+        """Test that a user read back with its deferred profile records only user.updated."""
+        user = User.objects.select_related("profile").get(pk=create_user().pk)
+        version = user.profile.version
+        OutboxEvent.objects.all().delete()
+
+        User.objects.get(pk=user.pk).save()
+        user.save()
+
+        assert topics() == ["user.updated", "user.updated"]
+        assert UserProfile.objects.get(user=user).version == version
+
+    def test_event_carries_request_id(self):
+        """Test that events record the request they were written in."""
+        with mock.patch("apps.authentication.models.get_request_id", return_value="req-1"):
+            create_user()
+
+        assert OutboxEvent.objects.get().request_id == "req-1"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_change_and_event_commit_together():
+    """Test that a user is not saved when its event cannot be written."""
+    with mock.patch("apps.authentication.models.record_event", side_effect=RuntimeError):
+        with pytest.raises(RuntimeError):
+            create_user()
+
+    assert not User.objects.exists()
+
+
+@pytest.mark.django_db
+class TestRelay:
+    """Test claiming, publishing and deleting batches."""
+
+    def test_publishes_in_batches_and_deletes(self):
+        """Test that events are published in id order and removed."""
+        for index in range(5):
+            create_user(f"user{index}")
+        publisher = ListPublisher()
+
+        assert relay(publisher, batch_size=2) == 5
+
+        assert [len(batch) for batch in publisher.batches] == [2, 2, 1]
+        ids = [event["id"] for batch in publisher.batches for event in batch]
+        assert ids == sorted(ids)
+        assert publisher.batches[0][0]["topic"] == "user.created"
+        assert not OutboxEvent.objects.exists()
+
+    def test_failed_publish_keeps_events(self):
+        """Test that events stay in the outbox when publishing fails."""
+        create_user()
+        publisher = mock.Mock()
+        publisher.publish.side_effect = ConnectionError
+
+        with pytest.raises(ConnectionError):
+            relay_batch(publisher)
+
+        assert OutboxEvent.objects.count() == 1
+
+    def test_documents_are_json(self):
+        """Test that published events can be serialized as they are."""
+        create_user()
+        publisher = ListPublisher()
+
+        relay_batch(publisher)
+
+        event = json.loads(json.dumps(publisher.batches[0][0]))
+        assert set(event) == set(outbox.EVENT_FIELDS)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="SKIP LOCKED needs PostgreSQL")
+def test_concurrent_relays_claim_different_events():
+    """Test that a relay skips the events another relay has claimed."""
+    for index in range(4):
+        create_user(f"user{index}")
+    claimed, release = threading.Event(), threading.Event()
+
+    class BlockingPublisher(ListPublisher):
+        def publish(self, events):
+            super().publish(events)
+            claimed.set()
+            release.wait(10)
+
+    first = BlockingPublisher()
+    thread = threading.Thread(target=lambda: (relay_batch(first, 2), connection.close()))
+    thread.start()
+    try:
+        assert claimed.wait(10)
+        second = ListPublisher()
+        with transaction.atomic():
+            relay_batch(second, 2)
+    finally:
+        release.set()
+        thread.join()
+
+    first_ids = {event["id"] for event in first.batches[0]}
+    second_ids = {event["id"] for event in second.batches[0]}
+    assert len(first_ids) == len(second_ids) == 2
+    assert not first_ids & second_ids
+    assert not OutboxEvent.objects.exists()
+
+
+class TestPublishers:
+    """Test publishing to Celery and Redis streams."""
+
+    EVENTS = [
+        {
+            "id": 7,
+            "topic": "user.created",
+            "key": "3",
+            "payload": {"user_id": 3},
+            "request_id": None,
+            "created_at": "2026-01-01T00:00:00+00:00",
+        }
+    ]
+
+    def test_celery_sends_one_task_per_event(self):
+        """Test that events become tasks sent over one producer."""
+        app = mock.MagicMock()
+
+        CeleryPublisher(task_name="handle", app=app).publish(self.EVENTS)
+
+        producer = app.producer_or_acquire.return_value.__enter__.return_value
+        app.send_task.assert_called_once_with(
+            "handle", args=[self.EVENTS[0]], task_id="outbox-7", producer=producer
+        )
+
+    def test_redis_appends_to_stream_in_one_round_trip(self):
+        """Test that events are appended with pipelined XADDs."""
+        client = mock.MagicMock()
+
+        RedisStreamPublisher(stream="events", maxlen=100, client=client).publish(self.EVENTS)
+
+        pipeline = client.pipeline.return_value
+        stream, fields = pipeline.xadd.call_args.args
+        assert stream == "events"
+        assert fields["payload"] == '{"user_id": 3}'
+        assert fields["request_id"] == ""
+        assert pipeline.xadd.call_args.kwargs == {"maxlen": 100, "approximate": True}
+        pipeline.execute.assert_called_once()
+
+    @pytest.mark.django_db
+    def test_task_sends_user_event_signal(self):
+        """Test that the Celery task hands the event to the signal receivers."""
+        received = []
+
+        def receiver(**kwargs):
+            received.append(kwargs)
+
+        outbox.user_event.connect(receiver)
+        try:
+            tasks.handle_user_event(self.EVENTS[0])
+        finally:
+            outbox.user_event.disconnect(receiver)
+
+        assert received[0]["event"] == self.EVENTS[0]
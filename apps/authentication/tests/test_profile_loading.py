@@ -0,0 +1,122 @@
+"""
+Tests for deferred loading of heavy profile columns.
+
+This module contains test cases for the UserProfile manager, its opt-in
+loaders, and the writes made by code paths that touch ``user.profile``.
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import HEAVY_PROFILE_FIELDS, User, UserProfile
+from apps.authentication.views import EmailAccountView
+
+SIGNATURE = "Regards,\n" + "x" * 10_000
+ACCOUNTS = {f"{index}@example.com": {"provider": "smtp"} for index in range(50)}
+
+
+@pytest.fixture
+def user():
+    """Create a user whose profile has large columns."""
+    user = User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!"
+    )
+    UserProfile.objects.filter(user=user).update(
+        email_signature=SIGNATURE, email_accounts=ACCOUNTS
+    )
+    return User.objects.get(pk=user.pk)
+
+
+def captured_sql(context):
+    """Return the SQL of the captured queries."""
+    return [query["sql"] for query in context.captured_queries]
+
+
+@pytest.mark.django_db
+class TestUserProfileManager:
+    """Test the deferring manager and its loaders."""
+
+    def test_related_access_skips_heavy_columns(self, user):
+        """Test that user.profile does not select the heavy columns."""
+        with CaptureQueriesContext(connection) as context:
+            profile = user.profile
+
+        (sql,) = captured_sql(context)
+        assert all(field not in sql for field in HEAVY_PROFILE_FIELDS)
+        assert profile.get_deferred_fields() == set(HEAVY_PROFILE_FIELDS)
+
+    @pytest.mark.parametrize(
+        "loader, loaded",
+        [
+            ("with_signature", {"email_signature"}),
+            ("with_email_accounts", {"email_accounts"}),
+            ("with_heavy_fields", set(HEAVY_PROFILE_FIELDS)),
+        ],
+    )
+    def test_loaders(self, user, loader, loaded):
+        """Test that each loader fetches exactly the columns it names."""
+        profile = getattr(UserProfile.objects, loader)().get(user=user)
+
+        assert profile.get_deferred_fields() == set(HEAVY_PROFILE_FIELDS) - loaded
+
+    def test_loaders_respect_only(self, user):
+        """Test that explicitly chosen columns are not widened."""
+        profile = UserProfile.objects.only("phone_number").with_heavy_fields().get(user=user)
+
+        assert "email_signature" in profile.get_deferred_fields()
+
+    def test_refresh_reloads_loaded_heavy_columns(self, user):
+        """Test that refresh_from_db does not leave loaded heavy columns stale."""
+        profile = UserProfile.objects.with_signature().get(user=user)
+        UserProfile.objects.filter(pk=profile.pk).update(email_signature="New")
+
+        profile.refresh_from_db()
+
+        assert profile.email_signature == "New"
+        assert profile.get_deferred_fields() == {"email_accounts"}
+
+
+@pytest.mark.django_db
+def test_user_save_does_not_rewrite_heavy_columns(user):
+    """Test that a user save leaves the profile and its heavy columns alone."""
+    user.first_name = "Ada"
+
+    with CaptureQueriesContext(connection) as context:
+        user.save()
+
+    assert not [sql for sql in captured_sql(context) if '"authentication_userprofile"' in sql]
+    profile = UserProfile.objects.with_heavy_fields().get(user=user)
+    assert (profile.email_signature, profile.email_accounts) == (SIGNATURE, ACCOUNTS)
+
+
+@pytest.mark.django_db
+def test_email_account_post_writes_only_accounts(user):
+    """Test that adding an email account is a versioned update that never touches the signature."""
+    request = APIRequestFactory().post(
+        "/",
+        {
+            "email": "sales@example.com",
+            "provider": "smtp",
+            "smtp_server": "smtp.example.com",
+            "smtp_port": 587,
+            "imap_server": "imap.example.com",
+            "imap_port": 993,
+            "password": "secret",
+        },
+        format="json",
+    )
+    force_authenticate(request, user=user)
+
+    with CaptureQueriesContext(connection) as context:
+        response = EmailAccountView.as_view()(request)
+
+    assert response.status_code == 201
+    assert all("email_signature" not in sql for sql in captured_sql(context))
+    updates = [sql for sql in captured_sql(context) if sql.startswith("UPDATE")]
+    assert len(updates) == 1
+    assert '"authentication_userprofile"."version" = 1' in updates[0]
+    profile = UserProfile.objects.with_email_accounts().get(user=user)
+    assert len(profile.email_accounts) == len(ACCOUNTS) + 1
+    assert profile.version == 2
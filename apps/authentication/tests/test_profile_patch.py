@@ -0,0 +1,127 @@
+"""
+Tests for partial profile updates.
+
+This module contains test cases for the profile details endpoint, asserting
+the SQL each PATCH generates and how its ETag changes.
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from apps.authentication.models import User
+
+
+@pytest.fixture
+def user():
+    """Create a user whose profile has large columns."""
+    user = User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!", first_name="Ada"
+    )
+    user.profile.email_signature = "x" * 10_000
+    user.profile.email_accounts = {
+        f"{index}@example.com": {"provider": "smtp"} for index in range(50)
+    }
+    user.profile.save()
+    return user
+
+
+@pytest.fixture
+def profile_client(api_client, user):
+    """Return an API client authenticated as the user."""
+    api_client.force_authenticate(user=user)
+    return api_client
+
+
+def patch(client, data, **headers):
+    """PATCH the profile details and return the response and its UPDATE statements."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.patch(reverse("profile-details"), data, format="json", **headers)
+    updates = [
+        query["sql"] for query in context.captured_queries if query["sql"].startswith("UPDATE")
+    ]
+    return response, updates
+
+
+@pytest.mark.django_db
+class TestProfileDetailView:
+    """Test the ProfileDetailView."""
+
+    def test_single_field_updates_only_that_column(self, profile_client, user):
+        """Test that changing phone_number writes only it plus the version columns."""
+        response, updates = patch(profile_client, {"phone_number": "555-0100"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(updates) == 1
+        assert updates[0].startswith(
+            'UPDATE "authentication_userprofile" SET "phone_number" = '
+        )
+        assert '"version" = ' in updates[0] and '"updated_at" = ' in updates[0]
+        assert "email_signature" not in updates[0]
+        assert "email_accounts" not in updates[0]
+        user.profile.refresh_from_db()
+        assert user.profile.phone_number == "555-0100"
+
+    def test_user_field_updates_user_row_only_for_that_column(self, profile_client, user):
+        """Test that a name change writes one user column and bumps the profile version."""
+        response, updates = patch(profile_client, {"last_name": "Lovelace"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(updates) == 2
+        assert updates[0].startswith('UPDATE "authentication_user" SET "last_name" = ')
+        assert "first_name" not in updates[0]
+        assert updates[1].startswith(
+            'UPDATE "authentication_userprofile" SET "updated_at" = '
+        )
+        assert '"version" = ' in updates[1]
+
+    def test_no_op_writes_nothing(self, profile_client, user):
+        """Test that sending current values issues no UPDATE and keeps the ETag."""
+        etag = profile_client.get(reverse("profile-details"))["ETag"]
+
+        response, updates = patch(
+            profile_client,
+            {
+                "first_name": "Ada",
+                "email_signature": user.profile.email_signature,
+                "email_accounts": user.profile.email_accounts,
+            },
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert updates == []
+        assert response["ETag"] == etag
+
+    def test_etag_changes_only_on_real_changes(self, profile_client):
+        """Test conditional GETs before and after a change."""
+        etag = profile_client.get(reverse("profile-details"))["ETag"]
+
+        assert (
+            profile_client.get(reverse("profile-details"), HTTP_IF_NONE_MATCH=etag).status_code
+            == status.HTTP_304_NOT_MODIFIED
+        )
+        response, _ = patch(profile_client, {"company_name": "Analytical Engines"})
+
+        assert response["ETag"] != etag
+        assert (
+            profile_client.get(reverse("profile-details"), HTTP_IF_NONE_MATCH=etag).status_code
+            == status.HTTP_200_OK
+        )
+
+    def test_stale_if_match_is_rejected(self, profile_client):
+        """Test that If-Match with an old ETag returns 412 and writes nothing."""
+        etag = profile_client.get(reverse("profile-details"))["ETag"]
+        patch(profile_client, {"company_name": "First"})
+
+        response, updates = patch(profile_client, {"company_name": "Second"}, HTTP_IF_MATCH=etag)
+
+        assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+        assert updates == []
+
+    def test_put_is_not_allowed(self, profile_client):
+        """Test that only partial updates are exposed."""
+        response = profile_client.put(reverse("profile-details"), {}, format="json")
+
+        assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
@@ -0,0 +1,126 @@
+"""
+Tests for refresh token rotation and revocation.
+
+This module contains test cases for the revocation Bloom filter, per-user
+session generations, and rotation on the token refresh endpoint.
+"""
+
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.authentication import revocation
+from apps.authentication.models import User
+
+
+@pytest.fixture
+def user():
+    """Create a user to issue tokens for."""
+    return User.objects.create_user(
+        username="user", email="user@example.com", password="TestPassword123!"
+    )
+
+
+class TestBloomFilter:
+    """Test the revocation Bloom filter."""
+
+    def test_no_false_negatives(self):
+        """Test that every added item is reported as present."""
+        bloom = revocation.BloomFilter.for_capacity(1000, 0.01)
+        items = [f"jti-{index}" for index in range(1000)]
+        for item in items:
+            bloom.add(item)
+
+        assert all(item in bloom for item in items)
+
+    def test_false_positive_rate(self):
+        """Test that the false positive rate stays near the configured rate."""
+        bloom = revocation.BloomFilter.for_capacity(1000, 0.01)
+        for index in range(1000):
+            bloom.add(f"jti-{index}")
+
+        false_positives = sum(f"other-{index}" in bloom for index in range(10000))
+
+        assert false_positives < 300
+
+    def test_bit_layout_matches_redis_setbit(self):
+        """Test that bit offsets use the same most-significant-bit-first order as SETBIT."""
+        bloom = revocation.BloomFilter(16, 1)
+        with mock.patch.object(bloom, "positions", return_value=[9]):
+            bloom.add("item")
+
+        assert bytes(bloom.bits) == b"\x00\x40"
+
+
+@pytest.mark.django_db
+class TestRevocation:
+    """Test token and session revocation checks."""
+
+    def test_older_generation_is_revoked(self, redis_client, user):
+        """Test that revoking all sessions rejects tokens from earlier generations."""
+        token = RefreshToken.for_user(user)
+        token[revocation.GENERATION_CLAIM] = 0
+        redis_client.hincrby.return_value = 1
+
+        revocation.revoke_user_sessions(user.pk)
+
+        assert revocation.is_revoked(token.payload) is True
+        token[revocation.GENERATION_CLAIM] = 1
+        assert revocation.is_revoked(token.payload) is False
+
+    def test_unrevoked_token_needs_no_redis_lookup(self, redis_client, user):
+        """Test that a filter miss is answered locally."""
+        token = RefreshToken.for_user(user)
+
+        assert revocation.is_revoked(token.payload) is False
+        redis_client.exists.assert_not_called()
+
+    def test_revoked_token_is_confirmed_in_redis(self, redis_client, user):
+        """Test that a filter hit is confirmed against Redis."""
+        token = RefreshToken.for_user(user)
+        redis_client.pipeline.return_value.execute.return_value = [True]
+        redis_client.exists.return_value = 1
+
+        assert revocation.revoke_token(token.payload) is True
+        assert revocation.is_revoked(token.payload) is True
+        redis_client.exists.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_refresh_rotates_and_rejects_reuse(api_client, redis_client, user):
+    """Test that a refresh token can only be used once."""
+    refresh = str(RefreshToken.for_user(user))
+    redis_client.pipeline.return_value.execute.side_effect = [[True], [None]]
+
+    first = api_client.post(reverse("token_refresh"), {"refresh": refresh}, format="json")
+    second = api_client.post(reverse("token_refresh"), {"refresh": refresh}, format="json")
+
+    assert first.status_code == status.HTTP_200_OK
+    assert first.data["refresh"] != refresh
+    assert second.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_refresh_fails_closed_without_redis(api_client, redis_client, user):
+    """Test that no new tokens are issued while the old one cannot be revoked."""
+    refresh = str(RefreshToken.for_user(user))
+    redis_client.pipeline.return_value.execute.side_effect = revocation.redis.ConnectionError
+
+    response = api_client.post(reverse("token_refresh"), {"refresh": refresh}, format="json")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "access" not in response.data
+
+
+@pytest.mark.django_db
+def test_revoke_sessions_endpoint(auth_client, redis_client):
+    """Test that the endpoint bumps the user's generation."""
+    redis_client.hincrby.return_value = 1
+
+    response = auth_client.post(reverse("revoke-sessions"))
+
+    assert response.status_code == status.HTTP_200_OK
+    redis_client.hincrby.assert_called_once()
@@ -0,0 +1,103 @@
+"""
+Tests for trigram-backed user search.
+
+This module contains test cases for the user search endpoint, the admin search
+hook, and the trigram indexes that serve them.
+"""
+
+import pytest
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework import status
+
+from apps.authentication.models import User
+from apps.authentication.search import search_users
+
+
+@pytest.fixture
+def users():
+    """Create users with distinct names and companies."""
+    alice = User.objects.create_user(
+        username="alice", email="alice@acme.io", password="TestPassword123!", first_name="Alice"
+    )
+    bob = User.objects.create_user(
+        username="bob", email="bob@example.com", password="TestPassword123!", last_name="Malice"
+    )
+    carol = User.objects.create_user(
+        username="carol", email="carol@example.com", password="TestPassword123!"
+    )
+    carol.profile.company_name = "Acme Corporation"
+    carol.profile.save()
+    return alice, bob, carol
+
+
+@pytest.mark.django_db
+class TestUserSearchView:
+    """Test the UserSearchView."""
+
+    def test_requires_admin(self, auth_client):
+        """Test that non-staff users cannot search."""
+        response = auth_client.get(reverse("user-search"), {"q": "alice"})
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_search_ranks_best_match_first(self, staff_client, users):
+        """Test that the closest match is returned first."""
+        alice, bob, _ = users
+
+        response = staff_client.get(reverse("user-search"), {"q": "alice"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [row["id"] for row in response.data["results"]] == [alice.pk, bob.pk]
+
+    def test_search_matches_company_name(self, staff_client, users):
+        """Test that profile company names are searched."""
+        alice, _, carol = users
+
+        response = staff_client.get(reverse("user-search"), {"q": "acme"})
+
+        assert {row["id"] for row in response.data["results"]} == {alice.pk, carol.pk}
+
+    def test_short_term_rejected(self, staff_client):
+        """Test that terms shorter than a trigram are rejected."""
+        response = staff_client.get(reverse("user-search"), {"q": "al"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_admin_search_uses_trigram_search(users):
+    """Test that the admin changelist search goes through search_users."""
+    _, _, carol = users
+    model_admin = site._registry[User]
+    request = RequestFactory().get("/admin/authentication/user/", {"q": "corporation"})
+
+    queryset, may_have_duplicates = model_admin.get_search_results(
+        request, User.objects.all(), "corporation"
+    )
+
+    assert list(queryset) == [carol]
+    assert may_have_duplicates is False
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="Trigram indexes need Postgres")
+def test_search_can_use_trigram_index(users):
+    """Test that every searched column can be served from its trigram index."""
+    queryset = search_users(User.objects.all(), "alice", rank=False)
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("SET LOCAL enable_indexscan = off")
+        plan = queryset.explain()
+
+    for index in (
+        "auth_user_email_trgm_idx",
+        "auth_user_username_trgm_idx",
+        "auth_user_first_trgm_idx",
+        "auth_user_last_trgm_idx",
+        "auth_profile_company_trgm_idx",
+    ):
+        assert index in plan
@@ -0,0 +1,122 @@
+"""
+Tests for synthetic user seeding.
+
+This module contains test cases for the seed_users command and the block
+generator behind it.
+"""
+
+from datetime import datetime, timezone
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from apps.authentication.models import User, UserProfile
+from apps.authentication.seeding import BLOCK_SIZE, generate_block, secondary_indexes
+
+OPTIONS = {
+    "count": 10 * BLOCK_SIZE,
+    "seed": 3,
+    "prefix": "seed",
+    "first_id": 1,
+    "password_hash": "hash",
+    "joined_before": datetime(2026, 1, 1, tzinfo=timezone.utc),
+}
+
+
+def seed(count, **options):
+    """Run the command quietly in this process."""
+    call_command(
+        "seed_users",
+        count,
+        workers=1,
+        joined_before="2026-01-01",
+        stdout=StringIO(),
+        stderr=StringIO(),
+        **options,
+    )
+
+
+def names(prefix):
+    """Return the generated values of the users with a prefix, in seed order."""
+    return list(
+        User.objects.filter(username__startswith=prefix)
+        .order_by("pk")
+        .values_list("first_name", "last_name", "date_joined", "profile__email_accounts")
+    )
+
+
+class TestGenerateBlock:
+    """Test the row generator."""
+
+    def test_blocks_are_deterministic(self):
+        """Test that a block depends only on the seed and its number."""
+        assert generate_block(2, **OPTIONS) == generate_block(2, **OPTIONS)
+        assert generate_block(2, **OPTIONS) != generate_block(2, **{**OPTIONS, "seed": 4})
+
+    def test_last_block_is_truncated(self):
+        """Test that the count cuts the last block short."""
+        users, profiles = generate_block(1, **{**OPTIONS, "count": BLOCK_SIZE + 10})
+
+        assert len(users) == len(profiles) == 10
+        assert users[0][0] == BLOCK_SIZE + 1
+        assert profiles[0][0] == users[0][0]
+
+
+@pytest.mark.django_db
+class TestSeedUsersCommand:
+    """Test the seed_users command."""
+
+    def test_loads_users_with_profiles(self):
+        """Test that users and profiles are loaded and usable."""
+        seed(1500, batch_size=1000)
+
+        assert User.objects.count() == UserProfile.objects.count() == 1500
+        user = User.objects.get(username="seed0")
+        assert user.check_password("SeedPassword123!")
+        assert user.profile.email_signature.startswith("Regards,\n")
+        profile = UserProfile.objects.with_email_accounts().get(user=user)
+        assert isinstance(profile.email_accounts, dict)
+
+    def test_sequence_is_advanced_past_seeded_ids(self):
+        """Test that users created afterwards do not collide with seeded ids."""
+        seed(10)
+
+        user = User.objects.create_user(
+            username="later", email="later@example.com", password="TestPassword123!"
+        )
+
+        assert user.pk > User.objects.exclude(pk=user.pk).order_by("-pk").first().pk
+
+    def test_same_seed_gives_same_data_whatever_the_batch_size(self):
+        """Test determinism across batch sizes."""
+        seed(2500, prefix="a", batch_size=1000)
+        seed(2500, prefix="b", batch_size=2000)
+
+        assert names("a") == names("b")
+
+    def test_existing_prefix_is_rejected(self):
+        """Test that seeding the same prefix twice fails before loading."""
+        seed(10)
+
+        with pytest.raises(CommandError):
+            seed(10)
+        assert User.objects.count() == 10
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_indexes_restores_them(self):
+        """Test that dropped secondary indexes are recreated after the load."""
+        # Committed loads, as Postgres refuses to index tables with pending
+        # deferred foreign key checks
+        before = secondary_indexes()
+
+        seed(100, rebuild_indexes=True)
+
+        assert before and secondary_indexes() == before
+
+    @pytest.mark.django_db
+    def test_unique_indexes_are_kept(self):
+        """Test that unique indexes without a constraint row are never dropped."""
+        names = {name for name, _ in secondary_indexes()}
+
+        assert "auth_user_email_lower_uniq" not in names
@@ -0,0 +1,103 @@
+"""
+Tests for the precompiled user data read path.
+
+This module contains snapshot tests proving the precompiled readers produce
+the same output as the DRF serializers they mirror.
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import User, UserProfile
+from apps.authentication.serializers import (
+    UserProfileSerializer,
+    UserSerializer,
+    profile_reader,
+    user_reader,
+)
+from apps.authentication.views import get_user_data
+
+
+@pytest.fixture
+def user():
+    """Create a user with a fully populated profile."""
+    user = User.objects.create_user(
+        username="user",
+        email="user@example.com",
+        password="TestPassword123!",
+        first_name="Ada",
+        last_name="Lovelace",
+    )
+    UserProfile.objects.filter(user=user).update(
+        company_name="Analytical Engines",
+        phone_number="+44 20 7946 0000",
+        email_signature="Regards,\nAda",
+        email_accounts={"ada@example.com": {"provider": "smtp", "smtp_port": 587}},
+        created_at=datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+        updated_at=datetime(2024, 6, 7, 8, 9, 10, tzinfo=timezone.utc),
+    )
+    return User.objects.get(pk=user.pk)
+
+
+def render(data):
+    """Render data exactly as an API response would."""
+    return JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+class TestPrecompiledReaders:
+    """Test that the readers match their serializers byte for byte."""
+
+    def test_user_reader_matches_serializer(self, user):
+        """Test the user reader against UserSerializer."""
+        assert render(user_reader.from_instance(user)) == render(UserSerializer(user).data)
+
+    def test_profile_reader_matches_serializer(self, user):
+        """Test the profile reader against UserProfileSerializer, including nulls."""
+        blank = User.objects.create_user(
+            username="blank", email="blank@example.com", password="TestPassword123!"
+        )
+
+        for profile in (user.profile, blank.profile):
+            row = UserProfile.objects.filter(pk=profile.pk).values(*profile_reader.lookups).get()
+
+            expected = UserProfileSerializer(profile).data
+            assert render(profile_reader.from_values(row)) == render(expected)
+
+    def test_get_user_data_snapshot(self, user, django_assert_num_queries):
+        """Test the endpoint output against a snapshot in a single query."""
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=user)
+
+        with django_assert_num_queries(1):
+            response = get_user_data(request)
+
+        assert json.loads(response.render().content) == {
+            "user": {
+                "id": user.pk,
+                "email": "user@example.com",
+                "username": "user",
+                "first_name": "Ada",
+                "last_name": "Lovelace",
+            },
+            "profile": {
+                "id": user.profile.pk,
+                "email": "user@example.com",
+                "first_name": "Ada",
+                "last_name": "Lovelace",
+                "company_name": "Analytical Engines",
+                "phone_number": "+44 20 7946 0000",
+                "email_signature": "Regards,\nAda",
+                "email_accounts": {"ada@example.com": {"provider": "smtp", "smtp_port": 587}},
+                "created_at": "2024-01-02T03:04:05.678901Z",
+                "updated_at": "2024-06-07T08:09:10Z",
+            },
+        }
+        assert response.data == {
+            "user": UserSerializer(user).data,
+            "profile": UserProfileSerializer(user.profile).data,
+        }
@@ -0,0 +1,103 @@
+"""
+Tests for the admin user listing.
+
+This module contains test cases for keyset pagination, sparse fieldsets and
+filters on the user listing API, and for the admin's estimated count paginator.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from apps.authentication.models import User
+from apps.authentication.pagination import EstimatedCountPaginator
+
+
+@pytest.fixture
+def users():
+    """Create users where several share the same date_joined."""
+    joined = timezone.now() - timedelta(days=1)
+    return [
+        User.objects.create_user(
+            username=f"user{index}",
+            email=f"user{index}@example.com",
+            password="TestPassword123!",
+            date_joined=joined if index < 4 else joined + timedelta(hours=index),
+            is_active=index % 2 == 0,
+        )
+        for index in range(7)
+    ]
+
+
+@pytest.mark.django_db
+class TestUserListView:
+    """Test the UserListView."""
+
+    def test_requires_admin(self, auth_client):
+        """Test that non-staff users cannot list users."""
+        response = auth_client.get(reverse("user-list"))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_pages_cover_all_users_once(self, staff_client, users):
+        """Test that following next links visits every user exactly once in order."""
+        url = reverse("user-list")
+        params = {"page_size": 3}
+        seen = []
+
+        while url:
+            response = staff_client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(row["id"] for row in response.data["results"])
+            url, params = response.data["next"], None
+
+        expected = sorted(
+            users + list(User.objects.filter(is_staff=True)),
+            key=lambda user: (user.date_joined, user.pk),
+            reverse=True,
+        )
+        assert seen == [user.pk for user in expected]
+
+    def test_sparse_fieldset(self, staff_client, users):
+        """Test that only the requested fields are returned."""
+        response = staff_client.get(reverse("user-list"), {"fields": "id,email,company_name"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data["results"][0]) == {"id", "email", "company_name"}
+
+    def test_unknown_field(self, staff_client):
+        """Test that unknown sparse fields are rejected."""
+        response = staff_client.get(reverse("user-list"), {"fields": "id,password"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_filter_is_active(self, staff_client, users):
+        """Test filtering the listing on active status."""
+        response = staff_client.get(reverse("user-list"), {"is_active": "false"})
+
+        assert {row["email"] for row in response.data["results"]} == {
+            user.email for user in users if not user.is_active
+        }
+
+    def test_filter_email_ignores_case(self, staff_client, users):
+        """Test that the email filter matches addresses in any case."""
+        response = staff_client.get(reverse("user-list"), {"email": users[0].email.upper()})
+
+        assert [row["email"] for row in response.data["results"]] == [users[0].email]
+
+    def test_invalid_cursor(self, staff_client):
+        """Test that a malformed cursor is rejected."""
+        response = staff_client.get(reverse("user-list"), {"cursor": "not-a-cursor"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_estimated_count_paginator_uses_exact_count_for_small_tables(users):
+    """Test that small tables still get an exact count."""
+    paginator = EstimatedCountPaginator(User.objects.order_by("pk"), 2)
+
+    assert paginator.count == len(users)
@@ -0,0 +1,222 @@
+"""
+Tests for webhook delivery.
+
+This module contains test cases for signing payloads, queueing events for
+subscribed endpoints, delivering batches to a local receiver over kept-alive
+connections, concurrency limits, backoff and dead-lettering.
+"""
+
+import json
+import socket
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.utils import timezone
+
+from apps.appsUtils.http_client import PooledHTTPClient
+from apps.authentication import webhooks
+from apps.authentication.models import WebhookDelivery, WebhookEndpoint
+from apps.authentication.outbox import user_event
+from apps.authentication.webhooks import (
+    concurrency_slot,
+    deliver,
+    dispatch,
+    redeliver,
+    signature_header,
+    verify_signature,
+)
+from apps.benchmarks.receiver import WebhookReceiver
+
+SECRET = "whsec-test"
+
+
+def event(event_id, topic="user.created"):
+    """Return an event document."""
+    return {
+        "id": event_id,
+        "topic": topic,
+        "key": "1",
+        "payload": {"user_id": 1},
+        "request_id": None,
+        "created_at": "2026-01-01T00:00:00+00:00",
+    }
+
+
+def create_endpoint(url="http://127.0.0.1:9/", **fields):
+    """Create an endpoint and return it."""
+    return WebhookEndpoint.objects.create(url=url, secret=SECRET, **fields)
+
+
+def queue(endpoint, count, **fields):
+    """Queue deliveries of ``count`` events to an endpoint."""
+    WebhookDelivery.objects.bulk_create(
+        WebhookDelivery(endpoint=endpoint, event=event(index), **fields) for index in range(count)
+    )
+
+
+@pytest.fixture
+def celery_app():
+    """Record the tasks sent instead of publishing them."""
+    with mock.patch.object(webhooks, "current_app") as app:
+        yield app
+
+
+@pytest.fixture
+def receiver():
+    """Run a local receiver answering 200."""
+    with WebhookReceiver() as receiver:
+        yield receiver
+
+
+class TestSignatures:
+    """Test signing and verifying payloads."""
+
+    BODY = b'{"events": []}'
+
+    def test_valid_signature(self):
+        """Test that a fresh signature of the body verifies."""
+        assert verify_signature(SECRET, signature_header(SECRET, self.BODY), self.BODY)
+
+    def test_rejects_tampering_and_replays(self):
+        """Test that a changed body, another secret and an old signature fail."""
+        header = signature_header(SECRET, self.BODY, timestamp=1_000_000)
+
+        assert verify_signature(SECRET, header, self.BODY, now=1_000_100)
+        assert not verify_signature(SECRET, header, b"{}", now=1_000_100)
+        assert not verify_signature("other", header, self.BODY, now=1_000_100)
+        assert not verify_signature(SECRET, header, self.BODY, now=1_001_000)
+
+    def test_rejects_malformed_headers(self):
+        """Test that malformed headers fail instead of raising."""
+        for header in ("", "v1=abc", "t=soon,v1=abc", None):
+            assert not verify_signature(SECRET, header, self.BODY)
+
+
+@pytest.mark.django_db
+class TestEnqueue:
+    """Test queueing published events for subscribed endpoints."""
+
+    def test_queues_for_subscribed_endpoints(
+        self, fake_redis, celery_app, django_capture_on_commit_callbacks
+    ):
+        """Test that only active endpoints subscribed to the topic get the event."""
+        every = create_endpoint()
+        created = create_endpoint(topics=["user.created"])
+        create_endpoint(topics=["user.updated"])
+        create_endpoint(is_active=False)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            user_event.send(sender=None, event=event(1))
+            user_event.send(sender=None, event=event(2))
+
+        assert set(WebhookDelivery.objects.values_list("endpoint_id", "event__id")) == {
+            (every.pk, 1),
+            (every.pk, 2),
+            (created.pk, 1),
+            (created.pk, 2),
+        }
+        # One task per endpoint for both events, after the batch window
+        sent = sorted(call.kwargs["args"][0] for call in celery_app.send_task.call_args_list)
+        assert sent == sorted([every.pk, created.pk])
+        assert celery_app.send_task.call_args.kwargs["countdown"] == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("fake_redis", "celery_app")
+class TestDelivery:
+    """Test delivering batches to the local receiver."""
+
+    def test_posts_signed_batches_over_one_connection(self, receiver):
+        """Test that events are posted in signed batches on a kept-alive connection."""
+        endpoint = create_endpoint(receiver.url, batch_size=2)
+        queue(endpoint, 5)
+
+        result = deliver(endpoint.pk, client=PooledHTTPClient())
+
+        assert result == {"delivered": 5, "failed": 0, "throttled": False}
+        assert len(receiver.requests) == 3
+        assert receiver.connections == 1
+        ids = []
+        for request in receiver.requests:
+            header = request["headers"][webhooks.SIGNATURE_HEADER]
+            assert verify_signature(SECRET, header, request["body"])
+            ids += [item["id"] for item in json.loads(request["body"])["events"]]
+        assert ids == [0, 1, 2, 3, 4]
+        assert not WebhookDelivery.objects.exists()
+
+    def test_failed_batch_backs_off(self, settings):
+        """Test that a rejected batch is retried later with a growing delay."""
+        settings.WEBHOOK_BACKOFF_BASE = 10
+        with WebhookReceiver(status=500) as receiver:
+            endpoint = create_endpoint(receiver.url)
+            queue(endpoint, 2, attempts=2)
+
+            result = deliver(endpoint.pk)
+
+        assert result["failed"] == 2
+        delivery = WebhookDelivery.objects.first()
+        assert (delivery.status, delivery.attempts, delivery.last_error) == (
+            "pending",
+            3,
+            "HTTP 500",
+        )
+        delay = (delivery.next_attempt_at - timezone.now()).total_seconds()
+        assert 19 < delay <= 40
+
+    def test_unreachable_endpoint_is_dead_lettered(self, settings):
+        """Test that deliveries failing their last attempt are kept as dead letters."""
+        settings.WEBHOOK_MAX_ATTEMPTS = 3
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            port = unused.getsockname()[1]
+        endpoint = create_endpoint(f"http://127.0.0.1:{port}/")
+        queue(endpoint, 1, attempts=2)
+
+        deliver(endpoint.pk)
+
+        delivery = WebhookDelivery.objects.get()
+        assert delivery.status == "dead"
+        assert delivery.last_error.startswith("ConnectionRefusedError")
+
+        assert redeliver(WebhookDelivery.objects.all()) == 1
+        delivery.refresh_from_db()
+        assert (delivery.status, delivery.attempts) == ("pending", 0)
+
+    def test_waits_for_retry_time(self, receiver):
+        """Test that deliveries are not posted before their next attempt."""
+        endpoint = create_endpoint(receiver.url)
+        queue(endpoint, 1, next_attempt_at=timezone.now() + timedelta(minutes=1))
+
+        assert deliver(endpoint.pk)["delivered"] == 0
+        assert not receiver.requests
+
+    def test_concurrency_limit(self, receiver):
+        """Test that deliveries beyond the endpoint's limit leave the work to others."""
+        endpoint = create_endpoint(receiver.url, max_concurrency=1)
+        queue(endpoint, 1)
+
+        with concurrency_slot(endpoint) as first:
+            assert first
+            assert deliver(endpoint.pk)["throttled"]
+        assert deliver(endpoint.pk)["delivered"] == 1
+
+    def test_backlog_continues_in_another_task(self, receiver, celery_app):
+        """Test that a run stopping with events left sends a task for the rest."""
+        endpoint = create_endpoint(receiver.url, batch_size=2)
+        queue(endpoint, 3)
+
+        assert deliver(endpoint.pk, max_batches=1)["delivered"] == 2
+
+        celery_app.send_task.assert_called_once_with(webhooks.DELIVER_TASK, args=[endpoint.pk])
+
+    def test_dispatch_schedules_endpoints_with_due_events(self, celery_app):
+        """Test that the beat task only schedules endpoints with due deliveries."""
+        due = create_endpoint()
+        later = create_endpoint()
+        create_endpoint()
+        queue(due, 1)
+        queue(later, 1, next_attempt_at=timezone.now() + timedelta(minutes=1))
+
+        assert dispatch() == 1
+        assert celery_app.send_task.call_args.kwargs["args"] == [due.pk]
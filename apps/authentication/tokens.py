@@ -0,0 +1,133 @@
+"""
+JWT token classes signed with the key ring.
+
+These replace simplejwt's AccessToken and RefreshToken so that tokens are
+signed with the active key of ``keys.get_key_ring()`` and verified against
+the key named in their ``kid`` header.
+"""
+
+import jwt
+from django.utils.translation import gettext_lazy as _
+from jwt import ExpiredSignatureError, InvalidAlgorithmError, InvalidTokenError
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError, TokenBackendExpiredToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .keys import get_key_ring
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    Token backend that signs with the active key and verifies by ``kid``.
+
+    Falls back to the configured simplejwt algorithm while the key ring is empty.
+    """
+
+    def encode(self, payload):
+        """
+        Sign a payload with the active key.
+
+        Args:
+            payload: The token claims
+
+        Returns:
+            str: The encoded token
+        """
+        key_ring = get_key_ring()
+        if not key_ring:
+            return super().encode(payload)
+
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            key_ring.active.private_key,
+            algorithm=key_ring.active.algorithm,
+            headers={"kid": key_ring.active.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        """
+        Verify a token with the key named in its header and return its claims.
+
+        Args:
+            token: The encoded token
+            verify: Whether to check the signature
+
+        Returns:
+            dict: The token claims
+
+        Raises:
+            TokenBackendError: If the token is malformed, has an unknown kid or
+                a bad signature
+            TokenBackendExpiredToken: If the token has expired
+        """
+        key_ring = get_key_ring()
+        if not key_ring:
+            return super().decode(token, verify=verify)
+
+        try:
+            key = key_ring.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise TokenBackendError(_("Token is invalid"))
+            return jwt.decode(
+                token,
+                key.public_key,
+                algorithms=[key.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    "verify_aud": self.audience is not None,
+                    "verify_signature": verify,
+                },
+            )
+        except InvalidAlgorithmError as e:
+            raise TokenBackendError(_("Invalid algorithm specified")) from e
+        except ExpiredSignatureError as e:
+            raise TokenBackendExpiredToken(_("Token is expired")) from e
+        except InvalidTokenError as e:
+            raise TokenBackendError(_("Token is invalid")) from e
+
+
+token_backend = KeyRingTokenBackend(
+    api_settings.ALGORITHM,
+    api_settings.SIGNING_KEY,
+    api_settings.VERIFYING_KEY,
+    api_settings.AUDIENCE,
+    api_settings.ISSUER,
+    api_settings.JWK_URL,
+    api_settings.LEEWAY,
+    api_settings.JSON_ENCODER,
+)
+
+
+class KeyRingTokenMixin:
+    """
+    Token mixin that uses the key ring backend.
+    """
+
+    @property
+    def token_backend(self):
+        """Return the key ring backend."""
+        return token_backend
+
+
+class AccessToken(KeyRingTokenMixin, tokens.AccessToken):
+    """
+    Access token signed with the key ring.
+    """
+
+
+class RefreshToken(KeyRingTokenMixin, tokens.RefreshToken):
+    """
+    Refresh token signed with the key ring.
+    """
+
+    access_token_class = AccessToken
@@ -7,11 +7,39 @@ and email account operations.
 
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import UserRegistrationView, UserProfileView
+from .views import (
+    AuditEventListView,
+    EmailAccountBulkView,
+    EmailAccountView,
+    ProfileDetailView,
+    UserExportView,
+    UserListView,
+    UserProfileView,
+    UserRegistrationView,
+    UserSearchView,
+    get_user_data,
+    request_account_deletion,
+    revoke_sessions,
+)
 
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='register'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('sessions/revoke/', revoke_sessions, name='revoke-sessions'),
+    path('account/', request_account_deletion, name='delete-account'),
     path('profile/', UserProfileView.as_view(), name='profile'),
+    path('profile/details/', ProfileDetailView.as_view(), name='profile-details'),
+    path('user-data/', get_user_data, name='user-data'),
+    path('email-accounts/', EmailAccountView.as_view(), name='email-accounts'),
+    path('email-accounts/bulk/', EmailAccountBulkView.as_view(), name='email-accounts-bulk'),
+    path(
+        'email-accounts/<str:email_id>/',
+        EmailAccountView.as_view(),
+        name='email-account-detail',
+    ),
+    path('users/', UserListView.as_view(), name='user-list'),
+    path('users/search/', UserSearchView.as_view(), name='user-search'),
+    path('users/export/', UserExportView.as_view(), name='user-export'),
+    path('audit-events/', AuditEventListView.as_view(), name='audit-event-list'),
 ]
@@ -6,26 +6,57 @@ and email account operations.
 """
 
 from django.contrib.auth import get_user_model
-from django.http import JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET
 from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import permissions, status, generics
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.appsUtils.deadlines import db_deadline
+from apps.appsUtils.idempotency import HEADER as IDEMPOTENCY_HEADER
+from apps.appsUtils.idempotency import IdempotentMixin
+
+from .audit import record_audit_event
+from .deletion import deletion_progress, request_deletion
+from .email_accounts import VersionConflict, apply_operations, remove_account, save_account
+from .exports import EXPORT_FORMATS, export_rows
+from .filters import filter_audit_events, filter_users
+from .keys import get_key_ring
+from .pagination import AuditKeysetPagination, KeysetPagination
+from .revocation import revoke_user_sessions
+from .search import MIN_SEARCH_LENGTH, search_users
 from .serializers import (
+    AuditEventSerializer,
+    BulkEmailAccountSerializer,
     EmailAccountSerializer,
     RegisterSerializer,
+    UserListSerializer,
     UserProfileSerializer,
     UserSerializer,
+    profile_reader,
+    user_reader,
 )
-from .models import User
+from .models import AuditEvent, User, UserProfile
 
 UserModel = get_user_model()
 
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name=IDEMPOTENCY_HEADER,
+    location=OpenApiParameter.HEADER,
+    description="Retries with the same key replay the first response",
+    required=False,
+    type=str,
+)
+
 
 @extend_schema(
     summary="Get CSRF token",
@@ -53,20 +84,96 @@ def get_csrf_token(request):
     return JsonResponse({"csrfToken": token})
 
 
+@require_GET
+def jwks(request):
+    """
+    Serve the public JWT verification keys as a JWKS document.
+
+    The document is built once per process when the keys are loaded, so this
+    view only compares ETags and writes prebuilt bytes.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        HttpResponse: The JWKS document, or 304 if the client's copy is current
+    """
+    key_ring = get_key_ring()
+    response = get_conditional_response(request, etag=key_ring.etag)
+    if response is None:
+        response = HttpResponse(key_ring.jwks_json, content_type="application/json")
+    response["ETag"] = key_ring.etag
+    response["Cache-Control"] = f"public, max-age={settings.JWT_JWKS_MAX_AGE}"
+    return response
+
+
 @extend_schema_view(
     post=extend_schema(
         summary="Register a new user",
         description="Create a new user account and return JWT tokens",
         tags=["authentication"],
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={201: UserSerializer},
     )
 )
-class UserRegistrationView(generics.CreateAPIView):
+class UserRegistrationView(IdempotentMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
 
 
+@extend_schema(
+    summary="Revoke all sessions",
+    description="Revoke every access and refresh token issued to the current user",
+    tags=["authentication"],
+    request=None,
+    responses={200: {"properties": {"message": {"type": "string"}}}},
+)
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def revoke_sessions(request):
+    """
+    Revoke all sessions of the current user.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        Response: Success message
+    """
+    revoke_user_sessions(request.user.pk)
+    return Response({"message": "All sessions revoked successfully"})
+
+
+@extend_schema(
+    summary="Delete account",
+    description=(
+        "Deactivate the current user and revoke their tokens at once; their data "
+        "is deleted in the background"
+    ),
+    tags=["authentication"],
+    request=None,
+    responses={202: {"properties": {"message": {"type": "string"}}}},
+)
+@api_view(["DELETE"])
+@permission_classes([permissions.IsAuthenticated])
+def request_account_deletion(request):
+    """
+    Deactivate the current user and queue the deletion of their account.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        Response: The deletion's progress, with status 202
+    """
+    deletion = request_deletion(request.user)
+    return Response(
+        {"message": "Account deletion started", **deletion_progress(deletion)},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
 @extend_schema_view(
     get=extend_schema(
         summary="Get user profile",
@@ -87,11 +194,102 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
+class PreconditionFailed(APIException):
+    """Raised when If-Match does not name the current profile version."""
+
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The profile has changed since it was fetched."
+    default_code = "precondition_failed"
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Get profile details",
+        description=(
+            "Retrieve the current user's profile. The ETag changes only when the "
+            "profile really changes, so If-None-Match requests return 304 otherwise."
+        ),
+        tags=["authentication"],
+    ),
+    patch=extend_schema(
+        summary="Patch profile details",
+        description=(
+            "Update only the given fields. Unchanged values are not written and do not "
+            "change the ETag. Send If-Match to reject the update if the profile changed."
+        ),
+        tags=["authentication"],
+    ),
+)
+class ProfileDetailView(generics.RetrieveUpdateAPIView):
+    """
+    API view to read and partially update the current user's profile
+    """
+
+    serializer_class = UserProfileSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ["get", "patch", "head", "options"]
+
+    def get_object(self):
+        """
+        Return the current user's profile, locked for the transaction on writes.
+
+        Returns:
+            UserProfile: The profile with its user
+        """
+        queryset = UserProfile.objects.with_heavy_fields().select_related("user")
+        if self.request.method == "PATCH":
+            queryset = queryset.select_for_update(of=("self",))
+        return queryset.get(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the profile, or 304 if the client's ETag is current."""
+        instance = self.get_object()
+        etag = _profile_etag(instance)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        response["ETag"] = etag
+        return response
+
+    def partial_update(self, request, *args, **kwargs):
+        """
+        Apply the changed fields and return the profile with its new ETag.
+
+        Raises:
+            PreconditionFailed: If If-Match does not match the current version
+        """
+        with transaction.atomic():
+            instance = self.get_object()
+            if_match = request.headers.get("If-Match")
+            if if_match and if_match != _profile_etag(instance):
+                raise PreconditionFailed()
+            serializer = self.get_serializer(instance, data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            if serializer.changed:
+                record_audit_event(
+                    "profile.updated",
+                    instance.user_id,
+                    request.user.pk,
+                    {"fields": serializer.changed_fields},
+                )
+
+        response = Response(serializer.data)
+        response["ETag"] = _profile_etag(instance)
+        return response
+
+
+def _profile_etag(profile):
+    """Return the ETag for a profile version."""
+    return f'"{profile.pk}-{profile.version}"'
+
+
 @extend_schema_view(
     post=extend_schema(
         summary="Add email account",
         description="Connect a new email account to the user's profile",
         tags=["authentication"],
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
     ),
     delete=extend_schema(
         summary="Remove email account",
@@ -104,7 +302,7 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         ],
     ),
 )
-class EmailAccountView(APIView):
+class EmailAccountView(IdempotentMixin, APIView):
     """
     API view to manage connected email accounts
     """
@@ -123,24 +321,14 @@ class EmailAccountView(APIView):
         """
         serializer = EmailAccountSerializer(data=request.data)
         if serializer.is_valid():
-            email_data = serializer.validated_data
-            user_profile = request.user.profile
-
-            # Add the new email account to the user's email accounts
-            if not user_profile.email_accounts:
-                user_profile.email_accounts = {}
-
-            email_id = email_data.get("email")
-            user_profile.email_accounts[email_id] = {
-                "provider": email_data.get("provider"),
-                "smtp_server": email_data.get("smtp_server"),
-                "smtp_port": email_data.get("smtp_port"),
-                "imap_server": email_data.get("imap_server"),
-                "imap_port": email_data.get("imap_port"),
-                "use_tls": email_data.get("use_tls", True),
-                "is_active": True,
-            }
-            user_profile.save()
+            email_id = serializer.validated_data.get("email")
+            try:
+                save_account(request.user, email_id, serializer.validated_data)
+            except VersionConflict as error:
+                return Response(
+                    {"error": "The email accounts changed concurrently", "version": error.version},
+                    status=status.HTTP_409_CONFLICT,
+                )
 
             return Response(
                 {"message": "Email account added successfully", "email": email_id},
@@ -162,14 +350,62 @@ class EmailAccountView(APIView):
         if not email_id:
             return Response({"error": "Email ID is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        user_profile = request.user.profile
-        if user_profile.email_accounts and email_id in user_profile.email_accounts:
-            # Remove the email account
-            user_profile.email_accounts.pop(email_id)
-            user_profile.save()
-            return Response({"message": "Email account removed successfully"})
-        else:
+        if not remove_account(request.user, email_id):
             return Response({"error": "Email account not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "Email account removed successfully"})
+
+
+@extend_schema(
+    summary="Change email accounts in bulk",
+    description=(
+        "Add, update and remove email accounts in one atomic change. Every operation "
+        "is checked first: if any is invalid or conflicts with the current accounts, "
+        "nothing is applied and the per-operation results say why. Send the profile "
+        "`version` to have the batch rejected with 412 if the profile changed since."
+    ),
+    tags=["authentication"],
+    request=BulkEmailAccountSerializer,
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
+)
+class EmailAccountBulkView(IdempotentMixin, APIView):
+    """
+    API view to apply a batch of email account operations in one update
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """
+        Apply the operations to the user's email accounts.
+
+        Args:
+            request: The HTTP request object with the ``operations`` and an
+                optional ``version``
+
+        Returns:
+            Response: The per-operation results and the profile version, with
+            200 if the batch was applied, 409 if it conflicts with the current
+            accounts, 412 if the version is stale, or 400 with the errors of
+            each operation
+        """
+        serializer = BulkEmailAccountSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results, applied, version = apply_operations(
+                request.user,
+                serializer.validated_data["operations"],
+                serializer.validated_data.get("version"),
+            )
+        except VersionConflict as conflict:
+            return Response(
+                {"detail": PreconditionFailed.default_detail, "version": conflict.version},
+                status=status.HTTP_412_PRECONDITION_FAILED,
+            )
+        return Response(
+            {"version": version, "results": results},
+            status=status.HTTP_200_OK if applied else status.HTTP_409_CONFLICT,
+        )
 
 
 @extend_schema(
@@ -177,6 +413,7 @@ class EmailAccountView(APIView):
     description="Retrieve the current user's data including profile details",
     tags=["authentication"],
 )
+@db_deadline(2)
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def get_user_data(request):
@@ -190,7 +427,199 @@ def get_user_data(request):
         Response: User data and profile details
     """
     user = request.user
-    user_data = UserSerializer(user).data
-    profile_data = UserProfileSerializer(user.profile).data
+    user_data = user_reader.from_instance(user)
+    # One query for the profile and the user columns its serializer reads
+    profile_data = profile_reader.from_values(
+        UserProfile.objects.filter(user_id=user.pk).values(*profile_reader.lookups).get()
+    )
 
     return Response({"user": user_data, "profile": profile_data})
+
+
+@extend_schema(
+    summary="Export users",
+    description=(
+        "Stream all users and their profiles as CSV or NDJSON. Rows are ordered by id; "
+        "pass the last exported id as `after` to resume an interrupted export."
+    ),
+    tags=["authentication"],
+    parameters=[
+        OpenApiParameter(name="output", description="csv (default) or ndjson", type=str),
+        OpenApiParameter(name="joined_after", description="ISO date or datetime", type=str),
+        OpenApiParameter(name="joined_before", description="ISO date or datetime", type=str),
+        OpenApiParameter(name="is_active", description="Filter on active status", type=bool),
+        OpenApiParameter(name="after", description="Resume after this user id", type=int),
+    ],
+    responses={200: None},
+)
+class UserExportView(APIView):
+    """
+    API view to stream a full export of users and profiles to admins
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """
+        Stream the filtered users as an attachment.
+
+        Args:
+            request: The HTTP request object
+
+        Returns:
+            StreamingHttpResponse: The export body, or a 400 response for bad parameters
+        """
+        output = request.query_params.get("output", "csv")
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {"output": f"Choose one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        after = request.query_params.get("after")
+        if after is not None:
+            if not after.isdigit():
+                return Response(
+                    {"after": "Enter a valid user id."}, status=status.HTTP_400_BAD_REQUEST
+                )
+            after = int(after)
+
+        queryset = filter_users(User.objects.all(), request.query_params)
+        render, content_type = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(
+            render(export_rows(queryset, after=after)), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="users.{output}"'
+        return response
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="List users",
+        description=(
+            "List users newest first with keyset pagination. Follow the `next` link to page; "
+            "use `fields` to request a subset of fields."
+        ),
+        tags=["authentication"],
+        parameters=[
+            OpenApiParameter(name="fields", description="Comma-separated field names", type=str),
+            OpenApiParameter(name="email", description="Exact email address", type=str),
+            OpenApiParameter(name="joined_after", description="ISO date or datetime", type=str),
+            OpenApiParameter(name="joined_before", description="ISO date or datetime", type=str),
+            OpenApiParameter(name="is_active", description="Filter on active status", type=bool),
+        ],
+    )
+)
+class UserListView(generics.ListAPIView):
+    """
+    Read-only API view listing users for admins and integrations
+    """
+
+    serializer_class = UserListSerializer
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        """
+        Return the filtered users, loading only the columns being serialized.
+
+        Returns:
+            QuerySet: The users to list
+        """
+        columns = {"id", KeysetPagination.ordering_field}
+        for field in self.get_serializer().fields.values():
+            columns.add(field.source.replace(".", "__"))
+
+        queryset = User.objects.only(*columns)
+        if any(column.startswith("profile__") for column in columns):
+            queryset = queryset.select_related("profile")
+        return filter_users(queryset, self.request.query_params)
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Search users",
+        description=(
+            "Search users by email, username, name or company name, best matches first."
+        ),
+        tags=["authentication"],
+        parameters=[
+            OpenApiParameter(name="q", description="Search term", required=True, type=str),
+            OpenApiParameter(name="limit", description="Maximum number of results", type=int),
+            OpenApiParameter(name="fields", description="Comma-separated field names", type=str),
+        ],
+    )
+)
+class UserSearchView(generics.ListAPIView):
+    """
+    Read-only API view searching users for admins and integrations
+    """
+
+    serializer_class = UserListSerializer
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = None
+    default_limit = 20
+    max_limit = 100
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return the best matching users for the search term.
+
+        Args:
+            request: The HTTP request object
+
+        Returns:
+            Response: The ranked results, or validation errors
+        """
+        term = request.query_params.get("q", "").strip()
+        if len(term) < MIN_SEARCH_LENGTH:
+            return Response(
+                {"q": f"Enter at least {MIN_SEARCH_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        queryset = search_users(User.objects.select_related("profile"), term)[:limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({"results": serializer.data})
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="List audit events",
+        description=(
+            "List profile and email account changes newest first with keyset pagination. "
+            "Events appear once the buffer holding them has been written."
+        ),
+        tags=["authentication"],
+        parameters=[
+            OpenApiParameter(name="user_id", description="User whose data changed", type=int),
+            OpenApiParameter(name="actor_id", description="User who made the change", type=int),
+            OpenApiParameter(name="action", description="Such as profile.updated", type=str),
+            OpenApiParameter(name="after", description="ISO date or datetime", type=str),
+            OpenApiParameter(name="before", description="ISO date or datetime", type=str),
+        ],
+    )
+)
+class AuditEventListView(generics.ListAPIView):
+    """
+    Read-only API view listing audit events for admins
+    """
+
+    serializer_class = AuditEventSerializer
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = AuditKeysetPagination
+
+    def get_queryset(self):
+        """
+        Return the filtered audit events.
+
+        Returns:
+            QuerySet: The events to list
+        """
+        return filter_audit_events(AuditEvent.objects.all(), self.request.query_params)
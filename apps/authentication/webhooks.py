@@ -0,0 +1,338 @@
+"""
+Outbound webhooks of user lifecycle events.
+
+Integrators register a ``WebhookEndpoint``. Every event published from the
+outbox to the ``user_event`` signal becomes a ``WebhookDelivery`` row for each
+subscribed endpoint, and a ``deliver_webhooks`` task is scheduled for the
+endpoint ``WEBHOOK_BATCH_WINDOW`` seconds later, at most once per window, so
+events arriving together are posted together. The task claims up to the
+endpoint's ``batch_size`` due rows with ``SELECT ... FOR UPDATE SKIP LOCKED``
+and posts them as one JSON document over the pooled keep-alive HTTP client.
+At most ``max_concurrency`` tasks deliver to an endpoint at once; the slots
+are counted in Redis.
+
+A failed batch is retried with exponential backoff and jitter by the
+``dispatch_webhooks`` beat task. Deliveries still failing after
+``WEBHOOK_MAX_ATTEMPTS`` attempts are dead-lettered: they stay in the table
+for inspection and can be queued again from the admin.
+
+Every request carries ``Webhook-Signature: t=<unix time>,v1=<hex digest>``,
+the HMAC-SHA256 of ``"<t>.<body>"`` under the endpoint's secret, which
+receivers check with ``verify_signature``. Delivery is at least once;
+receivers use the event ``id`` to ignore repeats.
+"""
+
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+
+import redis
+from celery import current_app
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.appsUtils.http_client import get_http_client
+from apps.appsUtils.redis_client import get_redis
+
+from .models import WebhookDelivery, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+DELIVER_TASK = "apps.authentication.tasks.deliver_webhooks"
+
+SIGNATURE_HEADER = "Webhook-Signature"
+
+KEY_PREFIX = "webhooks"
+
+
+def sign(secret, timestamp, body):
+    """
+    Return the signature of a request body.
+
+    Args:
+        secret: The endpoint's secret
+        timestamp: Unix time sent with the signature
+        body: The request body as bytes
+
+    Returns:
+        str: The hex HMAC-SHA256 digest
+    """
+    message = f"{timestamp}.".encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def signature_header(secret, body, timestamp=None):
+    """Return the ``Webhook-Signature`` value for a body, signed now by default."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    return f"t={timestamp},v1={sign(secret, timestamp, body)}"
+
+
+def verify_signature(secret, header, body, tolerance=None, now=None):
+    """
+    Check a ``Webhook-Signature`` header, as a receiver does.
+
+    Args:
+        secret: The endpoint's secret
+        header: The header value
+        body: The request body as bytes
+        tolerance: Largest age of the signature in seconds, defaults to
+            ``WEBHOOK_SIGNATURE_TOLERANCE``; older ones are rejected as replays
+        now: The current Unix time, defaults to now
+
+    Returns:
+        bool: Whether the signature is valid and recent
+    """
+    tolerance = settings.WEBHOOK_SIGNATURE_TOLERANCE if tolerance is None else tolerance
+    try:
+        fields = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(fields["t"])
+    except (AttributeError, KeyError, ValueError):
+        return False
+    if abs((time.time() if now is None else now) - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(fields.get("v1", ""), sign(secret, timestamp, body))
+
+
+def backoff(attempts):
+    """
+    Return the delay before retrying a delivery.
+
+    The delay doubles with every failed attempt up to ``WEBHOOK_BACKOFF_MAX``,
+    and is drawn from the upper half of that range so retries of deliveries
+    that failed together spread out.
+
+    Args:
+        attempts: The number of failed attempts so far
+
+    Returns:
+        float: Seconds to wait
+    """
+    ceiling = min(settings.WEBHOOK_BACKOFF_MAX, settings.WEBHOOK_BACKOFF_BASE * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def schedule_delivery(endpoint_id, countdown=None):
+    """
+    Schedule a delivery task for an endpoint unless one is already scheduled.
+
+    Args:
+        endpoint_id: The id of the WebhookEndpoint
+        countdown: Seconds before the task runs, defaults to
+            ``WEBHOOK_BATCH_WINDOW``; events arriving meanwhile join the batch
+
+    Returns:
+        bool: Whether a task was sent
+    """
+    countdown = settings.WEBHOOK_BATCH_WINDOW if countdown is None else countdown
+    try:
+        scheduled = get_redis().set(
+            f"{KEY_PREFIX}:scheduled:{endpoint_id}", 1, nx=True, px=max(1, int(countdown * 1000))
+        )
+    except redis.RedisError:
+        # Without the marker a task per event is sent; batches still form
+        # from the rows that are due when each task runs
+        logger.warning("Could not check scheduled webhook deliveries", exc_info=True)
+        scheduled = True
+    if scheduled:
+        current_app.send_task(DELIVER_TASK, args=[endpoint_id], countdown=countdown)
+    return bool(scheduled)
+
+
+def enqueue_event(sender, event, **kwargs):
+    """
+    Receiver for ``user_event`` queueing an event for its subscribed endpoints.
+
+    Args:
+        sender: The sender of the signal
+        event: The event document, see ``apps.authentication.outbox``
+    """
+    endpoints = [
+        endpoint
+        for endpoint in WebhookEndpoint.objects.filter(is_active=True)
+        if endpoint.subscribes_to(event["topic"])
+    ]
+    if not endpoints:
+        return
+    WebhookDelivery.objects.bulk_create(
+        WebhookDelivery(endpoint=endpoint, event=event) for endpoint in endpoints
+    )
+    for endpoint in endpoints:
+        transaction.on_commit(partial(schedule_delivery, endpoint.pk))
+
+
+@contextmanager
+def concurrency_slot(endpoint):
+    """
+    Try to take one of an endpoint's ``max_concurrency`` delivery slots.
+
+    Slots are members of a Redis sorted set scored by the time they were taken;
+    slots of workers that died are reclaimed after ``WEBHOOK_SLOT_TIMEOUT``.
+
+    Yields:
+        bool: Whether a slot was taken
+    """
+    key = f"{KEY_PREFIX}:inflight:{endpoint.pk}"
+    token = uuid.uuid4().hex
+    now = time.time()
+    client = get_redis()
+    pipeline = client.pipeline()
+    pipeline.zremrangebyscore(key, "-inf", now - settings.WEBHOOK_SLOT_TIMEOUT)
+    pipeline.zadd(key, {token: now})
+    pipeline.zrank(key, token)
+    pipeline.expire(key, settings.WEBHOOK_SLOT_TIMEOUT)
+    rank = pipeline.execute()[2]
+    try:
+        yield rank < endpoint.max_concurrency
+    finally:
+        client.zrem(key, token)
+
+
+def _record_failure(deliveries, error, now):
+    """Schedule the retry of failed deliveries, dead-lettering the exhausted ones."""
+    for delivery in deliveries:
+        delivery.attempts += 1
+        delivery.last_error = error
+        if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            delivery.status = WebhookDelivery.DEAD
+        else:
+            delivery.next_attempt_at = now + timedelta(seconds=backoff(delivery.attempts))
+    WebhookDelivery.objects.bulk_update(
+        deliveries, ["attempts", "last_error", "status", "next_attempt_at"]
+    )
+    dead = sum(delivery.status == WebhookDelivery.DEAD for delivery in deliveries)
+    if dead:
+        logger.warning("Dead-lettered %s webhook deliveries to %s", dead, deliveries[0].endpoint_id)
+
+
+def deliver_batch(endpoint, client=None, now=None):
+    """
+    Post an endpoint's oldest due deliveries as one request.
+
+    The rows stay locked while the request is in flight, so concurrent
+    deliveries to the endpoint post different events.
+
+    Args:
+        endpoint: The WebhookEndpoint
+        client: The HTTP client, defaults to the shared pooled client
+        now: The current time, defaults to now
+
+    Returns:
+        tuple: The number of events posted and the error, None on success
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        deliveries = list(
+            WebhookDelivery.objects.select_for_update(skip_locked=True)
+            .filter(endpoint=endpoint, status=WebhookDelivery.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[: endpoint.batch_size]
+        )
+        if not deliveries:
+            return 0, None
+
+        body = json.dumps(
+            {"events": [delivery.event for delivery in deliveries]}, cls=DjangoJSONEncoder
+        ).encode()
+        headers = {
+            "Content-Type": "application/json",
+            SIGNATURE_HEADER: signature_header(endpoint.secret, body),
+        }
+        try:
+            response = (client or get_http_client()).post(
+                endpoint.url, body, headers, timeout=settings.WEBHOOK_TIMEOUT
+            )
+            error = None if response.ok else f"HTTP {response.status}"
+        except (OSError, http.client.HTTPException) as exc:
+            error = f"{type(exc).__name__}: {exc}"
+
+        if error is None:
+            WebhookDelivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries]).delete()
+        else:
+            _record_failure(deliveries, error, now)
+    return len(deliveries), error
+
+
+def deliver(endpoint_id, max_batches=None, client=None):
+    """
+    Deliver an endpoint's due events in batches, within its concurrency limit.
+
+    Delivery stops at the first failed batch. When the endpoint still has a
+    backlog after ``max_batches`` batches, another task is sent to carry on.
+
+    Args:
+        endpoint_id: The id of the WebhookEndpoint
+        max_batches: Batches per run, defaults to ``WEBHOOK_MAX_BATCHES``
+        client: The HTTP client, defaults to the shared pooled client
+
+    Returns:
+        dict: Events delivered and failed, and whether the endpoint's slots
+        were all taken
+    """
+    max_batches = max_batches or settings.WEBHOOK_MAX_BATCHES
+    result = {"delivered": 0, "failed": 0, "throttled": False}
+    endpoint = WebhookEndpoint.objects.filter(pk=endpoint_id, is_active=True).first()
+    if endpoint is None:
+        return result
+
+    with concurrency_slot(endpoint) as acquired:
+        if not acquired:
+            # The deliveries in flight carry on with the backlog
+            result["throttled"] = True
+            return result
+        for _ in range(max_batches):
+            count, error = deliver_batch(endpoint, client)
+            if error is not None:
+                result["failed"] += count
+                return result
+            result["delivered"] += count
+            if count < endpoint.batch_size:
+                return result
+
+    current_app.send_task(DELIVER_TASK, args=[endpoint_id])
+    return result
+
+
+def dispatch(now=None):
+    """
+    Schedule delivery to every active endpoint with due deliveries.
+
+    Args:
+        now: The current time, defaults to now
+
+    Returns:
+        int: The number of endpoints a task was sent for
+    """
+    due = WebhookDelivery.objects.filter(
+        endpoint=OuterRef("pk"),
+        status=WebhookDelivery.PENDING,
+        next_attempt_at__lte=now or timezone.now(),
+    )
+    endpoint_ids = WebhookEndpoint.objects.filter(Exists(due), is_active=True).values_list(
+        "pk", flat=True
+    )
+    return sum(schedule_delivery(endpoint_id, countdown=0) for endpoint_id in endpoint_ids)
+
+
+def redeliver(deliveries):
+    """
+    Queue dead-lettered deliveries again with a fresh set of attempts.
+
+    Args:
+        deliveries: A WebhookDelivery queryset
+
+    Returns:
+        int: The number of deliveries queued
+    """
+    return deliveries.filter(status=WebhookDelivery.DEAD).update(
+        status=WebhookDelivery.PENDING, attempts=0, next_attempt_at=timezone.now(), last_error=""
+    )
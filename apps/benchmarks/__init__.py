@@ -0,0 +1,6 @@
+"""
+Benchmark suite for the API.
+
+Run it with ``DJANGO_SETTINGS_MODULE=apps.config.settings.benchmark python
+apps/manage.py bench``. See ``management/commands/bench.py`` for options.
+"""
@@ -0,0 +1,16 @@
+"""
+Django app configuration for the benchmark suite.
+"""
+
+from django.apps import AppConfig
+
+
+class BenchmarksConfig(AppConfig):
+    """
+    App configuration for the benchmarks app.
+
+    Only installed by the benchmark settings, to provide the ``bench`` command.
+    """
+
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.benchmarks"
@@ -0,0 +1,78 @@
+"""
+Throwaway environments for benchmark and query plan runs.
+
+This module provides the Redis swap and the throwaway test database shared by
+the ``bench`` and ``check_query_plans`` commands.
+"""
+
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.contrib.postgres.indexes import PostgresIndex
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models.signals import pre_migrate
+
+from apps.appsUtils import redis_client
+from apps.authentication.revocation import _cache as revocation_cache
+
+
+@contextmanager
+def swapped_redis(mode):
+    """
+    Use an in-memory Redis for the duration of the block when asked.
+
+    Args:
+        mode: ``"fake"`` for fakeredis, or ``"live"`` for the server at ``REDIS_URL``
+    """
+    previous = redis_client._client
+    if mode == "fake":
+        try:
+            import fakeredis
+        except ImportError as exc:
+            raise CommandError(
+                "fakeredis is required for --redis fake; pip install fakeredis "
+                "or pass --redis live"
+            ) from exc
+        redis_client._client = fakeredis.FakeRedis()
+    revocation_cache.reset()
+    try:
+        yield
+    finally:
+        redis_client._client = previous
+        revocation_cache.reset()
+
+
+def create_trigram_extension(sender, using, **kwargs):
+    """Receiver for ``pre_migrate`` creating the extension the trigram indexes need."""
+    if connections[using].vendor == "postgresql":
+        with connections[using].cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Run the block against a throwaway test database created from the models.
+
+    The schema is created without migrations. SQLite skips the Postgres-only
+    indexes, and Postgres gets the trigram extension first. The database is
+    destroyed when the block exits.
+    """
+    if connection.vendor != "postgresql":
+        for model in apps.get_models():
+            model._meta.indexes = [
+                index for index in model._meta.indexes if not isinstance(index, PostgresIndex)
+            ]
+    connection.settings_dict.setdefault("TEST", {})["MIGRATE"] = False
+    pre_migrate.connect(create_trigram_extension)
+    try:
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+    finally:
+        pre_migrate.disconnect(create_trigram_extension)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
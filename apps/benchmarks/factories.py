@@ -0,0 +1,168 @@
+"""
+Fixture factories seeding users and profiles for benchmarks.
+
+Users are inserted with ``bulk_create`` and share one precomputed password
+hash, so seeding costs a few statements per batch instead of a password hash,
+an INSERT and a profile signal per user. Names and profile fields come from
+the generators of ``apps.authentication.seeding``. Output is deterministic for
+a given seed, so runs compared against a baseline see the same data.
+"""
+
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from apps.authentication.models import User, UserProfile
+from apps.authentication.seeding import (
+    FIRST_NAMES,
+    LAST_NAMES,
+    company_name,
+    email_accounts,
+    email_signature,
+    phone_number,
+)
+
+# Password of every seeded user
+PASSWORD = "BenchPassword123!"
+
+
+def build_users(count, seed=0, prefix="bench", start=0, password_hash=None):
+    """
+    Build unsaved users with deterministic names and join dates.
+
+    Args:
+        count: Number of users to build
+        seed: Seed for the generated values
+        prefix: Prefix of every username and email address
+        start: Index of the first user, so batches can be built independently
+        password_hash: The hashed password shared by all users
+
+    Returns:
+        list: The unsaved User instances
+    """
+    rng = random.Random(f"{seed}:users:{start}")
+    password_hash = password_hash or make_password(PASSWORD)
+    now = timezone.now()
+    return [
+        User(
+            username=f"{prefix}{index}",
+            email=f"{prefix}{index}@example.com",
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            password=password_hash,
+            date_joined=now - timedelta(seconds=rng.randrange(365 * 86400)),
+        )
+        for index in range(start, start + count)
+    ]
+
+
+def build_profiles(users, seed=0, start=0, signature_size=200, accounts=2):
+    """
+    Build unsaved profiles for saved users.
+
+    Args:
+        users: Users with primary keys
+        seed: Seed for the generated values
+        start: Index of the first user, as passed to ``build_users``
+        signature_size: Length of each email signature
+        accounts: Number of email accounts per profile
+
+    Returns:
+        list: The unsaved UserProfile instances
+    """
+    rng = random.Random(f"{seed}:profiles:{start}")
+    return [
+        UserProfile(
+            user=user,
+            company_name=company_name(rng),
+            phone_number=phone_number(rng),
+            email_signature=email_signature(user.first_name, user.last_name).ljust(
+                signature_size, "-"
+            ),
+            email_accounts=email_accounts(rng, accounts),
+        )
+        for user in users
+    ]
+
+
+def seed_users(count, seed=0, prefix="bench", batch_size=1000, **profile_options):
+    """
+    Insert users and their profiles in batches.
+
+    Args:
+        count: Number of users to create
+        seed: Seed for the generated values
+        prefix: Prefix of every username and email address
+        batch_size: Number of rows per INSERT
+        **profile_options: Passed to ``build_profiles``
+
+    Returns:
+        list: The primary keys of the created users
+    """
+    password_hash = make_password(PASSWORD)
+    pks = []
+    for start in range(0, count, batch_size):
+        users = build_users(
+            min(batch_size, count - start),
+            seed=seed,
+            prefix=prefix,
+            start=start,
+            password_hash=password_hash,
+        )
+        with transaction.atomic():
+            # bulk_create skips post_save, so profiles are inserted explicitly
+            User.objects.bulk_create(users)
+            UserProfile.objects.bulk_create(
+                build_profiles(users, seed=seed, start=start, **profile_options)
+            )
+        pks.extend(user.pk for user in users)
+    return pks
+
+
+class BenchData:
+    """
+    The users seeded for a benchmark run, shared by micro-benchmarks and scenarios.
+    """
+
+    def __init__(self, pks, prefix="bench"):
+        """
+        Describe seeded users.
+
+        Args:
+            pks: The primary keys returned by ``seed_users``
+            prefix: The prefix the users were seeded with
+        """
+        self.pks = pks
+        self.prefix = prefix
+
+    def email(self, index):
+        """Return the email address of the seeded user at an index."""
+        return f"{self.prefix}{index % len(self.pks)}@example.com"
+
+    def users(self, count):
+        """Return the first ``count`` seeded users, cycling if fewer were seeded."""
+        users = {user.pk: user for user in User.objects.filter(pk__in=self.pks[:count])}
+        return [users[self.pks[index % len(self.pks)]] for index in range(count)]
+
+    @cached_property
+    def user(self):
+        """The first seeded user."""
+        return User.objects.get(pk=self.pks[0])
+
+    @cached_property
+    def admin(self):
+        """A staff user for the admin endpoints, created on first use."""
+        admin, _ = User.objects.get_or_create(
+            email=f"{self.prefix}-admin@example.com",
+            defaults={
+                "username": f"{self.prefix}-admin",
+                "password": make_password(PASSWORD),
+                "is_staff": True,
+                "is_superuser": True,
+            },
+        )
+        return admin
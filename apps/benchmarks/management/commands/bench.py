@@ -0,0 +1,222 @@
+"""
+Django management command to run the benchmark suite.
+"""
+
+import json
+import time
+import uuid
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.benchmarks.environment import swapped_redis, throwaway_database
+from apps.benchmarks.factories import BenchData, seed_users
+from apps.benchmarks.micro import BENCHMARKS, run_benchmarks
+from apps.benchmarks.runner import DEFAULT_THRESHOLD, compare, results_document
+from apps.benchmarks.scenarios import SCENARIOS, HTTPTransport, InProcessTransport, run_scenario
+from apps.benchmarks.server import ServerError, measure_server
+
+# Options stored with the results, so runs are only compared like for like
+RECORDED_OPTIONS = (
+    "users",
+    "seed",
+    "iterations",
+    "requests",
+    "concurrency",
+    "url",
+    "redis",
+    "server_workers",
+)
+
+
+class Command(BaseCommand):
+    """Django command to run micro-benchmarks and load scenarios."""
+
+    help = (
+        "Runs the micro-benchmarks and HTTP load scenarios on a throwaway database and "
+        "compares the results with a baseline"
+    )
+
+    def add_arguments(self, parser):
+        """Add the benchmark options."""
+        parser.add_argument(
+            "--micro",
+            nargs="*",
+            metavar="NAME",
+            help="Run micro-benchmarks: all, or those named or prefixed by NAME",
+        )
+        parser.add_argument(
+            "--scenarios", nargs="*", metavar="NAME", help="Run load scenarios: all, or NAME"
+        )
+        parser.add_argument(
+            "--server",
+            action="store_true",
+            help=(
+                "Start gunicorn with apps.config.gunicorn and report its time to first "
+                "request and memory per worker; GUNICORN_* variables select the configuration"
+            ),
+        )
+        parser.add_argument(
+            "--server-workers", type=int, default=2, help="Workers started by --server"
+        )
+        parser.add_argument("--list", action="store_true", help="List benchmarks and exit")
+        parser.add_argument("--users", type=int, default=1000, help="Users to seed")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the generated data")
+        parser.add_argument("--iterations", type=int, default=1000, help="Calls per benchmark")
+        parser.add_argument("--requests", type=int, default=200, help="Steps per scenario")
+        parser.add_argument("--concurrency", type=int, default=1, help="Sessions per scenario")
+        parser.add_argument(
+            "--url",
+            help=(
+                "Run scenarios against the server at this URL. Users are seeded into the "
+                "configured database, which must be the server's, and tokens are signed "
+                "with the local settings."
+            ),
+        )
+        parser.add_argument(
+            "--redis",
+            choices=["fake", "live"],
+            default="fake",
+            help="Use an in-memory fakeredis (default) or the server at REDIS_URL",
+        )
+        parser.add_argument("--output", help="Write the results document to this file")
+        parser.add_argument("--baseline", help="Results document to compare with")
+        parser.add_argument(
+            "--save-baseline", action="store_true", help="Write the results to --baseline"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help="Relative slowdown counted as a regression",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error if any metric regressed",
+        )
+
+    def handle(self, *args, **options):
+        """Run the selected benchmarks and report the results."""
+        if options["list"]:
+            for name in [*BENCHMARKS, *(f"scenario.{name}" for name in SCENARIOS)]:
+                self.stdout.write(name)
+            return
+
+        micro, scenarios = options["micro"], options["scenarios"]
+        if micro is None and scenarios is None and not options["server"]:
+            micro, scenarios = [], []
+        if options["url"] and micro is not None:
+            raise CommandError("--url only runs scenarios; pass --scenarios")
+        unknown = set(scenarios or ()) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if options["save_baseline"] and not options["baseline"]:
+            raise CommandError("--save-baseline needs --baseline")
+
+        benchmarks = {}
+        if options["server"]:
+            benchmarks.update(self.run_server(options))
+        if micro is not None or scenarios is not None:
+            with swapped_redis(options["redis"]):
+                if options["url"]:
+                    prefix = f"bench-{uuid.uuid4().hex[:6]}-"
+                    benchmarks.update(self.run(options, micro, scenarios, prefix=prefix))
+                else:
+                    with throwaway_database():
+                        benchmarks.update(self.run(options, micro, scenarios, prefix="bench"))
+
+        results = results_document(
+            benchmarks,
+            {key: options[key] for key in RECORDED_OPTIONS},
+        )
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2))
+            self.stderr.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(json.dumps(results, indent=2))
+        if options["baseline"]:
+            self.report_baseline(results, options)
+
+    def run(self, options, micro, scenarios, prefix):
+        """Seed the users and run the selected benchmarks."""
+        started = time.perf_counter()
+        pks = seed_users(options["users"], seed=options["seed"], prefix=prefix)
+        elapsed = time.perf_counter() - started
+        data = BenchData(pks, prefix=prefix)
+        benchmarks = {
+            "factory.seed_users": {
+                "count": len(pks),
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_sec": round(2 * len(pks) / elapsed, 1) if elapsed else None,
+            }
+        }
+        self.log("factory.seed_users", benchmarks["factory.seed_users"])
+
+        if micro is not None:
+            benchmarks.update(
+                run_benchmarks(
+                    data,
+                    names=micro,
+                    iterations=options["iterations"],
+                    log=self.stderr.write,
+                )
+            )
+        if scenarios is not None:
+            url = options["url"]
+            transport_factory = (lambda: HTTPTransport(url)) if url else InProcessTransport
+            for name in scenarios or SCENARIOS:
+                results = run_scenario(
+                    SCENARIOS[name],
+                    data,
+                    requests=options["requests"],
+                    concurrency=options["concurrency"],
+                    transport_factory=transport_factory,
+                )
+                for result_name, metrics in results.items():
+                    self.log(result_name, metrics)
+                benchmarks.update(results)
+        return benchmarks
+
+    def run_server(self, options):
+        """Measure the startup and memory of a gunicorn server."""
+        try:
+            results = measure_server(
+                workers=options["server_workers"], requests=options["requests"]
+            )
+        except ServerError as error:
+            raise CommandError(str(error)) from error
+        for name, metrics in results.items():
+            self.log(name, metrics)
+        return results
+
+    def report_baseline(self, results, options):
+        """Compare the results with the baseline, or save them as the new baseline."""
+        path = Path(options["baseline"])
+        if options["save_baseline"]:
+            path.write_text(json.dumps(results, indent=2))
+            self.stderr.write(self.style.SUCCESS(f"Baseline written to {path}"))
+            return
+        if not path.exists():
+            raise CommandError(f"{path} does not exist; create it with --save-baseline")
+
+        rows = compare(results, json.loads(path.read_text()), options["threshold"])
+        regressions = [row for row in rows if row["regressed"]]
+        for row in rows:
+            line = (
+                f"{row['benchmark']} {row['metric']}: {row['baseline']} -> {row['current']} "
+                f"({row['change']:+.1%})"
+            )
+            self.stderr.write(self.style.ERROR(line) if row["regressed"] else line)
+
+        if regressions:
+            message = f"{len(regressions)} of {len(rows)} metrics regressed"
+            if options["fail_on_regression"]:
+                raise CommandError(message)
+            self.stderr.write(self.style.WARNING(message))
+        else:
+            self.stderr.write(self.style.SUCCESS(f"No regressions in {len(rows)} metrics"))
+
+    def log(self, name, metrics):
+        """Write one result as a line of progress."""
+        self.stderr.write(f"{name}: {metrics}")
@@ -0,0 +1,148 @@
+"""
+Django management command to guard the query plans of the main endpoints.
+"""
+
+import io
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.benchmarks.environment import swapped_redis, throwaway_database
+from apps.benchmarks.factories import PASSWORD
+from apps.benchmarks.plans import (
+    DEFAULT_COST_THRESHOLD,
+    DEFAULT_LARGE_TABLE_ROWS,
+    PLAN_CASES,
+    baseline_document,
+    check_plans,
+    format_plan,
+    format_problems,
+    inspect_plans,
+    seeded_data,
+)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / "baselines" / "query_plans.json"
+# Seeding options stored with the baseline; costs are only comparable for equal data
+RECORDED_OPTIONS = ("users", "seed")
+PREFIX = "plan"
+
+
+class Command(BaseCommand):
+    """Django command to explain the SQL of the main endpoints and check the plans."""
+
+    help = (
+        "Replays the main endpoints on a seeded throwaway Postgres database, explains "
+        "their SQL and fails on sequential scans of large tables or cost regressions"
+    )
+
+    def add_arguments(self, parser):
+        """Add the query plan options."""
+        parser.add_argument("--cases", nargs="*", metavar="NAME", help="Check only these cases")
+        parser.add_argument("--list", action="store_true", help="List the cases and exit")
+        parser.add_argument("--users", type=int, default=20_000, help="Users to seed")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the generated data")
+        parser.add_argument(
+            "--baseline",
+            default=str(DEFAULT_BASELINE),
+            help="Baseline of plan costs to compare with",
+        )
+        parser.add_argument(
+            "--save-baseline", action="store_true", help="Write the plan costs to --baseline"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DEFAULT_COST_THRESHOLD,
+            help="Relative cost increase counted as a regression",
+        )
+        parser.add_argument(
+            "--large-table-rows",
+            type=int,
+            default=DEFAULT_LARGE_TABLE_ROWS,
+            help="Estimated rows from which a sequential scan of a table fails the check",
+        )
+        parser.add_argument(
+            "--redis",
+            choices=["fake", "live"],
+            default="fake",
+            help="Use an in-memory fakeredis (default) or the server at REDIS_URL",
+        )
+        parser.add_argument(
+            "--show-plans", action="store_true", help="Print every statement with its plan"
+        )
+
+    def handle(self, *args, **options):
+        """Explain the endpoints' SQL and report problems."""
+        if options["list"]:
+            for name in PLAN_CASES:
+                self.stdout.write(name)
+            return
+        unknown = set(options["cases"] or ()) - set(PLAN_CASES)
+        if unknown:
+            raise CommandError(f"Unknown cases: {', '.join(sorted(unknown))}")
+        if connection.vendor != "postgresql":
+            raise CommandError("Query plans can only be checked on Postgres")
+
+        with swapped_redis(options["redis"]), throwaway_database():
+            call_command(
+                "seed_users",
+                options["users"],
+                seed=options["seed"],
+                prefix=PREFIX,
+                password=PASSWORD,
+                joined_before="2026-01-01",
+                workers=1,
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+            results = inspect_plans(seeded_data(PREFIX), options["cases"])
+            if options["show_plans"]:
+                self.show(results)
+
+            path = Path(options["baseline"])
+            recorded = {key: options[key] for key in RECORDED_OPTIONS}
+            if options["save_baseline"]:
+                path.write_text(json.dumps(baseline_document(results, recorded), indent=2) + "\n")
+                self.stderr.write(self.style.SUCCESS(f"Baseline written to {path}"))
+                baseline = None
+            else:
+                baseline = self.load_baseline(path, recorded)
+            problems = check_plans(
+                results,
+                baseline,
+                large_table_rows=options["large_table_rows"],
+                threshold=options["threshold"],
+            )
+
+        statements = sum(len(statements) for statements in results.values())
+        if problems:
+            self.stderr.write(self.style.ERROR(format_problems(problems)))
+            raise CommandError(f"{len(problems)} problems in {statements} statements")
+        self.stdout.write(self.style.SUCCESS(f"Checked the plans of {statements} statements"))
+
+    def load_baseline(self, path, recorded):
+        """Return the baseline document, or None if it is missing or not comparable."""
+        if not path.exists():
+            self.stderr.write(
+                self.style.WARNING(f"{path} does not exist; only checking sequential scans")
+            )
+            return None
+        baseline = json.loads(path.read_text())
+        if baseline.get("meta") != recorded:
+            self.stderr.write(
+                self.style.WARNING(
+                    f"The baseline was recorded with {baseline.get('meta')}; "
+                    "only checking sequential scans"
+                )
+            )
+            return None
+        return baseline
+
+    def show(self, results):
+        """Write every explained statement with its plan."""
+        for case, statements in results.items():
+            for entry in statements.values():
+                self.stderr.write(f"[{case}] {entry['sql']}\n{format_plan(entry['plan'])}\n")
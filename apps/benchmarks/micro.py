@@ -0,0 +1,727 @@
+"""
+Micro-benchmarks for serializers, authentication, middleware, logging and data access.
+
+Each benchmark is a setup function registered with ``@benchmark``. It receives
+the seeded ``BenchData`` and an ``ExitStack`` for settings overrides and
+cleanup that must stay in place while it is measured, and returns the
+callable to time. Memory benchmarks return the callable whose allocations are
+measured instead.
+"""
+
+import itertools
+import logging
+import os
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack
+from functools import partial
+from io import StringIO
+from unittest import mock
+
+from celery import Celery
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.appsUtils.http_client import PooledHTTPClient
+from apps.appsUtils.log import JSONFormatter, QueueJSONHandler, RequestIdFilter, SamplingFilter
+from apps.appsUtils.redis_client import get_redis
+from apps.authentication import audit, deletion
+from apps.authentication.activity import apply_activity, record_seen
+from apps.authentication.audit import LocalBuffer, RedisBuffer, record_audit_event, write_rows
+from apps.authentication.authentication import ActivityJWTAuthentication, _verified_tokens
+from apps.authentication.exports import export_rows, stream_ndjson
+from apps.authentication.models import (
+    AccountDeletion,
+    AuditEvent,
+    OutboxEvent,
+    User,
+    UserProfile,
+    WebhookDelivery,
+    WebhookEndpoint,
+)
+from apps.authentication.outbox import CeleryPublisher, RedisStreamPublisher, relay_batch
+from apps.authentication.pagination import KeysetPagination
+from apps.authentication.revocation import _new_filter, is_revoked, revoke_token
+from apps.authentication.serializers import (
+    UserListSerializer,
+    UserProfileSerializer,
+    UserSerializer,
+    profile_reader,
+    user_reader,
+)
+from apps.authentication.tokens import AccessToken, token_backend
+from apps.authentication.views import (
+    EmailAccountBulkView,
+    EmailAccountView,
+    ProfileDetailView,
+    UserListView,
+    UserRegistrationView,
+    UserSearchView,
+    get_user_data,
+)
+from apps.authentication.webhooks import deliver_batch
+
+from .factories import seed_users
+from .receiver import WebhookReceiver
+from .runner import measure, measure_memory
+
+BENCHMARKS = {}
+
+
+class Benchmark:
+    """
+    A registered micro-benchmark.
+    """
+
+    def __init__(self, name, setup, vendor=None, memory=False, scale=1.0):
+        """
+        Args:
+            name: The name results are reported under
+            setup: Function of ``(data, stack)`` returning the callable to measure
+            vendor: The database vendor the benchmark needs, if any
+            memory: Whether to measure allocations instead of time
+            scale: Fraction of the requested iterations to run, for slow benchmarks
+        """
+        self.name = name
+        self.setup = setup
+        self.vendor = vendor
+        self.memory = memory
+        self.scale = scale
+
+    def run(self, data, iterations):
+        """
+        Set up and measure the benchmark.
+
+        Args:
+            data: The seeded BenchData
+            iterations: The number of timed calls requested for the suite
+
+        Returns:
+            dict: The benchmark's metrics
+        """
+        with ExitStack() as stack:
+            func = self.setup(data, stack)
+            if self.memory:
+                return measure_memory(func)
+            return measure(func, max(1, int(iterations * self.scale)))
+
+
+def benchmark(name, **options):
+    """
+    Register a setup function as a micro-benchmark.
+
+    Args:
+        name: The name results are reported under
+        **options: Passed to ``Benchmark``
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, **options)
+        return setup
+
+    return register
+
+
+def run_benchmarks(data, names=None, iterations=1000, log=None):
+    """
+    Run micro-benchmarks on the current database.
+
+    Benchmarks needing another database vendor are skipped.
+
+    Args:
+        data: The seeded BenchData
+        names: Names or name prefixes to run, defaults to all
+        iterations: The number of timed calls per benchmark
+        log: Optional function called with a progress message per benchmark
+
+    Returns:
+        dict: Benchmark name to metrics
+    """
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if names and not any(name == wanted or name.startswith(f"{wanted}.") for wanted in names):
+            continue
+        if bench.vendor and bench.vendor != connection.vendor:
+            if log:
+                log(f"{name}: skipped, requires {bench.vendor}")
+            continue
+        results[name] = bench.run(data, iterations)
+        if log:
+            log(f"{name}: {results[name]}")
+    return results
+
+
+def _bearer(user):
+    """Return an Authorization header value with a new access token for a user."""
+    return f"Bearer {AccessToken.for_user(user)}"
+
+
+def _authenticated(request, user):
+    """Force authentication of a factory request and return it."""
+    force_authenticate(request, user=user)
+    return request
+
+
+# Serializers and precompiled readers
+
+
+@benchmark("serializer.user.drf")
+def user_serializer(data, stack):
+    user = data.user
+    return lambda: UserSerializer(user).data
+
+
+@benchmark("serializer.user.reader")
+def user_reader_from_instance(data, stack):
+    user = data.user
+    return lambda: user_reader.from_instance(user)
+
+
+@benchmark("serializer.profile.drf")
+def profile_serializer(data, stack):
+    profile = UserProfile.objects.with_heavy_fields().select_related("user").get(user=data.user)
+    return lambda: UserProfileSerializer(profile).data
+
+
+@benchmark("serializer.profile.reader")
+def profile_reader_from_values(data, stack):
+    row = UserProfile.objects.filter(user=data.user).values(*profile_reader.lookups).get()
+    return lambda: profile_reader.from_values(row)
+
+
+@benchmark("serializer.user_list.page", scale=0.1)
+def user_list_page(data, stack):
+    users = list(User.objects.select_related("profile")[: KeysetPagination.page_size])
+    return lambda: UserListSerializer(users, many=True).data
+
+
+# JWT signing and verification, with and without the verified token cache
+
+
+def _signed_with(stack, algorithm):
+    """Sign tokens with a temporary key ring key, or the HS256 secret."""
+    if algorithm == "HS256":
+        return
+    directory = stack.enter_context(tempfile.TemporaryDirectory())
+    call_command(
+        "generate_signing_key",
+        algorithm=algorithm,
+        kid="bench",
+        directory=directory,
+        stdout=StringIO(),
+    )
+    stack.enter_context(
+        override_settings(JWT_SIGNING_KEYS_DIR=directory, JWT_ACTIVE_KID="bench")
+    )
+
+
+def _sign(data, stack, algorithm):
+    """Return the signing of a new access token."""
+    _signed_with(stack, algorithm)
+    user = data.user
+    return lambda: str(AccessToken.for_user(user))
+
+
+def _verify(data, stack, algorithm):
+    """Return the signature verification of an access token."""
+    _signed_with(stack, algorithm)
+    raw = str(AccessToken.for_user(data.user))
+    return lambda: token_backend.decode(raw)
+
+
+def _authenticate(data, stack, algorithm, cached):
+    """Return a call of the API authentication class for a bearer token."""
+    _signed_with(stack, algorithm)
+    if not cached:
+        stack.enter_context(override_settings(JWT_VERIFIED_TOKEN_CACHE_SIZE=0))
+    stack.callback(_verified_tokens.clear)
+    request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=_bearer(data.user))
+    authentication = ActivityJWTAuthentication()
+    return lambda: authentication.authenticate(request)
+
+
+for _algorithm in ("HS256", "RS256", "EdDSA"):
+    benchmark(f"jwt.sign.{_algorithm.lower()}")(partial(_sign, algorithm=_algorithm))
+    benchmark(f"jwt.verify.{_algorithm.lower()}")(partial(_verify, algorithm=_algorithm))
+for _algorithm in ("HS256", "EdDSA"):
+    benchmark(f"auth.authenticate.{_algorithm.lower()}.cached")(
+        partial(_authenticate, algorithm=_algorithm, cached=True)
+    )
+    benchmark(f"auth.authenticate.{_algorithm.lower()}.uncached")(
+        partial(_authenticate, algorithm=_algorithm, cached=False)
+    )
+
+
+# Token revocation
+
+
+@benchmark("revocation.is_revoked")
+def revocation_check(data, stack):
+    exp = int(time.time()) + 3600
+    for _ in range(1000):
+        revoke_token({"jti": uuid.uuid4().hex, "exp": exp})
+    payload = AccessToken.for_user(data.user).payload
+    return lambda: is_revoked(payload)
+
+
+@benchmark("revocation.bloom.contains")
+def bloom_contains(data, stack):
+    token_filter = _new_filter()
+    for _ in range(10_000):
+        token_filter.add(uuid.uuid4().hex)
+    jti = uuid.uuid4().hex
+    return lambda: jti in token_filter
+
+
+# Full middleware and view stack
+
+
+@benchmark("stack.health")
+def health(data, stack):
+    client = Client()
+    path = reverse("health_check")
+    return lambda: client.get(path)
+
+
+@benchmark("stack.profile_details")
+def profile_details(data, stack):
+    client = Client(HTTP_AUTHORIZATION=_bearer(data.user))
+    path = reverse("profile-details")
+    return lambda: client.get(path)
+
+
+@benchmark("stack.profile_details.not_modified")
+def profile_details_not_modified(data, stack):
+    client = Client(HTTP_AUTHORIZATION=_bearer(data.user))
+    path = reverse("profile-details")
+    etag = client.get(path)["ETag"]
+    return lambda: client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+
+# Views called directly, without middleware or authentication
+
+
+@benchmark("view.user_data")
+def user_data(data, stack):
+    request = _authenticated(APIRequestFactory().get("/"), data.user)
+    return lambda: get_user_data(request).render()
+
+
+@benchmark("view.profile_patch", scale=0.2)
+def profile_patch(data, stack):
+    view = ProfileDetailView.as_view()
+    factory = APIRequestFactory()
+    names = itertools.cycle(("Analytical Engines", "Difference Engines"))
+
+    def patch():
+        request = factory.patch("/", {"company_name": next(names)}, format="json")
+        return view(_authenticated(request, data.user)).render()
+
+    return patch
+
+
+def _register(data, stack, keyed):
+    """Return a registration of a new user, with or without an Idempotency-Key."""
+    view = UserRegistrationView.as_view()
+    factory = APIRequestFactory()
+    run = uuid.uuid4().hex[:8]
+    counter = itertools.count()
+
+    def register():
+        username = f"{run}-{next(counter)}"
+        headers = {"HTTP_IDEMPOTENCY_KEY": username} if keyed else {}
+        request = factory.post(
+            "/",
+            {"username": username, "email": f"{username}@example.com"},
+            format="json",
+            **headers,
+        )
+        return view(request).render()
+
+    return register
+
+
+benchmark("view.register.unkeyed", scale=0.2)(partial(_register, keyed=False))
+benchmark("view.register.idempotent", scale=0.2)(partial(_register, keyed=True))
+
+
+# Addresses connected and disconnected by the email account benchmarks
+BENCH_MAILBOXES = [f"mailbox{index}@example.com" for index in range(50)]
+
+
+def _mailbox(email):
+    """Return the fields of an email account to connect."""
+    return {
+        "email": email,
+        "provider": "smtp",
+        "smtp_server": "smtp.example.com",
+        "smtp_port": 587,
+        "imap_server": "imap.example.com",
+        "imap_port": 993,
+        "password": "app-password",
+    }
+
+
+@benchmark("view.email_accounts.bulk.50", scale=0.1)
+def email_accounts_bulk(data, stack):
+    """Connect 50 mailboxes in one request, then disconnect them in another."""
+    view = EmailAccountBulkView.as_view()
+    factory = APIRequestFactory()
+    adds = [{"op": "add", **_mailbox(email)} for email in BENCH_MAILBOXES]
+    removes = [{"op": "remove", "email": email} for email in BENCH_MAILBOXES]
+    batches = itertools.cycle((adds, removes))
+
+    def bulk():
+        request = factory.post("/", {"operations": next(batches)}, format="json")
+        return view(_authenticated(request, data.user)).render()
+
+    return bulk
+
+
+@benchmark("view.email_accounts.single.50", scale=0.01)
+def email_accounts_single(data, stack):
+    """Connect 50 mailboxes one request at a time, then disconnect them the same way."""
+    view = EmailAccountView.as_view()
+    factory = APIRequestFactory()
+    connecting = itertools.cycle((True, False))
+
+    def single():
+        if next(connecting):
+            for email in BENCH_MAILBOXES:
+                request = factory.post("/", _mailbox(email), format="json")
+                view(_authenticated(request, data.user)).render()
+        else:
+            for email in BENCH_MAILBOXES:
+                view(_authenticated(factory.delete("/"), data.user), email_id=email).render()
+
+    return single
+
+
+@benchmark("view.user_list.first_page", scale=0.1)
+def user_list_first_page(data, stack):
+    view = UserListView.as_view()
+    request = _authenticated(APIRequestFactory().get("/"), data.admin)
+    return lambda: view(request).render()
+
+
+@benchmark("view.user_list.deep_page", scale=0.1)
+def user_list_deep_page(data, stack):
+    view = UserListView.as_view()
+    middle = User.objects.order_by("-date_joined", "-pk")[len(data.pks) // 2]
+    cursor = KeysetPagination().encode_cursor(middle)
+    request = _authenticated(APIRequestFactory().get("/", {"cursor": cursor}), data.admin)
+    return lambda: view(request).render()
+
+
+@benchmark("view.user_search", scale=0.1)
+def user_search(data, stack):
+    view = UserSearchView.as_view()
+    request = _authenticated(APIRequestFactory().get("/", {"q": "lovel"}), data.admin)
+    return lambda: view(request).render()
+
+
+# Bulk paths
+
+
+@benchmark("export.ndjson", scale=0.01)
+def export_ndjson(data, stack):
+    return lambda: sum(len(chunk) for chunk in stream_ndjson(export_rows(User.objects.all())))
+
+
+@benchmark("activity.record_seen")
+def activity_record_seen(data, stack):
+    stack.enter_context(override_settings(USER_ACTIVITY_STALENESS=0))
+    pks = itertools.cycle(data.pks)
+    return lambda: record_seen(next(pks))
+
+
+@benchmark("activity.apply.1000", vendor="postgresql", scale=0.05)
+def activity_apply(data, stack):
+    pks = data.pks[:1000]
+    clock = itertools.count(time.time())
+    return lambda: apply_activity("last_seen", dict.fromkeys(pks, next(clock)))
+
+
+# Transactional outbox: the cost a user update pays for its event, and relaying
+# batches of OUTBOX_BATCH_SIZE events (events per second = ops_per_sec * batch)
+
+# Batches written to the outbox at a time for the relay benchmarks; refilling
+# is timed, so it must stay rare enough to land above the 95th percentile
+RELAY_POOL_BATCHES = 50
+
+
+@benchmark("outbox.user_update", scale=0.2)
+def outbox_user_update(data, stack):
+    stack.callback(lambda: OutboxEvent.objects.all().delete())
+    user = User.objects.get(pk=data.pks[0])
+    names = itertools.cycle(("Ada", "Augusta"))
+
+    def update():
+        user.first_name = next(names)
+        user.save(update_fields=["first_name"])
+
+    return update
+
+
+def _relay(data, stack, publisher):
+    """Return the relay of one batch from an outbox refilled when it runs dry."""
+    stack.callback(lambda: OutboxEvent.objects.all().delete())
+    batch_size = settings.OUTBOX_BATCH_SIZE
+    payload = {"user_id": data.pks[0], "email": data.email(0), "fields": ["first_name"]}
+
+    def refill():
+        OutboxEvent.objects.bulk_create(
+            OutboxEvent(topic="user.updated", key=str(data.pks[0]), payload=payload)
+            for _ in range(batch_size * RELAY_POOL_BATCHES)
+        )
+
+    def relay():
+        if not relay_batch(publisher, batch_size):
+            refill()
+            relay_batch(publisher, batch_size)
+
+    refill()
+    return relay
+
+
+@benchmark("outbox.relay.celery", scale=0.05)
+def outbox_relay_celery(data, stack):
+    app = Celery("bench", broker="memory://")
+    stack.callback(app.close)
+    return _relay(data, stack, CeleryPublisher(task_name="bench.user_event", app=app))
+
+
+@benchmark("outbox.relay.redis", scale=0.05)
+def outbox_relay_redis(data, stack):
+    return _relay(data, stack, RedisStreamPublisher(stream=f"bench:{uuid.uuid4().hex[:8]}"))
+
+
+# Audit log: the cost a change pays to record its event, buffered or inserted
+# directly, and sustained ingest of AUDIT_FLUSH_BATCH_SIZE events per COPY
+# (events per second = ops_per_sec * batch)
+
+
+def _audit_record(data, stack, buffer):
+    """Return the recording of one profile change into a buffer."""
+    stack.enter_context(mock.patch.object(audit, "_buffer", buffer))
+    pks = itertools.cycle(data.pks)
+    return lambda: record_audit_event("profile.updated", next(pks), changes={"fields": ["phone"]})
+
+
+@benchmark("audit.record.redis")
+def audit_record_redis(data, stack):
+    buffer = RedisBuffer()
+    stack.callback(lambda: get_redis().delete(buffer.live_key))
+    return _audit_record(data, stack, buffer)
+
+
+@benchmark("audit.record.local")
+def audit_record_local(data, stack):
+    # Never full and never due, so nothing is written while measuring
+    buffer = LocalBuffer(batch_size=10**9, interval=10**6, max_events=10**9)
+    stack.callback(lambda: buffer.rows.clear())
+    return _audit_record(data, stack, buffer)
+
+
+@benchmark("audit.record.insert", scale=0.2)
+def audit_record_insert(data, stack):
+    stack.callback(lambda: AuditEvent.objects.all().delete())
+    pks = itertools.cycle(data.pks)
+    return lambda: AuditEvent.objects.create(
+        action="profile.updated", user_id=next(pks), changes={"fields": ["phone"]}
+    )
+
+
+@benchmark("audit.ingest", scale=0.02)
+def audit_ingest(data, stack):
+    stack.callback(lambda: AuditEvent.objects.all().delete())
+    pks = itertools.cycle(data.pks)
+
+    def ingest():
+        created_at = timezone.now().isoformat()
+        write_rows(
+            [
+                (created_at, "profile.updated", pk, pk, '{"fields": ["phone"]}', None)
+                for pk in itertools.islice(pks, settings.AUDIT_FLUSH_BATCH_SIZE)
+            ]
+        )
+
+    return ingest
+
+
+# Webhooks: one batch posted to a local receiver over a kept-alive connection,
+# over a new connection per batch, and one event per request (events per
+# second = ops_per_sec * batch_size)
+
+
+def _webhook_batch(data, stack, batch_size, keep_alive=True):
+    """Return the delivery of one batch from a queue refilled when it runs dry."""
+    receiver = stack.enter_context(WebhookReceiver())
+    endpoint = WebhookEndpoint.objects.create(
+        url=receiver.url, secret="bench", batch_size=batch_size
+    )
+    stack.callback(endpoint.delete)
+    client = PooledHTTPClient()
+    stack.callback(client.close)
+    event = {"id": 0, "topic": "user.updated", "key": str(data.pks[0]), "payload": {}}
+
+    def refill():
+        WebhookDelivery.objects.bulk_create(
+            WebhookDelivery(endpoint=endpoint, event=event)
+            for _ in range(batch_size * RELAY_POOL_BATCHES)
+        )
+
+    def deliver():
+        if not deliver_batch(endpoint, client)[0]:
+            refill()
+            deliver_batch(endpoint, client)
+        if not keep_alive:
+            client.close()
+
+    refill()
+    return deliver
+
+
+@benchmark("webhooks.deliver.pooled", scale=0.05)
+def webhooks_deliver_pooled(data, stack):
+    return _webhook_batch(data, stack, batch_size=100)
+
+
+@benchmark("webhooks.deliver.new_connection", scale=0.05)
+def webhooks_deliver_new_connection(data, stack):
+    return _webhook_batch(data, stack, batch_size=100, keep_alive=False)
+
+
+@benchmark("webhooks.deliver.unbatched", scale=0.2)
+def webhooks_deliver_unbatched(data, stack):
+    return _webhook_batch(data, stack, batch_size=1)
+
+
+# Account deletion of users with a large footprint: the request deactivating
+# a user, deleting their rows in batches, and one cascading delete as a
+# request doing it synchronously would
+
+# Rows depending on each deleted user, and users created at a time; refilling
+# is timed, so it must stay rare enough to land above the 95th percentile
+DELETION_FOOTPRINT = 20_000
+DELETION_POOL_USERS = 12
+
+
+def _deleted_users(data, stack, delete):
+    """Return the deletion of one user from a pool refilled when it runs dry."""
+    pool, created = [], []
+    permissions = list(Permission.objects.order_by("pk")[:20])
+
+    def refill():
+        prefix = f"del{uuid.uuid4().hex[:8]}"
+        pks = seed_users(DELETION_POOL_USERS, prefix=prefix)
+        for pk in pks:
+            LogEntry.objects.bulk_create(
+                (
+                    LogEntry(user_id=pk, action_flag=2, object_repr=f"lead {index}")
+                    for index in range(DELETION_FOOTPRINT)
+                ),
+                batch_size=5000,
+            )
+            User.user_permissions.through.objects.bulk_create(
+                User.user_permissions.through(user_id=pk, permission=permission)
+                for permission in permissions
+            )
+        created.extend(pks)
+        pool.extend(User.objects.filter(pk__in=pks))
+
+    def delete_one():
+        if not pool:
+            refill()
+        delete(pool.pop())
+
+    def cleanup():
+        User.objects.filter(pk__in=created).delete()
+        AccountDeletion.objects.all().delete()
+        OutboxEvent.objects.all().delete()
+
+    stack.callback(cleanup)
+    refill()
+    return delete_one
+
+
+def _run_deletion(user):
+    """Delete a user's rows in batches, without pauses, as the task would."""
+    pending = AccountDeletion.objects.create(user_id=user.pk)
+    deletion.run_deletion(pending.pk, sleep=0, time_budget=0)
+
+
+@benchmark("deletion.request", scale=0.01)
+def deletion_request(data, stack):
+    stack.enter_context(mock.patch.object(deletion, "schedule_deletion"))
+    return _deleted_users(data, stack, deletion.request_deletion)
+
+
+@benchmark("deletion.batched", scale=0.01)
+def deletion_batched(data, stack):
+    return _deleted_users(data, stack, _run_deletion)
+
+
+@benchmark("deletion.cascade", scale=0.01)
+def deletion_cascade(data, stack):
+    return _deleted_users(data, stack, lambda user: user.delete())
+
+
+# Logging cost per request: one access record through the queued handler, a
+# handler writing in the request thread, and a record dropped by sampling
+
+
+def _access_log(data, stack, handler=None, rate=1.0):
+    """Return the logging of one access record to a throwaway logger."""
+    if handler is None:
+        handler = QueueJSONHandler(
+            stream=stack.enter_context(open(os.devnull, "w")),
+            redacted_fields=settings.LOG_REDACTED_FIELDS,
+        )
+        stack.callback(handler.stop)
+    handler.addFilter(SamplingFilter({"bench.access": rate}))
+    handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger(f"bench.access.{uuid.uuid4().hex[:8]}")
+    logger.propagate = False
+    logger.addHandler(handler)
+    stack.callback(logger.removeHandler, handler)
+    extra = {"method": "GET", "path": "/api/auth/user-data/", "status": 200, "duration_ms": 1.5}
+    return lambda: logger.info("%s %s %s", "GET", "/api/auth/user-data/", 200, extra=extra)
+
+
+@benchmark("logging.access.queued")
+def access_log_queued(data, stack):
+    return _access_log(data, stack)
+
+
+@benchmark("logging.access.blocking")
+def access_log_blocking(data, stack):
+    handler = logging.StreamHandler(stack.enter_context(open(os.devnull, "w")))
+    handler.setFormatter(JSONFormatter(settings.LOG_REDACTED_FIELDS))
+    return _access_log(data, stack, handler=handler)
+
+
+@benchmark("logging.access.sampled_out")
+def access_log_sampled_out(data, stack):
+    return _access_log(data, stack, rate=0)
+
+
+# Memory of loading profiles with and without the deferred heavy columns
+
+
+@benchmark("memory.profiles.deferred", memory=True)
+def profiles_deferred(data, stack):
+    return lambda: list(UserProfile.objects.all()[:1000])
+
+
+@benchmark("memory.profiles.full", memory=True)
+def profiles_full(data, stack):
+    return lambda: list(UserProfile.objects.with_heavy_fields()[:1000])
@@ -0,0 +1,376 @@
+"""
+Query plan regression guard.
+
+This module replays the main authentication endpoints in process, captures the
+SQL they issue and runs ``EXPLAIN (FORMAT JSON)`` on each statement against a
+seeded Postgres database. Plans are checked for sequential scans over large
+tables and compared with a baseline of total costs, so a migration or queryset
+change that stops a hot path from using an index fails before it ships. New
+statements and baseline statements no longer issued fail too, until the
+baseline is saved again.
+"""
+
+import re
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+from apps.authentication.tokens import RefreshToken
+
+from .factories import PASSWORD, BenchData
+
+# Relative increase of a plan's total cost counted as a regression
+DEFAULT_COST_THRESHOLD = 0.5
+# Cost increases below this are planner noise on any threshold
+ABSOLUTE_COST_TOLERANCE = 5.0
+# Tables the planner estimates at this many rows or more must not be seq scanned
+DEFAULT_LARGE_TABLE_ROWS = 5000
+
+EXPLAINED_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+PLAN_CASES = {}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?(?![\w\"])")
+_VALUE_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+
+
+class PlanCaseError(Exception):
+    """Raised when an endpoint replayed by a plan case does not respond as expected."""
+
+
+def plan_case(name):
+    """
+    Register a function replaying endpoint requests under a case name.
+
+    The function receives an ``APIClient`` and the ``BenchData`` of the seeded
+    users, and every statement it causes is explained.
+    """
+
+    def register(func):
+        PLAN_CASES[name] = func
+        return func
+
+    return register
+
+
+def expect(response, *statuses):
+    """
+    Check the status of a replayed request.
+
+    Raises:
+        PlanCaseError: If the status is not one of ``statuses``
+    """
+    if response.status_code not in statuses:
+        raise PlanCaseError(
+            f"{response.request['REQUEST_METHOD']} {response.request['PATH_INFO']} returned "
+            f"{response.status_code}: {response.content[:200]!r}"
+        )
+    return response
+
+
+def authenticated(client, user):
+    """Send a bearer access token for ``user`` with the client's requests."""
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+
+@plan_case("register")
+def register_case(client, data):
+    """UserRegistrationView creating a user and its profile."""
+    expect(
+        client.post(
+            reverse("register"),
+            {"username": f"{data.prefix}-new", "email": f"{data.prefix}-new@example.com"},
+            format="json",
+        ),
+        201,
+    )
+
+
+@plan_case("token.obtain")
+def token_obtain_case(client, data):
+    """TokenObtainPairView looking a user up by email."""
+    expect(
+        client.post(
+            reverse("token_obtain_pair"),
+            {"email": data.email(len(data.pks) // 2), "password": PASSWORD},
+            format="json",
+        ),
+        200,
+    )
+
+
+@plan_case("token.refresh")
+def token_refresh_case(client, data):
+    """TokenRefreshView rotating a refresh token."""
+    refresh = RefreshToken.for_user(data.user)
+    expect(client.post(reverse("token_refresh"), {"refresh": str(refresh)}, format="json"), 200)
+
+
+@plan_case("profile")
+def profile_case(client, data):
+    """UserProfileView reading and updating the current user."""
+    authenticated(client, data.user)
+    expect(client.get(reverse("profile")), 200)
+    expect(client.patch(reverse("profile"), {"first_name": "Plan"}, format="json"), 200)
+
+
+@plan_case("user_data")
+def user_data_case(client, data):
+    """get_user_data reading the user and profile."""
+    expect(authenticated(client, data.user).get(reverse("user-data")), 200)
+
+
+@plan_case("email_accounts")
+def email_accounts_case(client, data):
+    """EmailAccountView adding and removing a connected account."""
+    authenticated(client, data.user)
+    expect(
+        client.post(
+            reverse("email-accounts"),
+            {
+                "email": "plan@example.com",
+                "provider": "smtp",
+                "smtp_server": "smtp.example.com",
+                "smtp_port": 587,
+                "imap_server": "imap.example.com",
+                "imap_port": 993,
+                "password": "PlanPassword123!",
+            },
+            format="json",
+        ),
+        201,
+    )
+    expect(client.delete(reverse("email-account-detail", args=["plan@example.com"])), 200)
+
+
+def fingerprint(sql):
+    """
+    Return a statement with its literal values replaced by ``?``.
+
+    Statements issued with different values share a fingerprint, which keys
+    them in the baseline.
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _VALUE_LIST.sub("(...)", sql)
+    return " ".join(sql.split())
+
+
+def plan_nodes(plan):
+    """Yield a plan node and all of its descendants."""
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def explain(sql):
+    """
+    Return the plan Postgres chooses for a statement, without running it.
+
+    Args:
+        sql: A statement with its parameters inlined
+
+    Returns:
+        dict: The root node of the ``EXPLAIN (FORMAT JSON)`` output
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        document = cursor.fetchone()[0]
+    return document[0]["Plan"]
+
+
+def table_rows():
+    """Return the planner's row estimate of every table in the current schema."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, c.reltuples
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()
+            """
+        )
+        return dict(cursor.fetchall())
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back."""
+    with transaction.atomic():
+        try:
+            yield
+        finally:
+            transaction.set_rollback(True)
+
+
+def capture_case(func, data):
+    """
+    Replay a plan case and return the distinct statements it issued.
+
+    The requests' writes are rolled back, so cases can run in any order and
+    repeatedly against the same data.
+
+    Returns:
+        dict: Fingerprints mapped to the first statement issued with each
+    """
+    with rolled_back(), CaptureQueriesContext(connection) as captured:
+        func(APIClient(), data)
+    statements = {}
+    for query in captured.captured_queries:
+        sql = query["sql"]
+        if sql.lstrip().split(None, 1)[0].upper() in EXPLAINED_STATEMENTS:
+            statements.setdefault(fingerprint(sql), sql)
+    return statements
+
+
+def inspect_plans(data, names=None):
+    """
+    Replay plan cases and explain the statements they issue.
+
+    Args:
+        data: The ``BenchData`` of the seeded users
+        names: Case names, or None for all of them
+
+    Returns:
+        dict: Case names mapped to fingerprints mapped to ``{"sql", "plan"}``
+    """
+    results = {}
+    for name in names or PLAN_CASES:
+        statements = capture_case(PLAN_CASES[name], data)
+        results[name] = {
+            key: {"sql": sql, "plan": explain(sql)} for key, sql in statements.items()
+        }
+    return results
+
+
+def seq_scans(plan, rows, large_table_rows):
+    """Return the large tables a plan reads with a sequential scan."""
+    return sorted(
+        {
+            node["Relation Name"]
+            for node in plan_nodes(plan)
+            if node["Node Type"] == "Seq Scan"
+            and rows.get(node["Relation Name"], 0) >= large_table_rows
+        }
+    )
+
+
+def check_plans(
+    results,
+    baseline=None,
+    large_table_rows=DEFAULT_LARGE_TABLE_ROWS,
+    threshold=DEFAULT_COST_THRESHOLD,
+):
+    """
+    Find plans that scan large tables sequentially or differ from the baseline.
+
+    With a baseline, a statement it does not know and a statement it holds that
+    a case no longer issues are problems too, so new or changed SQL cannot
+    pass without its cost being recorded.
+
+    Args:
+        results: The output of ``inspect_plans``
+        baseline: A document from ``baseline_document``, or None to only check scans
+        large_table_rows: Estimated row count from which a table counts as large
+        threshold: Relative cost increase counted as a regression
+
+    Returns:
+        list: One dict per problem with ``case``, ``fingerprint``, ``problem``,
+        ``sql`` and ``plan``; statements no longer issued have no ``plan``
+    """
+    rows = table_rows()
+    problems = []
+    for case, statements in results.items():
+        costs = baseline["cases"].get(case, {}) if baseline is not None else None
+        for key, entry in statements.items():
+            plan = entry["plan"]
+            found = []
+            tables = seq_scans(plan, rows, large_table_rows)
+            if tables:
+                found.append(f"sequential scan on {', '.join(tables)}")
+            if costs is not None:
+                previous = costs.get(key)
+                current = plan["Total Cost"]
+                if previous is None:
+                    found.append("statement not in the baseline")
+                elif (
+                    current > previous * (1 + threshold)
+                    and current - previous > ABSOLUTE_COST_TOLERANCE
+                ):
+                    found.append(f"total cost {previous} -> {current}")
+            problems.extend(
+                {"case": case, "fingerprint": key, "problem": problem, **entry}
+                for problem in found
+            )
+        problems.extend(
+            {
+                "case": case,
+                "fingerprint": key,
+                "problem": "baseline statement no longer issued",
+                "sql": key,
+                "plan": None,
+            }
+            for key in sorted(set(costs or ()) - set(statements))
+        )
+    return problems
+
+
+def baseline_document(results, options):
+    """
+    Build the baseline stored for later comparisons.
+
+    Args:
+        results: The output of ``inspect_plans``
+        options: The seeding options, recorded so runs are compared like for like
+
+    Returns:
+        dict: ``{"meta": options, "cases": {case: {fingerprint: total cost}}}``
+    """
+    return {
+        "meta": options,
+        "cases": {
+            case: {key: entry["plan"]["Total Cost"] for key, entry in sorted(statements.items())}
+            for case, statements in results.items()
+        },
+    }
+
+
+def format_plan(plan, depth=0):
+    """Render a plan tree as indented text, one node per line."""
+    line = plan["Node Type"]
+    if "Relation Name" in plan:
+        line += f" on {plan['Relation Name']}"
+    if "Index Name" in plan:
+        line += f" using {plan['Index Name']}"
+    line += f"  (cost={plan['Startup Cost']}..{plan['Total Cost']} rows={plan['Plan Rows']})"
+    for key in ("Index Cond", "Filter", "Hash Cond", "Join Filter"):
+        if key in plan:
+            line += f"\n{'  ' * (depth + 1)}  {key}: {plan[key]}"
+    lines = ["  " * depth + line]
+    lines.extend(format_plan(child, depth + 1) for child in plan.get("Plans", ()))
+    return "\n".join(lines)
+
+
+def seeded_data(prefix):
+    """Return the ``BenchData`` of users seeded by ``seed_users`` with a prefix."""
+    pks = list(
+        User.objects.filter(username__regex=rf"^{re.escape(prefix)}[0-9]+$")
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    return BenchData(pks, prefix=prefix)
+
+
+def format_problems(problems):
+    """Render problems with the statement and plan of each, for failure output."""
+    return "\n\n".join(
+        f"[{problem['case']}] {problem['problem']}\n{problem['sql']}"
+        + (f"\n{format_plan(problem['plan'])}" if problem["plan"] else "")
+        for problem in problems
+    )
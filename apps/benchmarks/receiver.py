@@ -0,0 +1,74 @@
+"""
+Local HTTP server standing in for a webhook receiver.
+
+The server keeps connections alive (HTTP/1.1), records every request with the
+client port it arrived on, and answers with a configurable status, so tests
+and benchmarks can check batching, signatures and connection reuse without a
+real integrator.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookReceiver:
+    """
+    Receiver running in a background thread for the duration of a ``with`` block.
+    """
+
+    def __init__(self, status=200):
+        """
+        Args:
+            status: The status code every request is answered with
+        """
+        self.status = status
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Return the URL requests are posted to."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/hooks/"
+
+    @property
+    def connections(self):
+        """Return the number of TCP connections requests arrived on."""
+        with self._lock:
+            return len({request["client"] for request in self.requests})
+
+    def _handler(self):
+        """Return the request handler class recording into this receiver."""
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with receiver._lock:
+                    receiver.requests.append(
+                        {"client": self.client_address, "headers": self.headers, "body": body}
+                    )
+                self.send_response(receiver.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
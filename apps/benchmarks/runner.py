@@ -0,0 +1,180 @@
+"""
+Timing, result documents and baseline comparison for the benchmark suite.
+
+Every benchmark produces a flat dictionary of numbers. Latencies are kept in
+milliseconds and memory in bytes, so for every compared metric lower is
+better. Results are written as JSON documents of the form
+``{"meta": {...}, "benchmarks": {name: {metric: value}}}``; a baseline is
+simply an earlier results document.
+"""
+
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import django
+from django.db import connection
+from django.utils import timezone
+
+# Metrics compared against a baseline, all of which are better when lower
+COMPARED_METRICS = ("p50_ms", "p95_ms", "peak_bytes")
+
+# Relative slowdown tolerated before a metric counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Changes smaller than this are timer and allocator noise, not regressions
+ABSOLUTE_TOLERANCE = {"p50_ms": 0.005, "p95_ms": 0.01, "peak_bytes": 4096}
+
+
+def percentile(samples, fraction):
+    """
+    Return the nearest-rank percentile of sorted samples.
+
+    Args:
+        samples: The samples, sorted ascending
+        fraction: The percentile as a fraction between 0 and 1
+
+    Returns:
+        float: The sample at that rank
+    """
+    rank = max(1, math.ceil(fraction * len(samples)))
+    return samples[rank - 1]
+
+
+def summarize(samples_ns, errors=0):
+    """
+    Summarize latency samples.
+
+    Args:
+        samples_ns: Durations in nanoseconds
+        errors: Number of failed operations, reported alongside the timings
+
+    Returns:
+        dict: Count, mean, percentiles in milliseconds and throughput
+    """
+    samples = sorted(sample / 1_000_000 for sample in samples_ns)
+    total = sum(samples)
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "mean_ms": round(total / len(samples), 4),
+        "p50_ms": round(percentile(samples, 0.50), 4),
+        "p95_ms": round(percentile(samples, 0.95), 4),
+        "p99_ms": round(percentile(samples, 0.99), 4),
+        "max_ms": round(samples[-1], 4),
+        "ops_per_sec": round(len(samples) / total * 1000, 1) if total else None,
+    }
+
+
+def measure(func, iterations, warmup=None):
+    """
+    Time repeated calls of a function.
+
+    Args:
+        func: The callable to time, called without arguments
+        iterations: Number of timed calls
+        warmup: Number of untimed calls made first, defaults to a tenth of iterations
+
+    Returns:
+        dict: The summary of the timed calls
+    """
+    for _ in range(iterations // 10 if warmup is None else warmup):
+        func()
+
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(iterations):
+        start = clock()
+        func()
+        samples.append(clock() - start)
+    return summarize(samples)
+
+
+def measure_memory(func):
+    """
+    Measure the memory allocated by one call of a function.
+
+    Args:
+        func: The callable to measure, called without arguments
+
+    Returns:
+        dict: The peak traced allocation and what the result still holds
+    """
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    tracemalloc.clear_traces()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        result = func()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not started:
+            tracemalloc.stop()
+    del result
+    return {"peak_bytes": peak - baseline, "retained_bytes": retained - baseline}
+
+
+def results_document(benchmarks, options=None):
+    """
+    Wrap benchmark results with the environment they were measured in.
+
+    Args:
+        benchmarks: Mapping of benchmark name to its metrics
+        options: The options the suite was run with
+
+    Returns:
+        dict: The JSON serializable results document
+    """
+    return {
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "python": sys.version.split()[0],
+            "django": django.get_version(),
+            "platform": platform.platform(),
+            "database": connection.vendor,
+            "options": options or {},
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results against a baseline document.
+
+    Benchmarks missing from either document are skipped.
+
+    Args:
+        results: The current results document
+        baseline: An earlier results document
+        threshold: Relative increase above which a metric has regressed
+
+    Returns:
+        list: One dict per compared metric with the baseline and current
+        values, the relative change and whether it is a regression
+    """
+    rows = []
+    previous = baseline.get("benchmarks", {})
+    for name, metrics in sorted(results.get("benchmarks", {}).items()):
+        if name not in previous:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous[name].get(metric), metrics.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            rows.append(
+                {
+                    "benchmark": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": round(change, 4),
+                    "regressed": change > threshold
+                    and after - before > ABSOLUTE_TOLERANCE[metric],
+                }
+            )
+    return rows
@@ -0,0 +1,409 @@
+"""
+HTTP load scenarios.
+
+A scenario drives the API the way a kind of client does, through one or more
+concurrent sessions. Requests go through Django's test client in process by
+default, or over keep-alive HTTP connections to a running server, and each
+request's latency is recorded under its scenario and request name.
+"""
+
+import http.client
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from apps.authentication.tokens import RefreshToken
+
+from .factories import PASSWORD
+from .runner import summarize
+
+SCENARIOS = {}
+
+
+def scenario(cls):
+    """Register a Scenario subclass under its name."""
+    SCENARIOS[cls.name] = cls
+    return cls
+
+
+class InProcessTransport:
+    """
+    Sends requests through the full Django stack without a server.
+    """
+
+    def __init__(self):
+        """Create a test client for this transport's thread."""
+        self.client = Client()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Send a request.
+
+        Args:
+            method: The HTTP method
+            path: The path and query string
+            body: The encoded JSON body, if any
+            headers: Request headers by HTTP name
+
+        Returns:
+            tuple: The status code, body bytes and response headers
+        """
+        meta = {
+            f"HTTP_{name.upper().replace('-', '_')}": value
+            for name, value in (headers or {}).items()
+        }
+        response = self.client.generic(
+            method, path, data=body or b"", content_type="application/json", **meta
+        )
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+        else:
+            content = response.content
+        return response.status_code, content, dict(response.items())
+
+
+class HTTPTransport:
+    """
+    Sends requests to a running server over one keep-alive connection.
+    """
+
+    def __init__(self, url):
+        """
+        Args:
+            url: The server's base URL, such as ``http://127.0.0.1:8000``
+        """
+        parts = urlsplit(url)
+        connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        self.connection = connection_class(parts.netloc, timeout=30)
+        self.prefix = parts.path.rstrip("/")
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Send a request, reconnecting once if the server closed the connection.
+
+        Args:
+            method: The HTTP method
+            path: The path and query string
+            body: The encoded JSON body, if any
+            headers: Request headers by HTTP name
+
+        Returns:
+            tuple: The status code, body bytes and response headers
+        """
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        for attempt in range(2):
+            try:
+                self.connection.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                return response.status, response.read(), dict(response.getheaders())
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.connection.close()
+                if attempt:
+                    raise
+
+
+class Session:
+    """
+    One simulated client, recording the latency of every request it sends.
+    """
+
+    def __init__(self, transport, worker):
+        """
+        Args:
+            transport: The transport requests are sent through
+            worker: The index of this session among the concurrent sessions
+        """
+        self.transport = transport
+        self.worker = worker
+        self.headers = {}
+        self.state = {}
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+
+    def request(self, name, method, path, data=None, expect=(200,), headers=None):
+        """
+        Send a request and record its latency under a name.
+
+        Args:
+            name: The name the latency is recorded under
+            method: The HTTP method
+            path: The path and query string
+            data: A JSON serializable body, if any
+            expect: Status codes that count as success
+            headers: Extra request headers
+
+        Returns:
+            tuple: The status code, decoded JSON body (or None) and response headers
+        """
+        body = json.dumps(data).encode() if data is not None else None
+        start = time.perf_counter_ns()
+        status, content, response_headers = self.transport.request(
+            method, path, body, {**self.headers, **(headers or {})}
+        )
+        self.samples[name].append(time.perf_counter_ns() - start)
+        if status not in expect:
+            self.errors[name] += 1
+        try:
+            payload = json.loads(content) if content else None
+        except ValueError:
+            payload = None
+        return status, payload, response_headers
+
+
+class Scenario:
+    """
+    Base class of load scenarios.
+
+    Subclasses set ``name``, prepare shared state in ``__init__`` (which runs on
+    the main thread, so it may use the ORM) and implement ``step``.
+    """
+
+    name = None
+
+    def __init__(self, data, concurrency):
+        """
+        Args:
+            data: The seeded BenchData
+            concurrency: The number of concurrent sessions
+        """
+        self.data = data
+        self.concurrency = concurrency
+
+    def start(self, session):
+        """Prepare a session before its first step."""
+
+    def step(self, session, index):
+        """Perform the scenario's requests for one iteration."""
+        raise NotImplementedError
+
+
+class AuthenticatedScenario(Scenario):
+    """
+    Scenario whose sessions each act as their own seeded user.
+    """
+
+    def __init__(self, data, concurrency):
+        super().__init__(data, concurrency)
+        self.tokens = [RefreshToken.for_user(user) for user in self.users()]
+
+    def users(self):
+        """Return the user of each session."""
+        return self.data.users(self.concurrency)
+
+    def start(self, session):
+        token = self.tokens[session.worker]
+        session.headers["Authorization"] = f"Bearer {token.access_token}"
+        session.state["refresh"] = str(token)
+
+
+@scenario
+class RegisterScenario(Scenario):
+    """New users signing up, each with an Idempotency-Key."""
+
+    name = "register"
+
+    def __init__(self, data, concurrency):
+        super().__init__(data, concurrency)
+        self.run = uuid.uuid4().hex[:8]
+        self.path = reverse("register")
+
+    def step(self, session, index):
+        username = f"{self.run}-{index}"
+        session.request(
+            "register",
+            "POST",
+            self.path,
+            {"username": username, "email": f"{username}@example.com"},
+            expect=(201,),
+            headers={"Idempotency-Key": username},
+        )
+
+
+@scenario
+class LoginStormScenario(Scenario):
+    """Many seeded users obtaining tokens with their password at once."""
+
+    name = "login-storm"
+
+    def __init__(self, data, concurrency):
+        super().__init__(data, concurrency)
+        self.path = reverse("token_obtain_pair")
+
+    def step(self, session, index):
+        session.request(
+            "token", "POST", self.path, {"email": self.data.email(index), "password": PASSWORD}
+        )
+
+
+@scenario
+class TokenRefreshScenario(AuthenticatedScenario):
+    """Clients refreshing their rotating refresh token."""
+
+    name = "token-refresh"
+
+    def __init__(self, data, concurrency):
+        super().__init__(data, concurrency)
+        self.path = reverse("token_refresh")
+
+    def step(self, session, index):
+        status, payload, _ = session.request(
+            "refresh", "POST", self.path, {"refresh": session.state["refresh"]}
+        )
+        if status == 200:
+            session.state["refresh"] = payload["refresh"]
+
+
+@scenario
+class ProfilePollingScenario(AuthenticatedScenario):
+    """Clients polling the profile endpoints, occasionally editing the profile."""
+
+    name = "profile-polling"
+    patch_every = 10
+
+    def step(self, session, index):
+        status, _, headers = session.request(
+            "profile-details",
+            "GET",
+            reverse("profile-details"),
+            expect=(200, 304),
+            headers={"If-None-Match": session.state.get("etag", "")},
+        )
+        if status == 200:
+            session.state["etag"] = headers.get("ETag", "")
+        session.request("profile", "GET", reverse("profile"))
+        session.request("user-data", "GET", reverse("user-data"))
+
+        if index % self.patch_every == 0:
+            status, _, headers = session.request(
+                "profile-details.patch",
+                "PATCH",
+                reverse("profile-details"),
+                {"company_name": f"Company {index}"},
+            )
+            if status == 200:
+                session.state["etag"] = headers.get("ETag", "")
+
+
+@scenario
+class EmailAccountChurnScenario(AuthenticatedScenario):
+    """Clients connecting and disconnecting email accounts."""
+
+    name = "email-account-churn"
+
+    def step(self, session, index):
+        email = f"churn{index}@example.com"
+        session.request(
+            "email-accounts.add",
+            "POST",
+            reverse("email-accounts"),
+            {
+                "email": email,
+                "provider": "smtp",
+                "smtp_server": "smtp.example.com",
+                "smtp_port": 587,
+                "imap_server": "imap.example.com",
+                "imap_port": 993,
+                "password": PASSWORD,
+            },
+            expect=(201,),
+        )
+        session.request(
+            "email-accounts.remove",
+            "DELETE",
+            reverse("email-account-detail", kwargs={"email_id": email}),
+        )
+
+
+@scenario
+class AdminListingScenario(AuthenticatedScenario):
+    """Admins paging through and searching the user list."""
+
+    name = "admin-listing"
+    search_terms = ("lovel", "grace", "engines", "bench1")
+
+    def users(self):
+        return [self.data.admin] * self.concurrency
+
+    def step(self, session, index):
+        path = session.state.get("next") or reverse("user-list")
+        _, payload, _ = session.request("users.page", "GET", path)
+        next_link = payload.get("next") if payload else None
+        if next_link:
+            parts = urlsplit(next_link)
+            session.state["next"] = f"{parts.path}?{parts.query}"
+        else:
+            session.state["next"] = None
+        session.request(
+            "users.search",
+            "GET",
+            f"{reverse('user-search')}?q={self.search_terms[index % len(self.search_terms)]}",
+        )
+
+
+def run_scenario(cls, data, requests=200, concurrency=1, transport_factory=InProcessTransport):
+    """
+    Run a scenario for a number of steps spread over concurrent sessions.
+
+    Args:
+        cls: The Scenario subclass
+        data: The seeded BenchData
+        requests: The total number of steps to run
+        concurrency: The number of concurrent sessions
+        transport_factory: Callable returning a transport for one session
+
+    Returns:
+        dict: Metrics per request name as ``scenario.<name>.<request>``, plus the
+        scenario's overall step throughput
+    """
+    instance = cls(data, concurrency)
+    counter = itertools.count()
+
+    def work(worker):
+        session = Session(transport_factory(), worker)
+        instance.start(session)
+        try:
+            while (index := next(counter)) < requests:
+                instance.step(session, index)
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+        return session
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        sessions = [work(0)]
+    else:
+        with ThreadPoolExecutor(concurrency) as executor:
+            sessions = list(executor.map(work, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    samples, errors = defaultdict(list), Counter()
+    for session in sessions:
+        for name, durations in session.samples.items():
+            samples[name].extend(durations)
+        errors.update(session.errors)
+
+    prefix = f"scenario.{cls.name}"
+    results = {
+        f"{prefix}.{name}": summarize(durations, errors[name])
+        for name, durations in sorted(samples.items())
+    }
+    results[prefix] = {
+        "steps": requests,
+        "concurrency": concurrency,
+        "errors": sum(errors.values()),
+        "elapsed_s": round(elapsed, 3),
+        "steps_per_sec": round(requests / elapsed, 1),
+    }
+    return results
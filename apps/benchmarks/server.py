@@ -0,0 +1,181 @@
+"""
+Startup and memory benchmarks of the production gunicorn server.
+
+A gunicorn server is started with ``apps.config.gunicorn`` on a free local
+port, in the environment of the benchmark, so its ``GUNICORN_*`` variables
+select the configuration measured. The results are the time from starting
+the server to its first successful request, and the memory of the master and
+of every worker after they have served some requests. Proportional set size
+(PSS) divides shared pages between the processes sharing them, so it shows
+how much of the preloaded app workers still share.
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+
+HEALTH_PATH = "/health/"
+
+# Fields of /proc/<pid>/smaps_rollup reported, in kB
+MEMORY_FIELDS = {
+    "Rss": "rss_bytes",
+    "Pss": "pss_bytes",
+    "Shared_Clean": "shared_bytes",
+    "Shared_Dirty": "shared_bytes",
+    "Private_Clean": "private_bytes",
+    "Private_Dirty": "private_bytes",
+}
+
+
+class ServerError(Exception):
+    """Raised when the server does not start or its workers do not boot."""
+
+
+def free_port():
+    """Return a local TCP port that is not in use."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_memory(pid):
+    """
+    Return the memory of a process.
+
+    Args:
+        pid: The process id
+
+    Returns:
+        dict: ``rss_bytes``, ``pss_bytes``, ``shared_bytes`` and ``private_bytes``
+    """
+    memory = dict.fromkeys(MEMORY_FIELDS.values(), 0)
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            field, _, value = line.partition(":")
+            if field in MEMORY_FIELDS:
+                memory[MEMORY_FIELDS[field]] += int(value.split()[0]) * 1024
+    return memory
+
+
+def child_pids(pid):
+    """Return the ids of the processes whose parent is ``pid``."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # The command name may contain spaces; fields resume after ")"
+                fields = stat.read().rpartition(")")[2].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def get(url, timeout=5):
+    """Return the status of a GET request, or None if the server is not up."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+    except OSError:
+        return None
+
+
+def wait_for(predicate, timeout, interval=0.01):
+    """Call ``predicate`` until it is true or ``timeout`` seconds passed."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return False
+
+
+def measure_server(workers=2, requests=200, timeout=60):
+    """
+    Start a gunicorn server and measure its startup and memory.
+
+    Args:
+        workers: Worker processes to start
+        requests: Requests served before memory is measured
+        timeout: Seconds to wait for the server and its workers
+
+    Returns:
+        dict: ``server.startup`` and ``server.memory`` results
+
+    Raises:
+        ServerError: If the server does not answer or its workers do not boot
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{HEALTH_PATH}"
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--config",
+        "python:apps.config.gunicorn",
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--workers",
+        str(workers),
+    ]
+    errorlog = tempfile.TemporaryFile()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        command, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=errorlog
+    )
+    try:
+        if not wait_for(lambda: get(url) == 200 or server.poll() is not None, timeout):
+            raise ServerError(f"The server did not answer {url} within {timeout}s")
+        if server.poll() is not None:
+            errorlog.seek(0)
+            raise ServerError(f"The server exited: {errorlog.read().decode()[-2000:]}")
+        first_request = time.perf_counter() - started
+
+        if not wait_for(lambda: len(child_pids(server.pid)) >= workers, timeout):
+            raise ServerError(f"{workers} workers did not boot within {timeout}s")
+        all_booted = time.perf_counter() - started
+        errors = sum(get(url) != 200 for _ in range(requests))
+
+        master = process_memory(server.pid)
+        memory = [process_memory(pid) for pid in child_pids(server.pid)]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+        errorlog.close()
+
+    return {
+        "server.startup": {
+            "workers": workers,
+            "time_to_first_request_ms": round(first_request * 1000, 1),
+            "all_workers_booted_ms": round(all_booted * 1000, 1),
+        },
+        "server.memory": {
+            "requests": requests,
+            "errors": errors,
+            "master_rss_bytes": master["rss_bytes"],
+            **{
+                f"worker_{field}": round(sum(worker[field] for worker in memory) / len(memory))
+                for field in ("rss_bytes", "pss_bytes", "shared_bytes", "private_bytes")
+            },
+            "max_worker_rss_bytes": max(worker["rss_bytes"] for worker in memory),
+            "total_pss_bytes": master["pss_bytes"] + sum(worker["pss_bytes"] for worker in memory),
+        },
+    }
@@ -0,0 +1,15 @@
+"""
+Shared fixtures for the benchmark tests.
+"""
+
+import pytest
+
+from apps.authentication.revocation import _cache as revocation_cache
+
+
+@pytest.fixture
+def fake_redis(fake_redis):
+    """Extend the in-memory Redis with a fresh revocation cache."""
+    revocation_cache.reset()
+    yield fake_redis
+    revocation_cache.reset()
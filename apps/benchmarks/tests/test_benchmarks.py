@@ -0,0 +1,117 @@
+"""
+Tests for the benchmark suite.
+
+This module contains test cases for the timing and baseline comparison helpers,
+the fixture factories, and short smoke runs of micro-benchmarks and scenarios.
+"""
+
+import pytest
+
+from apps.authentication.models import User, UserProfile
+from apps.benchmarks.factories import PASSWORD, BenchData, seed_users
+from apps.benchmarks.micro import run_benchmarks
+from apps.benchmarks.runner import compare, measure, percentile
+from apps.benchmarks.scenarios import SCENARIOS, run_scenario
+
+
+def document(**metrics):
+    """Return a results document with one benchmark."""
+    return {"benchmarks": {"bench": metrics}}
+
+
+class TestRunner:
+    """Test the timing and comparison helpers."""
+
+    def test_percentile_is_nearest_rank(self):
+        """Test percentiles on a small sorted sample."""
+        samples = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+
+        assert percentile(samples, 0.5) == 5
+        assert percentile(samples, 0.95) == 10
+        assert percentile([7], 0.99) == 7
+
+    def test_measure_times_each_call(self):
+        """Test that measure makes the warmup and timed calls it reports."""
+        calls = []
+
+        result = measure(lambda: calls.append(1), iterations=20, warmup=5)
+
+        assert len(calls) == 25
+        assert result["count"] == 20
+        assert result["p50_ms"] <= result["p95_ms"] <= result["max_ms"]
+
+    def test_compare_flags_relative_slowdowns(self):
+        """Test that only changes above the threshold count as regressions."""
+        rows = compare(
+            document(p50_ms=1.5, p95_ms=2.1, peak_bytes=100_000),
+            document(p50_ms=1.0, p95_ms=2.0, peak_bytes=200_000),
+            threshold=0.25,
+        )
+
+        assert {row["metric"]: row["regressed"] for row in rows} == {
+            "p50_ms": True,
+            "p95_ms": False,
+            "peak_bytes": False,
+        }
+
+    def test_compare_ignores_noise_and_unknown_benchmarks(self):
+        """Test that tiny absolute changes and new benchmarks are not regressions."""
+        rows = compare(document(p50_ms=0.002), document(p50_ms=0.001))
+
+        assert [row["regressed"] for row in rows] == [False]
+        assert compare({"benchmarks": {"new": {"p50_ms": 1}}}, document(p50_ms=1)) == []
+
+
+@pytest.mark.django_db
+class TestFactories:
+    """Test the fixture factories."""
+
+    def test_seed_users_creates_users_with_profiles(self):
+        """Test that seeded users have profiles and the shared password."""
+        pks = seed_users(25, batch_size=10)
+
+        assert len(pks) == User.objects.count() == UserProfile.objects.count() == 25
+        user = User.objects.get(pk=pks[0])
+        assert user.check_password(PASSWORD)
+        assert user.profile.email_accounts
+
+    def test_seed_users_is_deterministic(self):
+        """Test that the same seed produces the same data."""
+        seed_users(10, seed=7, prefix="a")
+        seed_users(10, seed=7, prefix="b")
+
+        def names(prefix):
+            return list(
+                User.objects.filter(username__startswith=prefix)
+                .order_by("pk")
+                .values_list("first_name", "last_name", "profile__company_name")
+            )
+
+        assert names("a") == names("b")
+
+
+@pytest.mark.django_db
+def test_micro_benchmarks_smoke(fake_redis):
+    """Test a short run of a group of micro-benchmarks."""
+    data = BenchData(seed_users(20))
+
+    results = run_benchmarks(data, names=["serializer", "memory"], iterations=5)
+
+    assert "serializer.profile.reader" in results
+    assert results["serializer.profile.reader"]["count"] == 5
+    assert (
+        results["memory.profiles.full"]["peak_bytes"]
+        > results["memory.profiles.deferred"]["peak_bytes"]
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", ["profile-polling", "email-account-churn"])
+def test_scenario_smoke(fake_redis, name):
+    """Test a short in-process run of a scenario without errors."""
+    data = BenchData(seed_users(5))
+
+    results = run_scenario(SCENARIOS[name], data, requests=3)
+
+    assert results[f"scenario.{name}"]["errors"] == 0
+    assert results[f"scenario.{name}"]["steps"] == 3
@@ -0,0 +1,154 @@
+"""
+Tests for the query plan regression guard.
+
+This module checks the statement fingerprints and problem detection, and runs
+the guard over the main endpoints against the checked-in baseline.
+"""
+
+import json
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from apps.authentication.models import User
+from apps.benchmarks.factories import PASSWORD
+from apps.benchmarks.management.commands.check_query_plans import DEFAULT_BASELINE, PREFIX
+from apps.benchmarks.plans import (
+    PLAN_CASES,
+    check_plans,
+    fingerprint,
+    format_problems,
+    inspect_plans,
+    seeded_data,
+)
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="EXPLAIN (FORMAT JSON) needs Postgres"
+)
+
+
+def seed(users, seed=0):
+    """Seed users the way check_query_plans does and describe them."""
+    call_command(
+        "seed_users",
+        users,
+        seed=seed,
+        prefix=PREFIX,
+        password=PASSWORD,
+        joined_before="2026-01-01",
+        workers=1,
+        stdout=StringIO(),
+        stderr=StringIO(),
+    )
+    return seeded_data(PREFIX)
+
+
+def test_fingerprint_replaces_literals():
+    """Test that values are stripped but identifiers are kept."""
+    sql = (
+        'SELECT "t"."col1" FROM "t" WHERE "t"."email" = \'it\'\'s@example.com\' '
+        'AND "t"."id" IN (1, 2, 3) LIMIT 21'
+    )
+
+    assert fingerprint(sql) == (
+        'SELECT "t"."col1" FROM "t" WHERE "t"."email" = ? AND "t"."id" IN (...) LIMIT ?'
+    )
+
+
+@pytest.mark.django_db
+class TestCheckPlans:
+    """Test problem detection on a small seeded database."""
+
+    def test_sequential_scan_of_large_table_is_reported(self):
+        """Test that a lookup on an unindexed column fails with its plan."""
+        data = seed(2000)
+
+        def unindexed(client, data):
+            list(User.objects.filter(first_name="Ada")[:1])
+
+        with mock.patch.dict(PLAN_CASES, {"unindexed": unindexed}):
+            problems = check_plans(inspect_plans(data, ["unindexed"]), large_table_rows=1000)
+
+        assert [problem["problem"] for problem in problems] == [
+            "sequential scan on authentication_user"
+        ]
+        assert "Seq Scan on authentication_user" in format_problems(problems)
+
+    def test_small_tables_may_be_scanned(self):
+        """Test that sequential scans under the size limit pass."""
+        data = seed(200)
+
+        def unindexed(client, data):
+            list(User.objects.filter(first_name="Ada")[:1])
+
+        with mock.patch.dict(PLAN_CASES, {"unindexed": unindexed}):
+            assert check_plans(inspect_plans(data, ["unindexed"]), large_table_rows=1000) == []
+
+    def test_cost_increase_is_reported(self):
+        """Test that a plan costing more than the baseline allows is reported."""
+        results = inspect_plans(seed(2000), ["user_data"])
+        baseline = {
+            "cases": {"user_data": {key: 1.0 for key in results["user_data"]}},
+        }
+
+        problems = check_plans(results, baseline)
+
+        assert problems
+        assert all(problem["problem"].startswith("total cost 1.0 -> ") for problem in problems)
+
+    def test_statements_missing_from_baseline_are_reported(self):
+        """Test that statements the baseline does not know fail until it is saved."""
+        results = inspect_plans(seed(2000), ["user_data"])
+        known, *new = results["user_data"]
+        baseline = {"cases": {"user_data": {known: 1e9}}}
+
+        problems = check_plans(results, baseline)
+
+        assert [(problem["fingerprint"], problem["problem"]) for problem in problems] == [
+            (key, "statement not in the baseline") for key in new
+        ]
+        assert [problem["problem"] for problem in check_plans(results, {"cases": {}})] == [
+            "statement not in the baseline"
+        ] * len(results["user_data"])
+
+    def test_statements_no_longer_issued_are_reported(self):
+        """Test that baseline statements a case stopped issuing are reported."""
+        results = inspect_plans(seed(2000), ["user_data"])
+        dropped = 'SELECT "gone" FROM "authentication_user" WHERE "id" = ?'
+        baseline = {
+            "cases": {"user_data": {**{key: 1e9 for key in results["user_data"]}, dropped: 1.0}},
+        }
+
+        problems = check_plans(results, baseline)
+
+        assert [(problem["fingerprint"], problem["problem"]) for problem in problems] == [
+            (dropped, "baseline statement no longer issued")
+        ]
+        assert format_problems(problems) == (
+            f"[user_data] baseline statement no longer issued\n{dropped}"
+        )
+
+    def test_cases_leave_no_writes_behind(self, fake_redis):
+        """Test that the replayed requests are rolled back."""
+        data = seed(100)
+
+        inspect_plans(data)
+
+        assert User.objects.count() == 100
+
+
+@pytest.mark.django_db
+def test_endpoint_plans_match_baseline(fake_redis):
+    """Test the main endpoints against the checked-in baseline."""
+    baseline = json.loads(DEFAULT_BASELINE.read_text())
+    results = inspect_plans(seed(**baseline["meta"]))
+
+    problems = check_plans(results, baseline)
+
+    assert not problems, format_problems(problems)
+    assert {case: set(statements) for case, statements in results.items()} == {
+        case: set(statements) for case, statements in baseline["cases"].items()
+    }
@@ -0,0 +1,140 @@
+"""
+Tests for the production server configuration.
+
+This module contains test cases for the gunicorn configuration and its hooks,
+the startup warmup, and the server startup and memory benchmark.
+"""
+
+import gc
+import importlib
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from apps.appsUtils.process import current_rss
+from apps.benchmarks import server
+from apps.config import gunicorn, warmup
+
+
+@pytest.fixture
+def gunicorn_config(monkeypatch):
+    """Return a function reloading the gunicorn config with environment overrides."""
+
+    def load(**environ):
+        for name, value in environ.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(gunicorn)
+
+    yield load
+    monkeypatch.undo()
+    importlib.reload(gunicorn)
+
+
+def worker():
+    """Return a stand-in for a gunicorn worker."""
+    return SimpleNamespace(alive=True, pid=1234, log=mock.MagicMock())
+
+
+class TestGunicornConfig:
+    """Test the gunicorn configuration module."""
+
+    def test_defaults(self, gunicorn_config):
+        """Test preloading, sync workers and jittered recycling by default."""
+        config = gunicorn_config()
+
+        assert config.preload_app
+        assert config.worker_class == "sync"
+        assert config.workers >= 3
+        assert config.max_requests_jitter == config.max_requests // 10
+        assert config.wsgi_app == "apps.config.wsgi:application"
+
+    def test_threads_select_gthread(self, gunicorn_config):
+        """Test that more than one thread per worker selects the gthread worker."""
+        config = gunicorn_config(GUNICORN_THREADS="4", GUNICORN_WORKERS="2")
+
+        assert (config.worker_class, config.threads, config.workers) == ("gthread", 4, 2)
+
+    def test_current_rss(self):
+        """Test that the resident memory of this process is read from /proc."""
+        assert current_rss() > 1024 * 1024
+
+    def test_recycles_worker_over_rss_limit(self, gunicorn_config):
+        """Test that a worker over the memory limit stops after the request."""
+        config = gunicorn_config(GUNICORN_MAX_WORKER_RSS_MB="1")
+        over = worker()
+
+        config.post_request(over, None, {}, None)
+
+        assert not over.alive
+        over.log.warning.assert_called_once()
+
+    def test_keeps_worker_under_rss_limit(self, gunicorn_config):
+        """Test that a worker under the memory limit keeps running."""
+        config = gunicorn_config(GUNICORN_MAX_WORKER_RSS_MB="100000")
+        under = worker()
+
+        config.post_request(under, None, {}, None)
+
+        assert under.alive
+
+    def test_pre_fork_freezes_preloaded_app(self):
+        """Test that objects are frozen before forking a preloaded app."""
+        preloaded = SimpleNamespace(cfg=SimpleNamespace(preload_app=True))
+        try:
+            gunicorn.pre_fork(preloaded, None)
+
+            assert gc.get_freeze_count() > 0
+        finally:
+            gc.unfreeze()
+
+
+@pytest.mark.django_db
+class TestWarmup:
+    """Test the startup warmup."""
+
+    def test_builds_view_serializers(self):
+        """Test that the serializers of the API views are built."""
+        views = warmup.warm_urls()
+
+        assert len(views) > 10
+        assert warmup.warm_serializers(views) >= 3
+
+    def test_closes_connections(self):
+        """Test that no database connection is left for forked workers."""
+        with mock.patch.object(warmup.connections, "close_all") as close_all:
+            warmup.warm_up()
+
+        close_all.assert_called_once()
+
+
+class TestServerBenchmark:
+    """Test the server startup and memory benchmark."""
+
+    def test_process_memory(self):
+        """Test reading the memory of this process."""
+        memory = server.process_memory(os.getpid())
+
+        assert memory["rss_bytes"] >= memory["pss_bytes"] > 0
+        assert memory["rss_bytes"] == memory["shared_bytes"] + memory["private_bytes"]
+
+    def test_child_pids(self):
+        """Test finding the children of a process."""
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+        try:
+            assert child.pid in server.child_pids(os.getpid())
+        finally:
+            child.kill()
+            child.wait()
+
+    def test_measure_server(self):
+        """Test a short run against a real gunicorn server."""
+        results = server.measure_server(workers=2, requests=5, timeout=30)
+
+        assert results["server.startup"]["time_to_first_request_ms"] > 0
+        memory = results["server.memory"]
+        assert memory["errors"] == 0
+        assert memory["worker_rss_bytes"] > memory["worker_private_bytes"] > 0
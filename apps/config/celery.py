@@ -2,9 +2,20 @@
 Celery configuration file.
 """
 
+import logging
 import os
+import time
+from contextlib import ExitStack
 
 from celery import Celery
+from celery.signals import before_task_publish, task_postrun, task_prerun, worker_process_init
+from django.conf import settings
+
+from apps.appsUtils.deadlines import is_timeout, record_timeout, statement_deadline
+from apps.appsUtils.log import get_request_id, set_request_id
+from apps.profiling.memory import start_memory_profiler
+
+logger = logging.getLogger(__name__)
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "apps.config.settings")
@@ -14,9 +25,8 @@ redis_url = os.environ.get("REDIS_URL")
 if redis_url:
     os.environ["CELERY_BROKER_URL"] = redis_url
     os.environ["CELERY_RESULT_BACKEND"] = redis_url
-    print(f"Using Redis URL from environment: {redis_url}")
 else:
-    print("WARNING: REDIS_URL environment variable not found!")
+    logger.warning("REDIS_URL is not set; using the configured Celery broker")
 
 app = Celery("email_marketing")
 
@@ -28,7 +38,60 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
+@before_task_publish.connect
+def propagate_request_id(headers=None, **kwargs):
+    """Send the current request id with published tasks."""
+    request_id = get_request_id()
+    if request_id and headers is not None:
+        headers.setdefault("request_id", request_id)
+
+
+@task_prerun.connect
+def bind_request_id(task_id=None, task=None, **kwargs):
+    """Log a task's records under the request id it was sent from, or its own id."""
+    request_id = getattr(task.request, "request_id", None) if task is not None else None
+    set_request_id(request_id or task_id)
+
+
+@task_postrun.connect
+def unbind_request_id(**kwargs):
+    """Clear the request id once a task has run."""
+    set_request_id(None)
+
+
+# Deadlines of the tasks running in this process, by task id
+_task_deadlines = {}
+
+
+@task_prerun.connect
+def start_db_deadline(task_id=None, task=None, **kwargs):
+    """Bound a task's statements by its ``db_deadline`` option or ``DB_DEADLINE_CELERY``."""
+    budget = getattr(task, "db_deadline", None)
+    budget = settings.DB_DEADLINE_CELERY if budget is None else budget
+    if not budget:
+        return
+    stack = ExitStack()
+    _task_deadlines[task_id] = stack, stack.enter_context(statement_deadline(budget))
+
+
+@task_postrun.connect
+def end_db_deadline(task_id=None, task=None, retval=None, **kwargs):
+    """Count a task that ran out of time and lift its deadline."""
+    stack, deadline = _task_deadlines.pop(task_id, (None, None))
+    if stack is None:
+        return
+    if is_timeout(retval):
+        record_timeout(f"task:{task.name}", deadline.budget, time.monotonic() - deadline.started)
+    stack.close()
+
+
+@worker_process_init.connect
+def start_worker_memory_profiler(**kwargs):
+    """Start the memory reports of a pool process."""
+    start_memory_profiler()
+
+
 @app.task(bind=True)
 def debug_task(self):
-    """Debug task to print the request."""
-    print(f"Request: {self.request!r}")
+    """Debug task to log the request."""
+    logger.info("Request: %r", self.request)
@@ -0,0 +1,95 @@
+"""
+Gunicorn configuration for the production image.
+
+Run with ``gunicorn --config python:apps.config.gunicorn``. Every setting can
+be overridden from the environment:
+
+- ``GUNICORN_WORKERS``: worker processes, ``2 * CPUs + 1`` by default
+- ``GUNICORN_THREADS``: threads per worker; more than one selects ``gthread``
+- ``GUNICORN_WORKER_CLASS``: worker class, ``sync`` or ``gthread`` by default
+- ``GUNICORN_PRELOAD``: import the app in the master before forking
+- ``GUNICORN_MAX_REQUESTS`` / ``GUNICORN_MAX_REQUESTS_JITTER``: recycle a
+  worker after this many requests, staggered so workers do not restart together
+- ``GUNICORN_MAX_WORKER_RSS_MB``: recycle a worker whose resident memory grew
+  past this size, 0 to disable
+
+Workers report their memory growth while ``MEMORY_PROFILE_INTERVAL`` is set
+(see ``apps.profiling.memory``).
+
+With preloading, the app is imported and warmed up once in the master (see
+``apps.config.wsgi``) and its objects are moved to the garbage collector's
+permanent generation before every fork. Collections in the workers then
+never write to those objects' headers, so the pages stay shared copy-on-write
+instead of being copied into every worker.
+"""
+
+import gc
+import os
+
+from apps.appsUtils.process import current_rss
+
+
+def _env_int(name, default):
+    """Return an integer from the environment."""
+    return int(os.environ.get(name, default))
+
+
+def _cpu_count():
+    """Return the CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+wsgi_app = "apps.config.wsgi:application"
+
+workers = _env_int("GUNICORN_WORKERS", 2 * _cpu_count() + 1)
+threads = _env_int("GUNICORN_THREADS", 1)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync")
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+max_worker_rss = _env_int("GUNICORN_MAX_WORKER_RSS_MB", 512) * 1024 * 1024
+
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# Worker heartbeats on tmpfs; a disk-backed /tmp can stall them under I/O load
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+# Requests are logged by RequestIdMiddleware
+accesslog = None
+errorlog = "-"
+
+
+def pre_fork(server, worker):
+    """Freeze the preloaded app's objects so the new worker shares their pages."""
+    if server.cfg.preload_app:
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    """Start the worker's memory reports once it has loaded the app."""
+    from apps.profiling.memory import start_memory_profiler
+
+    start_memory_profiler()
+
+
+def post_request(worker, req, environ, resp):
+    """Restart the worker after this request if its memory grew too large."""
+    if not max_worker_rss or not worker.alive:
+        return
+    rss = current_rss()
+    if rss is not None and rss > max_worker_rss:
+        worker.log.warning(
+            "Worker %s uses %d MB, over the %d MB limit; restarting",
+            worker.pid,
+            rss // (1024 * 1024),
+            max_worker_rss // (1024 * 1024),
+        )
+        worker.alive = False
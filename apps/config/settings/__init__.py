@@ -16,7 +16,6 @@ BASE_DIR = os.path.join(
 env_name = os.environ.get("ENV_NAME", ".env")
 env_path = os.path.join(BASE_DIR, env_name)
 load_dotenv(env_path)
-print(f"\n\nLoading environment variables from {env_path}")
 
 
 # Determine which settings module to use
@@ -26,5 +25,3 @@ if environment == "staging":
     from .staging import *
 else:
     from .development import *
-
-print(f"Using {environment} settings")
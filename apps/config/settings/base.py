@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project
@@ -29,6 +30,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -38,9 +40,13 @@ INSTALLED_APPS = [
     
     # Local apps
     'apps.authentication',
+    'apps.profiling',
 ]
 
 MIDDLEWARE = [
+    'apps.appsUtils.middleware.RequestIdMiddleware',
+    'apps.profiling.middleware.SlowRequestMiddleware',
+    'apps.appsUtils.middleware.DeadlineMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -111,11 +117,223 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.authentication.ActivityJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# JWT settings
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # last_login is written in bulk from the activity buffer instead of per login
+    'UPDATE_LAST_LOGIN': False,
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.authentication.serializers.ActivityTokenObtainPairSerializer',
+    # Rotated refresh tokens are revoked in Redis rather than the token_blacklist app
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': False,
+    'TOKEN_REFRESH_SERIALIZER': 'apps.authentication.serializers.RotatingTokenRefreshSerializer',
+    # Signed with the key ring in JWT_SIGNING_KEYS_DIR when one is configured
+    'AUTH_TOKEN_CLASSES': ('apps.authentication.tokens.AccessToken',),
+}
+
+# Asymmetric JWT signing keys, one <kid>.pem file per key (RS256 or EdDSA)
+JWT_SIGNING_KEYS_DIR = os.environ.get('JWT_SIGNING_KEYS_DIR', '')
+JWT_ACTIVE_KID = os.environ.get('JWT_ACTIVE_KID', '')
+JWT_JWKS_MAX_AGE = int(os.environ.get('JWT_JWKS_MAX_AGE', '300'))
+# Verified access tokens remembered per process to skip signature checks
+JWT_VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get('JWT_VERIFIED_TOKEN_CACHE_SIZE', '10000'))
+
+# Redis
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', '0.5'))
+
+# Idempotency-Key handling for retried POSTs
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', '86400'))
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+
+# Most operations accepted by one bulk email account request
+EMAIL_ACCOUNTS_BULK_MAX_OPERATIONS = 100
+
+# Token revocation
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.environ.get('TOKEN_REVOCATION_SYNC_INTERVAL', '1'))
+TOKEN_REVOCATION_BLOOM_CAPACITY = 1_000_000
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = 0.001
+
+# User activity (last_login / last_seen) buffering
+USER_ACTIVITY_STALENESS = int(os.environ.get('USER_ACTIVITY_STALENESS', '60'))
+USER_ACTIVITY_FLUSH_INTERVAL = int(os.environ.get('USER_ACTIVITY_FLUSH_INTERVAL', '30'))
+USER_ACTIVITY_FLUSH_BATCH_SIZE = 1000
+USER_ACTIVITY_FLUSH_MAX_BATCHES = 50
+
+# Slow request capture; a threshold of 0 disables it and an interval of 0
+# disables stack sampling
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '1000'))
+SLOW_REQUEST_PROFILE_INTERVAL_MS = float(os.environ.get('SLOW_REQUEST_PROFILE_INTERVAL_MS', '5'))
+SLOW_REQUEST_PROFILE_AFTER_MS = float(
+    os.environ.get('SLOW_REQUEST_PROFILE_AFTER_MS', SLOW_REQUEST_THRESHOLD_MS / 2)
+)
+SLOW_REQUEST_BUFFER_SIZE = 100
+SLOW_REQUEST_MAX_QUERIES = 500
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '250'))
+
+# Worker memory reports; an interval of 0 disables them and 0 frames leaves
+# tracemalloc off
+MEMORY_PROFILE_INTERVAL = float(os.environ.get('MEMORY_PROFILE_INTERVAL', '0'))
+MEMORY_PROFILE_FRAMES = int(os.environ.get('MEMORY_PROFILE_FRAMES', '5'))
+MEMORY_PROFILE_TOP = 20
+MEMORY_PROFILE_HISTORY = 60
+MEMORY_RSS_GROWTH_MB_PER_HOUR = float(os.environ.get('MEMORY_RSS_GROWTH_MB_PER_HOUR', '50'))
+
+# Logging: JSON lines written to stdout by a background thread
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_QUEUE_SIZE = 10_000
+# Fraction of DEBUG and INFO records kept per logger; warnings are always kept
+LOG_SAMPLE_RATES = {
+    'apps.access': float(os.environ.get('LOG_ACCESS_SAMPLE_RATE', '1')),
+}
+# Keys whose values are redacted from log records and messages
+LOG_REDACTED_FIELDS = (
+    'password',
+    'password2',
+    'secret',
+    'token',
+    'access',
+    'refresh',
+    'authorization',
+    'api_key',
+    'cookie',
+)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'apps.appsUtils.log.RequestIdFilter'},
+        'sampling': {'()': 'apps.appsUtils.log.SamplingFilter', 'rates': LOG_SAMPLE_RATES},
+    },
+    'handlers': {
+        'json': {
+            '()': 'apps.appsUtils.log.QueueJSONHandler',
+            'queue_size': LOG_QUEUE_SIZE,
+            'redacted_fields': LOG_REDACTED_FIELDS,
+            'filters': ['sampling', 'request_id'],
+        },
+    },
+    'root': {'handlers': ['json'], 'level': LOG_LEVEL},
+    'loggers': {
+        # Django's own handlers would print a second, unstructured copy
+        'django': {'handlers': ['json'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
+# Transactional outbox of user lifecycle events, published by relay_outbox
+# to Celery tasks or a Redis stream
+OUTBOX_PUBLISHER = os.environ.get('OUTBOX_PUBLISHER', 'celery')
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '500'))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', '1'))
+OUTBOX_CELERY_TASK = 'apps.authentication.tasks.handle_user_event'
+OUTBOX_STREAM = os.environ.get('OUTBOX_STREAM', 'auth:user_events')
+OUTBOX_STREAM_MAXLEN = int(os.environ.get('OUTBOX_STREAM_MAXLEN', '100000'))
+
+# Database deadlines: the statements of a request must finish within its
+# budget in seconds, or it is answered with a 503 (0 disables deadlines).
+# Views set their own budget with @db_deadline; path prefixes without one
+# use DB_DEADLINE_PATHS, first match first
+DB_DEADLINE_DEFAULT = float(os.environ.get('DB_DEADLINE_DEFAULT', '10'))
+DB_DEADLINE_PATHS = {
+    '/admin/': 30,
+}
+DB_DEADLINE_CELERY = float(os.environ.get('DB_DEADLINE_CELERY', '600'))
+DB_DEADLINE_SLACK_MS = 100
+DB_DEADLINE_RETRY_AFTER = 5
+
+# Batched deletion of expired sessions and tokens by cleanup_expired_rows
+MAINTENANCE_INTERVAL = int(os.environ.get('MAINTENANCE_INTERVAL', '3600'))
+MAINTENANCE_BATCH_SIZE = int(os.environ.get('MAINTENANCE_BATCH_SIZE', '1000'))
+MAINTENANCE_BATCH_SLEEP = float(os.environ.get('MAINTENANCE_BATCH_SLEEP', '0.1'))
+MAINTENANCE_LOCK_TIMEOUT_MS = int(os.environ.get('MAINTENANCE_LOCK_TIMEOUT_MS', '200'))
+MAINTENANCE_MAX_LOCK_TIMEOUTS = 3
+MAINTENANCE_TIME_BUDGET = int(os.environ.get('MAINTENANCE_TIME_BUDGET', '300'))
+
+# Batched, resumable backfills of existing rows run by data migrations and
+# the backfill command
+BACKFILL_BATCH_SIZE = int(os.environ.get('BACKFILL_BATCH_SIZE', '1000'))
+BACKFILL_BATCH_SLEEP = float(os.environ.get('BACKFILL_BATCH_SLEEP', '0.05'))
+BACKFILL_LOCK_TIMEOUT_MS = int(os.environ.get('BACKFILL_LOCK_TIMEOUT_MS', '500'))
+BACKFILL_MAX_LOCK_TIMEOUTS = 10
+BACKFILL_REPORT_INTERVAL = 10
+
+# Account deletion: users are deactivated at once and their rows deleted by
+# Celery in batches, each run stopping after its time budget; deletions
+# without progress for ACCOUNT_DELETION_STALE_AFTER seconds are queued again
+ACCOUNT_DELETION_BATCH_SIZE = int(os.environ.get('ACCOUNT_DELETION_BATCH_SIZE', '1000'))
+ACCOUNT_DELETION_BATCH_SLEEP = float(os.environ.get('ACCOUNT_DELETION_BATCH_SLEEP', '0.05'))
+ACCOUNT_DELETION_LOCK_TIMEOUT_MS = int(os.environ.get('ACCOUNT_DELETION_LOCK_TIMEOUT_MS', '500'))
+ACCOUNT_DELETION_MAX_LOCK_TIMEOUTS = 10
+ACCOUNT_DELETION_TIME_BUDGET = int(os.environ.get('ACCOUNT_DELETION_TIME_BUDGET', '240'))
+ACCOUNT_DELETION_STALE_AFTER = 900
+ACCOUNT_DELETION_RESUME_INTERVAL = 300
+
+# Audit log of profile and email account changes, buffered in Redis (or in
+# each process with AUDIT_BUFFER=local) and written with COPY into monthly
+# partitions; a retention of 0 months keeps every partition
+AUDIT_BUFFER = os.environ.get('AUDIT_BUFFER', 'redis')
+AUDIT_FLUSH_INTERVAL = int(os.environ.get('AUDIT_FLUSH_INTERVAL', '10'))
+AUDIT_FLUSH_BATCH_SIZE = int(os.environ.get('AUDIT_FLUSH_BATCH_SIZE', '5000'))
+AUDIT_FLUSH_MAX_BATCHES = 20
+AUDIT_LOCAL_MAX_EVENTS = 100_000
+AUDIT_PARTITIONS_AHEAD = int(os.environ.get('AUDIT_PARTITIONS_AHEAD', '3'))
+AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', '12'))
+
+# Outgoing HTTP requests: idle keep-alive connections kept per host
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '10'))
+
+# Webhooks of user events, posted by Celery in signed batches per endpoint;
+# failing batches back off exponentially and are dead-lettered after the
+# last attempt
+WEBHOOK_BATCH_WINDOW = float(os.environ.get('WEBHOOK_BATCH_WINDOW', '1'))
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', '5'))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '10'))
+WEBHOOK_BACKOFF_BASE = 5
+WEBHOOK_BACKOFF_MAX = 3600
+WEBHOOK_MAX_BATCHES = 10
+WEBHOOK_SLOT_TIMEOUT = 120
+WEBHOOK_DISPATCH_INTERVAL = int(os.environ.get('WEBHOOK_DISPATCH_INTERVAL', '15'))
+WEBHOOK_SIGNATURE_TOLERANCE = 300
+
+# Populate URL resolvers, serializers and validators when the WSGI app loads
+WSGI_WARMUP = os.environ.get('WSGI_WARMUP', 'True') == 'True'
+
+# Celery beat
+CELERY_BEAT_SCHEDULE = {
+    'flush-user-activity': {
+        'task': 'apps.authentication.tasks.flush_user_activity',
+        'schedule': USER_ACTIVITY_FLUSH_INTERVAL,
+    },
+    'cleanup-expired-rows': {
+        'task': 'apps.authentication.tasks.cleanup_expired_rows',
+        'schedule': MAINTENANCE_INTERVAL,
+    },
+    'flush-audit-events': {
+        'task': 'apps.authentication.tasks.flush_audit_events',
+        'schedule': AUDIT_FLUSH_INTERVAL,
+    },
+    'maintain-audit-partitions': {
+        'task': 'apps.authentication.tasks.maintain_audit_partitions',
+        'schedule': 86400,
+    },
+    'dispatch-webhooks': {
+        'task': 'apps.authentication.tasks.dispatch_webhooks',
+        'schedule': WEBHOOK_DISPATCH_INTERVAL,
+    },
+    'resume-account-deletions': {
+        'task': 'apps.authentication.tasks.resume_account_deletions',
+        'schedule': ACCOUNT_DELETION_RESUME_INTERVAL,
+    },
+}
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -0,0 +1,29 @@
+# flake8: noqa
+"""
+Benchmark settings for email marketing project.
+
+Run the suite with ``DJANGO_SETTINGS_MODULE=apps.config.settings.benchmark``.
+``BENCH_DATABASE=sqlite`` (the default) benchmarks against a throwaway SQLite
+file; ``BENCH_DATABASE=postgres`` uses the development database settings,
+creating a separate test database on that server.
+"""
+
+import os
+import tempfile
+
+from .development import *  # noqa
+
+# Debug mode records every query and would skew the measurements
+DEBUG = False
+
+INSTALLED_APPS = INSTALLED_APPS + ["apps.benchmarks"]
+
+if os.environ.get("BENCH_DATABASE", "sqlite") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(tempfile.gettempdir(), "benchmark.sqlite3"),
+            "OPTIONS": {"timeout": 30},
+            "TEST": {"NAME": os.path.join(tempfile.gettempdir(), "test_benchmark.sqlite3")},
+        }
+    }
@@ -25,6 +25,9 @@ DATABASES = {
     }
 }
 
+# Debug toolbars and breakpoints need more time than production requests
+DB_DEADLINE_DEFAULT = float(os.environ.get("DB_DEADLINE_DEFAULT", "30"))
+
 # Email settings - Use console backend for development
 # EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 # EMAIL_HOST = os.environ.get("EMAIL_HOST", "smtp.gmail.com")
@@ -8,7 +8,6 @@ from ipaddress import IPv4Network
 
 from .base import *  # noqa
 
-print("Starting staging settings")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get("DJANGO_DEBUG", "False") == "True"
 
@@ -48,8 +47,6 @@ for subnet in [
     # Only add IPs that are not already in the ALLOWED_HOSTS
     ALLOWED_HOSTS.extend([str(ip) for ip in subnet.hosts() if str(ip) not in ALLOWED_HOSTS])
 
-print(f"Expanded ALLOWED_HOSTS count: {len(ALLOWED_HOSTS)}")
-
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 DATABASES = {
@@ -63,7 +60,6 @@ DATABASES = {
     }
 }
 
-print(f"DB_HOST: {DATABASES}")
 # Email settings
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = os.environ.get("EMAIL_HOST", "smtp.gmail.com")
@@ -79,7 +75,6 @@ MAILGUN_DOMAIN = os.environ.get("MAILGUN_DOMAIN", "artilence.tech")
 
 # Celery settings
 redis_url = os.environ.get("REDIS_URL")
-print(f"REDIS_URL from environment: {redis_url}")
 
 CELERY_BROKER_URL = redis_url or os.environ.get(
     "CELERY_BROKER_URL",
@@ -141,11 +136,3 @@ CSRF_COOKIE_HTTPONLY = os.environ.get("CSRF_COOKIE_HTTPONLY", False)
 SECURE_CROSS_ORIGIN_OPENER_POLICY = "same-origin-allow-popups"  # Less restrictive COOP setting
 SECURE_CROSS_ORIGIN_EMBEDDER_POLICY = None  # Disable COEP in staging for compatibility
 SECURE_REFERRER_POLICY = "strict-origin-when-cross-origin"
-
-print(f"CSRF_TRUSTED_ORIGINS: {CSRF_TRUSTED_ORIGINS}")
-print(f"ALLOWED_HOSTS: {ALLOWED_HOSTS}")
-print(f"CORS_ALLOW_CREDENTIALS: {CORS_ALLOW_CREDENTIALS}")
-print(f"CORS_ALLOW_ALL_ORIGINS: {CORS_ALLOW_ALL_ORIGINS}")
-print(f"CORS_ALLOWED_ORIGINS: {CORS_ALLOWED_ORIGINS}")
-print(f"CSRF_COOKIE_DOMAIN: {CSRF_COOKIE_DOMAIN}")
-print(f"SECURE_CROSS_ORIGIN_OPENER_POLICY: {SECURE_CROSS_ORIGIN_OPENER_POLICY}")
@@ -23,6 +23,8 @@ from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from apps.authentication.views import jwks
+
 
 def health_check(request):
     """
@@ -32,12 +34,15 @@ def health_check(request):
 
 
 urlpatterns = [
+    # Staff pages for slow request captures, under the admin
+    path("admin/slow-requests/", include("apps.profiling.urls")),
     path("admin/", admin.site.urls),
     # Health check endpoint for AWS ALB
     path("health/", health_check, name="health_check"),
     # JWT Authentication
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path(".well-known/jwks.json", jwks, name="jwks"),
     # API endpoints
     path('api/auth/', include('apps.authentication.urls')),
     # API Documentation
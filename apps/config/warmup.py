@@ -0,0 +1,106 @@
+"""
+Process warmup.
+
+Django and DRF do a lot of work lazily on the first requests a process
+serves: populating the URL resolvers, building serializer fields, importing
+the configured renderers and authentication classes and loading the password
+validators' word list. ``warm_up`` does that work once at startup. When
+gunicorn preloads the app it runs in the master before workers are forked,
+so the workers share the result instead of each paying for it on their first
+requests.
+"""
+
+import logging
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.contrib.auth.password_validation import get_default_password_validators
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+# DRF settings imported on first use
+API_CLASS_SETTINGS = (
+    "DEFAULT_RENDERER_CLASSES",
+    "DEFAULT_PARSER_CLASSES",
+    "DEFAULT_AUTHENTICATION_CLASSES",
+    "DEFAULT_PERMISSION_CLASSES",
+    "DEFAULT_THROTTLE_CLASSES",
+    "DEFAULT_CONTENT_NEGOTIATION_CLASS",
+    "DEFAULT_PAGINATION_CLASS",
+)
+
+
+def iter_views(patterns):
+    """Yield the view callbacks of URL patterns, recursing into included ones."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def warm_urls():
+    """
+    Populate the root URL resolver and its namespaces.
+
+    Returns:
+        list: The view callbacks of every URL pattern
+    """
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for _, namespace_resolver in resolver.namespace_dict.values():
+        namespace_resolver.reverse_dict
+    return list(iter_views(resolver.url_patterns))
+
+
+def warm_serializers(views):
+    """
+    Build the fields of the serializers used by class-based API views.
+
+    Args:
+        views: View callbacks, as returned by ``warm_urls``
+
+    Returns:
+        int: The number of serializer classes built
+    """
+    built = set()
+    for callback in views:
+        view_class = getattr(callback, "cls", None)
+        if view_class is None or not hasattr(view_class, "get_serializer_class"):
+            continue
+        try:
+            serializer_class = view_class().get_serializer_class()
+            if serializer_class not in built:
+                serializer_class().fields
+                built.add(serializer_class)
+        except Exception:
+            logger.debug("Could not warm up %s", view_class.__name__, exc_info=True)
+    return len(built)
+
+
+def warm_up():
+    """
+    Do the per-process work of the first requests ahead of time.
+
+    Database connections opened on the way are closed, so none are inherited
+    by forked workers.
+    """
+    started = time.perf_counter()
+    try:
+        views = warm_urls()
+        serializers = warm_serializers(views)
+        for name in API_CLASS_SETTINGS:
+            getattr(api_settings, name)
+        get_hashers()
+        get_default_password_validators()
+    finally:
+        connections.close_all()
+    logger.info(
+        "Warmed up %d views and %d serializers in %.0f ms",
+        len(views),
+        serializers,
+        (time.perf_counter() - started) * 1000,
+    )
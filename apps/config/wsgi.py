@@ -2,13 +2,21 @@
 WSGI config for email marketing project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+Unless ``WSGI_WARMUP`` is off, the work Django and DRF otherwise do on the
+first requests is done here, before the server accepts traffic.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
 
 import os
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apps.config.settings.base')
 application = get_wsgi_application()
+
+if settings.WSGI_WARMUP:
+    from apps.config.warmup import warm_up
+
+    warm_up()
@@ -0,0 +1,58 @@
+"""
+Shared fixtures for the tests of every app.
+"""
+
+import time
+from unittest import mock
+
+import pytest
+from rest_framework.test import APIClient
+
+from apps.appsUtils import redis_client as redis_module
+from apps.authentication import activity, authentication, revocation
+from apps.authentication.models import User
+
+
+@pytest.fixture
+def api_client():
+    """Return an unauthenticated API client."""
+    return APIClient()
+
+
+@pytest.fixture
+def staff_client(api_client, db):
+    """Return a client authenticated as a staff user, for the API and the admin pages."""
+    staff = User.objects.create_user(
+        username="admin", email="admin@example.com", password="AdminPassword123!", is_staff=True
+    )
+    api_client.force_authenticate(user=staff)
+    api_client.force_login(staff)
+    return api_client
+
+
+@pytest.fixture
+def fake_redis():
+    """Use an in-memory Redis for everything that calls get_redis."""
+    fakeredis = pytest.importorskip("fakeredis")
+    with mock.patch.object(redis_module, "_client", fakeredis.FakeRedis()):
+        yield redis_module._client
+
+
+@pytest.fixture
+def redis_client():
+    """Patch Redis for token revocation and activity tracking, starting from empty local caches."""
+    client = mock.MagicMock()
+    client.hget.return_value = None
+    revocation._cache.reset()
+    # Already synced, so the cache never reads the mock's events
+    revocation._cache.last_event_id = b"0-0"
+    revocation._cache.synced_at = time.monotonic()
+    authentication._verified_tokens.clear()
+    for recorded in activity._recorded.values():
+        recorded.clear()
+    with mock.patch.object(revocation, "get_redis", return_value=client), mock.patch.object(
+        activity, "get_redis", return_value=client
+    ):
+        yield client
+    revocation._cache.reset()
+    authentication._verified_tokens.clear()
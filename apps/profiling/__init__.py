@@ -0,0 +1,3 @@
+"""
+Capture of slow requests with their SQL and a sampled stack profile.
+"""
@@ -0,0 +1,16 @@
+"""
+Django app configuration for slow request profiling.
+"""
+
+from django.apps import AppConfig
+
+
+class ProfilingConfig(AppConfig):
+    """
+    App configuration for the profiling app.
+
+    Provides the slow request middleware and the staff pages listing captures.
+    """
+
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.profiling"
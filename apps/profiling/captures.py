@@ -0,0 +1,224 @@
+"""
+Storage and export of slow request captures.
+
+A capture records one slow request: its timing, the SQL it ran and the stack
+samples taken while it was slow. Captures are kept in a capped Redis list
+shared by all workers, newest first, so the staff pages see the slow requests
+of every process. They can be exported as speedscope JSON or as a ``pstats``
+file readable by ``python -m pstats`` and snakeviz.
+"""
+
+import json
+import logging
+import marshal
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import redis
+from django.conf import settings
+
+from apps.appsUtils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CAPTURES_KEY = "profiling:slow_requests"
+
+# Distinct stacks kept per capture, the most sampled first
+MAX_STACKS = 500
+
+
+def build_capture(request, response, duration, queries, watch, interval):
+    """
+    Describe a slow request.
+
+    Args:
+        request: The request
+        response: Its response
+        duration: Seconds the request took
+        queries: The ``QueryRecorder`` of the request
+        watch: The sampler ``Watch`` of the request, or None if not profiled
+        interval: Seconds between stack samples
+
+    Returns:
+        dict: The capture, ready to be stored as JSON
+    """
+    frames, samples = [], []
+    if watch is not None:
+        index = {}
+        for stack, count in watch.stacks.most_common(MAX_STACKS):
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append(frame)
+                ids.append(index[frame])
+            samples.append([ids, count])
+
+    user = getattr(request, "user", None)
+    return {
+        "id": uuid.uuid4().hex[:16],
+        "time": datetime.now(timezone.utc).isoformat(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "status": response.status_code,
+        "user_id": user.pk if user is not None and user.is_authenticated else None,
+        "duration_ms": round(duration * 1000, 3),
+        "query_count": queries.count,
+        "query_ms": round(queries.total * 1000, 3),
+        "queries": [
+            {"sql": sql, "many": many, "duration_ms": round(elapsed * 1000, 3)}
+            for sql, many, elapsed in queries.queries
+        ],
+        "sample_interval_ms": interval * 1000,
+        "frames": frames,
+        "samples": samples,
+    }
+
+
+def store_capture(capture):
+    """
+    Add a capture to the shared ring buffer, dropping the oldest beyond its size.
+
+    Returns:
+        bool: Whether the capture was stored
+    """
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.lpush(CAPTURES_KEY, json.dumps(capture))
+        pipeline.ltrim(CAPTURES_KEY, 0, settings.SLOW_REQUEST_BUFFER_SIZE - 1)
+        pipeline.execute()
+    except redis.RedisError:
+        # Captures are diagnostics and must never fail the request
+        logger.warning("Could not store the capture of %s", capture["path"], exc_info=True)
+        return False
+    return True
+
+
+def list_captures():
+    """Return the stored captures, newest first."""
+    return [json.loads(capture) for capture in get_redis().lrange(CAPTURES_KEY, 0, -1)]
+
+
+def get_capture(capture_id):
+    """Return the stored capture with an id, or None if it was dropped."""
+    for capture in list_captures():
+        if capture["id"] == capture_id:
+            return capture
+    return None
+
+
+def clear_captures():
+    """Remove every stored capture."""
+    get_redis().delete(CAPTURES_KEY)
+
+
+def _frame_name(frame):
+    """Return a readable name for a ``(filename, line, function)`` frame."""
+    filename, line, name = frame
+    return f"{name} ({filename}:{line})"
+
+
+def profile_summary(capture, limit=30):
+    """
+    Rank the functions of a capture's samples.
+
+    Returns:
+        list: Up to ``limit`` dicts with ``function``, ``self_ms`` (time at the
+        top of the stack) and ``total_ms`` (time anywhere on the stack), by
+        total time
+    """
+    interval = capture["sample_interval_ms"]
+    own, total = Counter(), Counter()
+    for ids, count in capture["samples"]:
+        own[ids[-1]] += count
+        for frame_id in set(ids):
+            total[frame_id] += count
+    return [
+        {
+            "function": _frame_name(capture["frames"][frame_id]),
+            "self_ms": round(own[frame_id] * interval, 3),
+            "total_ms": round(count * interval, 3),
+        }
+        for frame_id, count in total.most_common(limit)
+    ]
+
+
+def to_speedscope(capture):
+    """
+    Convert a capture's samples to the speedscope file format.
+
+    Returns:
+        dict: A document for https://www.speedscope.app
+    """
+    interval = capture["sample_interval_ms"]
+    samples = [ids for ids, _ in capture["samples"]]
+    weights = [count * interval for _, count in capture["samples"]]
+    name = f"{capture['method']} {capture['path']}"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "apps.profiling",
+        "activeProfileIndex": 0,
+        "shared": {
+            "frames": [
+                {"name": function, "file": filename, "line": line}
+                for filename, line, function in capture["frames"]
+            ]
+        },
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+    }
+
+
+def to_pstats(capture):
+    """
+    Convert a capture's samples to the marshalled format of ``cProfile``.
+
+    Call counts are sample counts. Self time is the time a function was at the
+    top of the stack and cumulative time the time it was anywhere on it.
+
+    Returns:
+        bytes: The contents of a ``.prof`` file for ``pstats.Stats``
+    """
+    interval = capture["sample_interval_ms"] / 1000
+    frames = [tuple(frame) for frame in capture["frames"]]
+    # function -> [calls, self time, cumulative time]
+    functions = defaultdict(lambda: [0, 0.0, 0.0])
+    # callee -> caller -> [calls, self time, cumulative time]
+    callers = defaultdict(lambda: defaultdict(lambda: [0, 0.0, 0.0]))
+    for ids, count in capture["samples"]:
+        elapsed = count * interval
+        functions[ids[-1]][1] += elapsed
+        for frame_id in set(ids):
+            functions[frame_id][0] += count
+            functions[frame_id][2] += elapsed
+        for position, (caller, callee) in enumerate(zip(ids, ids[1:])):
+            stats = callers[callee][caller]
+            stats[0] += count
+            stats[2] += elapsed
+            if position == len(ids) - 2:
+                stats[1] += elapsed
+
+    stats = {}
+    for frame_id, (calls, own, cumulative) in functions.items():
+        stats[frames[frame_id]] = (
+            calls,
+            calls,
+            own,
+            cumulative,
+            {
+                frames[caller]: (count, count, caller_own, caller_cumulative)
+                for caller, (count, caller_own, caller_cumulative) in callers[frame_id].items()
+            },
+        )
+    return marshal.dumps(stats)
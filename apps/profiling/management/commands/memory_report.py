@@ -0,0 +1,48 @@
+"""
+Django management command to show the memory growth of the workers.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.profiling.memory import format_report, list_reports, request_reset
+
+
+class Command(BaseCommand):
+    """Django command printing the latest memory report of each worker."""
+
+    help = (
+        "Shows the allocation sites and object types that grew the most in each "
+        "gunicorn and Celery worker, and the growth of their resident memory"
+    )
+
+    def add_arguments(self, parser):
+        """Add the report options."""
+        parser.add_argument("--top", type=int, default=10, help="Sites and types per worker")
+        parser.add_argument("--worker", help="Only the worker with this host:pid")
+        parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Ask every worker to measure its growth from its next report on",
+        )
+
+    def handle(self, *args, **options):
+        """Print the reports."""
+        if options["reset"]:
+            request_reset()
+            self.stdout.write("The workers take new baselines at their next report")
+            return
+        reports = list_reports()
+        if options["worker"]:
+            reports = [report for report in reports if report["worker"] == options["worker"]]
+            if not reports:
+                raise CommandError(f"No report of worker {options['worker']}")
+        if options["json"]:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+        if not reports:
+            self.stdout.write("No worker reports; is MEMORY_PROFILE_INTERVAL set?")
+        for report in reports:
+            self.stdout.write("\n".join(format_report(report, options["top"])))
@@ -0,0 +1,350 @@
+"""
+Memory growth reports of long-lived workers.
+
+Gunicorn and Celery workers call ``start_memory_profiler`` once they have
+loaded the app. With ``MEMORY_PROFILE_INTERVAL`` set, a daemon thread then
+reports on the worker every ``MEMORY_PROFILE_INTERVAL`` seconds:
+
+- the allocation sites that grew the most since the worker started, from a
+  ``tracemalloc`` snapshot compared with the baseline taken at start,
+  keeping ``MEMORY_PROFILE_FRAMES`` frames per allocation;
+- the Python objects by type whose count grew the most since the start;
+- the worker's resident memory and its growth per hour, a least-squares
+  slope over the last ``MEMORY_PROFILE_HISTORY`` reports, logged as a warning
+  once it passes ``MEMORY_RSS_GROWTH_MB_PER_HOUR``.
+
+Each worker's latest report is kept in a Redis hash shared by all workers,
+read by the staff memory page and the ``memory_report`` command. Reports
+older than three intervals belong to workers that exited and are dropped.
+
+With the interval at 0, the default, nothing is started and the workers run
+exactly as without this module. ``MEMORY_PROFILE_FRAMES`` at 0 keeps the RSS
+and object counts but leaves ``tracemalloc``, the costly part, off.
+"""
+
+import gc
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+import redis
+from django.conf import settings
+
+from apps.appsUtils.process import current_rss
+from apps.appsUtils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+REPORTS_KEY = "profiling:memory"
+RESET_KEY = "profiling:memory:reset"
+
+# Allocations made by tracemalloc itself and the import machinery
+IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def object_counts():
+    """Return the number of objects tracked by the garbage collector, by type."""
+    return Counter(
+        f"{type(obj).__module__}.{type(obj).__qualname__}" for obj in gc.get_objects()
+    )
+
+
+def growth_per_hour(history):
+    """
+    Return the least-squares slope of a memory history.
+
+    Args:
+        history: ``(time.monotonic(), bytes)`` pairs, oldest first
+
+    Returns:
+        float | None: Bytes gained per hour, or None with fewer than 3 points
+    """
+    if len(history) < 3:
+        return None
+    count = len(history)
+    mean_time = sum(point[0] for point in history) / count
+    mean_size = sum(point[1] for point in history) / count
+    variance = sum((point[0] - mean_time) ** 2 for point in history)
+    if not variance:
+        return None
+    covariance = sum((point[0] - mean_time) * (point[1] - mean_size) for point in history)
+    return covariance / variance * 3600
+
+
+def _format_frame(frame):
+    """Return ``filename:line`` for a tracemalloc frame."""
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryProfiler:
+    """
+    Reports the memory growth of the current worker since it started.
+    """
+
+    def __init__(self, interval, frames, top, history):
+        """
+        Create a profiler; ``start`` takes its baseline.
+
+        Args:
+            interval: Seconds between reports
+            frames: Frames kept per traced allocation, 0 to not trace them
+            top: Growth sites and object types kept per report
+            history: Resident memory samples the trend is computed over
+        """
+        self.interval = interval
+        self.frames = frames
+        self.top = top
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.started_at = None
+        self.rss_history = deque(maxlen=history)
+        self._baseline = None
+        self._baseline_counts = Counter()
+        self._started_tracing = False
+
+    def start(self):
+        """Take the baseline and report from a daemon thread until the process exits."""
+        if self.frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self.reset_baseline()
+        threading.Thread(target=self._run, name="memory-profiler", daemon=True).start()
+
+    def stop(self):
+        """Stop tracing allocations if this profiler started it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset_baseline(self):
+        """Measure growth from now on."""
+        self.started_at = time.time()
+        self._baseline_counts = object_counts()
+        self._baseline = self._snapshot()
+
+    def _snapshot(self):
+        """Return a filtered snapshot of the traced allocations, or None if not tracing."""
+        if not tracemalloc.is_tracing():
+            return None
+        return tracemalloc.take_snapshot().filter_traces(IGNORED_TRACES)
+
+    def growth_sites(self):
+        """
+        Compare the traced allocations with the baseline.
+
+        Returns:
+            list: Up to ``top`` dicts with the ``site`` (innermost frame), its
+            ``traceback`` (outermost first), ``size_diff``, ``size`` and
+            ``count_diff``, largest growth first
+        """
+        snapshot = self._snapshot()
+        if snapshot is None or self._baseline is None:
+            return []
+        key_type = "traceback" if self.frames > 1 else "lineno"
+        sites = []
+        for stat in snapshot.compare_to(self._baseline, key_type):
+            if stat.size_diff <= 0:
+                continue
+            sites.append(
+                {
+                    "site": _format_frame(stat.traceback[-1]),
+                    "traceback": [_format_frame(frame) for frame in stat.traceback],
+                    "size_diff": stat.size_diff,
+                    "size": stat.size,
+                    "count_diff": stat.count_diff,
+                }
+            )
+            if len(sites) == self.top:
+                break
+        return sites
+
+    def object_growth(self):
+        """
+        Compare the object counts by type with the baseline.
+
+        Returns:
+            list: Up to ``top`` dicts with the ``type``, its ``count`` and
+            ``count_diff``, largest growth first
+        """
+        counts = object_counts()
+        growth = Counter(counts)
+        growth.subtract(self._baseline_counts)
+        return [
+            {"type": name, "count": counts[name], "count_diff": diff}
+            for name, diff in growth.most_common(self.top)
+            if diff > 0
+        ]
+
+    def report(self):
+        """
+        Describe the growth of the worker since its baseline.
+
+        Returns:
+            dict: The report, ready to be stored as JSON
+        """
+        rss = current_rss()
+        if rss is not None:
+            self.rss_history.append((time.monotonic(), rss))
+        trend = growth_per_hour(self.rss_history)
+        growth_limit = settings.MEMORY_RSS_GROWTH_MB_PER_HOUR * 1024 * 1024
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        return {
+            "worker": self.worker,
+            "time": datetime.now(timezone.utc).isoformat(),
+            "timestamp": time.time(),
+            "since": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "rss_bytes": rss,
+            "rss_growth_per_hour": round(trend) if trend is not None else None,
+            "rss_growing": bool(growth_limit and trend is not None and trend > growth_limit),
+            "traced_bytes": traced,
+            "sites": self.growth_sites(),
+            "objects": self.object_growth(),
+        }
+
+    def _reset_requested(self):
+        """Whether staff asked for new baselines after this one was taken."""
+        requested = get_redis().get(RESET_KEY)
+        return requested is not None and float(requested) > self.started_at
+
+    def run_once(self):
+        """Report on the worker, log the report and store it for the staff pages."""
+        try:
+            if self._reset_requested():
+                self.reset_baseline()
+        except redis.RedisError:
+            logger.warning("Could not check for a memory baseline reset", exc_info=True)
+        report = self.report()
+        if report["rss_growing"]:
+            logger.warning(
+                "Worker %s memory grows %d MB per hour",
+                self.worker,
+                report["rss_growth_per_hour"] // (1024 * 1024),
+                extra={"memory": report},
+            )
+        else:
+            logger.info("Memory report of worker %s", self.worker, extra={"memory": report})
+        store_report(report)
+        return report
+
+    def _run(self):
+        """Report every interval until the process exits."""
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception:
+                # Reports are diagnostics and must never stop the worker
+                logger.exception("Could not report on the memory of worker %s", self.worker)
+
+
+def start_memory_profiler():
+    """
+    Start reporting on the memory of this worker, once per process.
+
+    Returns:
+        MemoryProfiler: The running profiler, or None if it is disabled
+    """
+    global _profiler
+    if not settings.MEMORY_PROFILE_INTERVAL:
+        return None
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = MemoryProfiler(
+                interval=settings.MEMORY_PROFILE_INTERVAL,
+                frames=settings.MEMORY_PROFILE_FRAMES,
+                top=settings.MEMORY_PROFILE_TOP,
+                history=settings.MEMORY_PROFILE_HISTORY,
+            )
+            _profiler.start()
+    return _profiler
+
+
+def store_report(report):
+    """
+    Store a worker's latest report in the shared hash.
+
+    Returns:
+        bool: Whether the report was stored
+    """
+    try:
+        get_redis().hset(REPORTS_KEY, report["worker"], json.dumps(report))
+    except redis.RedisError:
+        logger.warning("Could not store the memory report of %s", report["worker"], exc_info=True)
+        return False
+    return True
+
+
+def list_reports():
+    """
+    Return the latest report of each live worker, largest memory first.
+
+    Reports older than three intervals are removed.
+    """
+    client = get_redis()
+    stale_before = time.time() - 3 * settings.MEMORY_PROFILE_INTERVAL
+    reports, stale = [], []
+    for worker, report in client.hgetall(REPORTS_KEY).items():
+        report = json.loads(report)
+        if settings.MEMORY_PROFILE_INTERVAL and report["timestamp"] < stale_before:
+            stale.append(worker)
+        else:
+            reports.append(report)
+    if stale:
+        client.hdel(REPORTS_KEY, *stale)
+    return sorted(reports, key=lambda report: -(report["rss_bytes"] or 0))
+
+
+def _megabytes(size):
+    """Return a size in bytes as megabytes with one decimal."""
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def format_report(report, top=None):
+    """
+    Return a worker's report as lines of text.
+
+    Args:
+        report: The report
+        top: Growth sites and object types shown, all of the report's by default
+
+    Returns:
+        list: The lines
+    """
+    summary = f"{report['worker']} at {report['time']}"
+    if report["rss_bytes"] is not None:
+        summary += f": {_megabytes(report['rss_bytes'])} resident"
+    if report["rss_growth_per_hour"] is not None:
+        summary += f", {_megabytes(report['rss_growth_per_hour'])} per hour"
+    if report["rss_growing"]:
+        summary += " (growing)"
+    lines = [summary, f"  Allocation growth since {report['since']}:"]
+    for site in report["sites"][:top]:
+        growth = f"{_megabytes(site['size_diff']):>10} {site['count_diff']:>+9} blocks"
+        lines.append(f"    {growth}  {site['site']}")
+        lines.extend(f"        {frame}" for frame in site["traceback"][:-1])
+    if not report["sites"]:
+        lines.append("    none traced")
+    lines.append("  Object growth:")
+    for obj in report["objects"][:top]:
+        lines.append(f"    {obj['count_diff']:>+9} {obj['count']:>9}  {obj['type']}")
+    if not report["objects"]:
+        lines.append("    none")
+    return lines
+
+
+def request_reset():
+    """Ask every worker to measure growth from its next report on."""
+    get_redis().set(RESET_KEY, time.time())
@@ -0,0 +1,128 @@
+"""
+Middleware capturing slow requests.
+
+Every request is timed and runs with a ``connection.execute_wrapper`` that
+records the duration of each statement, and a stack sampler starts sampling
+it once it has run for ``SLOW_REQUEST_PROFILE_AFTER_MS``. Requests that take
+``SLOW_REQUEST_THRESHOLD_MS`` or more are stored with their SQL and samples;
+faster ones are dropped without any formatting. Statements slower than
+``SLOW_QUERY_THRESHOLD_MS`` are logged wherever they run.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+
+from .captures import build_capture, store_capture
+from .sampler import StackSampler
+
+logger = logging.getLogger(__name__)
+
+SAMPLER_SETTINGS = {"SLOW_REQUEST_PROFILE_INTERVAL_MS", "SLOW_REQUEST_PROFILE_AFTER_MS"}
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """
+    Return the process-wide stack sampler, or None if profiling is disabled.
+
+    Returns:
+        StackSampler: The sampler built from the profiling settings
+    """
+    global _sampler
+    if _sampler is None and settings.SLOW_REQUEST_PROFILE_INTERVAL_MS:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = StackSampler(
+                    interval=settings.SLOW_REQUEST_PROFILE_INTERVAL_MS / 1000,
+                    after=settings.SLOW_REQUEST_PROFILE_AFTER_MS / 1000,
+                )
+    return _sampler
+
+
+@receiver(setting_changed)
+def reset_sampler(setting, **kwargs):
+    """Rebuild the sampler when its settings are overridden."""
+    global _sampler
+    if setting in SAMPLER_SETTINGS:
+        _sampler = None
+
+
+class QueryRecorder:
+    """
+    Execute wrapper recording the SQL and duration of each statement.
+
+    Only the first ``limit`` statements are kept; ``count`` and ``total``
+    cover all of them. Parameters are not recorded, as they may hold secrets.
+    """
+
+    def __init__(self, limit):
+        """Create an empty recorder keeping up to ``limit`` statements."""
+        self.limit = limit
+        self.queries = []
+        self.count = 0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Run and time a statement."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.total += elapsed
+            if len(self.queries) < self.limit:
+                self.queries.append((sql, many, elapsed))
+            if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+                logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, sql)
+
+
+class SlowRequestMiddleware:
+    """
+    Store requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` for the staff pages.
+
+    A threshold of 0 disables the middleware.
+    """
+
+    def __init__(self, get_response):
+        """Wrap the next handler."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Time the request and capture it if it was slow."""
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if not threshold:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(settings.SLOW_REQUEST_MAX_QUERIES)
+        sampler = get_sampler()
+        watch = sampler.watch() if sampler is not None else None
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            if watch is not None:
+                sampler.unwatch(watch)
+
+        duration = time.perf_counter() - started
+        if duration * 1000 >= threshold:
+            store_capture(
+                build_capture(
+                    request,
+                    response,
+                    duration,
+                    recorder,
+                    watch,
+                    sampler.interval if sampler is not None else 0,
+                )
+            )
+        return response
@@ -0,0 +1,105 @@
+"""
+Statistical stack sampler for in-flight requests.
+
+One daemon thread per process reads the current frame of each watched thread
+with ``sys._current_frames()`` every ``interval`` seconds. A thread is only
+sampled once its request has been running for ``after`` seconds, so requests
+that finish quickly are never sampled and cost a dictionary insert and
+removal. The sampler sleeps while nothing is due, and is restarted in a
+process forked after it started.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Frames kept per sample, counted from the innermost one
+MAX_STACK_DEPTH = 128
+
+
+class Watch:
+    """
+    The samples taken of one thread while it serves a request.
+
+    ``stacks`` counts each distinct stack, stored root first as
+    ``(filename, first line, function name)`` tuples.
+    """
+
+    __slots__ = ("thread_id", "started", "stacks")
+
+    def __init__(self, thread_id, started):
+        """Start watching a thread from a ``time.monotonic()`` instant."""
+        self.thread_id = thread_id
+        self.started = started
+        self.stacks = Counter()
+
+
+def frame_stack(frame):
+    """Return the stack ending at a frame, root first."""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class StackSampler:
+    """
+    Samples the stacks of watched threads that have been running long enough.
+    """
+
+    def __init__(self, interval, after):
+        """
+        Create a sampler; its thread starts with the first watch.
+
+        Args:
+            interval: Seconds between samples
+            after: Seconds a watch must be running before it is sampled
+        """
+        self.interval = interval
+        self.after = after
+        self._watches = {}
+        self._condition = threading.Condition()
+        self._pid = None
+
+    def watch(self):
+        """
+        Start watching the calling thread.
+
+        Returns:
+            Watch: The watch to pass to ``unwatch``
+        """
+        watch = Watch(threading.get_ident(), time.monotonic())
+        with self._condition:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="stack-sampler", daemon=True).start()
+            self._watches[watch.thread_id] = watch
+            self._condition.notify()
+        return watch
+
+    def unwatch(self, watch):
+        """Stop sampling a watch; its stacks no longer change afterwards."""
+        with self._condition:
+            self._watches.pop(watch.thread_id, None)
+
+    def _run(self):
+        """Sample due watches until the process exits."""
+        while True:
+            with self._condition:
+                while not self._watches:
+                    self._condition.wait()
+                now = time.monotonic()
+                first_due = min(watch.started for watch in self._watches.values()) + self.after
+                if first_due <= now:
+                    frames = sys._current_frames()
+                    for watch in self._watches.values():
+                        frame = frames.get(watch.thread_id)
+                        if frame is not None and now - watch.started >= self.after:
+                            watch.stacks[frame_stack(frame)] += 1
+                    del frames
+            time.sleep(max(self.interval, first_due - now))
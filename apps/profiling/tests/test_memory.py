@@ -0,0 +1,232 @@
+"""
+Tests for worker memory reports.
+
+This module contains test cases for the allocation and object growth of a
+worker, its resident memory trend, the shared report storage, the staff page
+and the management command.
+"""
+
+import json
+import time
+import tracemalloc
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client
+from django.urls import reverse
+
+from apps.profiling import memory
+from apps.profiling.memory import (
+    MemoryProfiler,
+    format_report,
+    growth_per_hour,
+    list_reports,
+    request_reset,
+    start_memory_profiler,
+    store_report,
+)
+
+MB = 1024 * 1024
+
+# Objects kept alive by the test, as a leak would
+LEAKED = []
+
+
+class Leaky:
+    """An object that is never freed."""
+
+    def __init__(self):
+        """Hold a payload of its own."""
+        self.payload = "x" * 200 + str(id(self))
+
+
+def leak(count):
+    """Keep ``count`` more objects alive."""
+    LEAKED.extend(Leaky() for _ in range(count))
+
+
+@pytest.fixture
+def profiler():
+    """Return a started profiler tracing allocations, stopped after the test."""
+    profiler = MemoryProfiler(interval=3600, frames=5, top=20, history=10)
+    profiler.start()
+    yield profiler
+    profiler.stop()
+    LEAKED.clear()
+
+
+def make_report(worker="web-1:100", **fields):
+    """Return a stored-form report."""
+    return {
+        "worker": worker,
+        "time": "2026-01-01T00:00:00+00:00",
+        "timestamp": time.time(),
+        "since": "2026-01-01T00:00:00+00:00",
+        "rss_bytes": 300 * MB,
+        "rss_growth_per_hour": 80 * MB,
+        "rss_growing": True,
+        "traced_bytes": 10 * MB,
+        "sites": [
+            {
+                "site": "apps/cache.py:42",
+                "traceback": ["apps/views.py:10", "apps/cache.py:42"],
+                "size_diff": 5 * MB,
+                "size": 6 * MB,
+                "count_diff": 1000,
+            }
+        ],
+        "objects": [{"type": "builtins.dict", "count": 5000, "count_diff": 1200}],
+        **fields,
+    }
+
+
+class TestGrowthPerHour:
+    """Test the resident memory trend."""
+
+    def test_slope_of_a_steady_growth(self):
+        """Test that a steady growth is its rate per hour."""
+        history = [(0, 100 * MB), (1800, 150 * MB), (3600, 200 * MB)]
+
+        assert growth_per_hour(history) == pytest.approx(100 * MB)
+
+    def test_needs_three_points(self):
+        """Test that no trend is drawn from fewer than 3 points."""
+        assert growth_per_hour([(0, 0), (60, MB)]) is None
+
+
+class TestMemoryProfiler:
+    """Test the growth reports of a worker."""
+
+    def test_reports_growth_sites_and_objects(self, profiler):
+        """Test that the site and type of leaked objects are reported."""
+        leak(2000)
+
+        report = profiler.report()
+
+        assert any(site["site"].startswith(__file__) for site in report["sites"])
+        leaky = next(obj for obj in report["objects"] if obj["type"].endswith("Leaky"))
+        assert leaky["count_diff"] >= 2000
+        assert report["traced_bytes"] > 0
+
+    def test_reset_baseline(self, profiler):
+        """Test that growth before a new baseline is no longer reported."""
+        leak(2000)
+        profiler.reset_baseline()
+
+        report = profiler.report()
+
+        assert not any(obj["type"].endswith("Leaky") for obj in report["objects"])
+
+    def test_frames_zero_leaves_tracemalloc_off(self):
+        """Test that object counts and RSS are reported without tracing."""
+        profiler = MemoryProfiler(interval=3600, frames=0, top=5, history=10)
+        was_tracing = tracemalloc.is_tracing()
+        profiler.start()
+
+        report = profiler.report()
+
+        assert tracemalloc.is_tracing() == was_tracing
+        assert report["sites"] == []
+        assert report["rss_bytes"] > 0
+
+    def test_disabled_by_default(self, settings):
+        """Test that nothing is started with an interval of 0."""
+        settings.MEMORY_PROFILE_INTERVAL = 0
+
+        assert start_memory_profiler() is None
+
+
+@pytest.mark.usefixtures("fake_redis")
+class TestReports:
+    """Test logging and storing the reports of every worker."""
+
+    def test_flags_growing_worker(self, caplog, settings):
+        """Test that a worker growing faster than the limit is logged as a warning."""
+        settings.MEMORY_RSS_GROWTH_MB_PER_HOUR = 50
+        profiler = MemoryProfiler(interval=3600, frames=0, top=5, history=10)
+        profiler.reset_baseline()
+        now = time.monotonic()
+        profiler.rss_history.extend([(now - 7200, 100 * MB), (now - 3600, 200 * MB)])
+
+        with mock.patch.object(memory, "current_rss", return_value=300 * MB):
+            report = profiler.run_once()
+
+        assert report["rss_growing"]
+        assert report["rss_growth_per_hour"] == pytest.approx(100 * MB, rel=0.01)
+        assert [record.levelname for record in caplog.records] == ["WARNING"]
+        assert "memory grows" in caplog.text
+        assert list_reports()[0]["worker"] == profiler.worker
+
+    def test_reset_requested_by_staff(self):
+        """Test that workers take a new baseline once a reset is requested."""
+        profiler = MemoryProfiler(interval=3600, frames=0, top=5, history=10)
+        profiler.reset_baseline()
+        profiler.started_at -= 10
+        baseline = profiler.started_at
+
+        request_reset()
+        profiler.run_once()
+
+        assert profiler.started_at > baseline
+
+    def test_drops_reports_of_exited_workers(self, settings, fake_redis):
+        """Test that reports older than three intervals are removed."""
+        settings.MEMORY_PROFILE_INTERVAL = 60
+        store_report(make_report("web-1:100"))
+        store_report(make_report("web-1:101", timestamp=time.time() - 600, rss_bytes=400 * MB))
+
+        assert [report["worker"] for report in list_reports()] == ["web-1:100"]
+        assert fake_redis.hkeys(memory.REPORTS_KEY) == [b"web-1:100"]
+
+    def test_format_report(self):
+        """Test the text form of a report."""
+        lines = format_report(make_report())
+
+        assert lines[0].endswith("300.0 MB resident, 80.0 MB per hour (growing)")
+        assert "apps/cache.py:42" in lines[2]
+        assert lines[3].strip() == "apps/views.py:10"
+        assert "builtins.dict" in lines[-1]
+
+
+@pytest.mark.usefixtures("fake_redis")
+class TestStaffPageAndCommand:
+    """Test the staff memory page and the management command."""
+
+    def test_requires_staff(self):
+        """Test that non-staff users are sent to the admin login."""
+        response = Client().get(reverse("memory-reports"))
+
+        assert response.status_code == 302
+
+    def test_lists_reports(self, staff_client):
+        """Test the page and its JSON form."""
+        store_report(make_report())
+
+        page = staff_client.get(reverse("memory-reports"))
+        data = staff_client.get(reverse("memory-reports"), {"format": "json"}).json()
+
+        assert "apps/cache.py:42" in page.content.decode()
+        assert data["workers"][0]["worker"] == "web-1:100"
+
+    def test_reset(self, staff_client, fake_redis):
+        """Test that staff can ask for new baselines."""
+        response = staff_client.post(reverse("memory-reports-reset"))
+
+        assert response.status_code == 302
+        assert fake_redis.get(memory.RESET_KEY) is not None
+
+    def test_command(self):
+        """Test the management command."""
+        store_report(make_report())
+        text, data = StringIO(), StringIO()
+
+        call_command("memory_report", "--top", "1", stdout=text)
+        call_command("memory_report", "--json", stdout=data)
+
+        assert text.getvalue().startswith("web-1:100")
+        assert json.loads(data.getvalue())[0]["rss_bytes"] == 300 * MB
+        with pytest.raises(CommandError):
+            call_command("memory_report", "--worker", "gone:1")
@@ -0,0 +1,262 @@
+"""
+Tests for slow request capture.
+
+This module contains test cases for the statement recorder, the stack sampler,
+the middleware, the capture exports and the staff pages.
+"""
+
+import json
+import pstats
+import time
+from unittest import mock
+
+import pytest
+import redis
+from django.db import connection
+from django.http import JsonResponse
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from apps.authentication.models import User
+from apps.profiling import captures, middleware, views
+from apps.profiling.middleware import QueryRecorder
+from apps.profiling.sampler import StackSampler
+
+CAPTURE = {
+    "id": "abc123",
+    "time": "2026-01-01T00:00:00+00:00",
+    "method": "GET",
+    "path": "/api/auth/user-data/",
+    "status": 200,
+    "user_id": 1,
+    "duration_ms": 1500.0,
+    "query_count": 1,
+    "query_ms": 1200.0,
+    "queries": [{"sql": "SELECT 1", "many": False, "duration_ms": 1200.0}],
+    "sample_interval_ms": 5.0,
+    "frames": [["app.py", 1, "handle"], ["app.py", 10, "query"], ["app.py", 20, "render"]],
+    "samples": [[[0, 1], 3], [[0, 2], 1], [[0], 1]],
+}
+
+
+def spin(seconds):
+    """Keep the thread busy in this function."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+@pytest.fixture
+def stored():
+    """Collect the captures the middleware stores instead of writing to Redis."""
+    with mock.patch.object(middleware, "store_capture") as store_capture:
+        yield store_capture
+
+
+@pytest.mark.django_db
+class TestQueryRecorder:
+    """Test the execute wrapper."""
+
+    def test_records_statements_up_to_the_limit(self):
+        """Test that every statement is counted but only the first ones kept."""
+        recorder = QueryRecorder(limit=2)
+
+        with connection.execute_wrapper(recorder):
+            for _ in range(3):
+                User.objects.count()
+
+        assert recorder.count == 3
+        assert len(recorder.queries) == 2
+        assert "COUNT(*)" in recorder.queries[0][0]
+        assert recorder.total >= sum(elapsed for _, _, elapsed in recorder.queries)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_logs_slow_statements(self, caplog):
+        """Test that statements over the threshold are logged."""
+        with connection.execute_wrapper(QueryRecorder(limit=10)):
+            User.objects.count()
+
+        assert "Slow query" in caplog.text
+
+
+class TestStackSampler:
+    """Test the stack sampler."""
+
+    def test_samples_watched_thread(self):
+        """Test that a busy watched thread is sampled in its current function."""
+        sampler = StackSampler(interval=0.001, after=0)
+
+        watch = sampler.watch()
+        spin(0.1)
+        sampler.unwatch(watch)
+
+        assert watch.stacks
+        assert any(stack[-1][2] == "spin" for stack in watch.stacks)
+
+    def test_does_not_sample_fast_requests(self):
+        """Test that watches shorter than ``after`` are never sampled."""
+        sampler = StackSampler(interval=0.001, after=10)
+
+        watch = sampler.watch()
+        spin(0.05)
+        sampler.unwatch(watch)
+
+        assert not watch.stacks
+
+
+@pytest.mark.django_db
+class TestSlowRequestMiddleware:
+    """Test capturing requests over the threshold."""
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001)
+    def test_captures_slow_request_with_queries(self, stored):
+        """Test that a slow request is stored with its statements."""
+        user = User.objects.create_user(
+            username="user", email="user@example.com", password="TestPassword123!"
+        )
+        client = Client()
+        client.force_login(user)
+
+        response = client.get(reverse("admin:index"))
+
+        capture = stored.call_args.args[0]
+        assert capture["method"] == "GET"
+        assert capture["path"] == reverse("admin:index")
+        assert capture["status"] == response.status_code
+        assert capture["user_id"] == user.pk
+        assert capture["query_count"] == len(capture["queries"]) > 0
+
+    @override_settings(
+        SLOW_REQUEST_THRESHOLD_MS=0.001,
+        SLOW_REQUEST_PROFILE_INTERVAL_MS=1,
+        SLOW_REQUEST_PROFILE_AFTER_MS=0,
+    )
+    def test_profiles_slow_request(self, stored):
+        """Test that the stacks of a slow view are sampled."""
+
+        def slow_response(data):
+            spin(0.05)
+            return JsonResponse(data)
+
+        with mock.patch("apps.config.urls.JsonResponse", side_effect=slow_response):
+            Client().get("/health/")
+
+        functions = {frame[2] for frame in stored.call_args.args[0]["frames"]}
+        assert "spin" in functions
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=10_000)
+    def test_ignores_fast_requests(self, stored):
+        """Test that requests under the threshold are not stored."""
+        Client().get("/health/")
+
+        stored.assert_not_called()
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_threshold_zero_disables_capture(self, stored):
+        """Test that a threshold of 0 turns the middleware off."""
+        Client().get("/health/")
+
+        stored.assert_not_called()
+
+
+class TestCaptureStorage:
+    """Test the Redis ring buffer."""
+
+    @override_settings(SLOW_REQUEST_BUFFER_SIZE=10)
+    def test_store_pushes_and_trims(self):
+        """Test that a capture is pushed and the list capped at the buffer size."""
+        client = mock.MagicMock()
+        with mock.patch.object(captures, "get_redis", return_value=client):
+            assert captures.store_capture(CAPTURE)
+
+        pipeline = client.pipeline.return_value
+        pipeline.lpush.assert_called_once_with(captures.CAPTURES_KEY, json.dumps(CAPTURE))
+        pipeline.ltrim.assert_called_once_with(captures.CAPTURES_KEY, 0, 9)
+
+    def test_store_swallows_redis_errors(self):
+        """Test that an unavailable Redis never fails the request."""
+        client = mock.MagicMock()
+        client.pipeline.return_value.execute.side_effect = redis.ConnectionError()
+        with mock.patch.object(captures, "get_redis", return_value=client):
+            assert not captures.store_capture(CAPTURE)
+
+
+class TestExports:
+    """Test the profile summary and export formats."""
+
+    def test_profile_summary_ranks_by_total_time(self):
+        """Test self and total times computed from the samples."""
+        rows = captures.profile_summary(CAPTURE)
+
+        assert rows[0] == {"function": "handle (app.py:1)", "self_ms": 5.0, "total_ms": 25.0}
+        assert rows[1] == {"function": "query (app.py:10)", "self_ms": 15.0, "total_ms": 15.0}
+
+    def test_speedscope_document(self):
+        """Test a sampled speedscope profile with shared frames."""
+        document = captures.to_speedscope(CAPTURE)
+
+        profile = document["profiles"][0]
+        assert profile["type"] == "sampled"
+        assert profile["samples"] == [[0, 1], [0, 2], [0]]
+        assert profile["weights"] == [15.0, 5.0, 5.0]
+        assert profile["endValue"] == 25.0
+        assert document["shared"]["frames"][1] == {"name": "query", "file": "app.py", "line": 10}
+
+    def test_pstats_file_loads(self, tmp_path):
+        """Test that the pstats export loads with the standard library."""
+        path = tmp_path / "capture.prof"
+        path.write_bytes(captures.to_pstats(CAPTURE))
+
+        stats = pstats.Stats(str(path))
+
+        assert stats.total_tt == pytest.approx(0.025)
+        calls, _, own, cumulative, callers = stats.stats[("app.py", 10, "query")]
+        assert (calls, own, cumulative) == (3, pytest.approx(0.015), pytest.approx(0.015))
+        assert ("app.py", 1, "handle") in callers
+
+
+@pytest.mark.django_db
+class TestStaffPages:
+    """Test the staff pages listing and exporting captures."""
+
+    def test_requires_staff(self):
+        """Test that non-staff users are sent to the admin login."""
+        response = Client().get(reverse("slow-requests"))
+
+        assert response.status_code == 302
+        assert reverse("admin:login") in response["Location"]
+
+    def test_lists_captures(self, staff_client):
+        """Test the list page."""
+        with mock.patch.object(views, "list_captures", return_value=[CAPTURE]):
+            response = staff_client.get(reverse("slow-requests"))
+
+        assert response.status_code == 200
+        assert CAPTURE["path"] in response.content.decode()
+
+    def test_detail_shows_queries_and_functions(self, staff_client):
+        """Test the detail page."""
+        with mock.patch.object(views, "get_capture", return_value=CAPTURE):
+            response = staff_client.get(reverse("slow-request-detail", args=["abc123"]))
+
+        content = response.content.decode()
+        assert "SELECT 1" in content
+        assert "query (app.py:10)" in content
+
+    @pytest.mark.parametrize(
+        "output,filename", [("speedscope", "abc123.speedscope.json"), ("pstats", "abc123.prof")]
+    )
+    def test_exports_download(self, staff_client, output, filename):
+        """Test that exports are served as attachments."""
+        with mock.patch.object(views, "get_capture", return_value=CAPTURE):
+            response = staff_client.get(reverse("slow-request-export", args=["abc123", output]))
+
+        assert response.status_code == 200
+        assert filename in response["Content-Disposition"]
+
+    def test_dropped_capture_is_not_found(self, staff_client):
+        """Test a capture no longer in the buffer."""
+        with mock.patch.object(views, "get_capture", return_value=None):
+            response = staff_client.get(reverse("slow-request-detail", args=["gone"]))
+
+        assert response.status_code == 404
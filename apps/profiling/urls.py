@@ -0,0 +1,27 @@
+"""
+URL patterns for the slow request and worker memory staff pages.
+"""
+
+from django.urls import path
+
+from .views import (
+    memory_report_list,
+    memory_report_reset,
+    slow_request_clear,
+    slow_request_detail,
+    slow_request_export,
+    slow_request_list,
+)
+
+urlpatterns = [
+    path("", slow_request_list, name="slow-requests"),
+    path("clear/", slow_request_clear, name="slow-requests-clear"),
+    path("memory/", memory_report_list, name="memory-reports"),
+    path("memory/reset/", memory_report_reset, name="memory-reports-reset"),
+    path("<str:capture_id>/", slow_request_detail, name="slow-request-detail"),
+    path(
+        "<str:capture_id>/<str:output>/",
+        slow_request_export,
+        name="slow-request-export",
+    ),
+]
@@ -0,0 +1,108 @@
+"""
+Staff pages listing and exporting slow request captures and worker memory reports.
+"""
+
+import json
+
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
+
+from apps.appsUtils.deadlines import timeout_counts
+
+from .captures import (
+    clear_captures,
+    get_capture,
+    list_captures,
+    profile_summary,
+    to_pstats,
+    to_speedscope,
+)
+from .memory import list_reports, request_reset
+
+EXPORTS = {
+    "speedscope": ("application/json", "speedscope.json"),
+    "pstats": ("application/octet-stream", "prof"),
+}
+
+
+def _capture_or_404(capture_id):
+    """Return a stored capture or raise Http404."""
+    capture = get_capture(capture_id)
+    if capture is None:
+        raise Http404("The capture was dropped from the buffer")
+    return capture
+
+
+@staff_member_required
+def slow_request_list(request):
+    """List the stored captures, newest first, and the database deadline timeouts."""
+    context = {
+        **admin.site.each_context(request),
+        "title": "Slow requests",
+        "captures": list_captures(),
+        "timeouts": timeout_counts(),
+    }
+    return render(request, "profiling/slow_requests.html", context)
+
+
+@staff_member_required
+def slow_request_detail(request, capture_id):
+    """Show a capture's statements, slowest first, and its hottest functions."""
+    capture = _capture_or_404(capture_id)
+    context = {
+        **admin.site.each_context(request),
+        "title": f"{capture['method']} {capture['path']}",
+        "capture": capture,
+        "queries": sorted(capture["queries"], key=lambda query: -query["duration_ms"]),
+        "functions": profile_summary(capture),
+    }
+    return render(request, "profiling/slow_request_detail.html", context)
+
+
+@staff_member_required
+def slow_request_export(request, capture_id, output):
+    """Download a capture's samples as a speedscope or pstats file."""
+    if output not in EXPORTS:
+        raise Http404("Unknown export format")
+    capture = _capture_or_404(capture_id)
+    content_type, extension = EXPORTS[output]
+    if output == "speedscope":
+        content = json.dumps(to_speedscope(capture))
+    else:
+        content = to_pstats(capture)
+    response = HttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{capture_id}.{extension}"'
+    return response
+
+
+@staff_member_required
+@require_POST
+def slow_request_clear(request):
+    """Empty the capture buffer."""
+    clear_captures()
+    return redirect("slow-requests")
+
+
+@staff_member_required
+def memory_report_list(request):
+    """Show the latest memory report of each worker, or download them as JSON."""
+    reports = list_reports()
+    if request.GET.get("format") == "json":
+        return JsonResponse({"workers": reports})
+    context = {
+        **admin.site.each_context(request),
+        "title": "Worker memory",
+        "reports": reports,
+    }
+    return render(request, "profiling/memory.html", context)
+
+
+@staff_member_required
+@require_POST
+def memory_report_reset(request):
+    """Ask every worker to measure its growth from now on."""
+    request_reset()
+    return redirect("memory-reports")